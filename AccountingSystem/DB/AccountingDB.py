@@ -29,6 +29,7 @@ class AccountingDB( DB ):
     self.dbCatalog = {}
     self.dbBucketsLength = {}
     self.__keysCache = {}
+    self.__bulkInsertSize = self.getCSOption( "RecordsPerBulkInsert", 1000 )
     maxParallelInsertions = self.getCSOption( "ParallelRecordInsertions", 10 )
     self.__threadPool = ThreadPool( 1, maxParallelInsertions )
     self.__threadPool.daemonize()
@@ -493,16 +494,20 @@ class AccountingDB( DB ):
       return S_OK( retVal[ 'Value' ][0][0] )
     return S_ERROR( "Key id %s for value %s does not exist although it shoud" % ( keyName, keyValue ) )
 
-  def __addKeyValue( self, typeName, keyName, keyValue ):
-    """
-      Adds a key value to a key table if not existant
-    """
+  def __sanitizeKeyValue( self, keyValue ):
     #Cast to string just in case
     if type( keyValue ) != types.StringType:
       keyValue = str( keyValue )
     #No more than 64 chars for keys
     if len( keyValue ) > 64:
       keyValue = keyValue[:64]
+    return keyValue
+
+  def __addKeyValue( self, typeName, keyName, keyValue ):
+    """
+      Adds a key value to a key table if not existant
+    """
+    keyValue = self.__sanitizeKeyValue( keyValue )
 
     #Look into the cache
     if typeName not in self.__keysCache:
@@ -534,6 +539,65 @@ class AccountingDB( DB ):
     keyCache[ keyValue ] = result[ 'Value' ]
     return result
 
+  def __loadKeyIds( self, keyTable, keyValues, keyCache, conn = False ):
+    """
+      Load into the cache the ids of the key values that are in the key table
+    """
+    for iP in range( 0, len( keyValues ), self.__bulkInsertSize ):
+      retVal = self._escapeValues( keyValues[ iP : iP + self.__bulkInsertSize ] )
+      if not retVal[ 'OK' ]:
+        return retVal
+      retVal = self._query( "SELECT `id`, `value` FROM `%s` WHERE `value` in ( %s )" % ( keyTable,
+                                                                                         ", ".join( retVal[ 'Value' ] ) ),
+                            conn = conn )
+      if not retVal[ 'OK' ]:
+        return retVal
+      #Comparisons in the DB may be case insensitive and ignore trailing spaces
+      foundIds = {}
+      for keyId, value in retVal[ 'Value' ]:
+        value = self.__sanitizeKeyValue( value )
+        foundIds[ value ] = keyId
+        foundIds.setdefault( value.lower().rstrip( " " ), keyId )
+      for keyValue in keyValues[ iP : iP + self.__bulkInsertSize ]:
+        if keyValue in foundIds:
+          keyCache[ keyValue ] = foundIds[ keyValue ]
+        elif keyValue.lower().rstrip( " " ) in foundIds:
+          keyCache[ keyValue ] = foundIds[ keyValue.lower().rstrip( " " ) ]
+    return S_OK()
+
+  def __addKeyValues( self, typeName, keyName, keyValues ):
+    """
+      Get the ids for a list of key values adding the ones that don't exist.
+      All the values not in the cache are resolved with one query ( and one insert if needed )
+      Returns S_OK( list of ids in the same order as the values )
+    """
+    keyValues = [ self.__sanitizeKeyValue( keyValue ) for keyValue in keyValues ]
+    keyCache = self.__keysCache.setdefault( typeName, {} ).setdefault( keyName, {} )
+    missing = list( set( [ keyValue for keyValue in keyValues if keyValue not in keyCache ] ) )
+    if missing:
+      keyTable = _getTableName( "key", typeName, keyName )
+      retVal = self.__loadKeyIds( keyTable, missing, keyCache )
+      if not retVal[ 'OK' ]:
+        return retVal
+      missing = [ keyValue for keyValue in missing if keyValue not in keyCache ]
+    if missing:
+      self.log.info( "Inserting %s new values for key %s" % ( len( missing ), keyName ) )
+      for iP in range( 0, len( missing ), self.__bulkInsertSize ):
+        retVal = self._escapeValues( missing[ iP : iP + self.__bulkInsertSize ] )
+        if not retVal[ 'OK' ]:
+          return retVal
+        retVal = self._update( "INSERT IGNORE INTO `%s` ( `value` ) VALUES %s" % ( keyTable,
+                                                                                 ", ".join( [ "( %s )" % v for v in retVal[ 'Value' ] ] ) ) )
+        if not retVal[ 'OK' ]:
+          return retVal
+      retVal = self.__loadKeyIds( keyTable, missing, keyCache )
+      if not retVal[ 'OK' ]:
+        return retVal
+      for keyValue in missing:
+        if keyValue not in keyCache:
+          return S_ERROR( "Key id %s for value %s does not exist although it shoud" % ( keyName, keyValue ) )
+    return S_OK( [ keyCache[ keyValue ] for keyValue in keyValues ] )
+
   def calculateBucketLengthForTime( self, typeName, now, when ):
     """
     Get the expected bucket time for a moment in time
@@ -587,19 +651,43 @@ class AccountingDB( DB ):
       return retVal
     return S_OK( retVal[ 'lastRowId' ] )
 
+  def __insertBundleInQueueTable( self, typeName, recordsList ):
+    """
+    Insert several records of the same type in the in table with multi row inserts
+    """
+    sqlFields = [ 'taken', 'takenSince' ] + self.dbCatalog[ typeName ][ 'typeFields' ]
+    numExp = len( self.dbCatalog[ typeName ][ 'typeFields' ] )
+    sqlRows = []
+    for startTime, endTime, valuesList in recordsList:
+      if len( valuesList ) + 2 != numExp:
+        return S_ERROR( "Fields mismatch for record %s. %s fields and %s expected" % ( typeName,
+                                                                                       len( valuesList ) + 2,
+                                                                                       numExp ) )
+      retVal = self._escapeValues( list( valuesList ) + [ startTime, endTime ] )
+      if not retVal[ 'OK' ]:
+        return retVal
+      sqlRows.append( "( 0, UTC_TIMESTAMP(), %s )" % ", ".join( retVal[ 'Value' ] ) )
+    cmd = "INSERT INTO `%s` ( %s ) VALUES " % ( _getTableName( "in", typeName ),
+                                                ", ".join( [ "`%s`" % f for f in sqlFields ] ) )
+    for iP in range( 0, len( sqlRows ), self.__bulkInsertSize ):
+      retVal = self._update( cmd + ", ".join( sqlRows[ iP : iP + self.__bulkInsertSize ] ) )
+      if not retVal[ 'OK' ]:
+        return retVal
+    return S_OK()
+
   def insertRecordBundleThroughQueue( self, recordsToQueue ) :
     if self.__readOnly:
       return S_ERROR( "ReadOnly mode enabled. No modification allowed" )
-    recordsToProcess = []
-    now = Time.toEpoch()
+    recordsByType = {}
     for record in recordsToQueue:
       typeName, startTime, endTime, valuesList = record
-      result = self.__insertInQueueTable( typeName, startTime, endTime, valuesList )
+      if not typeName in self.dbCatalog:
+        return S_ERROR( "Type %s has not been defined in the db" % typeName )
+      recordsByType.setdefault( typeName, [] ).append( ( startTime, endTime, valuesList ) )
+    for typeName in recordsByType:
+      result = self.__insertBundleInQueueTable( typeName, recordsByType[ typeName ] )
       if not result[ 'OK' ]:
         return result
-      iD = result[ 'Value' ]
-      recordsToProcess.append( ( iD, typeName, startTime, endTime, valuesList, now ) )
-
     return S_OK()
 
   def insertRecordThroughQueue( self, typeName, startTime, endTime, valuesList ):
@@ -622,6 +710,31 @@ class AccountingDB( DB ):
     Do the real insert and delete from the in buffer table
     """
     self.log.verbose( "Received bundle to process", "of %s elements" % len( recordTuples ) )
+    recordsByType = {}
+    for record in recordTuples:
+      recordsByType.setdefault( record[1], [] ).append( record )
+    for typeName in recordsByType:
+      typeRecords = recordsByType[ typeName ]
+      result = self.insertRecordBundleDirectly( typeName, [ ( record[2], record[3], record[4] ) for record in typeRecords ] )
+      if not result[ 'OK' ]:
+        #Find out which records are the bad ones
+        self.log.warn( "Can't insert bundle, inserting records one by one", result[ 'Message' ] )
+        self.__insertRecordsFromINTable( typeRecords )
+        continue
+      idList = [ str( record[0] ) for record in typeRecords ]
+      for iP in range( 0, len( idList ), self.__bulkInsertSize ):
+        result = self._update( "DELETE FROM `%s` WHERE id in ( %s )" % ( _getTableName( "in", typeName ),
+                                                                        ", ".join( idList[ iP : iP + self.__bulkInsertSize ] ) ) )
+        if not result[ 'OK' ]:
+          self.log.error( "Can't delete rows from the IN table", result[ 'Message' ] )
+      now = Time.toEpoch()
+      for record in typeRecords:
+        gMonitor.addMark( "insertiontime", now - record[5] )
+
+  def __insertRecordsFromINTable( self, recordTuples ):
+    """
+    Insert records one by one and delete them from the in buffer table
+    """
     for record in recordTuples:
       iD, typeName, startTime, endTime, valuesList, insertionEpoch = record
       result = self.insertRecordDirectly( typeName, startTime, endTime, valuesList )
@@ -635,6 +748,100 @@ class AccountingDB( DB ):
       gMonitor.addMark( "insertiontime", Time.toEpoch() - insertionEpoch )
 
 
+  def insertRecordBundleDirectly( self, typeName, recordsList ):
+    """
+    Add a list of ( startTime, endTime, valuesList ) entries of the same type.
+    All key ids are resolved in bulk and the contributions to each bucket are added up in
+    memory, so all the records are written with one multi row insert in the type table and
+    one multi row upsert in the buckets table in a single transaction
+    """
+    if self.__readOnly:
+      return S_ERROR( "ReadOnly mode enabled. No modification allowed" )
+    if not typeName in self.dbCatalog:
+      return S_ERROR( "Type %s has not been defined in the db" % typeName )
+    if not recordsList:
+      return S_OK()
+    self.log.info( "Adding %s records" % len( recordsList ), "for type %s" % typeName )
+    typeFields = self.dbCatalog[ typeName ][ 'typeFields' ]
+    keyFields = self.dbCatalog[ typeName ][ 'keys' ]
+    numKeys = len( keyFields )
+    numValues = len( self.dbCatalog[ typeName ][ 'values' ] )
+    for startTime, endTime, valuesList in recordsList:
+      if len( valuesList ) != numKeys + numValues:
+        return S_ERROR( "Fields mismatch for record %s. %s fields and %s expected" % ( typeName,
+                                                                                       len( valuesList ) + 2,
+                                                                                       len( typeFields ) ) )
+    #Discover key indexes
+    keyIdsColumns = []
+    for keyPos in range( numKeys ):
+      retVal = self.__addKeyValues( typeName, keyFields[ keyPos ], [ record[2][ keyPos ] for record in recordsList ] )
+      if not retVal[ 'OK' ]:
+        return retVal
+      keyIdsColumns.append( retVal[ 'Value' ] )
+    #Generate type rows and add up the bucket contributions
+    nowEpoch = int( Time.toEpoch( Time.dateTime() ) )
+    typeRows = []
+    bucketsData = {}
+    for iP in range( len( recordsList ) ):
+      startTime, endTime, valuesList = recordsList[ iP ]
+      keyIds = tuple( [ keyIdsColumns[ keyPos ][ iP ] for keyPos in range( numKeys ) ] )
+      values = valuesList[ numKeys: ]
+      retVal = self._escapeValues( list( keyIds ) + list( values ) + [ startTime, endTime ] )
+      if not retVal[ 'OK' ]:
+        return retVal
+      typeRows.append( "( %s )" % ", ".join( retVal[ 'Value' ] ) )
+      try:
+        values = [ float( value ) for value in values ]
+      except ( ValueError, TypeError ), excp:
+        return S_ERROR( "Invalid value for record %s: %s" % ( typeName, excp ) )
+      for bStartTime, bProportion, bLength in self.calculateBuckets( typeName, startTime, endTime, nowEpoch ):
+        bucketKey = ( bStartTime, bLength ) + keyIds
+        bucketValues = bucketsData.get( bucketKey )
+        if bucketValues is None:
+          bucketValues = [ 0.0 ] * ( numValues + 1 )
+          bucketsData[ bucketKey ] = bucketValues
+        for valPos in range( numValues ):
+          bucketValues[ valPos ] += values[ valPos ] * bProportion
+        #HACK: One more record to split in the buckets to be able to count total entries
+        bucketValues[ numValues ] += bProportion
+    gMonitor.addMark( "registeradded", len( recordsList ) )
+    gMonitor.addMark( "registeradded:%s" % typeName, len( recordsList ) )
+    self.log.verbose( "Bundle splitted", "in %s bucket rows" % len( bucketsData ) )
+    retVal = self._getConnection()
+    if not retVal[ 'OK' ]:
+      return retVal
+    connObj = retVal[ 'Value' ]
+    try:
+      #A dead lock rolls back the whole transaction, so it is the whole transaction that is restarted
+      for _i in range( max( 1, self.__deadLockRetries ) ):
+        retVal = self.__writeBundle( typeName, typeRows, bucketsData, connObj )
+        if retVal[ 'OK' ] or retVal[ 'Message' ].find( "try restarting transaction" ) == -1:
+          break
+        self.log.verbose( "Dead lock writing the bundle, restarting the transaction", retVal[ 'Message' ] )
+      return retVal
+    finally:
+      connObj.close()
+
+  def __writeBundle( self, typeName, typeRows, bucketsData, connObj ):
+    """ Write the type rows and the bucket contributions of a bundle in one transaction,
+        rolled back if any of the statements fails
+    """
+    retVal = self.__startTransaction( connObj )
+    if not retVal[ 'OK' ]:
+      return retVal
+    cmd = "INSERT INTO `%s` ( %s ) VALUES " % ( _getTableName( "type", typeName ),
+                                                ", ".join( [ "`%s`" % f for f in self.dbCatalog[ typeName ][ 'typeFields' ] ] ) )
+    for iP in range( 0, len( typeRows ), self.__bulkInsertSize ):
+      retVal = self._update( cmd + ", ".join( typeRows[ iP : iP + self.__bulkInsertSize ] ), conn = connObj )
+      if not retVal[ 'OK' ]:
+        self.__rollbackTransaction( connObj )
+        return retVal
+    retVal = self.__writeBucketsBulk( typeName, bucketsData, connObj = connObj )
+    if not retVal[ 'OK' ]:
+      self.__rollbackTransaction( connObj )
+      return retVal
+    return self.__commitTransaction( connObj )
+
   def insertRecordDirectly( self, typeName, startTime, endTime, valuesList ):
     """
     Add an entry to the type contents
@@ -898,6 +1105,32 @@ class AccountingDB( DB ):
 
     return S_ERROR( "Cannot update bucket: %s" % result[ 'Message' ] )
 
+  def __writeBucketsBulk( self, typeName, bucketsData, connObj = False ):
+    """ Add the aggregated contributions to the buckets with multi row upserts.
+        bucketsData is { ( startTime, bucketLength, keyId1, ... ) : [ value1, ..., entries ] }
+    """
+    sqlFields = [ '`startTime`', '`bucketLength`' ]
+    for keyField in self.dbCatalog[ typeName ][ 'keys' ]:
+      sqlFields.append( "`%s`" % keyField )
+    sqlUpData = []
+    for valueField in self.dbCatalog[ typeName ][ 'values' ] + [ 'entriesInBucket' ]:
+      valueField = "`%s`" % valueField
+      sqlFields.append( valueField )
+      sqlUpData.append( "%s=%s+VALUES(%s)" % ( valueField, valueField, valueField ) )
+    valuesGroups = []
+    for bucketKey in bucketsData:
+      sqlValues = [ str( val ) for val in bucketKey ] + [ repr( val ) for val in bucketsData[ bucketKey ] ]
+      valuesGroups.append( "( %s )" % ",".join( sqlValues ) )
+    cmd = "INSERT INTO `%s` ( %s ) VALUES " % ( _getTableName( "bucket", typeName ), ", ".join( sqlFields ) )
+    upCmd = " ON DUPLICATE KEY UPDATE %s" % ", ".join( sqlUpData )
+    for iP in range( 0, len( valuesGroups ), self.__bulkInsertSize ):
+      fullCmd = "%s%s%s" % ( cmd, ", ".join( valuesGroups[ iP : iP + self.__bulkInsertSize ] ), upCmd )
+      #No retry here: after a dead lock the transaction has been rolled back by the server
+      result = self._update( fullCmd, conn = connObj )
+      if not result[ 'OK' ]:
+        return S_ERROR( "Cannot update bucket: %s" % result[ 'Message' ] )
+    return S_OK()
+
   def __checkFieldsExistsInType( self, typeName, fields, tableType ):
     """
     Check wether a list of fields exist for a given typeName
@@ -0,0 +1,105 @@
+########################################################################
+# $HeadURL $
+# File: AccountingDBTests.py
+########################################################################
+
+""" :mod: AccountingDBTests
+    =======================
+
+    .. module: AccountingDBTests
+    :synopsis: test cases for the AccountingDB bulk record insertion
+
+    test cases for AccountingDB.insertRecordBundleDirectly, the statements
+    are run on a fake connection that applies them only on COMMIT and drops
+    the whole transaction on a dead lock, as InnoDB does
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+from DIRAC import S_OK, S_ERROR, gLogger
+## SUT
+from DIRAC.AccountingSystem.DB.AccountingDB import AccountingDB
+
+class FakeConnection( object ):
+  """ connection keeping the statements of the open transaction """
+
+  def __init__( self ):
+    self.committed = []
+    self.pending = []
+
+  def close( self ):
+    pass
+
+class DeadLockAccountingDB( AccountingDB ):
+  """ AccountingDB with a dead lock on the given statements """
+
+  def __init__( self, deadLocks ):
+    self.log = gLogger.getSubLogger( 'DeadLockAccountingDB' )
+    self._AccountingDB__readOnly = False
+    self._AccountingDB__deadLockRetries = 2
+    self._AccountingDB__bulkInsertSize = 1000
+    self.maxBucketTime = 604800
+    self.dbCatalog = { 'Test' : { 'keys' : [ 'User' ],
+                                  'values' : [ 'CPUTime' ],
+                                  'typeFields' : [ 'User', 'CPUTime', 'startTime', 'endTime' ] } }
+    self.dbBucketsLength = { 'Test' : [ ( 86400 * 365, 86400 ) ] }
+    # Known keys, no key table access
+    self._AccountingDB__keysCache = { 'Test' : { 'User' : { 'user1' : 1, 'user2' : 2 } } }
+    # Statement numbers, counted from 1, that fail with a dead lock
+    self.deadLocks = deadLocks
+    self.statements = 0
+    self.connection = FakeConnection()
+
+  def _getConnection( self ):
+    return S_OK( self.connection )
+
+  def _escapeValues( self, inValues = None ):
+    return S_OK( [ str( value ) for value in inValues ] )
+
+  def _query( self, cmd, conn = None ):
+    if cmd == "COMMIT":
+      conn.committed.extend( conn.pending )
+    conn.pending = []
+    return S_OK( () )
+
+  def _update( self, cmd, conn = None ):
+    self.statements += 1
+    if self.statements in self.deadLocks:
+      conn.pending = []
+      return S_ERROR( "Deadlock found when trying to get lock; try restarting transaction" )
+    conn.pending.append( cmd )
+    return S_OK( 1 )
+
+########################################################################
+class BundleDeadLockTestCase( unittest.TestCase ):
+  """
+  .. class:: BundleDeadLockTestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.records = [ ( 1000, 1100, [ 'user1', 10 ] ), ( 1000, 1100, [ 'user2', 20 ] ) ]
+
+  def testDeadLockOnBuckets( self ):
+    """ the type rows are written again when the bucket upsert dead locks """
+    accountingDB = DeadLockAccountingDB( deadLocks = [ 2 ] )
+    self.assertTrue( accountingDB.insertRecordBundleDirectly( 'Test', self.records )['OK'] )
+    committed = accountingDB.connection.committed
+    self.assertEqual( len( committed ), 2 )
+    self.assertTrue( committed[0].startswith( "INSERT INTO `ac_type_Test`" ) )
+    self.assertTrue( committed[1].startswith( "INSERT INTO `ac_bucket_Test`" ) )
+
+  def testRepeatedDeadLock( self ):
+    """ the bundle fails, for the records to be inserted one by one, when the retries are exhausted """
+    accountingDB = DeadLockAccountingDB( deadLocks = [ 2, 4 ] )
+    self.assertFalse( accountingDB.insertRecordBundleDirectly( 'Test', self.records )['OK'] )
+    self.assertEqual( accountingDB.connection.committed, [] )
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( BundleDeadLockTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
@@ -21,8 +21,12 @@ class DataCache:
     self.purgeThread.start()
     self.__dataCache = DictCache()
     self.__graphCache = DictCache( deleteFunction = self._deleteGraph )
+    self.__sliceCache = DictCache()
     self.__dataLifeTime = 600
     self.__graphLifeTime = 3600
+    #Computations in progress: key -> [ finished event, result ]
+    self.__inFlight = {}
+    self.__inFlightLock = threading.Lock()
 
   def setGraphsLocation( self, graphsDir ):
     self.graphsLocation = graphsDir
@@ -37,19 +41,62 @@ class DataCache:
       time.sleep( 600 )
       self.__graphCache.purgeExpired()
       self.__dataCache.purgeExpired()
+      self.__sliceCache.purgeExpired()
+
+  def __getCached( self, cache, cacheKey, dataFunc, *args ):
+    """
+    Get a value from a cache if exists, else generate it with dataFunc. Concurrent
+    misses for the same key wait for the first one to generate it and get its result
+    """
+    data = cache.get( cacheKey )
+    if data != False:
+      return S_OK( data )
+    self.__inFlightLock.acquire()
+    try:
+      flight = self.__inFlight.get( cacheKey )
+      generate = not flight
+      if generate:
+        flight = [ threading.Event(), None ]
+        self.__inFlight[ cacheKey ] = flight
+    finally:
+      self.__inFlightLock.release()
+    if generate:
+      flight[1] = S_ERROR( "Exception while generating data" )
+      try:
+        flight[1] = dataFunc( *args )
+        if flight[1][ 'OK' ]:
+          cache.add( cacheKey, self.__dataLifeTime, flight[1][ 'Value' ] )
+      finally:
+        self.__inFlightLock.acquire()
+        try:
+          del( self.__inFlight[ cacheKey ] )
+        finally:
+          self.__inFlightLock.release()
+        flight[0].set()
+    else:
+      flight[0].wait()
+    result = flight[1]
+    if not result[ 'OK' ]:
+      return result
+    return S_OK( result[ 'Value' ] )
 
   def getReportData( self, reportRequest, reportHash, dataFunc ):
     """
     Get report data from cache if exists, else generate it
     """
-    reportData = self.__dataCache.get( reportHash )
-    if reportData == False:
-      retVal = dataFunc( reportRequest )
-      if not retVal[ 'OK' ]:
-        return retVal
-      reportData = retVal[ 'Value' ]
-      self.__dataCache.add( reportHash, self.__dataLifeTime, reportData )
-    return S_OK( reportData )
+    return self.__getCached( self.__dataCache, reportHash, dataFunc, reportRequest )
+
+  def getSliceData( self, sliceHash ):
+    """
+    Get the rows of a time slice of a query from cache, False if not cached
+    """
+    return self.__sliceCache.get( sliceHash )
+
+  def addSliceData( self, sliceHash, sliceData ):
+    """
+    Cache the rows of a time slice of a query
+    """
+    self.__sliceCache.add( sliceHash, self.__dataLifeTime, sliceData )
 
   def getReportPlot( self, reportRequest, reportHash, reportData, plotFunc ):
     """
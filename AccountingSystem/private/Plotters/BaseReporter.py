@@ -1,4 +1,8 @@
 import time, copy, types
+try:
+  import hashlib as md5
+except:
+  import md5
 from DIRAC import S_OK, S_ERROR, gLogger
 from DIRAC.AccountingSystem.private.DBUtils import DBUtils
 from DIRAC.AccountingSystem.private.DataCache import gDataCache
@@ -12,6 +16,9 @@ class BaseReporter( DBUtils ):
   _PARAM_CONVERT_TO_GRANULARITY = 'convertToGranularity'
   _VALID_PARAM_CONVERT_TO_GRANULARITY = ( 'sum', 'average' )
   _PARAM_CONSOLIDATION_FUNCTION = "consolidationFunction"
+  #Number of buckets in the time slices cached by _getTimedData, it does not change
+  #the number of queries, one per report or two around the cached slices
+  _SLICE_BUCKETS = 6
 
   _EA_THUMBNAIL = 'thumbnail'
   _EA_WIDTH = 'width'
@@ -146,14 +153,13 @@ class BaseReporter( DBUtils ):
         condDict[ keyword ] = preCondDict[ keyword ]
     #Query!
     timeGrouping = ( "%%s, %s" % groupingFields[0], [ 'startTime' ] + groupingFields[1] )
-    retVal = self._retrieveBucketedData( self._typeName,
-                                          startTime,
-                                          endTime,
-                                          selectFields,
-                                          condDict,
-                                          timeGrouping,
-                                          ( '%s', [ 'startTime' ] )
-                                          )
+    retVal = self.__retrieveSlicedData( startTime,
+                                        endTime,
+                                        selectFields,
+                                        condDict,
+                                        timeGrouping,
+                                        ( '%s', [ 'startTime' ] )
+                                        )
     if not retVal[ 'OK' ]:
       return retVal
     dataDict = self._groupByField( 0, retVal[ 'Value' ] )
@@ -172,6 +178,97 @@ class BaseReporter( DBUtils ):
       dataDict = self._calculateProportionalGauges( dataDict )
     return S_OK( ( dataDict, coarsestGranularity ) )
 
+  def __retrieveSlicedData( self, startTime, endTime, selectFields, condDict, groupFields, orderFields ):
+    """
+    Retrieve data grouped and ordered by startTime, the rows being ( grouping, startTime, ... ).
+    The rows of the time slices of _SLICE_BUCKETS buckets, aligned to multiples of their length
+    and older than the last complete bucket, are cached. The range is retrieved with one query,
+    or with a query before and a query after the cached slices
+    """
+    bucketLength = self._getBucketLengthForTime( self._typeName, startTime )
+    #The DB moves the query limits one hour forward, slices only join without gaps or
+    #overlaps if the buckets are aligned to the hour and have the same length
+    if 3600 % bucketLength or self._getBucketLengthForTime( self._typeName, endTime + 3600 ) != bucketLength:
+      return self._retrieveBucketedData( self._typeName, startTime, endTime, selectFields,
+                                         condDict, groupFields, orderFields )
+    sliceLength = bucketLength * self._SLICE_BUCKETS
+    nowEpoch = int( Time.toEpoch() )
+    stableLimit = min( nowEpoch - nowEpoch % bucketLength - bucketLength - 3600, endTime + 1 )
+    queryStart = startTime - startTime % bucketLength
+    #Complete stable slices in the range
+    firstSlice = queryStart + ( -queryStart ) % sliceLength
+    sliceStarts = range( firstSlice, stableLimit - sliceLength + 1, sliceLength )
+    sliceHashes = dict( [ ( sliceStart, self.__getSliceHash( sliceStart, sliceLength, selectFields,
+                                                             condDict, groupFields, orderFields ) )
+                          for sliceStart in sliceStarts ] )
+    #The first run of cached slices is used, the rest of the range is queried
+    cachedRows = []
+    cachedStart = cachedEnd = None
+    for sliceStart in sliceStarts:
+      sliceData = gDataCache.getSliceData( sliceHashes[ sliceStart ] )
+      if sliceData is False:
+        if cachedStart is not None:
+          break
+        continue
+      if cachedStart is None:
+        cachedStart = sliceStart
+      cachedEnd = sliceStart + sliceLength
+      cachedRows.extend( sliceData )
+    if cachedStart is None:
+      return self.__retrieveAndSlice( queryStart, endTime + 1, sliceLength, sliceHashes, selectFields,
+                                      condDict, groupFields, orderFields )
+    retVal = self.__retrieveAndSlice( queryStart, cachedStart, sliceLength, sliceHashes, selectFields,
+                                      condDict, groupFields, orderFields )
+    if not retVal[ 'OK' ]:
+      return retVal
+    dataList = retVal[ 'Value' ] + cachedRows
+    retVal = self.__retrieveAndSlice( cachedEnd, endTime + 1, sliceLength, sliceHashes, selectFields,
+                                      condDict, groupFields, orderFields )
+    if not retVal[ 'OK' ]:
+      return retVal
+    return S_OK( dataList + retVal[ 'Value' ] )
+
+  def __retrieveAndSlice( self, rangeStart, rangeEnd, sliceLength, sliceHashes, selectFields,
+                          condDict, groupFields, orderFields ):
+    """
+    Retrieve the data from rangeStart to rangeEnd with one query and cache the rows of the
+    slices of sliceHashes contained in the range
+    """
+    if rangeStart >= rangeEnd:
+      return S_OK( [] )
+    #The DB modifies the condition and grouping arguments
+    queryArgs = copy.deepcopy( ( self._typeName, rangeStart, rangeEnd - 1, selectFields,
+                                 condDict, groupFields, orderFields ) )
+    retVal = self._retrieveBucketedData( *queryArgs )
+    if not retVal[ 'OK' ]:
+      return retVal
+    #Tuples, the rows are modified when grouped
+    dataList = [ tuple( row ) for row in retVal[ 'Value' ] ]
+    #A row of the slice starting at sliceStart has its startTime in
+    #[ sliceStart + 3600, sliceStart + sliceLength + 3600 )
+    slicesData = dict( [ ( sliceStart, [] ) for sliceStart in sliceHashes
+                         if rangeStart <= sliceStart and sliceStart + sliceLength <= rangeEnd ] )
+    for row in dataList:
+      rowSlice = int( row[1] ) - 3600
+      rowSlice -= rowSlice % sliceLength
+      if rowSlice in slicesData:
+        slicesData[ rowSlice ].append( row )
+    for sliceStart in slicesData:
+      gDataCache.addSliceData( sliceHashes[ sliceStart ], slicesData[ sliceStart ] )
+    return S_OK( dataList )
+
+  def __getSliceHash( self, sliceStart, sliceLength, selectFields, condDict, groupFields, orderFields ):
+    """
+    Cache key of the rows of a time slice of a query
+    """
+    sliceHash = md5.md5()
+    sliceHash.update( repr( ( self._typeName, sliceStart, sliceLength ) ) )
+    sliceHash.update( repr( selectFields ) )
+    sliceHash.update( repr( sorted( condDict.items() ) ) )
+    sliceHash.update( repr( ( groupFields, orderFields ) ) )
+    sliceHash.update( self._setup )
+    return sliceHash.hexdigest()
+
   def _executeConsolidation( self, functor, dataDict ):
     for timeKey in dataDict:
       dataDict[ timeKey ] = [ functor( *dataDict[ timeKey ] ) ]
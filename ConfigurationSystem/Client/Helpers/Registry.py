@@ -3,20 +3,97 @@ __RCSID__ = "$Id$"
 
 import types
 from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities.LockRing import LockRing
 from DIRAC.ConfigurationSystem.Client.Config import gConfig
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.ConfigurationSystem.private.Refresher import gRefresher
 from DIRAC.ConfigurationSystem.Client.Helpers.CSGlobals import getVO
 
 gBaseRegistrySection = "/Registry"
 
+class RegistryIndex( object ):
+  """
+  Reverse maps of the Registry section. They are built from one version of the configuration
+  and never modified afterwards
+  """
+
+  #Group options that can be looked up by value
+  groupAttributes = ( 'Users', 'VO', 'Properties', 'VOMSRole' )
+
+  def __init__( self ):
+    self.users = self.__getSections( "Users" )
+    self.groups = self.__getSections( "Groups" )
+    self.hosts = self.__getSections( "Hosts" )
+    self.userDNs = {}
+    self.dnToUser = {}
+    for username in self.users or []:
+      dnList = gConfig.getValue( "%s/Users/%s/DN" % ( gBaseRegistrySection, username ), [] )
+      self.userDNs[ username ] = dnList
+      for dn in dnList:
+        self.dnToUser.setdefault( dn, username )
+    self.dnToHost = {}
+    for hostname in self.hosts or []:
+      for dn in gConfig.getValue( "%s/Hosts/%s/DN" % ( gBaseRegistrySection, hostname ), [] ):
+        self.dnToHost.setdefault( dn, hostname )
+    self.groupsWithAttr = dict( [ ( attrName, {} ) for attrName in self.groupAttributes ] )
+    for group in self.groups or []:
+      for attrName in self.groupAttributes:
+        attrIndex = self.groupsWithAttr[ attrName ]
+        if attrName == 'VOMSRole':
+          valueList = [ gConfig.getValue( "%s/Groups/%s/%s" % ( gBaseRegistrySection, group, attrName ), "" ) ]
+        else:
+          valueList = gConfig.getValue( "%s/Groups/%s/%s" % ( gBaseRegistrySection, group, attrName ), [] )
+        for value in valueList:
+          if group not in attrIndex.setdefault( value, [] ):
+            attrIndex[ value ].append( group )
+    for attrIndex in self.groupsWithAttr.values():
+      for groupList in attrIndex.values():
+        groupList.sort()
+
+  def __getSections( self, sectionName ):
+    retVal = gConfig.getSections( "%s/%s" % ( gBaseRegistrySection, sectionName ) )
+    if not retVal[ 'OK' ]:
+      return None
+    return retVal[ 'Value' ]
+
+  def getSectionError( self, sectionName ):
+    return S_ERROR( "Path %s/%s does not exist or it's not a section" % ( gBaseRegistrySection, sectionName ) )
+
+gRegistryIndex = ( None, None )
+gRegistryIndexLock = LockRing().getLock()
+
+def getRegistryIndex():
+  """
+  Get the RegistryIndex for the current configuration. It's generated again when the configuration changes
+  """
+  global gRegistryIndex
+  gRefresher.refreshConfigurationIfNeeded()
+  compiledCFG = gConfigurationData.getCompiledCFG()
+  indexCFG, registryIndex = gRegistryIndex
+  if indexCFG is compiledCFG:
+    return registryIndex
+  gRegistryIndexLock.acquire()
+  try:
+    #Somebody else may have built it meanwhile
+    indexCFG, registryIndex = gRegistryIndex
+    if indexCFG is not compiledCFG:
+      registryIndex = RegistryIndex()
+      gRegistryIndex = ( compiledCFG, registryIndex )
+    return registryIndex
+  finally:
+    gRegistryIndexLock.release()
+
 def getUsernameForDN( dn, usersList = False ):
+  registryIndex = getRegistryIndex()
   if not usersList:
-    retVal = gConfig.getSections( "%s/Users" % gBaseRegistrySection )
-    if not retVal[ 'OK' ]:
-      return retVal
-    usersList = retVal[ 'Value' ]
-  for username in usersList:
-    if dn in gConfig.getValue( "%s/Users/%s/DN" % ( gBaseRegistrySection, username ), [] ):
-      return S_OK( username )
+    if registryIndex.users is None:
+      return registryIndex.getSectionError( "Users" )
+    if dn in registryIndex.dnToUser:
+      return S_OK( registryIndex.dnToUser[ dn ] )
+  else:
+    for username in usersList:
+      if dn in registryIndex.userDNs.get( username, [] ):
+        return S_OK( username )
   return S_ERROR( "No username found for dn %s" % dn )
 
 def getDNForUsername( username ):
@@ -32,18 +109,13 @@ def getGroupsForDN( dn ):
   return getGroupsForUser( retVal[ 'Value' ] )
 
 def __getGroupsWithAttr( attrName, value ):
-  retVal = gConfig.getSections( "%s/Groups" % gBaseRegistrySection )
-  if not retVal[ 'OK' ]:
-    return retVal
-  groupsList = retVal[ 'Value' ]
-  groups = []
-  for group in groupsList:
-    if value in gConfig.getValue( "%s/Groups/%s/%s" % ( gBaseRegistrySection, group, attrName ), [] ):
-      groups.append( group )
+  registryIndex = getRegistryIndex()
+  if registryIndex.groups is None:
+    return registryIndex.getSectionError( "Groups" )
+  groups = registryIndex.groupsWithAttr[ attrName ].get( value )
   if not groups:
     return S_ERROR( "No groups found for %s=%s" % ( attrName,value ) )
-  groups.sort()
-  return S_OK( groups )
+  return S_OK( list( groups ) )
 
 def getGroupsForUser( username ):
   return __getGroupsWithAttr( 'Users', username )
@@ -57,13 +129,11 @@ def getGroupsWithProperty( propName ):
   return __getGroupsWithAttr( "Properties", propName )
 
 def getHostnameForDN( dn ):
-  retVal = gConfig.getSections( "%s/Hosts" % gBaseRegistrySection )
-  if not retVal[ 'OK' ]:
-    return retVal
-  hostList = retVal[ 'Value' ]
-  for hostname in hostList:
-    if dn in gConfig.getValue( "%s/Hosts/%s/DN" % ( gBaseRegistrySection, hostname ), [] ):
-      return S_OK( hostname )
+  registryIndex = getRegistryIndex()
+  if registryIndex.hosts is None:
+    return registryIndex.getSectionError( "Hosts" )
+  if dn in registryIndex.dnToHost:
+    return S_OK( registryIndex.dnToHost[ dn ] )
   return S_ERROR( "No hostname found for dn %s" % dn )
 
 def getDefaultUserGroup():
@@ -202,14 +272,12 @@ def getVOMSVOForGroup( group ):
   return vomsVO
 
 def getGroupsWithVOMSAttribute( vomsAttr ):
-  retVal = gConfig.getSections( "%s/Groups" % ( gBaseRegistrySection ) )
-  if not retVal[ 'OK' ]:
+  registryIndex = getRegistryIndex()
+  if registryIndex.groups is None:
     return []
-  groups = []
-  for group in retVal[ 'Value' ]:
-    if vomsAttr == gConfig.getValue( "%s/Groups/%s/VOMSRole" % ( gBaseRegistrySection, group ), "" ):
-      groups.append( group )
-  return groups
+  #The index is sorted but the groups used to be returned in the CS order
+  groups = registryIndex.groupsWithAttr[ 'VOMSRole' ].get( vomsAttr, [] )
+  return [ group for group in registryIndex.groups if group in groups ]
 
 def getVOs():
   """ Get all the configured VOs
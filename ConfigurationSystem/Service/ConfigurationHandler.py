@@ -25,11 +25,15 @@ class ConfigurationHandler( RequestHandler ):
 
   types_getCompressedDataIfNewer = [ types.StringType ]
   def export_getCompressedDataIfNewer( self, sClientVersion ):
-    sVersion = gServiceInterface.getVersion()
-    retDict = { 'newestVersion' : sVersion }
-    if sClientVersion < sVersion:
-      retDict[ 'data' ] = gServiceInterface.getCompressedConfigurationData()
-    return S_OK( retDict )
+    return S_OK( gServiceInterface.getCompressedDataIfNewer( sClientVersion ) )
+
+  types_getCompressedDeltaIfNewer = [ types.StringType ]
+  def export_getCompressedDeltaIfNewer( self, sClientVersion ):
+    """
+    Same as getCompressedDataIfNewer but if possible send the modifications from the client version
+    in the 'delta' key instead of the whole configuration
+    """
+    return S_OK( gServiceInterface.getCompressedDataIfNewer( sClientVersion, useDelta = True ) )
 
   types_publishSlaveServer = [ types.StringType ]
   def export_publishSlaveServer( self, sURL ):
@@ -98,7 +98,8 @@ class ConfigurationClient:
 
   def getOption( self, optionPath, typeValue = None ):
     gRefresher.refreshConfigurationIfNeeded()
-    optionValue = gConfigurationData.extractOptionFromCFG( optionPath )
+    compiledCFG = gConfigurationData.getCompiledCFG()
+    optionValue = compiledCFG.getOption( optionPath )
 
     if optionValue == None:
       return S_ERROR( "Path %s does not exist or it's not an option" % optionPath )
@@ -112,22 +113,45 @@ class ConfigurationClient:
     if not type( typeValue ) == types.TypeType:
       requestedType = type( typeValue )
 
+    #Casts are kept with the compiled configuration so they are discarded with it
+    castKey = ( optionPath, requestedType )
+    try:
+      castOK, castValue = compiledCFG.casts[ castKey ]
+    except KeyError:
+      castOK, castValue = self.__castValue( optionValue, requestedType )
+      compiledCFG.casts[ castKey ] = ( castOK, castValue )
+    except TypeError:
+      #Unhashable type
+      castOK, castValue = self.__castValue( optionValue, requestedType )
+    if not castOK:
+      if castValue is None:
+        castValue = "Type mismatch between default (%s) and configured value (%s) " % ( str( typeValue ), optionValue )
+      return S_ERROR( castValue )
+    if requestedType == types.ListType:
+      #Callers may modify the list
+      return S_OK( list( castValue ) )
+    return S_OK( castValue )
+
+  def __castValue( self, optionValue, requestedType ):
+    """
+    Cast a configuration value. Returns a ( OK, value or error message ) tuple
+    """
     if requestedType == types.ListType:
       try:
-        return S_OK( List.fromChar( optionValue, ',' ) )
+        return True, List.fromChar( optionValue, ',' )
       except Exception:
-        return S_ERROR( "Can't convert value (%s) to comma separated list" % str( optionValue ) )
+        return False, "Can't convert value (%s) to comma separated list" % str( optionValue )
     elif requestedType == types.BooleanType:
       try:
-        return S_OK( optionValue.lower() in ( "y", "yes", "true", "1" ) )
+        return True, optionValue.lower() in ( "y", "yes", "true", "1" )
       except Exception:
-        return S_ERROR( "Can't convert value (%s) to Boolean" % str( optionValue ) )
+        return False, "Can't convert value (%s) to Boolean" % str( optionValue )
     else:
       try:
-        return S_OK( requestedType( optionValue ) )
+        return True, requestedType( optionValue )
       except:
-        return S_ERROR( "Type mismatch between default (%s) and configured value (%s) " % ( str( typeValue ), optionValue ) )
-
+        #The message depends on the default value so it's generated by the caller
+        return False, None
 
   def getSections( self, sectionPath, listOrdered = True ):
     gRefresher.refreshConfigurationIfNeeded()
@@ -148,11 +172,11 @@ class ConfigurationClient:
   def getOptionsDict( self, sectionPath ):
     gRefresher.refreshConfigurationIfNeeded()
     optionsDict = {}
-    optionList = gConfigurationData.getOptionsFromCFG( sectionPath )
-    if type( optionList ) == types.ListType:
-      for option in optionList:
-        optionsDict[ option ] = gConfigurationData.extractOptionFromCFG( "%s/%s" %
-                                                              ( sectionPath, option ) )
+    compiledCFG = gConfigurationData.getCompiledCFG()
+    sectionData = compiledCFG.getSection( sectionPath )
+    if sectionData is not None:
+      for option in sectionData[1]:
+        optionsDict[ option ] = compiledCFG.getOption( "%s/%s" % ( sectionPath, option ) )
       return S_OK( optionsDict )
     else:
       return S_ERROR( "Path %s does not exist or it's not a section" % sectionPath )
@@ -7,12 +7,51 @@ import zipfile
 import threading, thread
 import time
 import DIRAC
-from DIRAC.Core.Utilities import List, Time
+from DIRAC.Core.Utilities import List, Time, DEncode
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.Utilities.CFG import CFG
 from DIRAC.Core.Utilities.LockRing import LockRing
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
 
+class CompiledCFG:
+  """
+  Read only flattened view of a CFG. Options and sections are indexed by their
+  normalized path ( /Section/Subsection/Option ) so lookups do not have to walk the CFG
+  """
+
+  def __init__( self, cfg ):
+    self.cfg = cfg
+    self.options = {}
+    self.sections = {}
+    #( path, type ) -> ( OK, casted value or error message ). Filled by the readers
+    self.casts = {}
+    self.__compile( cfg, "" )
+
+  def __compile( self, cfg, basePath ):
+    sectionList = cfg.listSections( True )
+    optionList = cfg.listOptions( True )
+    self.sections[ basePath or "/" ] = ( sectionList, optionList )
+    for option in optionList:
+      self.options[ "%s/%s" % ( basePath, option ) ] = cfg[ option ]
+    for section in sectionList:
+      self.__compile( cfg[ section ], "%s/%s" % ( basePath, section ) )
+
+  @staticmethod
+  def normalizePath( path ):
+    return "/%s" % "/".join( [ level.strip() for level in path.split( "/" ) if level.strip() != "" ] )
+
+  def getOption( self, path ):
+    try:
+      return self.options[ path ]
+    except KeyError:
+      return self.options.get( self.normalizePath( path ) )
+
+  def getSection( self, path ):
+    try:
+      return self.sections[ path ]
+    except KeyError:
+      return self.sections.get( self.normalizePath( path ) )
+
 class ConfigurationData:
 
   def __init__( self, loadDefaultCFG = True ):
@@ -21,13 +60,20 @@ class ConfigurationData:
     self.threadingEvent.set()
     self.threadingLock = lr.getLock()
     self.runningThreadsNumber = 0
-    self.compressedConfigurationData = ""
+    self.compressedConfigurationData = None
+    #List of ( version, compressed remote CFG ) used to generate deltas for the clients
+    self.__versionHistory = []
+    self.__versionHistorySize = 0
+    self.__deltaCache = {}
+    self.__deltaLock = lr.getLock()
     self.configurationPath = "/DIRAC/Configuration"
     self.backupsDir = os.path.join( DIRAC.rootPath, "etc", "csbackup" )
     self._isService = False
     self.localCFG = CFG()
     self.remoteCFG = CFG()
     self.mergedCFG = CFG()
+    #Flattened view of the merged CFG. It's replaced (never modified) when the merged CFG changes
+    self.__compiledCFG = None
     self.remoteServerList = []
     if loadDefaultCFG:
       defaultCFGFile = os.path.join( DIRAC.rootPath, "etc", "dirac.cfg" )
@@ -43,6 +89,8 @@ class ConfigurationData:
   def sync( self ):
     gLogger.debug( "Updating configuration internals" )
     self.mergedCFG = self.remoteCFG.mergeWith( self.localCFG )
+    #It will be compiled again by the first reader
+    self.__compiledCFG = None
     self.remoteServerList = []
     localServers = self.extractOptionFromCFG( "%s/Servers" % self.configurationPath,
                                         self.localCFG,
@@ -55,7 +103,84 @@ class ConfigurationData:
     if remoteServers:
       self.remoteServerList.extend( List.fromChar( remoteServers, "," ) )
     self.remoteServerList = List.uniqueElements( self.remoteServerList )
-    self.compressedConfigurationData = zlib.compress( str( self.remoteCFG ), 9 )
+    if self.__versionHistorySize:
+      self.compressedConfigurationData = zlib.compress( str( self.remoteCFG ), 9 )
+      self.__addToVersionHistory( self.getVersion(), self.compressedConfigurationData )
+    else:
+      #Only compress if somebody asks for it
+      self.compressedConfigurationData = None
+
+  def getCompiledCFG( self ):
+    """
+    Get the flattened view of the merged CFG. Readers don't need to lock since the view
+    is never modified, a new one is generated and swapped in when the configuration changes
+    """
+    compiledCFG = self.__compiledCFG
+    if compiledCFG is None or compiledCFG.cfg is not self.mergedCFG:
+      mergedCFG = self.mergedCFG
+      compiledCFG = CompiledCFG( mergedCFG )
+      #Don't publish it if the merged CFG has been replaced meanwhile
+      if mergedCFG is self.mergedCFG:
+        self.__compiledCFG = compiledCFG
+    return compiledCFG
+
+  def keepVersionHistory( self, numVersions = 10 ):
+    """
+    Keep the last versions of the remote CFG to be able to serve deltas to the clients
+    """
+    self.__versionHistorySize = max( 0, numVersions )
+    self.sync()
+
+  def __addToVersionHistory( self, version, compressedData ):
+    #Version 0 means there is no configuration yet
+    if version == "0":
+      return
+    history = [ entry for entry in self.__versionHistory if entry[0] != version ]
+    history.append( ( version, compressedData ) )
+    self.__versionHistory = history[ -self.__versionHistorySize: ]
+
+  def getCompressedDelta( self, fromVersion, toVersion ):
+    """
+    Get the compressed list of modifications to go from one version of the remote CFG to another.
+    Returns False if any of the versions is not known or if the delta is not worth it
+    """
+    self.__deltaLock.acquire()
+    try:
+      deltaKey = ( fromVersion, toVersion )
+      if deltaKey not in self.__deltaCache:
+        history = dict( self.__versionHistory )
+        if fromVersion not in history or toVersion not in history:
+          return False
+        fromCFG = CFG().loadFromBuffer( zlib.decompress( history[ fromVersion ] ) )
+        toCFG = CFG().loadFromBuffer( zlib.decompress( history[ toVersion ] ) )
+        delta = zlib.compress( DEncode.encode( fromCFG.getModifications( toCFG ) ), 9 )
+        if len( delta ) >= len( history[ toVersion ] ):
+          delta = False
+        #Only keep the deltas to the newest version
+        for cachedKey in list( self.__deltaCache ):
+          if cachedKey[1] != toVersion:
+            del( self.__deltaCache[ cachedKey ] )
+        self.__deltaCache[ deltaKey ] = delta
+      return self.__deltaCache[ deltaKey ]
+    finally:
+      self.__deltaLock.release()
+
+  def getCompressedDataIfNewer( self, clientVersion, useDelta = False ):
+    """
+    Generate the reply for a client that has clientVersion. It will contain the new version and
+    if the client is out of date either the full compressed data or a delta for the client version
+    """
+    version = self.getVersion()
+    retDict = { 'newestVersion' : version }
+    if clientVersion >= version:
+      return retDict
+    if useDelta:
+      delta = self.getCompressedDelta( clientVersion, version )
+      if delta:
+        retDict[ 'delta' ] = delta
+        return retDict
+    retDict[ 'data' ] = self.getCompressedData()
+    return retDict
 
   def loadFile( self, fileName ):
     try:
@@ -83,10 +208,28 @@ class ConfigurationData:
     self.loadRemoteCFGFromMem( sUncompressedData )
 
   def loadRemoteCFGFromMem( self, data ):
-    self.lock()
-    self.remoteCFG.loadFromBuffer( data )
-    self.unlock()
-    self.sync()
+    #Parse into a new CFG and swap it so readers don't have to wait
+    remoteCFG = CFG()
+    remoteCFG.loadFromBuffer( data )
+    self.setRemoteCFG( remoteCFG, clone = False )
+
+  def applyRemoteCompressedDelta( self, delta, newVersion ):
+    """
+    Apply a delta generated by getCompressedDelta to a copy of the remote CFG and swap it in
+    """
+    try:
+      modList = DEncode.decode( zlib.decompress( delta ) )[0]
+    except Exception, e:
+      return S_ERROR( "Cannot decode configuration delta: %s" % str( e ) )
+    remoteCFG = self.remoteCFG.clone()
+    result = remoteCFG.applyModifications( modList )
+    if not result[ 'OK' ]:
+      return result
+    version = self.getVersion( remoteCFG )
+    if version != newVersion:
+      return S_ERROR( "Configuration delta generated version %s instead of %s" % ( version, newVersion ) )
+    self.setRemoteCFG( remoteCFG, clone = False )
+    return S_OK()
 
   def loadConfigurationData( self, fileName = False ):
     name = self.getName()
@@ -117,8 +260,11 @@ class ConfigurationData:
     return self.dangerZoneEnd( None )
 
   def getSectionsFromCFG( self, path, cfg = False, ordered = False ):
-    if not cfg:
-      cfg = self.mergedCFG
+    if not cfg or cfg is self.mergedCFG:
+      sectionData = self.getCompiledCFG().getSection( path )
+      if sectionData is None:
+        return None
+      return list( sectionData[0] )
     self.dangerZoneStart()
     try:
       levelList = [ level.strip() for level in path.split( "/" ) if level.strip() != "" ]
@@ -130,8 +276,11 @@ class ConfigurationData:
     return self.dangerZoneEnd( None )
 
   def getOptionsFromCFG( self, path, cfg = False, ordered = False ):
-    if not cfg:
-      cfg = self.mergedCFG
+    if not cfg or cfg is self.mergedCFG:
+      sectionData = self.getCompiledCFG().getSection( path )
+      if sectionData is None:
+        return None
+      return list( sectionData[1] )
     self.dangerZoneStart()
     try:
       levelList = [ level.strip() for level in path.split( "/" ) if level.strip() != "" ]
@@ -143,8 +292,8 @@ class ConfigurationData:
     return self.dangerZoneEnd( None )
 
   def extractOptionFromCFG( self, path, cfg = False, disableDangerZones = False ):
-    if not cfg:
-      cfg = self.mergedCFG
+    if not cfg or cfg is self.mergedCFG:
+      return self.getCompiledCFG().getOption( path )
     if not disableDangerZones:
       self.dangerZoneStart()
     try:
@@ -234,6 +383,13 @@ class ConfigurationData:
     except:
       return 300
 
+  def getDeltaVersions( self ):
+    try:
+      return int( self.extractOptionFromCFG( "%s/DeltaVersions" % self.configurationPath,
+                                        self.mergedCFG ) )
+    except:
+      return 10
+
   def getSlavesGraceTime( self ):
     try:
       return int( self.extractOptionFromCFG( "%s/SlavesGraceTime" % self.configurationPath,
@@ -284,7 +440,14 @@ class ConfigurationData:
     self.sync()
 
   def getCompressedData( self ):
-    return self.compressedConfigurationData
+    compressedData = self.compressedConfigurationData
+    if compressedData is None:
+      remoteCFG = self.remoteCFG
+      compressedData = zlib.compress( str( remoteCFG ), 9 )
+      #Don't cache it if the remote CFG has been replaced meanwhile
+      if remoteCFG is self.remoteCFG:
+        self.compressedConfigurationData = compressedData
+    return compressedData
 
   def isMaster( self ):
     value = self.extractOptionFromCFG( "%s/Master" % self.configurationPath,
@@ -374,8 +537,10 @@ class ConfigurationData:
       self.__backupCurrentConfiguration( backupName )
     return S_OK()
 
-  def setRemoteCFG( self, cfg, disableSync = False ):
-    self.remoteCFG = cfg.clone()
+  def setRemoteCFG( self, cfg, disableSync = False, clone = True ):
+    if clone:
+      cfg = cfg.clone()
+    self.remoteCFG = cfg
     if not disableSync:
       self.sync()
 
@@ -15,16 +15,28 @@ from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 def _updateFromRemoteLocation( serviceClient ):
   gLogger.debug( "", "Trying to refresh from %s" % serviceClient.serviceURL )
   localVersion = gConfigurationData.getVersion()
-  retVal = serviceClient.getCompressedDataIfNewer( localVersion )
-  if retVal[ 'OK' ]:
-    dataDict = retVal[ 'Value' ]
-    if localVersion < dataDict[ 'newestVersion' ] :
-      gLogger.debug( "New version available", "Updating to version %s..." % dataDict[ 'newestVersion' ] )
+  retVal = serviceClient.getCompressedDeltaIfNewer( localVersion )
+  if not retVal[ 'OK' ] and retVal[ 'Message' ].find( "Unknown method" ) > -1:
+    #Old server, it can only send the whole configuration
+    retVal = serviceClient.getCompressedDataIfNewer( localVersion )
+  if not retVal[ 'OK' ]:
+    return retVal
+  dataDict = retVal[ 'Value' ]
+  if localVersion < dataDict[ 'newestVersion' ] :
+    gLogger.debug( "New version available", "Updating to version %s..." % dataDict[ 'newestVersion' ] )
+    if 'delta' in dataDict:
+      result = gConfigurationData.applyRemoteCompressedDelta( dataDict[ 'delta' ], dataDict[ 'newestVersion' ] )
+      if not result[ 'OK' ]:
+        gLogger.warn( "Cannot apply configuration delta. Getting the whole configuration", result[ 'Message' ] )
+        retVal = serviceClient.getCompressedDataIfNewer( localVersion )
+        if not retVal[ 'OK' ]:
+          return retVal
+        dataDict = retVal[ 'Value' ]
+    if 'data' in dataDict:
       gConfigurationData.loadRemoteCFGFromCompressedMem( dataDict[ 'data' ] )
-      gLogger.debug( "Updated to version %s" % gConfigurationData.getVersion() )
-      gEventDispatcher.triggerEvent( "CSNewVersion", dataDict[ 'newestVersion' ], threaded = True )
-    return S_OK()
-  return retVal
+    gLogger.debug( "Updated to version %s" % gConfigurationData.getVersion() )
+    gEventDispatcher.triggerEvent( "CSNewVersion", dataDict[ 'newestVersion' ], threaded = True )
+  return S_OK()
 
 
 class Refresher( threading.Thread ):
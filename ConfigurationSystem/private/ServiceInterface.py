@@ -22,6 +22,7 @@ class ServiceInterface( threading.Thread ):
     gLogger.info( "Initializing Configuration Service", "URL is %s" % sURL )
     self.__modificationsIgnoreMask = [ '/DIRAC/Configuration/Servers', '/DIRAC/Configuration/Version' ]
     gConfigurationData.setAsService()
+    gConfigurationData.keepVersionHistory( gConfigurationData.getDeltaVersions() )
     if not gConfigurationData.isMaster():
       gLogger.info( "Starting configuration service as slave" )
       gRefresher.autoRefreshAndPublish( self.sURL )
@@ -159,6 +160,9 @@ class ServiceInterface( threading.Thread ):
   def getCompressedConfigurationData( self ):
     return gConfigurationData.getCompressedData()
 
+  def getCompressedDataIfNewer( self, sClientVersion, useDelta = False ):
+    return gConfigurationData.getCompressedDataIfNewer( sClientVersion, useDelta = useDelta )
+
   def getVersion( self ):
     return gConfigurationData.getVersion()
 
@@ -0,0 +1,83 @@
+########################################################################
+# $HeadURL $
+# File: ConfigurationDataTests.py
+########################################################################
+
+""" :mod: ConfigurationDataTests
+    =======================
+
+    .. module: ConfigurationDataTests
+    :synopsis: test cases for ConfigurationData
+
+    test cases for the compiled view of the configuration
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+## SUT
+from DIRAC.ConfigurationSystem.private.ConfigurationData import ConfigurationData
+
+CFGDATA = """
+DIRAC
+{
+  Setup = Production
+  Configuration
+  {
+    Version = 2013-01-01 00:00:00
+  }
+}
+Systems
+{
+  WorkloadManagement
+  {
+    Sites = A, B
+    Agents
+    {
+    }
+  }
+}
+"""
+
+########################################################################
+class ConfigurationDataTestCase( unittest.TestCase ):
+  """
+  .. class:: ConfigurationDataTestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.confData = ConfigurationData( False )
+    self.confData.loadRemoteCFGFromMem( CFGDATA )
+
+  def testOptions( self ):
+    """ options are found whatever the path format """
+    self.assertEqual( self.confData.extractOptionFromCFG( "/DIRAC/Setup" ), "Production" )
+    self.assertEqual( self.confData.extractOptionFromCFG( "DIRAC//Setup/" ), "Production" )
+    self.assertEqual( self.confData.extractOptionFromCFG( "/DIRAC" ), None )
+    self.assertEqual( self.confData.extractOptionFromCFG( "/DIRAC/Setup/Nope" ), None )
+
+  def testSections( self ):
+    """ sections and options of a section """
+    self.assertEqual( self.confData.getSectionsFromCFG( "/" ), [ 'DIRAC', 'Systems' ] )
+    self.assertEqual( self.confData.getOptionsFromCFG( "/Systems/WorkloadManagement" ), [ 'Sites' ] )
+    self.assertEqual( self.confData.getSectionsFromCFG( "/Systems/WorkloadManagement/Sites" ), None )
+    sectionList = self.confData.getSectionsFromCFG( "/Systems/WorkloadManagement" )
+    sectionList.append( 'Services' )
+    self.assertEqual( self.confData.getSectionsFromCFG( "/Systems/WorkloadManagement" ), [ 'Agents' ] )
+
+  def testChanges( self ):
+    """ the compiled view follows the changes """
+    compiledCFG = self.confData.getCompiledCFG()
+    self.assertTrue( compiledCFG is self.confData.getCompiledCFG() )
+    self.confData.setOptionInCFG( "/DIRAC/Setup", "Certification" )
+    self.assertEqual( self.confData.extractOptionFromCFG( "/DIRAC/Setup" ), "Certification" )
+    self.assertEqual( compiledCFG.getOption( "/DIRAC/Setup" ), "Production" )
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( ConfigurationDataTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
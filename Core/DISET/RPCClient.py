@@ -18,6 +18,40 @@ class _MagicMethod:
   def __str__( self ):
     return "<RPCClient method %s>" % self.__remoteFuncName
 
+class RPCBatch:
+  """
+  Queue several calls to the same service and send them in one go
+
+    batch = rpcClient.batch()
+    batch.setJobStatus( jobID, status, minorStatus, source )
+    batch.setJobParameter( jobID, name, value )
+    result = batch.execute()
+
+  result is S_OK with the list of the results of each call in the same order
+  """
+
+  def __init__( self, innerRPCClient ):
+    self.__innerRPCClient = innerRPCClient
+    self.__callList = []
+
+  def __queueRPC( self, sFunctionName, args ):
+    self.__callList.append( ( sFunctionName, args ) )
+    return len( self.__callList ) - 1
+
+  def __getattr__( self, attrName ):
+    return _MagicMethod( self.__queueRPC, attrName )
+
+  def __len__( self ):
+    return len( self.__callList )
+
+  def execute( self ):
+    """
+    Send all the queued calls and empty the queue
+    """
+    callList = self.__callList
+    self.__callList = []
+    return self.__innerRPCClient.executeRPCBatch( callList )
+
 class RPCClient:
 
   def __init__( self, *args, **kwargs ):
@@ -33,6 +67,12 @@ class RPCClient:
     retVal = self.__innerRPCClient.executeRPC( sFunctionName, args )
     return retVal
 
+  def batch( self ):
+    """
+    Get a batch to queue calls that will be executed in one connection
+    """
+    return RPCBatch( self.__innerRPCClient )
+
   def __getattr__( self, attrName ):
     """
     Function for emulating the existance of functions
@@ -9,7 +9,7 @@ from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR, isReturnStructure
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
 from DIRAC.ConfigurationSystem.Client.Config import gConfig
 from DIRAC.Core.DISET.private.MessageBroker import getGlobalMessageBroker
-from DIRAC.Core.Utilities import Time
+from DIRAC.Core.Utilities import Time, List
 import DIRAC
 
 def getServiceOption( serviceInfo, optionName, defaultValue ):
@@ -116,8 +116,10 @@ class RequestHandler( object ):
     try:
       if actionType == "RPC":
         retVal = self.__doRPC( actionTuple[1] )
+      elif actionType == "BatchRPC":
+        retVal = self.__doBatchRPC( actionTuple[1] )
       elif actionType == "FileTransfer":
-        retVal = self.__doFileTransfer( actionTuple[1] )
+        retVal = self.__doFileTransfer( actionTuple[1], proposalTuple )
       elif actionType == "Connection":
         retVal = self.__doConnection( actionTuple[1] )
       else:
@@ -138,12 +140,14 @@ class RequestHandler( object ):
 #
 #####
 
-  def __doFileTransfer( self, sDirection ):
+  def __doFileTransfer( self, sDirection, proposalTuple = None ):
     """
     Execute a file transfer action
 
     @type sDirection: string
     @param sDirection: Direction of the transfer
+    @type proposalTuple: tuple
+    @param proposalTuple: Proposal sent by the client. It may ask for the streaming mode
     @return: S_OK/S_ERROR
     """
     retVal = self.__trPool.receive( self.__trid )
@@ -155,7 +159,14 @@ class RequestHandler( object ):
     if "transfer_%s" % sDirection not in dir( self ):
       self.__trPool.send( self.__trid, S_ERROR( "Service can't transfer files %s" % sDirection ) )
       return
-    retVal = self.__trPool.send( self.__trid, S_OK( "Accepted" ) )
+    streamingParams = False
+    if proposalTuple and len( proposalTuple ) > 3 and type( proposalTuple[3] ) == types.DictType:
+      if proposalTuple[3].get( 'fileStreaming' ):
+        streamingParams = FileHelper.getStreamingParams()
+    acceptMsg = S_OK( "Accepted" )
+    if streamingParams:
+      acceptMsg[ 'streaming' ] = streamingParams
+    retVal = self.__trPool.send( self.__trid, acceptMsg )
     if not retVal[ 'OK' ]:
       return retVal
     self.__logRemoteQuery( "FileTransfer/%s" % sDirection, fileInfo )
@@ -164,6 +175,7 @@ class RequestHandler( object ):
     try:
       try:
         fileHelper = FileHelper( self.__trPool.get( self.__trid ) )
+        fileHelper.setStreaming( streamingParams )
         if sDirection == "fromClient":
           fileHelper.setDirection( "fromClient" )
           uRetVal = self.transfer_fromClient( fileInfo[0], fileInfo[1], fileInfo[2], fileHelper )
@@ -229,6 +241,40 @@ class RequestHandler( object ):
     self.__logRemoteQuery( "RPC/%s" % method, args )
     return self.__RPCCallFunction( method, args )
 
+  def __doBatchRPC( self, methods ):
+    """
+    Execute several RPC actions received in one message
+
+    @type methods: string
+    @param methods: Comma separated list of the methods authorized for the batch
+    @return: S_OK( list of S_OK/S_ERROR results )
+    """
+    retVal = self.__trPool.receive( self.__trid )
+    if not retVal[ 'OK' ]:
+      raise RequestHandler.ConnectionError( "Error while receiving arguments %s %s" % ( self.srv_getFormattedRemoteCredentials(),
+                                                                         retVal[ 'Message' ] ) )
+    callList = retVal[ 'Value' ]
+    if type( callList ) not in ( types.ListType, types.TupleType ):
+      return S_ERROR( "A batch must be a list of ( method, args )" )
+    authorizedMethods = List.fromChar( methods, "," )
+    results = []
+    for method, args in callList:
+      if method not in authorizedMethods:
+        results.append( S_ERROR( "Method %s was not proposed in the batch" % method ) )
+        continue
+      self.serviceInfoDict[ 'actionTuple' ] = ( 'RPC', method )
+      self.__logRemoteQuery( "RPC/%s" % method, args )
+      startTime = time.time()
+      uReturnValue = self.__RPCCallFunction( method, args )
+      if not isReturnStructure( uReturnValue ):
+        message = "Method %s for action RPC does not have a return value!" % method
+        gLogger.error( message )
+        uReturnValue = S_ERROR( message )
+      self.__logRemoteQueryResponse( uReturnValue, time.time() - startTime )
+      results.append( uReturnValue )
+    self.serviceInfoDict[ 'actionTuple' ] = ( 'BatchRPC', methods )
+    return S_OK( results )
+
   def __RPCCallFunction( self, method, args ):
     realMethod = "export_%s" % method
     gLogger.debug( "RPC to %s" % realMethod )
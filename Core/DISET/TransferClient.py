@@ -9,6 +9,9 @@ from DIRAC.Core.Utilities import File
 
 class TransferClient( BaseClient ):
 
+  #Ask the server for the streaming mode (see FileHelper.setStreaming)
+  _useStreaming = True
+
   def _sendTransferHeader( self, actionName, fileInfo ):
     """
     Send the header of the transfer
@@ -25,7 +28,10 @@ class TransferClient( BaseClient ):
     trid, transport = retVal[ 'Value' ]
     try:
       #FFC -> File from Client
-      retVal = self._proposeAction( transport, ( "FileTransfer", actionName ) )
+      actionOptions = {}
+      if self._useStreaming:
+        actionOptions[ 'fileStreaming' ] = True
+      retVal = self._proposeAction( transport, ( "FileTransfer", actionName ), actionOptions )
       if not retVal[ 'OK' ]:
         return retVal
       retVal = transport.sendData( S_OK( fileInfo ) )
@@ -34,7 +40,10 @@ class TransferClient( BaseClient ):
       retVal = transport.receiveData()
       if not retVal[ 'OK' ]:
         return retVal
-      return S_OK( ( trid, transport ) )
+      result = S_OK( ( trid, transport ) )
+      #Servers that know the streaming mode send its parameters with the acceptance
+      result[ 'streaming' ] = retVal.get( 'streaming', False )
+      return result
     except Exception, e:
       self._disconnect( trid )
       return S_ERROR( "Cound not request transfer: %s" % str( e ) )
@@ -64,6 +73,7 @@ class TransferClient( BaseClient ):
     trid, transport = retVal[ 'Value' ]
     try:
       fileHelper.setTransport( transport )
+      fileHelper.setStreaming( retVal[ 'streaming' ] )
       retVal = fileHelper.FDToNetwork( fd )
       if not retVal[ 'OK' ]:
         return retVal
@@ -98,6 +108,7 @@ class TransferClient( BaseClient ):
     trid, transport = retVal[ 'Value' ]
     try:
       fileHelper.setTransport( transport )
+      fileHelper.setStreaming( retVal[ 'streaming' ] )
       retVal = fileHelper.networkToDataSink( dS )
       if not retVal[ 'OK' ]:
         return retVal
@@ -144,10 +155,12 @@ class TransferClient( BaseClient ):
     trid, transport = retVal[ 'Value' ]
     try:
       fileHelper = FileHelper( transport )
+      fileHelper.setStreaming( retVal[ 'streaming' ] )
       retVal = fileHelper.bulkToNetwork( fileList, compress, onthefly )
       if not retVal[ 'OK' ]:
         return retVal
-      retVal = transport.receiveData()      return retVal
+      retVal = transport.receiveData()
+      return retVal
     finally:
       self._disconnect( trid )
 
@@ -177,6 +190,7 @@ class TransferClient( BaseClient ):
     trid, transport = retVal[ 'Value' ]
     try:
       fileHelper = FileHelper( transport )
+      fileHelper.setStreaming( retVal[ 'streaming' ] )
       retVal = fileHelper.networkToBulk( destDir, compress )
       if not retVal[ 'OK' ]:
         return retVal
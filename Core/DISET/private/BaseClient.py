@@ -3,6 +3,10 @@ __RCSID__ = "$Id$"
 
 import types
 import thread
+try:
+  from hashlib import md5
+except:
+  from md5 import md5
 import DIRAC
 from DIRAC.Core.DISET.private.Protocols import gProtocolDict
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
@@ -12,7 +16,9 @@ from DIRAC.ConfigurationSystem.Client.Config import gConfig
 from DIRAC.ConfigurationSystem.Client.PathFinder import getServiceURL
 from DIRAC.Core.Security import CS
 from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
+from DIRAC.Core.DISET.private.ConnectionPool import getGlobalConnectionPool
 from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
+from DIRAC.Core.Utilities import DEncodeV2
 
 class BaseClient:
 
@@ -31,6 +37,7 @@ class BaseClient:
   KW_PROXY_CHAIN = "proxyChain"
   KW_SKIP_CA_CHECK = "skipCACheck"
   KW_KEEP_ALIVE_LAPSE = "keepAliveLapse"
+  KW_KEEP_CONNECTION = "keepConnection"
 
   __threadConfig = ThreadConfig()
 
@@ -45,10 +52,14 @@ class BaseClient:
     self.__idDict = {}
     self.__extraCredentials = ""
     self.__enableThreadCheck = False
+    self.__keepConnection = False
+    self.__codecs = []
     for initFunc in ( self.__discoverSetup, self.__discoverVO, self.__discoverTimeout,
                       self.__discoverURL, self.__discoverCredentialsToUse,
                       self.__checkTransportSanity,
-                      self.__setKeepAliveLapse ):
+                      self.__setKeepAliveLapse,
+                      self.__discoverKeepConnection,
+                      self.__discoverCodecs ):
       result = initFunc()
       if not result[ 'OK' ] and self.__initStatus[ 'OK' ]:
         self.__initStatus = result
@@ -213,18 +224,25 @@ and this is thread %s
       #raise Exception( msgTxt )
 
 
-  def _connect( self ):
+  def _connect( self, reuseConnection = True ):
     deco = self.__threadConfig.getDecorator()
     if callable( deco ):
-      return deco( self.__innerConnect )()
-    return self.__innerConnect()
+      return deco( self.__innerConnect )( reuseConnection )
+    return self.__innerConnect( reuseConnection )
 
-  def __innerConnect( self ):
+  def __innerConnect( self, reuseConnection = True ):
     self.__discoverExtraCredentials()
     if not self.__initStatus[ 'OK' ]:
       return self.__initStatus
     if self.__enableThreadCheck:
       self.__checkThreadID()
+    if self.__keepConnection and reuseConnection:
+      transport = getGlobalConnectionPool().get( self.__getConnectionKey() )
+      if transport:
+        trid = getGlobalTransportPool().add( transport )
+        result = S_OK( ( trid, transport ) )
+        result[ 'reusedConnection' ] = True
+        return result
     gLogger.debug( "Connecting to: %s" % self.serviceURL )
     try:
       transport = gProtocolDict[ self.__URLTuple[0] ][ 'transport' ]( self.__URLTuple[1:3], **self.kwargs )
@@ -236,15 +254,44 @@ and this is thread %s
     trid = getGlobalTransportPool().add( transport )
     return S_OK( ( trid, transport ) )
 
-  def _disconnect( self, trid ):
+  def _disconnect( self, trid, keepConnection = False ):
+    if keepConnection and self.__keepConnection:
+      transport = getGlobalTransportPool().remove( trid )
+      if transport:
+        getGlobalConnectionPool().release( self.__getConnectionKey(), transport )
+      return
     getGlobalTransportPool().close( trid )
 
-  def _proposeAction( self, transport, action ):
+  def __getConnectionKey( self ):
+    """
+    Connections can only be shared between clients talking to the same URL
+    with the same credentials
+    """
+    proxyString = self.kwargs.get( self.KW_PROXY_STRING, "" )
+    if proxyString:
+      proxyString = md5( proxyString ).hexdigest()
+    return ( self.serviceURL,
+             self.useCertificates,
+             self.kwargs.get( self.KW_PROXY_LOCATION, "" ),
+             proxyString,
+             self.kwargs.get( self.KW_SKIP_CA_CHECK, False ),
+             str( self.__extraCredentials ) )
+
+  def _proposeAction( self, transport, action, actionOptions = None ):
     if not self.__initStatus[ 'OK' ]:
       return self.__initStatus
     stConnectionInfo = ( ( self.__URLTuple[3], self.setup, self.vo ),
                          action,
                          self.__extraCredentials )
+    proposalOptions = {}
+    if actionOptions:
+      proposalOptions.update( actionOptions )
+    if self.__keepConnection and action[0] in ( "RPC", "BatchRPC" ):
+      proposalOptions[ 'keepAlive' ] = True
+    if self.__codecs:
+      proposalOptions[ 'codecs' ] = self.__codecs
+    if proposalOptions:
+      stConnectionInfo += ( proposalOptions, )
     retVal = transport.sendData( S_OK( stConnectionInfo ) )
     if not retVal[ 'OK' ]:
       return retVal
@@ -256,6 +303,9 @@ and this is thread %s
       if 'delegate' in serverRequirements:
         gLogger.debug( "A delegation is requested" )
         serverReturn = self.__delegateCredentials( transport, serverRequirements[ 'delegate' ] )
+    #Use the encoding the server has agreed on
+    if serverReturn[ 'OK' ]:
+      transport.setSendCodec( serverReturn.get( 'codec', 'v1' ) )
     return serverReturn
 
   def __delegateCredentials( self, transport, delegationRequest ):
@@ -290,6 +340,21 @@ and this is thread %s
     self.kwargs[ self.KW_KEEP_ALIVE_LAPSE ] = kaa
     return S_OK()
 
+  def __discoverKeepConnection( self ):
+    if self.KW_KEEP_CONNECTION in self.kwargs:
+      self.__keepConnection = bool( self.kwargs[ self.KW_KEEP_CONNECTION ] )
+    else:
+      self.__keepConnection = gConfig.getValue( "/DIRAC/KeepConnections", False )
+    return S_OK()
+
+  def __discoverCodecs( self ):
+    if gConfig.getValue( "/DIRAC/DISET/EnableCodecV2", True ):
+      self.__codecs = [ DEncodeV2.CODEC_NAME ]
+    return S_OK()
+
+  def keepsConnection( self ):
+    return self.__keepConnection
+
   def _getBaseStub( self ):
     newKwargs = dict( self.kwargs )
     #Set DN
@@ -0,0 +1,123 @@
+# $HeadURL$
+"""
+  ConnectionPool keeps authenticated client transports open so that several
+  sequential RPCs to the same service with the same credentials can reuse them
+  instead of paying a new connection and SSL handshake per call
+"""
+__RCSID__ = "$Id$"
+
+import time
+import select
+import threading
+from DIRAC.FrameworkSystem.Client.Logger import gLogger
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
+
+class ConnectionPool:
+
+  def __init__( self, maxIdleTime = 30, maxConnectionsPerKey = 4 ):
+    self.__maxIdleTime = maxIdleTime
+    self.__maxConnectionsPerKey = maxConnectionsPerKey
+    self.__lock = threading.Lock()
+    #connKey -> [ ( transport, lastUsed ), ... ]
+    self.__idle = {}
+    self.__log = gLogger.getSubLogger( "ConnectionPool" )
+    result = gThreadScheduler.addPeriodicTask( maxIdleTime, self.purgeIdle )
+    if not result[ 'OK' ]:
+      self.__log.error( "Cannot add idle purge task to thread scheduler", result[ 'Message' ] )
+
+  def setMaxIdleTime( self, maxIdleTime ):
+    self.__maxIdleTime = maxIdleTime
+
+  def __isHealthy( self, transport, lastUsed ):
+    """
+    An idle transport is usable if it has not been idle for too long and nothing
+    is waiting to be read from it (data on an idle socket means EOF or garbage)
+    """
+    if time.time() - lastUsed > self.__maxIdleTime:
+      return False
+    try:
+      inList = select.select( [ transport.getSocket() ], [], [], 0 )[0]
+    except Exception:
+      return False
+    return not inList
+
+  def __closeTransport( self, transport ):
+    try:
+      transport.close()
+    except Exception:
+      pass
+
+  def get( self, connKey ):
+    """
+    Get a healthy idle transport for the key or None if there is none
+    """
+    while True:
+      self.__lock.acquire()
+      try:
+        try:
+          transport, lastUsed = self.__idle[ connKey ].pop()
+        except ( KeyError, IndexError ):
+          return None
+        if not self.__idle[ connKey ]:
+          del( self.__idle[ connKey ] )
+      finally:
+        self.__lock.release()
+      if self.__isHealthy( transport, lastUsed ):
+        self.__log.debug( "Reusing connection to %s" % connKey[0] )
+        return transport
+      self.__log.debug( "Discarding stale connection to %s" % connKey[0] )
+      self.__closeTransport( transport )
+
+  def release( self, connKey, transport ):
+    """
+    Give back a transport after a successful RPC so it can be reused
+    """
+    self.__lock.acquire()
+    try:
+      idleList = self.__idle.setdefault( connKey, [] )
+      if len( idleList ) < self.__maxConnectionsPerKey:
+        idleList.append( ( transport, time.time() ) )
+        return
+    finally:
+      self.__lock.release()
+    self.__closeTransport( transport )
+
+  def purgeIdle( self ):
+    """
+    Close all the transports that have been idle for more than the max idle time
+    """
+    limit = time.time() - self.__maxIdleTime
+    toClose = []
+    self.__lock.acquire()
+    try:
+      for connKey in list( self.__idle ):
+        idleList = self.__idle[ connKey ]
+        toClose.extend( [ transport for transport, lastUsed in idleList if lastUsed < limit ] )
+        idleList = [ ( transport, lastUsed ) for transport, lastUsed in idleList if lastUsed >= limit ]
+        if idleList:
+          self.__idle[ connKey ] = idleList
+        else:
+          del( self.__idle[ connKey ] )
+    finally:
+      self.__lock.release()
+    for transport in toClose:
+      self.__closeTransport( transport )
+
+  def closeAll( self ):
+    self.__lock.acquire()
+    try:
+      idle = self.__idle
+      self.__idle = {}
+    finally:
+      self.__lock.release()
+    for connKey in idle:
+      for transport, lastUsed in idle[ connKey ]:
+        self.__closeTransport( transport )
+
+gConnectionPool = None
+
+def getGlobalConnectionPool():
+  global gConnectionPool
+  if not gConnectionPool:
+    gConnectionPool = ConnectionPool()
+  return gConnectionPool
@@ -9,6 +9,7 @@ except:
   import md5
 import types
 import threading
+import Queue
 import cStringIO
 import tarfile
 import tempfile
@@ -17,14 +18,77 @@ from DIRAC.FrameworkSystem.Client.Logger import gLogger
 
 gLogger = gLogger.getSubLogger( "FileTransmissionHelper" )
 
+class AsyncHash( threading.Thread ):
+  """
+  Update a hash in a separate thread so it's computed while the next chunk is on the wire.
+  hashlib releases the GIL for big buffers. If nothing arrives for a while the thread exits
+  and the updates are done inline
+  """
+
+  def __init__( self, hashObj, idleTimeout = 120 ):
+    threading.Thread.__init__( self )
+    self.setDaemon( True )
+    self.__hash = hashObj
+    self.__idleTimeout = idleTimeout
+    self.__queue = Queue.Queue( 8 )
+    self.__lock = threading.Lock()
+    self.__stopped = False
+    self.__digest = None
+    self.start()
+
+  def run( self ):
+    while True:
+      try:
+        data = self.__queue.get( timeout = self.__idleTimeout )
+      except Queue.Empty:
+        self.__lock.acquire()
+        try:
+          if self.__queue.empty():
+            self.__stopped = True
+            return
+        finally:
+          self.__lock.release()
+        continue
+      if data is None:
+        return
+      self.__hash.update( data )
+
+  def update( self, data ):
+    self.__lock.acquire()
+    try:
+      if self.__stopped:
+        self.__hash.update( data )
+      else:
+        self.__queue.put( data )
+    finally:
+      self.__lock.release()
+
+  def hexdigest( self ):
+    if self.__digest is None:
+      self.__lock.acquire()
+      try:
+        if not self.__stopped:
+          self.__queue.put( None )
+      finally:
+        self.__lock.release()
+      self.join()
+      self.__digest = self.__hash.hexdigest()
+    return self.__digest
+
 class FileHelper:
 
   __validDirections = ( "toClient", "fromClient", 'receive', 'send' )
   __directionsMapping = { 'toClient' : 'send', 'fromClient' : 'receive' }
 
+  #Streaming mode: the receiver acknowledges every ackEvery packets and the sender
+  #keeps up to twice that number of packets in flight
+  streamingPacketSize = 4194304
+  streamingAckEvery = 4
+
   def __init__( self, oTransport = None, checkSum = True ):
     self.oTransport = oTransport
     self.__checkMD5 = checkSum
+    self.__streaming = False
     self.__oMD5 = md5.md5()
     self.bFinishedTransmission = False
     self.bReceivedEOF = False
@@ -33,6 +97,53 @@ class FileHelper:
     self.__fileBytes = 0
     self.__log = gLogger.getSubLogger( "FileHelper" )
 
+  @classmethod
+  def getStreamingParams( cls ):
+    """
+    Parameters of the streaming mode sent by the server to the client when it's accepted
+    """
+    return { 'ackEvery' : cls.streamingAckEvery }
+
+  def setStreaming( self, streamingParams ):
+    """
+    Enable the streaming mode with the parameters agreed in the transfer header.
+    A False value keeps the packet by packet acknowledged mode
+    """
+    if not streamingParams:
+      self.__streaming = False
+      return
+    self.__streaming = True
+    self.__ackEvery = max( 1, int( streamingParams.get( 'ackEvery', self.streamingAckEvery ) ) )
+    self.__window = 2 * self.__ackEvery
+    self.__inFlight = 0
+    self.__receivedPackets = 0
+    self.packetSize = self.streamingPacketSize
+
+  def isStreaming( self ):
+    return self.__streaming
+
+  def __resetHash( self ):
+    if self.__streaming and self.__checkMD5:
+      self.__oMD5 = AsyncHash( md5.md5() )
+    else:
+      self.__oMD5 = md5.md5()
+
+  def __endOfTransferMsg( self ):
+    endMsg = S_OK()
+    endMsg[ 'EndOfTransfer' ] = True
+    return endMsg
+
+  def __waitEndOfTransfer( self ):
+    """
+    Skip the pending acknowledgements until the receiver confirms the end of the transfer
+    """
+    while True:
+      retVal = self.oTransport.receiveData()
+      if not retVal[ 'OK' ]:
+        return retVal
+      if retVal.get( 'EndOfTransfer' ):
+        return S_OK()
+
   def disableCheckSum( self ):
     self.__checkMD5 = False
     
@@ -61,13 +172,40 @@ class FileHelper:
     retVal = self.oTransport.sendData( S_OK( ( True, sBuffer ) ) )
     if not retVal[ 'OK' ]:
       return retVal
+    if not self.__streaming:
+      retVal = self.oTransport.receiveData()
+      return retVal
+    self.__inFlight += 1
+    if self.__inFlight < self.__window:
+      return S_OK()
     retVal = self.oTransport.receiveData()
-    return retVal
+    if not retVal[ 'OK' ]:
+      return retVal
+    if retVal.get( 'AbortTransfer' ):
+      #Tell the receiver we have stopped and wait for it to drain what is in flight
+      abortTrans = S_OK( ( False, "" ) )
+      abortTrans[ 'AbortTransfer' ] = True
+      result = self.oTransport.sendData( abortTrans )
+      if not result[ 'OK' ]:
+        return result
+      result = self.__waitEndOfTransfer()
+      if not result[ 'OK' ]:
+        return result
+      self.__finishedTransmission()
+      return retVal
+    self.__inFlight -= self.__ackEvery
+    return S_OK()
 
   def sendEOF( self ):
+    if self.bFinishedTransmission:
+      return S_OK()
     retVal = self.oTransport.sendData( S_OK( ( False, self.__oMD5.hexdigest() ) ) )
     if not retVal[ 'OK' ]:
       return retVal
+    if self.__streaming:
+      retVal = self.__waitEndOfTransfer()
+      if not retVal[ 'OK' ]:
+        return retVal
     self.__finishedTransmission()
     return S_OK()
 
@@ -81,7 +219,10 @@ class FileHelper:
   def receiveData( self, maxBufferSize = 0 ):
     retVal = self.oTransport.receiveData( maxBufferSize = maxBufferSize )
     if 'AbortTransfer' in retVal and retVal[ 'AbortTransfer' ]:
-      self.oTransport.sendData( S_OK() )
+      if self.__streaming:
+        self.oTransport.sendData( self.__endOfTransferMsg() )
+      else:
+        self.oTransport.sendData( S_OK() )
       self.__finishedTransmission()
       self.bReceivedEOF = True
       return S_OK( '' )
@@ -89,13 +230,21 @@ class FileHelper:
       return retVal
     stBuffer = retVal[ 'Value' ]
     if stBuffer[0]:
+      #Acknowledge before hashing so the sender can go on
+      if not self.__streaming:
+        self.oTransport.sendData( S_OK() )
+      else:
+        self.__receivedPackets += 1
+        if self.__receivedPackets % self.__ackEvery == 0:
+          self.oTransport.sendData( S_OK() )
       if self.__checkMD5:
         self.__oMD5.update( stBuffer[1] )
-      self.oTransport.sendData( S_OK() )
     else:
       self.bReceivedEOF = True
       if self.__checkMD5 and not self.__oMD5.hexdigest() == stBuffer[1]:
         self.bErrorInMD5 = True
+      if self.__streaming:
+        self.oTransport.sendData( self.__endOfTransferMsg() )
       self.__finishedTransmission()
       return S_OK( "" )
     return S_OK( stBuffer[1] )
@@ -105,7 +254,17 @@ class FileHelper:
 
   def markAsTransferred( self ):
     if not self.bFinishedTransmission:
-      if self.direction == "receive":
+      if self.direction == "receive" and self.__streaming:
+        abortTrans = S_OK()
+        abortTrans[ 'AbortTransfer' ] = True
+        self.oTransport.sendData( abortTrans )
+        #Drop what is in flight until the sender stops
+        while True:
+          retVal = self.oTransport.receiveData()
+          if not retVal[ 'OK' ] or retVal.get( 'AbortTransfer' ) or not retVal[ 'Value' ][0]:
+            break
+        self.oTransport.sendData( self.__endOfTransferMsg() )
+      elif self.direction == "receive":
         self.oTransport.receiveData()
         abortTrans = S_OK()
         abortTrans[ 'AbortTransfer' ] = True
@@ -116,11 +275,17 @@ class FileHelper:
         retVal = self.oTransport.sendData( abortTrans )
         if not retVal[ 'OK' ]:
           return retVal
-        self.oTransport.receiveData()
+        if self.__streaming:
+          self.__waitEndOfTransfer()
+        else:
+          self.oTransport.receiveData()
     self.__finishedTransmission()
 
   def __finishedTransmission( self ):
     self.bFinishedTransmission = True
+    #Aborted transfers would leave the hash thread waiting for data
+    if isinstance( self.__oMD5, AsyncHash ):
+      self.__oMD5.hexdigest()
 
   def finishedTransmission( self ):
     return self.bFinishedTransmission
@@ -151,7 +316,7 @@ class FileHelper:
   def networkToDataSink( self, dataSink, maxFileSize = 0 ):
     if "write" not in dir( dataSink ):
       return S_ERROR( "%s data sink object does not have a write method" % str( dataSink ) )
-    self.__oMD5 = md5.md5()
+    self.__resetHash()
     self.bReceivedEOF = False
     self.bErrorInMD5 = False
     receivedBytes = 0
@@ -211,7 +376,7 @@ class FileHelper:
     return S_OK()
 
   def FDToNetwork( self, iFD ):
-    self.__oMD5 = md5.md5()
+    self.__resetHash()
     iPacketSize = self.packetSize
     self.__fileBytes = 0
     sentBytes = 0
@@ -226,7 +391,9 @@ class FileHelper:
           return S_OK()
         sentBytes += len( sBuffer )
         sBuffer = os.read( iFD, iPacketSize )
-      self.sendEOF()
+      dRetVal = self.sendEOF()
+      if not dRetVal[ 'OK' ]:
+        return dRetVal
     except Exception, e:
       gLogger.exception( "Error while sending file" )
       return S_ERROR( "Error while sending file: %s" % str( e ) )
@@ -243,7 +410,7 @@ class FileHelper:
   def DataSourceToNetwork( self, dataSource ):
     if "read" not in dir( dataSource ):
       return S_ERROR( "%s data source object does not have a read method" % str( dataSource ) )
-    self.__oMD5 = md5.md5()
+    self.__resetHash()
     iPacketSize = self.packetSize
     self.__fileBytes = 0
     sentBytes = 0
@@ -258,7 +425,9 @@ class FileHelper:
           return S_OK()
         sentBytes += len( sBuffer )
         sBuffer = dataSource.read( iPacketSize )
-      self.sendEOF()
+      dRetVal = self.sendEOF()
+      if not dRetVal[ 'OK' ]:
+        return dRetVal
     except Exception, e:
       gLogger.exception( "Error while sending file" )
       return S_ERROR( "Error while sending file: %s" % str( e ) )
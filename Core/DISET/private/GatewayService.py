@@ -1,6 +1,7 @@
 
 import os
 import cStringIO
+import types
 import DIRAC
 from DIRAC import gConfig, gLogger, S_OK, S_ERROR
 from DIRAC.Core.Utilities import List, Time
@@ -47,6 +48,8 @@ class GatewayService( Service ):
     self._msgBroker.useMessageObjects( False )
     getGlobalMessageBroker().useMessageObjects( False )
     self._msgForwarder = MessageForwarder( self._msgBroker )
+    #Keep the last CS versions to serve deltas
+    gConfigurationData.keepVersionHistory( gConfigurationData.getDeltaVersions() )
     return S_OK()
 
   #Threaded process function
@@ -79,6 +82,10 @@ class GatewayService( Service ):
       self._transportPool.close( trid )
     return result
 
+  def _acceptKeepAlive( self, proposalTuple, servedProposals ):
+    #Forwarded connections are always closed after the action
+    return False
+
   def _receiveAndCheckProposal( self, trid ):
     clientTransport = self._transportPool.get( trid )
     #Get the peer credentials
@@ -182,12 +189,25 @@ class GatewayService( Service ):
       return
     if actionType == "FileTransfer":
       gLogger.warn( "Received a file transfer action from %s" % idString )
-      clientTransport.sendData( S_OK( "Accepted" ) )
+      acceptMsg = S_OK( "Accepted" )
+      streamingParams = False
+      if len( proposalTuple ) > 3 and type( proposalTuple[3] ) == types.DictType:
+        if proposalTuple[3].get( 'fileStreaming' ):
+          streamingParams = FileHelper.getStreamingParams()
+          acceptMsg[ 'streaming' ] = streamingParams
+      clientTransport.sendData( acceptMsg )
       retVal = self.__forwardFileTransferCall( targetService, clientInitArgs,
-                                                actionMethod, retVal[ 'Value' ], clientTransport )
+                                                actionMethod, retVal[ 'Value' ], clientTransport,
+                                                streamingParams )
     elif actionType == "RPC":
       gLogger.info( "Forwarding %s/%s action to %s for %s" % ( actionType, actionMethod, targetService, idString ) )
       retVal = self.__forwardRPCCall( targetService, clientInitArgs, actionMethod, retVal[ 'Value' ] )
+    elif actionType == "BatchRPC":
+      gLogger.info( "Forwarding %s/%s action to %s for %s" % ( actionType, actionMethod, targetService, idString ) )
+      retVal = RPCClient( targetService, **clientInitArgs ).executeRPCBatch( retVal[ 'Value' ] )
+      if retVal[ 'OK' ]:
+        for callResult in retVal[ 'Value' ]:
+          callResult.pop( 'rpcStub', None )
     elif actionType == "Connection" and actionMethod == "new":
       gLogger.info( "Initiating a messaging connection to %s for %s" % ( targetService, idString ) )
       retVal = self._msgForwarder.addClient( trid, targetService, clientInitArgs, retVal[ 'Value' ] )
@@ -202,24 +222,21 @@ class GatewayService( Service ):
 
   def __forwardRPCCall( self, targetService, clientInitArgs, method, params ):
     if targetService == "Configuration/Server":
-      if method == "getCompressedDataIfNewer":
+      if method in ( "getCompressedDataIfNewer", "getCompressedDeltaIfNewer" ):
         #Relay CS data directly
-        serviceVersion = gConfigurationData.getVersion()
-        retDict = { 'newestVersion' : serviceVersion }
-        clientVersion = params[0]
-        if clientVersion < serviceVersion:
-          retDict[ 'data' ] = gConfigurationData.getCompressedData()
-        return S_OK( retDict )
+        return S_OK( gConfigurationData.getCompressedDataIfNewer( params[0],
+                                                                  useDelta = method == "getCompressedDeltaIfNewer" ) )
     #Default
     rpcClient = RPCClient( targetService, **clientInitArgs )
     methodObj = getattr( rpcClient, method )
     return methodObj( *params )
 
   def __forwardFileTransferCall( self, targetService, clientInitArgs, method,
-                                 params, clientTransport ):
+                                 params, clientTransport, streamingParams = False ):
     transferRelay = TransferRelay( targetService, **clientInitArgs )
     transferRelay.setTransferLimit( self.__transferBytesLimit )
     cliFH = FileHelper( clientTransport )
+    cliFH.setStreaming( streamingParams )
     #Check file size
     if method.find( "ToClient" ) > -1:
       cliFH.setDirection( "send" )
@@ -286,9 +303,10 @@ class TransferRelay( TransferClient ):
       self.errMsg( "Could not send header", result[ 'Message' ] )
       return result
     self.infoMsg( "Starting to send data to service" )
-    srvTransport = result[ 'Value' ]
+    trid, srvTransport = result[ 'Value' ]
     srvFileHelper = FileHelper( srvTransport )
     srvFileHelper.setDirection( "send" )
+    srvFileHelper.setStreaming( result[ 'streaming' ] )
     result = srvFileHelper.BufferToNetwork( data )
     if not result[ 'OK' ]:
       self.errMsg( "Could send data to server", result[ 'Message' ] )
@@ -309,6 +327,7 @@ class TransferRelay( TransferClient ):
     trid, srvTransport = result[ 'Value' ]
     srvFileHelper = FileHelper( srvTransport )
     srvFileHelper.setDirection( "receive" )
+    srvFileHelper.setStreaming( result[ 'streaming' ] )
     sIO = cStringIO.StringIO()
     result = srvFileHelper.networkToDataSink( sIO, self.__transferBytesLimit )
     if not result[ 'OK' ]:
@@ -378,7 +397,7 @@ class TransferRelay( TransferClient ):
     if not result[ 'OK' ]:
       self.errMsg( "Could not send header", result[ 'Message' ] )
       return result
-    srvTransport = result[ 'Value' ]
+    trid, srvTransport = result[ 'Value' ]
     response = srvTransport.receiveData( 1048576 )
     srvTransport.close()
     self.infoMsg( "Sending data back to client" )
@@ -14,19 +14,76 @@ class InnerRPCClient( BaseClient ):
     if not retVal[ 'OK' ]:
       retVal[ 'rpcStub' ] = stub
       return retVal
+    reusedConnection = retVal.get( 'reusedConnection', False )
     trid, transport = retVal[ 'Value' ]
+    keepConnection = False
     try:
       retVal = self._proposeAction( transport, ( "RPC", functionName ) )
+      if not retVal[ 'OK' ] and reusedConnection:
+        #The server may have dropped an idle connection. Nothing has been executed yet so retry with a new one
+        self._disconnect( trid )
+        retVal = self._connect( reuseConnection = False )
+        if not retVal[ 'OK' ]:
+          retVal[ 'rpcStub' ] = stub
+          return retVal
+        trid, transport = retVal[ 'Value' ]
+        retVal = self._proposeAction( transport, ( "RPC", functionName ) )
       if not retVal[ 'OK' ]:
         retVal[ 'rpcStub' ] = stub
         return retVal
+      serverKeepsConnection = retVal.get( 'keepAlive', False )
       retVal = transport.sendData( S_OK( args ) )
       if not retVal[ 'OK' ]:
         return retVal
       receivedData = transport.receiveData()
       if type( receivedData ) == types.DictType:
+        keepConnection = serverKeepsConnection and receivedData.get( 'OK', False )
         receivedData[ 'rpcStub' ] = stub
       return receivedData
     finally:
-      self._disconnect( trid )
+      self._disconnect( trid, keepConnection )
 
+  def __executeRPCBatch( self, callList ):
+    baseStub = self._getBaseStub()
+    functionNames = []
+    for functionName, args in callList:
+      if functionName not in functionNames:
+        functionNames.append( functionName )
+    retVal = self._connect()
+    if not retVal[ 'OK' ]:
+      return retVal
+    trid, transport = retVal[ 'Value' ]
+    keepConnection = False
+    try:
+      retVal = self._proposeAction( transport, ( "BatchRPC", ",".join( functionNames ) ) )
+      if not retVal[ 'OK' ]:
+        return retVal
+      serverKeepsConnection = retVal.get( 'keepAlive', False )
+      retVal = transport.sendData( S_OK( [ ( functionName, tuple( args ) ) for functionName, args in callList ] ) )
+      if not retVal[ 'OK' ]:
+        return retVal
+      receivedData = transport.receiveData()
+      if type( receivedData ) != types.DictType or not receivedData.get( 'OK' ):
+        return receivedData
+      keepConnection = serverKeepsConnection
+      results = receivedData[ 'Value' ]
+      for iP in range( min( len( results ), len( callList ) ) ):
+        if type( results[ iP ] ) == types.DictType:
+          results[ iP ][ 'rpcStub' ] = ( baseStub, callList[ iP ][0], tuple( callList[ iP ][1] ) )
+      return S_OK( results )
+    finally:
+      self._disconnect( trid, keepConnection )
+
+  def executeRPCBatch( self, callList ):
+    """
+    Execute several RPCs to the same service in one connection.
+    callList is a list of ( functionName, args ) tuples. Returns S_OK with the list
+    of the individual S_OK/S_ERROR results in the same order
+    """
+    if not callList:
+      return S_OK( [] )
+    result = self.__executeRPCBatch( callList )
+    if not result[ 'OK' ] and result[ 'Message' ].find( "is not a known action type" ) > -1:
+      #Old server. Execute the calls one by one
+      return S_OK( [ self.executeRPC( functionName, tuple( args ) ) for functionName, args in callList ] )
+    return result
@@ -1,10 +1,12 @@
 
 import os
 import time
+import types
+import select
 import DIRAC
 import threading
 from DIRAC import gConfig, gLogger, S_OK, S_ERROR, gMonitor
-from DIRAC.Core.Utilities import List, Time, MemStat
+from DIRAC.Core.Utilities import List, Time, MemStat, DEncodeV2
 from DIRAC.Core.DISET.private.LockManager import LockManager
 from DIRAC.FrameworkSystem.Client.MonitoringClient import MonitoringClient
 from DIRAC.Core.DISET.private.ServiceConfiguration import ServiceConfiguration
@@ -24,8 +26,11 @@ class Service:
   SVC_VALID_ACTIONS = { 'RPC' : 'export',
                         'FileTransfer': 'transfer',
                         'Message' : 'msg',
-                        'Connection' : 'Message' }
+                        'Connection' : 'Message',
+                        'BatchRPC' : 'RPC' }
   SVC_SECLOG_CLIENT = SecurityLogClient()
+  #Seconds between checks for queued connections while a kept alive connection is idle
+  SVC_KEEPALIVE_POLL_TIME = 0.1
 
   def __init__( self, serviceData ):
     self._svcData = serviceData
@@ -283,6 +288,7 @@ class Service:
   def _processInThread( self, clientTransport ):
     self.__maxFD = max( self.__maxFD, clientTransport.oSocket.fileno() )
     self._lockManager.lockGlobal()
+    globalLocked = True
     try:
       monReport = self.__startReportToMonitoring()
     except Exception, e:
@@ -300,32 +306,86 @@ class Service:
       trid = self._transportPool.add( clientTransport )
       if not trid:
         return
-      #Receive and check proposal
-      result = self._receiveAndCheckProposal( trid )
-      if not result[ 'OK' ]:
-        self._transportPool.sendAndClose( trid, result )
-        return
-      proposalTuple = result[ 'Value' ]
-      #Instantiate handler
-      result = self._instantiateHandler( trid, proposalTuple )
-      if not result[ 'OK' ]:
-        self._transportPool.sendAndClose( trid, result )
-        return
-      handlerObj = result[ 'Value' ]
-      #Execute the action
-      result = self._processProposal( trid, proposalTuple, handlerObj )
-      #Close the connection if required
-      if result[ 'closeTransport' ] or not result[ 'OK' ]:
-        if not result[ 'OK' ]:
-          gLogger.error( "Error processing proposal", result[ 'Message' ] )
-        self._transportPool.close( trid )
+      result = self.__serveProposal( trid )
+      #Keep serving RPCs through the same connection while the client asks for it
+      servedProposals = 1
+      while result and result[ 'OK' ] and result.get( 'keepAlive' ):
+        #An idle connection does not count as a petition being processed
+        self._lockManager.unlockGlobal()
+        globalLocked = False
+        if not self.__waitForNextProposal( trid ):
+          self._transportPool.close( trid )
+          return result
+        self._lockManager.lockGlobal()
+        globalLocked = True
+        self._monitor.addMark( "Queries" )
+        servedProposals += 1
+        result = self.__serveProposal( trid, servedProposals )
       return result
     finally:
-      self._lockManager.unlockGlobal()
+      if globalLocked:
+        self._lockManager.unlockGlobal()
       if monReport:
         self.__endReportToMonitoring( *monReport )
 
 
+  def __serveProposal( self, trid, servedProposals = 1 ):
+    #Receive and check proposal
+    result = self._receiveAndCheckProposal( trid )
+    if not result[ 'OK' ]:
+      self._transportPool.sendAndClose( trid, result )
+      return
+    proposalTuple = result[ 'Value' ]
+    #Instantiate handler
+    result = self._instantiateHandler( trid, proposalTuple )
+    if not result[ 'OK' ]:
+      self._transportPool.sendAndClose( trid, result )
+      return
+    handlerObj = result[ 'Value' ]
+    #Execute the action
+    result = self._processProposal( trid, proposalTuple, handlerObj, servedProposals )
+    #Close the connection if required
+    if result[ 'closeTransport' ] or not result[ 'OK' ]:
+      if not result[ 'OK' ]:
+        gLogger.error( "Error processing proposal", result[ 'Message' ] )
+      self._transportPool.close( trid )
+    return result
+
+  def __waitForNextProposal( self, trid ):
+    """
+    Wait for the client to send another proposal through a kept alive connection.
+    The connection is given up as soon as other connections are waiting for the thread
+    """
+    clientTransport = self._transportPool.get( trid )
+    if not clientTransport:
+      return False
+    if clientTransport.byteStream:
+      return True
+    endTime = time.time() + self._cfg.getKeepAliveIdleTime()
+    while self._threadPool.pendingJobs() == 0:
+      waitTime = min( self.SVC_KEEPALIVE_POLL_TIME, endTime - time.time() )
+      if waitTime <= 0:
+        return False
+      try:
+        inList = select.select( [ clientTransport.getSocket() ], [], [], waitTime )[0]
+      except Exception:
+        return False
+      if inList:
+        return True
+    return False
+
+  def _acceptKeepAlive( self, proposalTuple, servedProposals ):
+    """
+    Only RPCs can keep the connection and only if there are no queries waiting for a thread
+    """
+    if proposalTuple[1][0] not in ( 'RPC', 'BatchRPC' ) or len( proposalTuple ) < 4:
+      return False
+    if type( proposalTuple[3] ) != types.DictType or not proposalTuple[3].get( 'keepAlive' ):
+      return False
+    if servedProposals >= self._cfg.getMaxRequestsPerConnection():
+      return False
+    return self._threadPool.pendingJobs() == 0
+
   def _createIdentityString( self, credDict, clientTransport = None ):
     if 'username' in credDict:
       if 'group' in credDict:
@@ -358,6 +418,12 @@ class Service:
     #Check if there are extra credentials
     if proposalTuple[2]:
       clientTransport.setExtraCredentials( proposalTuple[2] )
+    #Answer with the best encoding the client knows
+    sendCodec = 'v1'
+    if len( proposalTuple ) > 3 and type( proposalTuple[3] ) == types.DictType:
+      if DEncodeV2.CODEC_NAME in proposalTuple[3].get( 'codecs', [] ):
+        sendCodec = DEncodeV2.CODEC_NAME
+    clientTransport.setSendCodec( sendCodec )
     #Check if this is the requested service
     requestedService = proposalTuple[0][0]
     if requestedService not in self._validNames:
@@ -374,6 +440,13 @@ class Service:
     return S_OK( proposalTuple )
 
   def _authorizeProposal( self, actionTuple, trid, credDict ):
+    #A batch is authorized only if each of the methods in it is
+    if actionTuple[0] == 'BatchRPC':
+      for method in List.fromChar( actionTuple[1], "," ):
+        result = self._authorizeProposal( ( 'RPC', method ), trid, credDict )
+        if not result[ 'OK' ]:
+          return result
+      return S_OK()
     #Find CS path for the Auth rules
     referedAction = self._isMetaAction( actionTuple[0] )
     if referedAction:
@@ -446,9 +519,16 @@ class Service:
       return S_ERROR( "Server error while loading handler" )
     return S_OK( handlerInstance )
 
-  def _processProposal( self, trid, proposalTuple, handlerObj ):
+  def _processProposal( self, trid, proposalTuple, handlerObj, servedProposals = 1 ):
     #Notify the client we're ready to execute the action
-    retVal = self._transportPool.send( trid, S_OK() )
+    keepAlive = self._acceptKeepAlive( proposalTuple, servedProposals )
+    readyMsg = S_OK()
+    if keepAlive:
+      readyMsg[ 'keepAlive' ] = True
+    clientTransport = self._transportPool.get( trid )
+    if clientTransport and clientTransport.getSendCodec() != 'v1':
+      readyMsg[ 'codec' ] = clientTransport.getSendCodec()
+    retVal = self._transportPool.send( trid, readyMsg )
     if not retVal[ 'OK' ]:
       return retVal
 
@@ -476,7 +556,8 @@ class Service:
       if not result[ 'OK' ]:
         self._msgBroker.removeTransport( trid )
 
-    result[ 'closeTransport' ] = not messageConnection or not result[ 'OK' ]
+    result[ 'closeTransport' ] = ( not messageConnection and not keepAlive ) or not result[ 'OK' ]
+    result[ 'keepAlive' ] = keepAlive
     return result
 
   def _mbConnect( self, trid, handlerObj = None ):
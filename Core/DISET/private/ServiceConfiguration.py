@@ -74,6 +74,18 @@ class ServiceConfiguration:
     except:
       return 20
 
+  def getKeepAliveIdleTime( self ):
+    try:
+      return int( self.getOption( "KeepAliveIdleTime" ) )
+    except:
+      return 10
+
+  def getMaxRequestsPerConnection( self ):
+    try:
+      return int( self.getOption( "MaxRequestsPerConnection" ) )
+    except:
+      return 100
+
   def getMaxThreadsForMethod( self, actionType, method ):
     try:
       return int( self.getOption( "ThreadLimit/%s/%s" % ( actionType, method ) ) )
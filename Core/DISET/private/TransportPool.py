@@ -147,6 +147,14 @@ class TransportPool:
       return S_ERROR( "No transport with id %s defined" % trid )
     self.__remove( trid )
 
+  def remove( self, trid ):
+    """
+    Forget about a transport without closing it
+    """
+    transport = self.get( trid )
+    self.__remove( trid )
+    return transport
+
   def __remove( self, trid ):
     self.__modLock.acquire()
     try:
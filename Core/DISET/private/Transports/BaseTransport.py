@@ -2,15 +2,15 @@
 __RCSID__ = "$Id$"
 
 import time
+import types
 import select
-import cStringIO
 try:
   from hashlib import md5
 except:
   from md5 import md5
 
 from DIRAC.Core.Utilities.ReturnValues import S_ERROR, S_OK
-from DIRAC.Core.Utilities import DEncode
+from DIRAC.Core.Utilities import DEncode, DEncodeV2
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
 
 class BaseTransport:
@@ -19,6 +19,9 @@ class BaseTransport:
   iListenQueueSize = 5
   iReadTimeout = 600
   keepAliveMagic = "dka"
+  #Can _write send memoryview slices of the data?
+  zeroCopyWrites = False
+  sendCodecs = { 'v1' : DEncode, DEncodeV2.CODEC_NAME : DEncodeV2 }
 
   def __init__( self, stServerAddress, bServerMode = False, **kwargs ):
     self.bServerMode = bServerMode
@@ -36,6 +39,8 @@ class BaseTransport:
     self.waitingForKeepAlivePong = False
     self.__keepAliveLapse = 0
     self.oSocket = None
+    self.__sendCodecName = 'v1'
+    self.__sendCodec = DEncode
     if 'keepAliveLapse' in kwargs:
       try:
         self.__keepAliveLapse = max( 150, int( kwargs[ 'keepAliveLapse' ] ) )
@@ -53,6 +58,20 @@ class BaseTransport:
   def getKeepAliveLapse( self ):
     return self.__keepAliveLapse
 
+  def setSendCodec( self, codecName ):
+    """
+    Set the encoding to use when sending data. Received data is always decoded
+    with the codec it was encoded with
+    """
+    if codecName not in self.sendCodecs:
+      return S_ERROR( "Unknown codec %s" % codecName )
+    self.__sendCodecName = codecName
+    self.__sendCodec = self.sendCodecs[ codecName ]
+    return S_OK()
+
+  def getSendCodec( self ):
+    return self.__sendCodecName
+
   def handshake( self ):
     return S_OK()
 
@@ -111,30 +130,62 @@ class BaseTransport:
     except Exception, e:
       return S_ERROR( "Exception while reading from peer: %s" % str( e ) )
 
+  def _readInto( self, memView, skipReadyCheck = False ):
+    """
+    Read from the peer into a writable memoryview. Returns the number of bytes read.
+    Transports that can receive directly into a buffer should overwrite this
+    """
+    retVal = self._read( len( memView ), skipReadyCheck )
+    if not retVal[ 'OK' ]:
+      return retVal
+    data = retVal[ 'Value' ]
+    memView[ :len( data ) ] = data
+    return S_OK( len( data ) )
+
   def _write( self, buffer ):
     return S_OK( self.oSocket.send( buffer ) )
 
+  def __sendChunk( self, chunk ):
+    bytesToSend = len( chunk )
+    packSentBytes = 0
+    while packSentBytes < bytesToSend:
+      try:
+        if packSentBytes:
+          result = self._write( chunk[ packSentBytes: ] )
+        else:
+          result = self._write( chunk )
+        if not result[ 'OK' ]:
+          return result
+        sentBytes = result[ 'Value' ]
+      except Exception, e:
+        return S_ERROR( "Exception while sending data: %s" % e )
+      if sentBytes == 0:
+        return S_ERROR( "Connection closed by peer" )
+      packSentBytes += sentBytes
+    return S_OK()
+
   def sendData( self, uData, prefix = False ):
     self.__updateLastActionTimestamp()
-    sCodedData = DEncode.encode( uData )
+    sCodedData = self.__sendCodec.encode( uData )
     if prefix:
-      dataToSend = "%s%s:%s" % ( prefix, len( sCodedData ), sCodedData )
+      header = "%s%s:" % ( prefix, len( sCodedData ) )
     else:
-      dataToSend = "%s:%s" % ( len( sCodedData ), sCodedData )
-    for index in range( 0, len( dataToSend ), self.packetSize ):
-      bytesToSend = min( self.packetSize, len( dataToSend ) - index )
-      packSentBytes = 0
-      while packSentBytes < bytesToSend:
-        try:
-          result = self._write( dataToSend[ index + packSentBytes : index + bytesToSend ] )
-          if not result[ 'OK' ]:
-            return result
-          sentBytes = result[ 'Value' ]
-        except Exception, e:
-          return S_ERROR( "Exception while sending data: %s" % e )
-        if sentBytes == 0:
-          return S_ERROR( "Connection closed by peer" )
-        packSentBytes += sentBytes
+      header = "%s:" % len( sCodedData )
+    #The header goes with the first packet. The rest is sent without building the whole message again
+    firstPacketSize = max( 0, self.packetSize - len( header ) )
+    result = self.__sendChunk( header + sCodedData[ :firstPacketSize ] )
+    if not result[ 'OK' ]:
+      return result
+    if len( sCodedData ) <= firstPacketSize:
+      return S_OK()
+    if self.zeroCopyWrites:
+      dataView = memoryview( sCodedData )
+    else:
+      dataView = sCodedData
+    for index in xrange( firstPacketSize, len( sCodedData ), self.packetSize ):
+      result = self.__sendChunk( dataView[ index : index + self.packetSize ] )
+      if not result[ 'OK' ]:
+        return result
     return S_OK()
 
 
@@ -175,6 +226,8 @@ class BaseTransport:
       #From here it must be a real message!
       #Process the size and remove the msg length from the bytestream
       pkgSize = int( self.byteStream[ :iSeparatorPosition ] )
+      if maxBufferSize and pkgSize > maxBufferSize:
+        return S_ERROR( "Read limit exceeded (%s chars)" % maxBufferSize )
       pkgData = self.byteStream[ iSeparatorPosition + 1: ]
       readSize = len( pkgData )
       if readSize >= pkgSize:
@@ -182,30 +235,23 @@ class BaseTransport:
         data = pkgData[ :pkgSize ]
         self.byteStream = pkgData[ pkgSize: ]
       else:
-        #If we still need to read stuff
-        pkgMem = cStringIO.StringIO()
-        pkgMem.write( pkgData )
-        #Receive while there's still data to be received
+        #Receive the rest of the message directly into a buffer of the announced size
+        pkgMem = bytearray( pkgSize )
+        pkgMem[ :readSize ] = pkgData
+        pkgData = ""
+        self.byteStream = ""
+        data = memoryview( pkgMem )
         while readSize < pkgSize:
-          retVal = self._read( pkgSize - readSize, skipReadyCheck = True )
+          retVal = self._readInto( data[ readSize: ], skipReadyCheck = True )
           if not retVal[ 'OK' ]:
             return retVal
           if not retVal[ 'Value' ]:
             return S_ERROR( "Peer closed connection" )
-          rcvData = retVal[ 'Value' ]
-          readSize += len( rcvData )
-          pkgMem.write( rcvData )
-          if maxBufferSize and readSize > maxBufferSize:
-            return S_ERROR( "Read limit exceeded (%s chars)" % maxBufferSize )
-        #Data is here! take it out from the bytestream, dencode and return
-        if readSize == pkgSize:
-          data = pkgMem.getvalue()
-          self.byteStream = ""
-        else: #readSize > pkgSize:
-          pkgMem.seek( 0, 0 )
-          data = pkgMem.read( pkgSize )
-          self.byteStream = pkgMem.read()
+          readSize += retVal[ 'Value' ]
       try:
+        #v2 is decoded straight from the buffer, v1 needs a string
+        if not DEncodeV2.isV2( data ) and type( data ) != types.StringType:
+          data = data.tobytes()
         data = DEncode.decode( data )[0]
       except Exception, e:
         return S_ERROR( "Could not decode received data: %s" % str( e ) )
@@ -0,0 +1,202 @@
+########################################################################
+# $HeadURL $
+# File: FileHelperTests.py
+########################################################################
+
+""" :mod: FileHelperTests
+    =======================
+
+    .. module: FileHelperTests
+    :synopsis: test cases for the FileHelper transfers and their relay by the Gateway
+
+    test cases for the packet by packet and streaming modes of FileHelper and
+    for the TransferRelay of the GatewayService, the transports are pairs of
+    queues and each end runs in its own thread
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import os
+import copy
+import Queue
+import threading
+import unittest
+from DIRAC import S_OK, S_ERROR
+## SUT
+from DIRAC.Core.DISET.private.FileHelper import FileHelper, AsyncHash
+from DIRAC.Core.DISET.private.GatewayService import TransferRelay
+
+class QueueTransport( object ):
+  """ one end of a connection, the messages go through queues """
+
+  def __init__( self, inQueue, outQueue ):
+    self.inQueue = inQueue
+    self.outQueue = outQueue
+    self.closed = False
+
+  def sendData( self, data ):
+    self.outQueue.put( copy.deepcopy( data ) )
+    return S_OK()
+
+  def receiveData( self, maxBufferSize = 0 ):
+    try:
+      return self.inQueue.get( timeout = 10 )
+    except Queue.Empty:
+      return S_ERROR( "Nothing received" )
+
+  def close( self ):
+    self.closed = True
+
+def transportPair():
+  """ both ends of a connection """
+  aQueue = Queue.Queue()
+  bQueue = Queue.Queue()
+  return QueueTransport( aQueue, bQueue ), QueueTransport( bQueue, aQueue )
+
+class SmallPacketsFileHelper( FileHelper ):
+  """ FileHelper streaming small packets, for the transfers to take many round trips """
+  streamingPacketSize = 1024
+  streamingAckEvery = 2
+
+def inThread( function, *args ):
+  """ run function in a thread, its result is put in the returned list """
+  result = []
+  thread = threading.Thread( target = lambda: result.append( function( *args ) ) )
+  thread.setDaemon( True )
+  thread.start()
+  return thread, result
+
+class TestTransferRelay( TransferRelay ):
+  """ TransferRelay connected to a service end of a transport pair """
+
+  def __init__( self, srvTransport, streamingParams ):
+    self.setTransferLimit( 1024 * 1024 )
+    self.srvTransport = srvTransport
+    self.streamingParams = streamingParams
+    self.headers = []
+
+  def getDestinationService( self ):
+    return "Test/Service"
+
+  def _sendTransferHeader( self, actionName, fileInfo ):
+    self.headers.append( ( actionName, fileInfo ) )
+    result = S_OK( ( 1, self.srvTransport ) )
+    result[ 'streaming' ] = self.streamingParams
+    return result
+
+########################################################################
+class FileHelperTestCase( unittest.TestCase ):
+  """
+  .. class:: FileHelperTestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.data = os.urandom( 50 * 1024 + 7 )
+    self.streamingParams = SmallPacketsFileHelper.getStreamingParams()
+
+  def transfer( self, streamingParams ):
+    """ send self.data from one end to the other """
+    sendTransport, receiveTransport = transportPair()
+    sender = SmallPacketsFileHelper( sendTransport )
+    sender.setDirection( "send" )
+    sender.setStreaming( streamingParams )
+    receiver = SmallPacketsFileHelper( receiveTransport )
+    receiver.setDirection( "receive" )
+    receiver.setStreaming( streamingParams )
+    thread, sent = inThread( sender.BufferToNetwork, self.data )
+    received = receiver.networkToString()
+    thread.join( 10 )
+    self.assertEqual( sent, [ S_OK() ] )
+    self.assertEqual( received, S_OK( self.data ) )
+    self.assertEqual( sender.getHash(), receiver.getHash() )
+    self.assertTrue( sender.finishedTransmission() and receiver.finishedTransmission() )
+    # No message is left on the connection
+    self.assertTrue( sendTransport.inQueue.empty() and receiveTransport.inQueue.empty() )
+
+  def testPacketByPacket( self ):
+    """ every packet is acknowledged """
+    self.transfer( False )
+
+  def testStreaming( self ):
+    """ the packets are acknowledged every ackEvery packets """
+    self.transfer( self.streamingParams )
+
+  def testStreamingAbort( self ):
+    """ the receiver aborts, the packets in flight are drained """
+    sendTransport, receiveTransport = transportPair()
+    sender = SmallPacketsFileHelper( sendTransport )
+    sender.setDirection( "send" )
+    sender.setStreaming( self.streamingParams )
+    receiver = SmallPacketsFileHelper( receiveTransport )
+    receiver.setDirection( "receive" )
+    receiver.setStreaming( self.streamingParams )
+    thread, sent = inThread( sender.BufferToNetwork, self.data )
+    self.assertTrue( receiver.receiveData()[ 'OK' ] )
+    receiver.markAsTransferred()
+    thread.join( 10 )
+    self.assertEqual( sent, [ S_OK() ] )
+    self.assertTrue( sender.finishedTransmission() )
+    self.assertTrue( sendTransport.inQueue.empty() and receiveTransport.inQueue.empty() )
+    # The hash thread of the sender is done
+    self.assertEqual( [ hashThread for hashThread in threading.enumerate() if isinstance( hashThread, AsyncHash ) ], [] )
+
+########################################################################
+class TransferRelayTestCase( unittest.TestCase ):
+  """
+  .. class:: TransferRelayTestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.streamingParams = SmallPacketsFileHelper.getStreamingParams()
+    self.relayTransport, self.srvTransport = transportPair()
+    self.relay = TestTransferRelay( self.relayTransport, self.streamingParams )
+
+  def testListBulk( self ):
+    """ the service answer to ListBulk is sent back to the client """
+    self.srvTransport.sendData( S_OK( [ 'a.txt', 'b/c.txt' ] ) )
+    self.assertEqual( self.relay.forwardListBulk( FileHelper(), ( 'bulk.tar.bz2', 'token' ) ),
+                      S_OK( [ 'a.txt', 'b/c.txt' ] ) )
+    self.assertEqual( self.relay.headers, [ ( 'ListBulk', ( 'bulk.tar.bz2', 'token' ) ) ] )
+    self.assertTrue( self.relayTransport.closed )
+
+  def testStreamingToClient( self ):
+    """ the data streamed by the service is streamed to the client by the gateway """
+    data = os.urandom( 20 * 1024 + 3 )
+    srvFileHelper = SmallPacketsFileHelper( self.srvTransport )
+    srvFileHelper.setDirection( "send" )
+    srvFileHelper.setStreaming( self.streamingParams )
+
+    def serveFile():
+      result = srvFileHelper.BufferToNetwork( data )
+      self.srvTransport.sendData( S_OK( 'served' ) )
+      return result
+    srvThread, served = inThread( serveFile )
+
+    gwTransport, cliTransport = transportPair()
+    gwFileHelper = SmallPacketsFileHelper( gwTransport )
+    gwFileHelper.setDirection( "send" )
+    gwFileHelper.setStreaming( self.streamingParams )
+    gwThread, forwarded = inThread( self.relay.forwardToClient, gwFileHelper, ( 'file', 'token' ) )
+
+    cliFileHelper = SmallPacketsFileHelper( cliTransport )
+    cliFileHelper.setDirection( "receive" )
+    cliFileHelper.setStreaming( self.streamingParams )
+    self.assertEqual( cliFileHelper.networkToString(), S_OK( data ) )
+    srvThread.join( 10 )
+    gwThread.join( 10 )
+    self.assertEqual( served, [ S_OK() ] )
+    self.assertEqual( forwarded, [ S_OK( 'served' ) ] )
+    self.assertTrue( self.srvTransport.inQueue.empty() and self.relayTransport.inQueue.empty() )
+    self.assertTrue( gwTransport.inQueue.empty() and cliTransport.inQueue.empty() )
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( FileHelperTestCase )
+  SUITE.addTest( TESTLOADER.loadTestsFromTestCase( TransferRelayTestCase ) )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
@@ -0,0 +1,138 @@
+########################################################################
+# $HeadURL $
+# File: ServiceTests.py
+########################################################################
+
+""" :mod: ServiceTests
+    =======================
+
+    .. module: ServiceTests
+    :synopsis: test cases for the kept alive connections of Service
+
+    test cases for the Service connections kept alive between RPCs, the
+    proposals are served by a fake handler through socket pairs
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import time
+import select
+import socket
+import unittest
+from DIRAC import S_OK
+from DIRAC.Core.Utilities.ThreadPool import ThreadPool
+## SUT
+from DIRAC.Core.DISET.private.Service import Service
+from DIRAC.Core.DISET.private.LockManager import LockManager
+
+class FakeConfiguration:
+
+  def getKeepAliveIdleTime( self ):
+    return 30
+
+class FakeMonitor:
+
+  def addMark( self, *args ):
+    pass
+
+  def setComponentExtraParam( self, *args ):
+    pass
+
+class FakeTransport:
+
+  def __init__( self, name ):
+    self.name = name
+    self.byteStream = ''
+    # Client end of the connection
+    self.oSocket, self.clientSocket = socket.socketpair()
+
+  def handshake( self ):
+    return S_OK()
+
+  def getSocket( self ):
+    return self.oSocket
+
+class FakeTransportPool:
+
+  def __init__( self ):
+    self.transports = {}
+    self.closed = []
+
+  def add( self, transport ):
+    self.transports[ transport.name ] = transport
+    return transport.name
+
+  def get( self, trid ):
+    return self.transports.get( trid )
+
+  def close( self, trid ):
+    self.closed.append( trid )
+
+class KeepAliveService( Service ):
+  """ Service with one thread asking to keep all the connections alive """
+
+  def __init__( self ):
+    self._cfg = FakeConfiguration()
+    self._monitor = FakeMonitor()
+    self._stats = { 'queries' : 0, 'connections' : 0 }
+    self._transportPool = FakeTransportPool()
+    self._lockManager = LockManager( 1 )
+    self._threadPool = ThreadPool( 1, 1 )
+    self._threadPool.daemonize()
+    self._Service__maxFD = 0
+    self.served = []
+
+  def _Service__serveProposal( self, trid, servedProposals = 1 ):
+    self.served.append( trid )
+    clientSocket = self._transportPool.get( trid ).getSocket()
+    if select.select( [ clientSocket ], [], [], 0 )[0]:
+      clientSocket.recv( 1024 )
+    result = S_OK()
+    result[ 'keepAlive' ] = True
+    return result
+
+########################################################################
+class KeepAliveTestCase( unittest.TestCase ):
+  """
+  .. class:: KeepAliveTestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.service = KeepAliveService()
+
+  def waitForServed( self, trid ):
+    """ wait for the proposal of the connection to be served """
+    endTime = time.time() + 5
+    while trid not in self.service.served and time.time() < endTime:
+      time.sleep( 0.05 )
+    return trid in self.service.served
+
+  def testQueuedConnection( self ):
+    """ an idle kept alive connection is dropped for a queued connection """
+    self.service.handleConnection( FakeTransport( 'idle' ) )
+    self.assertTrue( self.waitForServed( 'idle' ) )
+    # The only thread is waiting for the next proposal of the idle connection
+    self.service.handleConnection( FakeTransport( 'queued' ) )
+    self.assertTrue( self.waitForServed( 'queued' ) )
+    self.assertEqual( self.service._transportPool.closed, [ 'idle' ] )
+
+  def testNextProposal( self ):
+    """ the next proposal of a kept alive connection is served by the same thread """
+    transport = FakeTransport( 'active' )
+    self.service.handleConnection( transport )
+    self.assertTrue( self.waitForServed( 'active' ) )
+    transport.clientSocket.send( 'proposal' )
+    endTime = time.time() + 5
+    while len( self.service.served ) < 2 and time.time() < endTime:
+      time.sleep( 0.05 )
+    self.assertEqual( self.service.served, [ 'active', 'active' ] )
+    self.assertEqual( self.service._transportPool.closed, [] )
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( KeepAliveTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
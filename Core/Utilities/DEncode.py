@@ -16,6 +16,7 @@ __RCSID__ = "$Id$"
 
 import types
 import datetime
+from DIRAC.Core.Utilities import DEncodeV2
 
 _dateTimeObject = datetime.datetime.utcnow()
 _dateTimeType = type( _dateTimeObject )
@@ -234,6 +235,9 @@ def encode( uObject ):
 def decode( data ):
   if not data:
     return data
+  #v2 streams are self identifying
+  if DEncodeV2.isV2( data ):
+    return DEncodeV2.decode( data )
   try:
     #print "DECODE FUNCTION : %s" % g_dDecodeFunctions[ sStream [ iIndex ] ]
     return g_dDecodeFunctions[ data[ 0 ] ]( data, 0 )
@@ -0,0 +1,370 @@
+# $HeadURL$
+"""
+Compact binary encoding for DISET messages (DEncode v2)
+
+Every encoded stream starts with the MAGIC byte so it can be told apart
+from a DEncode v1 stream. Values are encoded with a one byte tag followed
+by a binary body:
+ c/h/i/q -> int as int8/int16/int32/int64
+ J -> long fitting in int64
+ L -> long as length prefixed decimal text
+ f -> float as double
+ T/F -> bool
+ S -> string with a one byte length
+ s -> string with a four byte length
+ u -> unicode as length prefixed utf-8
+ z -> datetime (a), date (d) or time (t)
+ n -> none
+ l/t/d -> list/tuple/dict with a four byte number of items
+ k -> well known dict key from INTERNED_KEYS
+ K -> dict key seen for the first time in this stream
+ R -> back reference to a K dict key
+
+decode works on strings and on memoryviews without copying the buffer
+"""
+__RCSID__ = "$Id$"
+
+import types
+import struct
+import datetime
+
+MAGIC = "\x02"
+CODEC_NAME = "v2"
+
+#Append only! The position of each key is part of the wire format
+INTERNED_KEYS = ( 'OK', 'Value', 'Message', 'Successful', 'Failed', 'rpcStub',
+                  'Size', 'Checksum', 'ChecksumType', 'GUID', 'Status', 'MinorStatus',
+                  'ApplicationStatus', 'Source', 'JobID', 'Replicas', 'ParameterNames',
+                  'Records', 'Metadata', 'keepAlive' )
+_maxKeyRefs = 65535
+
+_dateTimeObject = datetime.datetime.utcnow()
+_dateTimeType = type( _dateTimeObject )
+_dateType = type( _dateTimeObject.date() )
+_timeType = type( _dateTimeObject.time() )
+
+_sInt8 = struct.Struct( ">b" )
+_sInt16 = struct.Struct( ">h" )
+_sInt32 = struct.Struct( ">i" )
+_sInt64 = struct.Struct( ">q" )
+_sUInt16 = struct.Struct( ">H" )
+_sUInt32 = struct.Struct( ">I" )
+_sDouble = struct.Struct( ">d" )
+_sDateTime = struct.Struct( ">HBBBBBI" )
+_sDate = struct.Struct( ">HBB" )
+_sTime = struct.Struct( ">BBBI" )
+
+#Precomputed headers for the most common cases
+_shortStringHeaders = [ "S" + chr( iLen ) for iLen in range( 256 ) ]
+_internedKeyHeaders = dict( [ ( key, "k" + chr( iPos ) ) for iPos, key in enumerate( INTERNED_KEYS ) ] )
+
+g_dEncodeFunctions = {}
+g_dDecodeFunctions = {}
+
+def _toStr( value ):
+  if type( value ) != types.StringType:
+    return value.tobytes()
+  return value
+
+#Encoding and decoding ints
+def encodeInt( iValue, eList, keyHeaders ):
+  if -128 <= iValue <= 127:
+    eList.append( "c" + _sInt8.pack( iValue ) )
+  elif -32768 <= iValue <= 32767:
+    eList.append( "h" + _sInt16.pack( iValue ) )
+  elif -2147483648 <= iValue <= 2147483647:
+    eList.append( "i" + _sInt32.pack( iValue ) )
+  else:
+    eList.append( "q" + _sInt64.pack( iValue ) )
+
+def decodeInt8( data, i, keyList ):
+  return ( _sInt8.unpack_from( data, i + 1 )[0], i + 2 )
+
+def decodeInt16( data, i, keyList ):
+  return ( _sInt16.unpack_from( data, i + 1 )[0], i + 3 )
+
+def decodeInt32( data, i, keyList ):
+  return ( _sInt32.unpack_from( data, i + 1 )[0], i + 5 )
+
+def decodeInt64( data, i, keyList ):
+  return ( int( _sInt64.unpack_from( data, i + 1 )[0] ), i + 9 )
+
+g_dEncodeFunctions[ types.IntType ] = encodeInt
+g_dDecodeFunctions[ "c" ] = decodeInt8
+g_dDecodeFunctions[ "h" ] = decodeInt16
+g_dDecodeFunctions[ "i" ] = decodeInt32
+g_dDecodeFunctions[ "q" ] = decodeInt64
+
+#Encoding and decoding longs
+def encodeLong( iValue, eList, keyHeaders ):
+  if -9223372036854775808 <= iValue <= 9223372036854775807:
+    eList.append( "J" + _sInt64.pack( iValue ) )
+  else:
+    sValue = str( iValue )
+    eList.append( "L" + _sUInt32.pack( len( sValue ) ) + sValue )
+
+def decodeLong( data, i, keyList ):
+  return ( long( _sInt64.unpack_from( data, i + 1 )[0] ), i + 9 )
+
+def decodeBigLong( data, i, keyList ):
+  end = i + 5 + _sUInt32.unpack_from( data, i + 1 )[0]
+  return ( long( _toStr( data[ i + 5 : end ] ) ), end )
+
+g_dEncodeFunctions[ types.LongType ] = encodeLong
+g_dDecodeFunctions[ "J" ] = decodeLong
+g_dDecodeFunctions[ "L" ] = decodeBigLong
+
+#Encoding and decoding floats
+def encodeFloat( fValue, eList, keyHeaders ):
+  eList.append( "f" + _sDouble.pack( fValue ) )
+
+def decodeFloat( data, i, keyList ):
+  return ( _sDouble.unpack_from( data, i + 1 )[0], i + 9 )
+
+g_dEncodeFunctions[ types.FloatType ] = encodeFloat
+g_dDecodeFunctions[ "f" ] = decodeFloat
+
+#Encoding and decoding booleans
+def encodeBool( bValue, eList, keyHeaders ):
+  if bValue:
+    eList.append( "T" )
+  else:
+    eList.append( "F" )
+
+def decodeTrue( data, i, keyList ):
+  return ( True, i + 1 )
+
+def decodeFalse( data, i, keyList ):
+  return ( False, i + 1 )
+
+g_dEncodeFunctions[ types.BooleanType ] = encodeBool
+g_dDecodeFunctions[ "T" ] = decodeTrue
+g_dDecodeFunctions[ "F" ] = decodeFalse
+
+#Encoding and decoding strings
+def encodeString( sValue, eList, keyHeaders ):
+  sLen = len( sValue )
+  if sLen < 256:
+    eList.append( _shortStringHeaders[ sLen ] )
+  else:
+    eList.append( "s" + _sUInt32.pack( sLen ) )
+  eList.append( sValue )
+
+def decodeShortString( data, i, keyList ):
+  end = i + 2 + ord( data[ i + 1 ] )
+  return ( _toStr( data[ i + 2 : end ] ), end )
+
+def decodeString( data, i, keyList ):
+  end = i + 5 + _sUInt32.unpack_from( data, i + 1 )[0]
+  return ( _toStr( data[ i + 5 : end ] ), end )
+
+g_dEncodeFunctions[ types.StringType ] = encodeString
+g_dDecodeFunctions[ "S" ] = decodeShortString
+g_dDecodeFunctions[ "s" ] = decodeString
+
+#Encoding and decoding unicode strings
+def encodeUnicode( sValue, eList, keyHeaders ):
+  valueStr = sValue.encode( 'utf-8' )
+  eList.append( "u" + _sUInt32.pack( len( valueStr ) ) )
+  eList.append( valueStr )
+
+def decodeUnicode( data, i, keyList ):
+  end = i + 5 + _sUInt32.unpack_from( data, i + 1 )[0]
+  return ( unicode( _toStr( data[ i + 5 : end ] ), 'utf-8' ), end )
+
+g_dEncodeFunctions[ types.UnicodeType ] = encodeUnicode
+g_dDecodeFunctions[ "u" ] = decodeUnicode
+
+#Encoding and decoding datetime
+def encodeDateTime( oValue, eList, keyHeaders ):
+  oType = type( oValue )
+  if oType != _dateType and oValue.tzinfo is not None:
+    raise Exception( "Cannot encode datetime objects with timezone information" )
+  if oType == _dateTimeType:
+    eList.append( "za" + _sDateTime.pack( oValue.year, oValue.month, oValue.day,
+                                          oValue.hour, oValue.minute, oValue.second,
+                                          oValue.microsecond ) )
+  elif oType == _dateType:
+    eList.append( "zd" + _sDate.pack( oValue.year, oValue.month, oValue.day ) )
+  elif oType == _timeType:
+    eList.append( "zt" + _sTime.pack( oValue.hour, oValue.minute, oValue.second, oValue.microsecond ) )
+  else:
+    raise Exception( "Unexpected type %s while encoding a datetime object" % str( oType ) )
+
+def decodeDateTime( data, i, keyList ):
+  dataType = data[ i + 1 ]
+  if dataType == 'a':
+    return ( datetime.datetime( *_sDateTime.unpack_from( data, i + 2 ) ), i + 2 + _sDateTime.size )
+  elif dataType == 'd':
+    return ( datetime.date( *_sDate.unpack_from( data, i + 2 ) ), i + 2 + _sDate.size )
+  elif dataType == 't':
+    return ( datetime.time( *_sTime.unpack_from( data, i + 2 ) ), i + 2 + _sTime.size )
+  raise Exception( "Unexpected type %s while decoding a datetime object" % dataType )
+
+g_dEncodeFunctions[ _dateTimeType ] = encodeDateTime
+g_dEncodeFunctions[ _dateType ] = encodeDateTime
+g_dEncodeFunctions[ _timeType ] = encodeDateTime
+g_dDecodeFunctions[ 'z' ] = decodeDateTime
+
+#Encoding and decoding None
+def encodeNone( oValue, eList, keyHeaders ):
+  eList.append( "n" )
+
+def decodeNone( data, i, keyList ):
+  return ( None, i + 1 )
+
+g_dEncodeFunctions[ types.NoneType ] = encodeNone
+g_dDecodeFunctions[ 'n' ] = decodeNone
+
+#Encode and decode a list
+def _encodeSequence( lValue, eList, keyHeaders ):
+  encFuncs = g_dEncodeFunctions
+  append = eList.append
+  for uObject in lValue:
+    #Fast path for short strings
+    if type( uObject ) == types.StringType and len( uObject ) < 256:
+      append( _shortStringHeaders[ len( uObject ) ] )
+      append( uObject )
+    else:
+      encFuncs[ type( uObject ) ]( uObject, eList, keyHeaders )
+
+def encodeList( lValue, eList, keyHeaders ):
+  eList.append( "l" + _sUInt32.pack( len( lValue ) ) )
+  _encodeSequence( lValue, eList, keyHeaders )
+
+def decodeList( data, i, keyList ):
+  numItems = _sUInt32.unpack_from( data, i + 1 )[0]
+  i += 5
+  oL = []
+  append = oL.append
+  decFuncs = g_dDecodeFunctions
+  isStr = type( data ) == types.StringType
+  for _iItem in xrange( numItems ):
+    tag = data[ i ]
+    #Fast path for short strings
+    if tag == "S" and isStr:
+      end = i + 2 + ord( data[ i + 1 ] )
+      append( data[ i + 2 : end ] )
+      i = end
+    else:
+      ob, i = decFuncs[ tag ]( data, i, keyList )
+      append( ob )
+  return ( oL, i )
+
+g_dEncodeFunctions[ types.ListType ] = encodeList
+g_dDecodeFunctions[ "l" ] = decodeList
+
+#Encode and decode a tuple
+def encodeTuple( tValue, eList, keyHeaders ):
+  eList.append( "t" + _sUInt32.pack( len( tValue ) ) )
+  _encodeSequence( tValue, eList, keyHeaders )
+
+def decodeTuple( data, i, keyList ):
+  oL, i = decodeList( data, i, keyList )
+  return ( tuple( oL ), i )
+
+g_dEncodeFunctions[ types.TupleType ] = encodeTuple
+g_dDecodeFunctions[ "t" ] = decodeTuple
+
+#Encode and decode dict keys
+#keyHeaders maps the string keys already known in the stream to their encoded form
+def encodeKey( key, eList, keyHeaders ):
+  if type( key ) != types.StringType:
+    g_dEncodeFunctions[ type( key ) ]( key, eList, keyHeaders )
+    return
+  header = keyHeaders.get( key )
+  if header:
+    eList.append( header )
+    return
+  numRefs = len( keyHeaders ) - len( INTERNED_KEYS )
+  if numRefs < _maxKeyRefs:
+    keyHeaders[ key ] = "R" + _sUInt16.pack( numRefs )
+    eList.append( "K" + _sUInt32.pack( len( key ) ) )
+    eList.append( key )
+  else:
+    encodeString( key, eList, keyHeaders )
+
+def decodeInternedKey( data, i, keyList ):
+  return ( INTERNED_KEYS[ ord( data[ i + 1 ] ) ], i + 2 )
+
+def decodeNewKey( data, i, keyList ):
+  key, end = decodeString( data, i, keyList )
+  keyList.append( key )
+  return ( key, end )
+
+def decodeKeyRef( data, i, keyList ):
+  return ( keyList[ _sUInt16.unpack_from( data, i + 1 )[0] ], i + 3 )
+
+g_dDecodeFunctions[ "k" ] = decodeInternedKey
+g_dDecodeFunctions[ "K" ] = decodeNewKey
+g_dDecodeFunctions[ "R" ] = decodeKeyRef
+
+#Encode and decode a dictionary
+def encodeDict( dValue, eList, keyHeaders ):
+  eList.append( "d" + _sUInt32.pack( len( dValue ) ) )
+  encFuncs = g_dEncodeFunctions
+  append = eList.append
+  strType = types.StringType
+  shortHeaders = _shortStringHeaders
+  for key, value in dValue.iteritems():
+    #Fast path for already known keys
+    header = keyHeaders.get( key )
+    if header and type( key ) == strType:
+      append( header )
+    else:
+      encodeKey( key, eList, keyHeaders )
+    #Fast path for short strings
+    vType = type( value )
+    if vType == strType and len( value ) < 256:
+      append( shortHeaders[ len( value ) ] )
+      append( value )
+    else:
+      encFuncs[ vType ]( value, eList, keyHeaders )
+
+def decodeDict( data, i, keyList ):
+  numItems = _sUInt32.unpack_from( data, i + 1 )[0]
+  i += 5
+  oD = {}
+  decFuncs = g_dDecodeFunctions
+  isStr = type( data ) == types.StringType
+  for _iItem in xrange( numItems ):
+    tag = data[ i ]
+    if tag == "R":
+      k = keyList[ _sUInt16.unpack_from( data, i + 1 )[0] ]
+      i += 3
+    else:
+      k, i = decFuncs[ tag ]( data, i, keyList )
+    tag = data[ i ]
+    #Fast path for short strings
+    if tag == "S" and isStr:
+      end = i + 2 + ord( data[ i + 1 ] )
+      oD[ k ] = data[ i + 2 : end ]
+      i = end
+    else:
+      oD[ k ], i = decFuncs[ tag ]( data, i, keyList )
+  return ( oD, i )
+
+g_dEncodeFunctions[ types.DictType ] = encodeDict
+g_dDecodeFunctions[ "d" ] = decodeDict
+
+
+def isV2( data ):
+  """
+  Check if an encoded stream has been encoded with this codec
+  """
+  return len( data ) > 0 and data[0] == MAGIC
+
+#Encode function
+def encode( uObject ):
+  eList = [ MAGIC ]
+  g_dEncodeFunctions[ type( uObject ) ]( uObject, eList, dict( _internedKeyHeaders ) )
+  return "".join( eList )
+
+def decode( data ):
+  """
+  Decode a v2 stream. data can be a string or a memoryview
+  Returns a tuple with the decoded object and the position where it ended
+  """
+  if not isV2( data ):
+    raise ValueError( "Data is not DEncode v2 encoded" )
+  return g_dDecodeFunctions[ data[ 1 ] ]( data, 1, [] )
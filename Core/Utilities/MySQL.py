@@ -49,6 +49,23 @@
     Returns S_OK with number of updated registers in Value or S_ERROR upon failure.
 
 
+    _query( cmd, [conn], params = [ value, ... ] )
+    _update( cmd, [conn], params = [ value, ... ] )
+
+    The command can also be a template with %s placeholders, the values in
+    "params" are escaped locally and put in their place. Lists and tuples are
+    expanded to "( value1, value2 )" for IN conditions and None gives NULL.
+    Strings are always quoted, MySQL functions like UTC_TIMESTAMP() go in the
+    template. A literal % is written %%. The split templates are cached by text.
+
+
+    _updateMany( cmd, paramsList, [conn] )
+
+    Executes the same template for each params list of paramsList over a single
+    connection. INSERT and REPLACE templates with a single row, optionally followed
+    by ON DUPLICATE KEY UPDATE, are sent as multi-row statements.
+
+
     _createTables( tableDict )
 
     Create a new Table in the DB
@@ -90,6 +107,12 @@
       String type values will be appropriately escaped.
 
 
+    insertManyFields( self, tableName, inFields, inValuesList, conn = None ):
+
+      Insert one row in "tableName" per list of values of "inValuesList"
+      using multi-row statements.
+
+
     updateFields( self, tableName, updateFields = None, updateValues = None,
                   condDict = None,
                   limit = False, conn = None,
@@ -175,11 +198,22 @@ gInstancesCount = 0
 gDebugFile = None
 
 import collections
+import re
 import time
 import threading
-from types import StringTypes, DictType, ListType, TupleType, BooleanType
+from types import StringTypes, DictType, ListType, TupleType, BooleanType, IntType, LongType, FloatType, NoneType
 
 MAXCONNECTRETRY = 10
+MAXCACHEDSTATEMENTS = 1000
+
+# Values starting with these MySQL functions are not quoted by _escapeString and _escapeValues,
+# statement parameters are always quoted
+SPECIALVALUES = ( 'UTC_TIMESTAMP', 'TIMESTAMPADD', 'TIMESTAMPDIFF' )
+
+gStatementCache = {}
+gPlaceholderRE = re.compile( r'(%%|%s)' )
+gMultiRowRE = re.compile( r'^(\s*(?:INSERT|REPLACE)\s.*?\sVALUES\s*)\(', re.I | re.S )
+gOnDuplicateRE = re.compile( r'^\s+ON\s+DUPLICATE\s+KEY\s+UPDATE\s', re.I )
 
 def _checkQueueSize( maxQueueSize ):
   """
@@ -228,6 +262,106 @@ def _quotedList( fieldList = None ):
   return ', '.join( quotedFields )
 
 
+def _quotedString( myString ):
+  """
+    Escape a string without a round trip to the server and quote it with '"'.
+    The connections use the default character set, the escaping does not depend
+    on them
+  """
+  return '"%s"' % MySQLdb.escape_string( str( myString ) )
+
+def _sqlLiteral( value ):
+  """
+    SQL representation of a statement parameter
+  """
+  valueType = type( value )
+  if valueType in ( IntType, LongType, BooleanType ):
+    return str( value )
+  if valueType == FloatType:
+    return repr( value )
+  if valueType == NoneType:
+    return 'NULL'
+  if valueType in ( ListType, TupleType ):
+    if not value:
+      return '( NULL )'
+    return '( %s )' % ', '.join( [ _sqlLiteral( v ) for v in value ] )
+  return _quotedString( value )
+
+def _compiledStatement( cmd ):
+  """
+    Split a statement template in the literal parts between its %s placeholders
+  """
+  try:
+    return gStatementCache[ cmd ]
+  except KeyError:
+    pass
+  parts = []
+  literal = []
+  for token in gPlaceholderRE.split( cmd ):
+    if token == '%s':
+      parts.append( ''.join( literal ) )
+      literal = []
+    elif token == '%%':
+      literal.append( '%' )
+    else:
+      literal.append( token )
+  parts.append( ''.join( literal ) )
+  if len( gStatementCache ) >= MAXCACHEDSTATEMENTS:
+    gStatementCache.clear()
+  gStatementCache[ cmd ] = parts
+  return parts
+
+def _splitMultiRow( cmd ):
+  """
+    Split an INSERT or REPLACE template in the part before the row, the row and
+    an ON DUPLICATE KEY UPDATE clause, for the rows to be sent in one statement.
+    Returns None if the template can not be sent as a multi-row statement
+  """
+  match = gMultiRowRE.match( cmd )
+  if not match:
+    return None
+  prefix = match.group( 1 )
+  # Find the end of the row, the parenthesis in quoted strings do not count
+  depth = 0
+  quote = None
+  for pos in range( len( prefix ), len( cmd ) ):
+    char = cmd[pos]
+    if quote:
+      if char == quote:
+        quote = None
+    elif char in ( '"', "'" ):
+      quote = char
+    elif char == '(':
+      depth += 1
+    elif char == ')':
+      depth -= 1
+      if not depth:
+        break
+  else:
+    return None
+  rowTemplate = cmd[len( prefix ):pos + 1]
+  suffix = cmd[pos + 1:]
+  if suffix.strip() and not gOnDuplicateRE.match( suffix ):
+    return None
+  # The parameters must all be in the row
+  if len( _compiledStatement( prefix ) ) != 1 or len( _compiledStatement( suffix ) ) != 1:
+    return None
+  return _buildStatement( prefix, [] ), rowTemplate, _buildStatement( suffix.rstrip(), [] )
+
+def _buildStatement( cmd, params ):
+  """
+    Put the escaped params in the placeholders of the cmd template
+  """
+  parts = _compiledStatement( cmd )
+  if len( params ) != len( parts ) - 1:
+    raise ValueError( 'Statement expects %d parameters, got %d' % ( len( parts ) - 1, len( params ) ) )
+  statement = [ parts[0] ]
+  for i in range( len( params ) ):
+    statement.append( _sqlLiteral( params[i] ) )
+    statement.append( parts[i + 1] )
+  return ''.join( statement )
+
+
 class MySQL:
   """
   Basic multithreaded DIRAC MySQL Client Class
@@ -477,30 +611,23 @@ class MySQL:
     To be used for escaping any MySQL string before passing it to the DB
     this should prevent passing non-MySQL accepted characters to the DB
     It also includes quotation marks " around the given string
+    The escaping is done locally, no connection is needed
     """
 
-    retDict = self.__getConnection()
-    if not retDict['OK']:
-      return retDict
-    connection = retDict['Value']
-
-    specialValues = ( 'UTC_TIMESTAMP', 'TIMESTAMPADD', 'TIMESTAMPDIFF' )
-
     try:
-      myString = str( myString )
+      escape_string = str( myString )
+      for sV in SPECIALVALUES:
+        if escape_string.find( sV ) == 0:
+          break
+      else:
+        escape_string = _quotedString( escape_string )
     except ValueError:
       return S_ERROR( "Cannot escape value!" )
-
-    try:
-      for sV in specialValues:
-        if myString.find( sV ) == 0:
-          return S_OK( myString )
-      escape_string = connection.escape_string( str( myString ) )
-      self.log.debug( '__escape_string: returns', '"%s"' % escape_string )
-      return S_OK( '"%s"' % escape_string )
     except Exception, x:
       self.log.debug( '__escape_string: Could not escape string', '"%s"' % myString )
       return self._except( '__escape_string', x, 'Could not escape string' )
+    self.log.debug( '__escape_string: returns', escape_string )
+    return S_OK( escape_string )
 
   def __checkTable( self, tableName, force = False ):
 
@@ -560,7 +687,7 @@ class MySQL:
           tupleValues.append( retDict['Value'] )
         inEscapeValues.append( '(' + ', '.join( tupleValues ) + ')' ) 
       elif type( value ) == BooleanType:
-        inEscapeValues = [str( value )]
+        inEscapeValues.append( str( value ) )
       else:
         retDict = self.__escapeString( str( value ) )
         if not retDict['OK']:
@@ -595,13 +722,19 @@ class MySQL:
       return self._except( '_connect', x, 'Could not connect to DB.' )
 
 
-  def _query( self, cmd, conn = None, debug = False ):
+  def _query( self, cmd, conn = None, debug = False, params = None ):
     """
     execute MySQL query command
     return S_OK structure with fetchall result as tuple
     it returns an empty tuple if no matching rows are found
     return S_ERROR upon error
     """
+    if params is not None:
+      try:
+        cmd = _buildStatement( cmd, params )
+      except Exception, x:
+        return self._except( '_query', x, 'Invalid statement parameters.' )
+
     if debug:
       self.logger.debug( '_query:', cmd )
     else:
@@ -656,11 +789,17 @@ class MySQL:
     return retDict
 
 
-  def _update( self, cmd, conn = None, debug = False ):
+  def _update( self, cmd, conn = None, debug = False, params = None ):
     """ execute MySQL update command
         return S_OK with number of updated registers upon success
         return S_ERROR upon error
     """
+    if params is not None:
+      try:
+        cmd = _buildStatement( cmd, params )
+      except Exception, x:
+        return self._except( '_update', x, 'Invalid statement parameters.' )
+
     if debug:
       self.logger.debug( '_update:', cmd )
     else:
@@ -703,6 +842,61 @@ class MySQL:
 
     return retDict
 
+  def _updateMany( self, cmd, paramsList, conn = None, maxRows = 1000 ):
+    """ execute the MySQL update command template for each params list of paramsList
+        INSERT and REPLACE templates are sent as multi-row statements of up to maxRows rows,
+        the other ones are executed one after the other with the same cursor
+        return S_OK with the total number of updated registers upon success
+        return S_ERROR upon error
+    """
+    if not paramsList:
+      return S_OK( 0 )
+
+    try:
+      cmdList = []
+      multiRow = _splitMultiRow( cmd )
+      if multiRow:
+        prefix, rowTemplate, suffix = multiRow
+        for i in range( 0, len( paramsList ), maxRows ):
+          cmdList.append( prefix + ','.join( [ _buildStatement( rowTemplate, params )
+                                               for params in paramsList[i:i + maxRows] ] ) + suffix )
+      else:
+        cmdList = [ _buildStatement( cmd, params ) for params in paramsList ]
+    except Exception, x:
+      return self._except( '_updateMany', x, 'Invalid statement parameters.' )
+
+    self.logger.verbose( '_updateMany: %d statements for' % len( cmdList ), cmd[:min( len( cmd ) , 512 )] )
+
+    if gDebugFile:
+      start = time.time()
+
+    retDict = self.__getConnection( conn = conn )
+    if not retDict['OK']:
+      return retDict
+    connection = retDict['Value']
+
+    try:
+      cursor = connection.cursor()
+      res = 0
+      for statement in cmdList:
+        res += cursor.execute( statement )
+      self.log.verbose( '_updateMany:', res )
+      retDict = S_OK( res )
+    except Exception, x:
+      self.log.warn( '_updateMany: %s: %s' % ( cmd, str( x ) ) )
+      retDict = self._except( '_updateMany', x, 'Execution failed.' )
+
+    try:
+      cursor.close()
+    except Exception:
+      pass
+
+    if gDebugFile:
+      print >> gDebugFile, time.time() - start, cmd.replace( '\n', '' ), len( paramsList )
+      gDebugFile.flush()
+
+    return retDict
+
   def _transaction( self, cmdList, conn = None ):
     """ dummy transaction support
 
@@ -1519,6 +1713,38 @@ class MySQL:
     return self._update( 'INSERT INTO %s %s VALUES %s' %
                          ( table, inFieldString, inValueString ), conn, debug = True )
 
+#############################################################################
+  def insertManyFields( self, tableName, inFields, inValuesList, conn = None ):
+    """
+      Insert one row in "tableName" per list of values of "inValuesList",
+      assigning them to the fields "inFields".
+      The rows are sent with multi-row INSERT statements.
+    """
+    table = _quotedList( [tableName] )
+    if not table:
+      error = 'Invalid tableName argument'
+      self.log.warn( 'insertManyFields:', error )
+      return S_ERROR( error )
+
+    inFieldString = _quotedList( inFields )
+    if inFieldString == None:
+      error = 'Invalid inFields arguments'
+      self.log.warn( 'insertManyFields:', error )
+      return S_ERROR( error )
+
+    for inValues in inValuesList:
+      if len( inValues ) != len( inFields ):
+        error = 'Mismatch between inFields and inValues.'
+        self.log.warn( 'insertManyFields:', error )
+        return S_ERROR( error )
+
+    self.log.verbose( 'insertManyFields:', 'inserting %d rows of ( %s ) into table %s'
+                          % ( len( inValuesList ), inFieldString, table ) )
+
+    cmd = 'INSERT INTO %s (  %s ) VALUES ( %s )' % ( table, inFieldString.replace( '%', '%%' ),
+                                                     ', '.join( [ '%s' ] * len( inFields ) ) )
+    return self._updateMany( cmd, inValuesList, conn )
+
 
   def executeStoredProcedure( self, packageName, parameters, outputIds, output = True, array = None, conn = False ):
     conDict = self._getConnection()
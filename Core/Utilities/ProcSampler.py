@@ -0,0 +1,222 @@
+########################################################################
+# $HeadURL$
+# File :   ProcSampler.py
+########################################################################
+
+""" In process sampler of the linux /proc file system.
+
+    A ProcSampler scans /proc once per call to sample() and builds a ProcSample:
+    a snapshot of all the processes with a parent -> children index, from which the
+    cumulative CPU, VSize and RSS of a process subtree are computed without
+    walking /proc again. The last samples are kept so that CPU rates can be
+    derived. Load average, memory and disk space are read directly from
+    /proc/loadavg, /proc/meminfo and statvfs instead of forking cat, free or df.
+"""
+
+__RCSID__ = "$Id$"
+
+import os
+import time
+from collections import deque
+
+from DIRAC import S_OK, S_ERROR
+
+#Positions in the process info tuples
+PPID, PGRP, CPU, VSIZE, RSS, NAME = range( 6 )
+
+class ProcSample( object ):
+  """ Snapshot of the processes found in /proc at a given time
+  """
+
+  def __init__( self, sampleTime, processes, children ):
+    #Time of the scan
+    self.time = sampleTime
+    #pid -> ( ppid, pgrp, cpuSeconds, vsizeBytes, rssBytes, name )
+    self.processes = processes
+    #ppid -> [ pid, ... ]
+    self.children = children
+
+  def __addSubtree( self, pid, subtree ):
+    """ Add pid and all its descendants to the subtree list
+    """
+    pending = [ pid ]
+    while pending:
+      pid = pending.pop()
+      if pid in subtree:
+        continue
+      subtree[ pid ] = True
+      pending.extend( self.children.get( pid, [] ) )
+
+  def getSubtree( self, pid ):
+    """ Get the pids of the process, its descendants and the orphans (reparented to init)
+        in the same process groups together with their descendants
+    """
+    pid = int( pid )
+    if pid not in self.processes:
+      return []
+    subtree = {}
+    self.__addSubtree( pid, subtree )
+    processGroups = set( [ self.processes[ sPid ][ PGRP ] for sPid in subtree if sPid in self.processes ] )
+    for orphanPid in self.children.get( 1, [] ):
+      if orphanPid not in subtree and self.processes[ orphanPid ][ PGRP ] in processGroups:
+        self.__addSubtree( orphanPid, subtree )
+    return [ sPid for sPid in subtree if sPid in self.processes ]
+
+  def getUsage( self, pid ):
+    """ Get the cumulative CPU (seconds), Vsize and RSS (bytes) of the subtree of pid
+    """
+    subtree = self.getSubtree( pid )
+    if not subtree:
+      return S_ERROR( 'Process %s does not exist' % pid )
+    cpu = 0.0
+    vsize = 0.0
+    rss = 0.0
+    for sPid in subtree:
+      info = self.processes[ sPid ]
+      cpu += info[ CPU ]
+      vsize += info[ VSIZE ]
+      rss += info[ RSS ]
+    return S_OK( { 'CPU' : cpu, 'Vsize' : vsize, 'RSS' : rss, 'PIDs' : subtree } )
+
+class ProcSampler( object ):
+  """ Sample the processes and the node status from /proc
+  """
+
+  def __init__( self, procPath = '/proc', historySize = 10 ):
+    self.procPath = procPath
+    self.history = deque( maxlen = max( 2, historySize ) )
+    try:
+      self.clockTicks = float( os.sysconf( 'SC_CLK_TCK' ) )
+    except ( ValueError, OSError ):
+      self.clockTicks = 100.0
+    self.pageSize = os.sysconf( 'SC_PAGESIZE' )
+
+  def __readStat( self, pid ):
+    """ Parse /proc/<pid>/stat. Returns None if the process is gone
+    """
+    try:
+      statFile = open( os.path.join( self.procPath, pid, 'stat' ), 'r' )
+      try:
+        procStat = statFile.read()
+      finally:
+        statFile.close()
+    except IOError:
+      return None
+    #The command name can contain spaces and parenthesis, it ends at the last ')'
+    nameEnd = procStat.rfind( ')' )
+    if nameEnd == -1:
+      return None
+    name = procStat[ procStat.find( '(' ) + 1 : nameEnd ]
+    #Fields after the name start with the state (field 3 in proc(5))
+    fields = procStat[ nameEnd + 2: ].split()
+    try:
+      ticks = int( fields[11] ) + int( fields[12] ) + int( fields[13] ) + int( fields[14] )
+      return ( int( fields[1] ), int( fields[2] ), ticks / self.clockTicks,
+               int( fields[20] ), int( fields[21] ) * self.pageSize, name )
+    except ( IndexError, ValueError ):
+      return None
+
+  def sample( self, maxAge = 0 ):
+    """ Scan /proc and return a new ProcSample. If the last sample is younger than
+        maxAge seconds it is returned instead
+    """
+    now = time.time()
+    if maxAge and self.history and 0 <= now - self.history[-1].time < maxAge:
+      return S_OK( self.history[-1] )
+    try:
+      entries = os.listdir( self.procPath )
+    except OSError, excp:
+      return S_ERROR( 'Cannot list %s: %s' % ( self.procPath, excp ) )
+    processes = {}
+    children = {}
+    for entry in entries:
+      if not entry.isdigit():
+        continue
+      info = self.__readStat( entry )
+      if info is None:
+        continue
+      pid = int( entry )
+      processes[ pid ] = info
+      children.setdefault( info[ PPID ], [] ).append( pid )
+    procSample = ProcSample( now, processes, children )
+    self.history.append( procSample )
+    return S_OK( procSample )
+
+  def getUsage( self, pid, maxAge = 0 ):
+    """ Get the cumulative CPU, Vsize and RSS of the subtree of pid
+    """
+    result = self.sample( maxAge )
+    if not result[ 'OK' ]:
+      return result
+    return result[ 'Value' ].getUsage( pid )
+
+  def getCPURate( self, pid ):
+    """ Get the CPU used per wall clock second by the subtree of pid between
+        the two last samples
+    """
+    if len( self.history ) < 2:
+      return S_ERROR( 'Not enough samples to compute a rate' )
+    previous, last = self.history[-2], self.history[-1]
+    elapsed = last.time - previous.time
+    if elapsed <= 0:
+      return S_ERROR( 'Samples are not ordered in time' )
+    result = last.getUsage( pid )
+    if not result[ 'OK' ]:
+      return result
+    lastCPU = result[ 'Value' ][ 'CPU' ]
+    result = previous.getUsage( pid )
+    if not result[ 'OK' ]:
+      return result
+    return S_OK( max( 0.0, lastCPU - result[ 'Value' ][ 'CPU' ] ) / elapsed )
+
+  def getLoadAverage( self ):
+    """ Get the 1 minute load average
+    """
+    try:
+      loadFile = open( os.path.join( self.procPath, 'loadavg' ), 'r' )
+      try:
+        return S_OK( float( loadFile.read().split()[0] ) )
+      finally:
+        loadFile.close()
+    except ( IOError, IndexError, ValueError ), excp:
+      return S_ERROR( 'Could not read the load average: %s' % excp )
+
+  def getMemInfo( self ):
+    """ Get the contents of /proc/meminfo as a dict. Values are in kB
+    """
+    memInfo = {}
+    try:
+      memFile = open( os.path.join( self.procPath, 'meminfo' ), 'r' )
+      try:
+        for line in memFile:
+          fields = line.split()
+          if len( fields ) >= 2:
+            memInfo[ fields[0].rstrip( ':' ) ] = int( fields[1] )
+      finally:
+        memFile.close()
+    except ( IOError, ValueError ), excp:
+      return S_ERROR( 'Could not read the memory information: %s' % excp )
+    return S_OK( memInfo )
+
+  def getMemoryUsed( self ):
+    """ Get the memory used by the node in kB, excluding buffers and page cache
+    """
+    result = self.getMemInfo()
+    if not result[ 'OK' ]:
+      return result
+    memInfo = result[ 'Value' ]
+    if 'MemTotal' not in memInfo or 'MemFree' not in memInfo:
+      return S_ERROR( 'No memory totals found' )
+    used = memInfo[ 'MemTotal' ] - memInfo[ 'MemFree' ]
+    used -= memInfo.get( 'Buffers', 0 ) + memInfo.get( 'Cached', 0 )
+    return S_OK( float( used ) )
+
+  @staticmethod
+  def getDiskSpace( path = '.' ):
+    """ Get the free disk space available to the user in the partition containing the path, in MB
+    """
+    try:
+      stat = os.statvfs( path )
+    except OSError, excp:
+      return S_ERROR( 'Could not get the disk space of %s: %s' % ( path, excp ) )
+    return S_OK( int( stat.f_bavail * stat.f_frsize / ( 1024 * 1024 ) ) )
@@ -10,7 +10,7 @@
 """
 
 from DIRAC import gLogger, S_OK, S_ERROR
-from DIRAC.Core.Utilities.Subprocess import shellCall
+from DIRAC.Core.Utilities.ProcSampler import ProcSampler
 
 __RCSID__ = "$Id$"
 
@@ -24,6 +24,9 @@ class ProcessMonitor:
     """
     self.log = gLogger.getSubLogger( 'ProcessMonitor' )
     self.osType = platform.uname()
+    #All the checks done within maxSampleAge seconds share the same /proc scan
+    self.maxSampleAge = 1
+    self.sampler = ProcSampler()
 
   #############################################################################
   def getCPUConsumed( self, pid ):
@@ -47,20 +50,29 @@ class ProcessMonitor:
       return S_ERROR( 'Unsupported platform' )  
 
   def getResourceConsumedLinux( self, pid ):
-    """Returns the CPU consumed given a PID assuming a proc file system exists.
+    """Returns the CPU, Vsize and RSS consumed by a PID, its children and the orphans
+       in its process group assuming a proc file system exists.
     """
-    pid = str( pid )
-    masterProcPath = '/proc/%s/stat' % ( pid )
-    if not os.path.exists( masterProcPath ):
-      return S_ERROR( 'Process %s does not exist' % ( pid ) )
-
-    #Get the current process list
-    pidListResult = self.__getProcListLinux()
-    if not pidListResult['OK']:
-      return pidListResult
-
-    pidList = pidListResult['Value']
-    return self.__getChildResourceConsumedLinux( pid, pidList )
+    result = self.sampler.getUsage( pid, maxAge = self.maxSampleAge )
+    if not result['OK']:
+      return result
+    usage = result['Value']
+    if usage['CPU'] == 0:
+      self.log.error( 'Consumed CPU is found to be 0' )
+      self.log.info( 'Contributing processes:' )
+      for childPid in usage['PIDs']:
+        info = self.__getProcInfoLinux( childPid )
+        if info['OK']:
+          self.log.info( '  PID:', info['Value'] )
+    return S_OK( { "CPU": usage['CPU'],
+                   "Vsize": usage['Vsize'],
+                   "RSS": usage['RSS'] } )
+
+  def getCPURateLinux( self, pid ):
+    """Returns the CPU seconds per wall clock second used by a PID and its children
+       between the two last samples.
+    """
+    return self.sampler.getCPURate( pid )
 
   #############################################################################
   def getCPUConsumedLinux( self, pid ):
@@ -87,90 +99,6 @@ class ProcessMonitor:
     return S_OK( {'Vsize': vsize, 'RSS': rss } )
  
 
-  #############################################################################
-  def __getProcListLinux( self ):
-    """Gets list of process IDs from /proc/*.
-    """
-    result = shellCall( 10, 'ls -d /proc/[0-9]*' )
-
-    if not result['OK']:
-      if not 'Value' in result:
-        return result
-    procList = result['Value'][1].replace( '/proc/', '' ).split( '\n' )
-
-    return S_OK( procList )
-
-  #############################################################################
-  def __getChildResourceConsumedLinux( self, pid, pidList, infoDict = None ):
-    """Adds contributions to CPU total from child processes recursively.
-    """
-    childCPU = 0
-    vsize = 0
-    rss = 0
-    pageSize = os.sysconf('SC_PAGESIZE')
-    if not infoDict:
-      infoDict = {}
-      for pidCheck in pidList:
-        info = self.__getProcInfoLinux( pidCheck )
-        if info['OK']:
-          infoDict[pidCheck] = info['Value']
-
-    procGroup = self.__getProcGroupLinux( pid )
-    if not procGroup['OK']:
-      return procGroup
-
-    procGroup = procGroup['Value'].strip()
-
-    for pidCheck, info in infoDict.items():
-      if pidCheck in infoDict and info[3] == pid:
-        contribution = float( info[13] ) / 100 + float( info[14] ) / 100 + float( info[15] ) / 100 + float( info[16] ) / 100
-        childCPU += contribution
-        vsize += float( info[22] )
-        rss += float( info[23] ) * pageSize
-        self.log.debug( 'Added %s to CPU total (now %s) from child PID %s %s' % ( contribution, childCPU, info[0], info[1] ) )
-        del infoDict[pidCheck]
-        result = self.__getChildResourceConsumedLinux( pidCheck, pidList, infoDict )
-        if result['OK']:
-          childCPU += result['Value']['CPU']
-          vsize += result['Value']['Vsize']
-          rss += result['Value']['RSS'] 
-
-
-    #Next add any contributions from orphan processes in same process group
-    for pidCheck, info in infoDict.items():
-      if pidCheck in infoDict and info[3] == 1 and info[4] == procGroup:
-        contribution = float( info[13] ) / 100 + float( info[14] ) / 100 + float( info[15] ) / 100 + float( info[16] ) / 100
-        childCPU += contribution
-        vsize += float( info[22] )
-        rss += float( info[23] ) * pageSize
-        self.log.debug( 'Added %s to CPU total (now %s) from orphan PID %s %s' % ( contribution, childCPU, info[0], info[1] ) )
-        del infoDict[pidCheck]
-
-    #Finally add the parent itself
-    if pid in infoDict:
-      info = infoDict[pid]
-      contribution = float( info[13] ) / 100 + float( info[14] ) / 100 + float( info[15] ) / 100 + float( info[16] ) / 100
-      childCPU += contribution
-      vsize += float( info[22] )
-      rss += float( info[23] ) * pageSize
-      self.log.debug( 'Added %s to CPU total (now %s) from PID %s %s' % ( contribution, childCPU, info[0], info[1] ) )
-      del infoDict[pid]
-
-      # Some debug printout if 0 CPU is determined
-      if childCPU == 0:
-        self.log.error( 'Consumed CPU is found to be 0' )
-        self.log.info( 'Contributing processes:' )
-        for pidCheck in pidList:
-          if pidCheck not in infoDict:
-            info = self.__getProcInfoLinux( pidCheck )
-            if info['OK']:
-              self.log.info( '  PID:', info['Value'] )
-
-    return S_OK( { "CPU": childCPU,
-                   "Vsize": vsize,
-                   "RSS": rss } )
-
-
   #############################################################################
   def __getProcInfoLinux( self, pid ):
     """Attempts to read /proc/PID/stat and returns list of items if ok.
@@ -393,24 +321,12 @@ class ProcessMonitor:
       return S_ERROR( 'Not able to check %s' % pid )
     return S_OK( procStat.split( ' ' ) )
 
-  #############################################################################
-  def __getProcGroupLinux( self, pid ):
-    """Returns UID for given PID.
-    """
-    result = shellCall( 10, 'ps --no-headers -o pgrp -p %s' % ( pid ) )
-    if not result['OK']:
-      if  not 'Value' in result:
-        return result
-
-    return S_OK( result['Value'][1] )
-
   #############################################################################
   def __checkCurrentOS( self ):
     """Checks it is possible to determine CPU consumed with this utility
        for the current OS.
     """
     localOS = None
-    self.osType = platform.uname()
     if re.search( 'Darwin', self.osType[0] ):
       localOS = 'Mac'
     elif re.search( 'Windows', self.osType[0] ):
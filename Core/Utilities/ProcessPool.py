@@ -143,12 +143,18 @@ class WorkingProcess( multiprocessing.Process ):
     
     * on every failed read attempt (from empty  :pendingQueue:), the  idle loop counter is increased,
       worker is terminated when counter is reaching a value of 10;
+    * when it has processed :maxTasks: tasks, so the pool replaces it by a fresh one (recycling),
     * when stopEvent is set (so ProcessPool is in draining mode),
     * when parent process PID is set to 1 (init process, parent process with ProcessPool is dead).
   
   """
 
-  def __init__( self, pendingQueue, resultsQueue, stopEvent, keepRunning ):
+  ## values of the working flag
+  IDLE = 0
+  WORKING = 1
+  RETIRING = 2
+
+  def __init__( self, pendingQueue, resultsQueue, stopEvent, keepRunning, maxTasks = 0 ):
     """ c'tor
 
     :param self: self reference
@@ -158,6 +164,7 @@ class WorkingProcess( multiprocessing.Process ):
     :type multiprocessing.Queue 
     :param  stopEvent: event to stop processing
     :type multiprocessing.Event
+    :param int maxTasks: number of tasks to process before exiting (0 = no limit)
     """
     multiprocessing.Process.__init__( self )
     ## daemonize
@@ -174,6 +181,8 @@ class WorkingProcess( multiprocessing.Process ):
     self.__stopEvent = stopEvent
     ## keep process running until stop event
     self.__keepRunning = keepRunning
+    ## tasks to process before recycling
+    self.__maxTasks = maxTasks
     ## placeholder for watchdog thread
     self.__watchdogThread = None
     ## placeholder for process thread
@@ -208,7 +217,15 @@ class WorkingProcess( multiprocessing.Process ):
 
     :param self: self reference
     """
-    return self.__working.value == 1
+    return self.__working.value == self.WORKING
+
+  def isRetiring( self ):
+    """ 
+    Check if process is exiting and will not take any more tasks
+
+    :param self: self reference
+    """
+    return self.__working.value == self.RETIRING
 
   def taskProcessed( self ):
     """ 
@@ -216,7 +233,7 @@ class WorkingProcess( multiprocessing.Process ):
 
     :param self: self reference
     """
-    return self.__taskCounter
+    return self.__taskCounter.value
     
   def __processTask( self ):
     """ 
@@ -275,7 +292,7 @@ class WorkingProcess( multiprocessing.Process ):
         continue
 
       ## toggle __working flag
-      self.__working.value = 1
+      self.__working.value = self.WORKING
       ## save task
       self.task = task
       ## reset idle loop counter
@@ -304,20 +321,43 @@ class WorkingProcess( multiprocessing.Process ):
         self.task.setResult( S_ERROR("Task produced no results") )  
         noResults = True
       
-      ## check results and callbacks presence, put task to results queue
+      ## increase task counter
+      taskCounter += 1
+      self.__taskCounter.value = taskCounter
+      ## the slot is released before telling the pool, so a dead worker can only be busy with a lost task
+      retiring = timeout or noResults or ( self.__maxTasks and taskCounter >= self.__maxTasks )
+      self.__working.value = self.RETIRING if retiring else self.IDLE
+
+      ## put task to results queue if it has callbacks, otherwise just tell the pool it is done
       if self.task.hasCallback() or self.task.hasPoolCallback():
         self.__resultsQueue.put( task )
+      else:
+        self.__resultsQueue.put( TaskDone( task.getTaskID() ) )
       if timeout or noResults:  
         # The task execution timed out, stop the process to prevent it from running 
-        # in the background
-        time.sleep( 1 )
+        # in the background, once the result is flushed to the pool (killing the queue
+        # feeder thread would lose it and with it the slot of the task)
+        self.__resultsQueue.close()
+        self.__resultsQueue.join_thread()
         os.kill( self.pid, signal.SIGKILL )
         return   
-      ## increase task counter
-      taskCounter += 1
-      self.__taskCounter = taskCounter 
-      ## toggle __working flag
-      self.__working.value = 0
+      if retiring:
+        ## recycled, the pool will spawn a fresh worker
+        return
+
+class TaskDone( object ):
+  """ 
+  .. class:: TaskDone
+
+  Notification sent back by WorkingProcess for a finished task without callbacks
+  """
+  def __init__( self, taskID ):
+    """ c'tor
+
+    :param self: self reference
+    :param taskID: finished task ID
+    """
+    self.taskID = taskID
    
 class ProcessTask( object ):
   """ 
@@ -561,6 +601,18 @@ class ProcessPool( object ):
   and one :multiprocessing.Event: instance (stopEvent), which is working as a fuse to destroy idle workers 
   in a clean manner. 
 
+  Slots
+
+  Every queued task takes one of the :maxSize: slots until the worker reports it back through the resultsQueue
+  (a :TaskDone: notification is sent for tasks without callbacks). :ProcessPool.getFreeSlots: tells how many
+  tasks can be queued without waiting and :ProcessPool.waitFreeSlot: blocks until one of them is released.
+
+  Worker reuse
+
+  Workers are processing tasks one after the other, so any per process setup done by the tasks (module level
+  caches, proxies, loaded plugins) is shared by all of them. With :maxTasksPerWorker: set, a worker exits after
+  that many tasks and it is replaced by a new one, which bounds the effect of leaks in the tasks.
+
   Processing of task begins with pushing it into :pendingQueue: using :ProcessPool.queueTask: or 
   :ProcessPool.createAndQueueTask:. Every time new task is queued, :ProcessPool: is checking existance of 
   active and idle workers and spawning new ones when required. The task is then read and processed on worker 
@@ -586,7 +638,7 @@ class ProcessPool( object ):
   """
   def __init__( self, minSize = 2, maxSize = 0, maxQueuedRequests = 10,
                 strictLimits = True, poolCallback=None, poolExceptionCallback=None,
-                keepProcessesRunning=True ):
+                keepProcessesRunning=True, maxTasksPerWorker = 0 ):
     """ c'tor
 
     :param self: self reference
@@ -596,6 +648,7 @@ class ProcessPool( object ):
     :param bool strictLimits: flag to workers overcommitment
     :param callable poolCallbak: results callback
     :param callable poolExceptionCallback: exception callback
+    :param int maxTasksPerWorker: tasks executed by a worker before it is replaced (0 = never)
     """
     ## min workers
     self.__minSize = max( 1, minSize )
@@ -619,8 +672,13 @@ class ProcessPool( object ):
     self.__stopEvent = multiprocessing.Event()
     ## keep processes running flag
     self.__keepRunning = keepProcessesRunning
+    ## worker recycling
+    self.__maxTasksPerWorker = max( 0, maxTasksPerWorker )
     ## lock 
     self.__prListLock = threading.Lock()
+    ## tasks queued or being executed and the condition notified when one of them is done
+    self.__tasksInFlight = 0
+    self.__slotCondition = threading.Condition( threading.Lock() )
     
     ## workers dict
     self.__workersDict = {}
@@ -710,17 +768,87 @@ class ProcessPool( object ):
     counter = 0
     self.__prListLock.acquire()
     try:
-      counter = len( [ pid for pid, worker in self.__workersDict.items() if not worker.isWorking() ] )
+      counter = len( [ pid for pid, worker in self.__workersDict.items() \
+                         if not worker.isWorking() and not worker.isRetiring() ] )
     finally:
       self.__prListLock.release()
     return counter
 
+  def __getNumActiveProcesses( self ):
+    """ 
+    Count processes which are not retiring
+
+    :param self: self reference
+    """
+    self.__prListLock.acquire()
+    try:
+      return len( [ pid for pid, worker in self.__workersDict.items() if not worker.isRetiring() ] )
+    finally:
+      self.__prListLock.release()
+
   def getFreeSlots( self ):
     """ get number of free slots available for workers
 
     :param self: self reference
     """
-    return max( 0, self.__maxSize - self.getNumWorkingProcesses() )
+    return max( 0, self.__maxSize - self.__tasksInFlight )
+
+  def waitFreeSlot( self, timeout = None ):
+    """ 
+    Block until a slot is free or :timeout: seconds have passed
+
+    In daemon mode this waits for the background thread to process a result, otherwise
+    the results are processed by the calling thread.
+
+    :param self: self reference
+    :param timeout: seconds to wait, None waits forever
+    :return: S_OK( number of free slots )
+    """
+    end = None
+    if timeout is not None:
+      end = time.time() + timeout
+    while True:
+      freeSlots = self.getFreeSlots()
+      if freeSlots:
+        return S_OK( freeSlots )
+      waitTime = None
+      if end is not None:
+        waitTime = end - time.time()
+        if waitTime <= 0:
+          return S_ERROR( "No free slot after %s seconds" % timeout )
+      self.__waitTaskFinished( waitTime, lambda: self.__tasksInFlight >= self.__maxSize )
+
+  def __waitTaskFinished( self, waitTime, stillWaiting ):
+    """ 
+    Wait up to :waitTime: seconds for tasks to finish
+
+    :param self: self reference
+    :param waitTime: seconds to wait, None waits until a task is done
+    :param callable stillWaiting: checked with the slots lock held before sleeping
+    """
+    if self.__daemonProcess and not self.__draining and self.__daemonProcess.is_alive():
+      self.__slotCondition.acquire()
+      try:
+        if stillWaiting():
+          self.__slotCondition.wait( waitTime )
+      finally:
+        self.__slotCondition.release()
+    else:
+      self.processResults( timeout = min( waitTime or 1, 1 ) )
+
+  def __taskFinished( self, count = 1 ):
+    """ 
+    Release slots and wake up the threads waiting for them
+
+    :param self: self reference
+    :param int count: number of finished tasks
+    """
+    self.__slotCondition.acquire()
+    try:
+      self.__tasksInFlight = max( 0, self.__tasksInFlight - count )
+      self.__slotCondition.notifyAll()
+    finally:
+      self.__slotCondition.release()
 
   def __spawnWorkingProcess( self ):
     """ 
@@ -730,7 +858,8 @@ class ProcessPool( object ):
     """
     self.__prListLock.acquire()
     try:
-      worker = WorkingProcess( self.__pendingQueue, self.__resultsQueue, self.__stopEvent, self.__keepRunning )
+      worker = WorkingProcess( self.__pendingQueue, self.__resultsQueue, self.__stopEvent, self.__keepRunning,
+                               self.__maxTasksPerWorker )
       while worker.pid == None:
         time.sleep(0.1)
       self.__workersDict[ worker.pid ] = worker
@@ -742,13 +871,19 @@ class ProcessPool( object ):
     Delete references of dead workingProcesses from ProcessPool.__workingProcessList 
     """
     ## check wounded processes
+    lostTasks = 0
     self.__prListLock.acquire()
     try:
       for pid, worker in self.__workersDict.items():
         if not worker.is_alive():
+          ## died while executing a task, that one will never be reported back
+          if worker.isWorking():
+            lostTasks += 1
           del self.__workersDict[pid]
     finally:
       self.__prListLock.release()
+    if lostTasks:
+      self.__taskFinished( lostTasks )
 
   def __spawnNeededWorkingProcesses( self ):
     """ 
@@ -762,18 +897,17 @@ class ProcessPool( object ):
     if self.__draining or self.__stopEvent.is_set():
       return
 
-    while len( self.__workersDict ) < self.__minSize:
+    while self.__getNumActiveProcesses() < self.__minSize:
       if self.__draining or self.__stopEvent.is_set():  
         return
       self.__spawnWorkingProcess()
 
     while self.hasPendingTasks() and \
           self.getNumIdleProcesses() == 0 and \
-          len( self.__workersDict ) < self.__maxSize:
+          self.__getNumActiveProcesses() < self.__maxSize:
       if self.__draining or self.__stopEvent.is_set():
         return
       self.__spawnWorkingProcess()
-      time.sleep( 0.1 )
 
   def queueTask( self, task, blocking = True, usePoolCallbacks= False ):
     """ 
@@ -789,18 +923,19 @@ class ProcessPool( object ):
     if usePoolCallbacks and ( self.__poolCallback or self.__poolExceptionCallback ):
       task.enablePoolCallbacks()
 
-    self.__prListLock.acquire()
+    ## the slot is taken before the worker can possibly report the task back
+    self.__slotCondition.acquire()
+    try:
+      self.__tasksInFlight += 1
+    finally:
+      self.__slotCondition.release()
     try:
       self.__pendingQueue.put( task, block = blocking )
     except Queue.Full:
-      self.__prListLock.release()
+      self.__taskFinished()
       return S_ERROR( "Queue is full" )
-    finally:
-      self.__prListLock.release()
 
     self.__spawnNeededWorkingProcesses()
-    ## throttle a bit to allow task state propagation
-    time.sleep( 0.1 )
     return S_OK()
 
   def createAndQueueTask( self,
@@ -860,22 +995,30 @@ class ProcessPool( object ):
     """
     return not self.__pendingQueue.empty() or self.getNumWorkingProcesses()
 
-  def processResults( self ):
+  def processResults( self, timeout = 0 ):
     """ 
     Execute tasks' callbacks removing them from results queue
 
     :param self: self reference
+    :param timeout: seconds to wait for the first result if none is available yet
     """
+    self.__cleanDeadProcesses()
+    if not self.__pendingQueue.empty():
+      self.__spawnNeededWorkingProcesses()
     processed = 0
     while True:
-      self.__cleanDeadProcesses()
-      if not self.__pendingQueue.empty():
-        self.__spawnNeededWorkingProcesses()
-      time.sleep( 0.1 )
-      if self.__resultsQueue.empty():
-        break
       ## get task
-      task = self.__resultsQueue.get()
+      try:
+        if timeout and not processed:
+          task = self.__resultsQueue.get( True, timeout )
+        else:
+          task = self.__resultsQueue.get( False )
+      except Queue.Empty:
+        break
+      self.__taskFinished()
+      processed += 1
+      if isinstance( task, TaskDone ):
+        continue
       ## execute callbacks
       try:
         task.doExceptionCallback()
@@ -887,7 +1030,10 @@ class ProcessPool( object ):
             self.__poolCallback( task.getTaskID(), task.taskResults() )
       except Exception, error:
         pass
-      processed += 1
+    if processed:
+      ## recycled workers have to be replaced
+      self.__cleanDeadProcesses()
+      self.__spawnNeededWorkingProcesses()
     return processed
 
   def processAllResults( self, timeout=10 ):
@@ -897,11 +1043,11 @@ class ProcessPool( object ):
     :param self: self reference
     """
     start = time.time()
-    while self.getNumWorkingProcesses() or not self.__pendingQueue.empty():
-      self.processResults()      
-      time.sleep( 1 )
-      if time.time() - start > timeout:
+    while self.__tasksInFlight:
+      remaining = timeout - ( time.time() - start )
+      if remaining <= 0:
         break
+      self.__waitTaskFinished( min( remaining, 1 ), lambda: self.__tasksInFlight )
     self.processResults()
 
   def finalize( self, timeout = 60 ):
@@ -972,9 +1118,11 @@ class ProcessPool( object ):
     """
     while True:
       if self.__draining:
+        ## waitFreeSlot callers have to process the results by themselves from now on
+        self.__taskFinished( 0 )
         return
-      self.processResults()
-      time.sleep( 1 )
+      ## wakes up as soon as a result is available
+      self.processResults( timeout = 1 )
 
   def __del__( self ):
     """ 
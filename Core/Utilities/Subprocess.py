@@ -2,7 +2,7 @@
 """
 DIRAC Wrapper to execute python and system commands with a wrapper, that might
 set a timeout.
-3 FUNCTIONS are provided:
+4 FUNCTIONS are provided:
    
      - shellCall( iTimeOut, cmdSeq, callbackFunction = None, env = None ):
        it uses subprocess.Popen class with "shell = True".
@@ -22,10 +22,17 @@ set a timeout.
        ( returncode, stdout, stderr ) the tuple will also be available upon
        timeout error or buffer overflow error.
 
+     - systemCalls( iTimeOut, cmdSeqList, env = None, shell = False ):
+       runs the commands of cmdSeqList concurrently and returns S_OK with the
+       list of their systemCall results, the timeout applies to each of them.
+
      - pythonCall( iTimeOut, function, \*stArgs, \*\*stKeyArgs )
        calls function with given arguments within a timeout Wrapper
        should be used to wrap third party python functions
 
+The output pipes of the children are read in a single poll (epoll on Linux) loop,
+woken up by SIGCHLD when called from the main thread.
+
 """
 __RCSID__ = "$Id$"
 
@@ -38,6 +45,8 @@ import sys
 import types
 import subprocess
 import signal
+import errno
+import fcntl
 # Very Important:
 #  Here we can not import directly from DIRAC, since this file it is imported
 #  at initialization time therefore the full path is necessary
@@ -138,6 +147,143 @@ class Watchdog( object ):
                "Value": ( 2, '', '' )  }
     return ret
 
+# Size of the reads from the child pipes
+READ_SIZE = 65536
+# Longest wait for the exit of a child which left its pipes open, when SIGCHLD can't wake up the loop
+MAX_IDLE_WAIT = 0.5
+
+class _Poller( object ):
+  """
+  .. class:: _Poller
+
+  epoll where available, poll otherwise, with the timeout in seconds
+  """
+  def __init__( self ):
+    """ c'tor """
+    if hasattr( select, 'epoll' ):
+      self.__poller = select.epoll()
+      self.__scale = 1.
+      self.__events = select.EPOLLIN | select.EPOLLPRI | select.EPOLLERR | select.EPOLLHUP
+    else:
+      self.__poller = select.poll()
+      self.__scale = 1000.
+      self.__events = select.POLLIN | select.POLLPRI | select.POLLERR | select.POLLHUP
+
+  def register( self, fd ):
+    """ watch :fd: for reading """
+    self.__poller.register( fd, self.__events )
+
+  def unregister( self, fd ):
+    """ stop watching :fd: """
+    self.__poller.unregister( fd )
+
+  def poll( self, timeout = None ):
+    """ get the ready file descriptors, wait forever if :timeout: is None
+
+    :return: list of file descriptors, empty if interrupted by a signal
+    """
+    if timeout is None:
+      timeout = -1
+    else:
+      timeout = max( timeout, 0 ) * self.__scale
+    try:
+      return [ fd for fd, _event in self.__poller.poll( timeout ) ]
+    except ( IOError, OSError, select.error ), x:
+      if x.args[0] == errno.EINTR:
+        return []
+      raise
+
+  def close( self ):
+    """ release the epoll file descriptor """
+    if hasattr( self.__poller, 'close' ):
+      self.__poller.close()
+
+class _ChildOutput( object ):
+  """
+  .. class:: _ChildOutput
+
+  output and exit status of a child process started by Subprocess.systemCall
+  """
+  def __init__( self, child, cmdSeq, callback, bufferLimit, log ):
+    """ c'tor """
+    self.child = child
+    self.pid = child.pid
+    self.cmdSeq = cmdSeq
+    self.callback = callback
+    self.bufferLimit = bufferLimit
+    self.log = log
+    # fd -> 0 for stdout, 1 for stderr
+    self.fds = { child.stdout.fileno() : 0, child.stderr.fileno() : 1 }
+    # stdout and stderr chunks, with a callback only the end of the last line
+    self.chunks = ( [], [] )
+    self.lengths = [ 0, 0 ]
+    self.exitStatus = None
+    self.error = ''
+
+  def read( self, fd ):
+    """ read the available data from :fd:
+
+    :return: False at the end of the output or if the buffer limit is reached
+    """
+    try:
+      data = os.read( fd, READ_SIZE )
+    except OSError, x:
+      if x.errno in ( errno.EAGAIN, errno.EINTR ):
+        return True
+      self.log.exception( "SUBPROCESS: read exception" )
+      self.error = 'Can not read from output: %s' % str( x )
+      return False
+    if not data:
+      return False
+    index = self.fds[fd]
+    if self.callback is None:
+      self.chunks[index].append( data )
+      self.lengths[index] += len( data )
+    else:
+      lines = data.split( "\n" )
+      if len( lines ) > 1:
+        lines[0] = ''.join( self.chunks[index] ) + lines[0]
+        del self.chunks[index][:]
+        self.lengths[index] = 0
+        for line in lines[:-1]:
+          self.__callLineCallback( index, line )
+      if lines[-1]:
+        self.chunks[index].append( lines[-1] )
+        self.lengths[index] += len( lines[-1] )
+    if self.lengths[index] > self.bufferLimit:
+      self.log.error( 'Maximum output buffer length reached' )
+      self.error = 'Reached maximum allowed length (%d bytes) for called function return value' % self.bufferLimit
+      return False
+    return True
+
+  def drain( self ):
+    """ read what is left in the pipes without waiting """
+    for fd in self.fds.keys():
+      while fd in select.select( [ fd ], [], [], 0 )[0]:
+        if not self.read( fd ):
+          break
+
+  def __callLineCallback( self, index, line ):
+    """ line callback execution """
+    try:
+      self.callback( index, line )
+    except Exception:
+      self.log.exception( 'Exception while calling callback function',
+                          '%s' % self.callback.__name__ )
+      self.log.showStack()
+
+  def getOutput( self, index ):
+    """ stdout ( :index: = 0 ) or stderr ( :index: = 1 ) """
+    return ''.join( self.chunks[index] )
+
+  def close( self ):
+    """ close the pipes """
+    try:
+      self.child.stdout.close()
+      self.child.stderr.close()
+    except Exception:
+      pass
+
 class Subprocess:
   """
   .. class:: Subprocess
@@ -157,12 +303,12 @@ class Subprocess:
     except Exception, x:
       self.log.exception( 'Failed initialisation of Subprocess object' )
       raise x
-    
+
     self.child = None
     self.childPID = 0
     self.childKilled = False
+    self.killedStatus = {}
     self.callback = None
-    self.bufferList = []
     self.cmdSeq = []
 
   def changeTimeout( self, timeout ):
@@ -175,26 +321,6 @@ class Subprocess:
       self.timeout = False
     #self.log.debug( 'Timeout set to', timeout )
 
-  def __readFromFD( self, fd, baseLength = 0 ):
-    """ read from file descriptior :fd:
-
-    :param fd: file descriptior
-    :param int baseLength: ???
-    """
-    dataString = ''
-    redBuf = " "
-    while len( redBuf ) > 0:
-      redBuf = os.read( fd, 8192 )
-      dataString += redBuf
-      if len( dataString ) + baseLength > self.bufferLimit:
-        self.log.error( 'Maximum output buffer length reached' )
-        retDict = S_ERROR( 'Reached maximum allowed length (%d bytes) '
-                           'for called function return value' % self.bufferLimit )
-        retDict[ 'Value' ] = dataString
-        return retDict
-
-    return S_OK( dataString )
-
   def __executePythonFunction( self, function, writePipe, *stArgs, **stKeyArgs ):
     """
     execute function :funtion: using :stArgs: and :stKeyArgs:
@@ -216,24 +342,6 @@ class Subprocess:
     finally:
       os._exit( 0 )
 
-  def __selectFD( self, readSeq, timeout = False ):
-    """ select file descriptor from :readSeq: list """
-    validList = []
-    for fd in readSeq:
-      try:
-        os.fstat( fd )
-        validList.append( fd )
-      except OSError:
-        pass
-    if not validList:
-      return False
-    if self.timeout and not timeout:
-      timeout = self.timeout
-    if not timeout:
-      return select.select( validList , [], [] )[0]
-    else:
-      return select.select( validList , [], [], timeout )[0]
-
   def __killPid( self, pid, sig = 9 ):
     """ send signal :sig: to process :pid:
 
@@ -247,14 +355,21 @@ class Subprocess:
         self.log.exception( 'Exception while killing timed out process' )
         raise x
 
-  def __poll( self, pid ):
-    """ wait for :pid: """
+  def __waitPid( self, pid, options = 0 ):
+    """ wait for :pid:
+
+    :return: the waitpid status, None if still running with os.WNOHANG
+    """
     try:
-      return os.waitpid( pid, os.WNOHANG )
-    except os.error:
-      if self.childKilled:
-        return False
+      retPid, status = os.waitpid( pid, options )
+    except OSError, x:
+      if x.errno == errno.EINTR:
+        return None
+      # Already collected by killChild
+      return self.killedStatus.get( pid, 0 )
+    if not retPid:
       return None
+    return status
 
   def killChild( self, recursive = True ):
     """ kill child process 
@@ -264,38 +379,41 @@ class Subprocess:
     if self.childPID < 1:
       self.log.error( "Could not kill child", "Child PID is %s" % self.childPID )
       return - 1
-    os.kill( self.childPID, signal.SIGSTOP )
+    exitStatus = self.__killProcessTree( self.childPID, recursive )
+    self.childKilled = True
+    return exitStatus
+
+  def __killProcessTree( self, pid, recursive = True ):
+    """ stop :pid: and its descendants, kill them and collect the exit status of :pid: """
+    try:
+      os.kill( pid, signal.SIGSTOP )
+    except OSError:
+      pass
     if recursive:
-      for gcpid in getChildrenPIDs( self.childPID, lambda cpid: os.kill( cpid, signal.SIGSTOP ) ):
+      for gcpid in getChildrenPIDs( pid, lambda cpid: os.kill( cpid, signal.SIGSTOP ) ):
         try:
           os.kill( gcpid, signal.SIGKILL )
-          self.__poll( gcpid )
+          os.waitpid( gcpid, os.WNOHANG )
         except Exception:
           pass
-    self.__killPid( self.childPID )
-
-    #HACK to avoid python bug
-    # self.child.wait()
-    exitStatus = self.__poll( self.childPID )
-    i = 0
-    while exitStatus == None and i < 1000:
-      i += 1
-      time.sleep( 0.000001 )
-      exitStatus = self.__poll( self.childPID )
-    try:
-      exitStatus = os.waitpid( self.childPID, 0 )
-    except os.error:
-      pass
-    self.childKilled = True
-    if exitStatus == None:
-      return exitStatus
-    return exitStatus[1]
+    self.__killPid( pid )
+    # A killed process exits even if stopped
+    exitStatus = None
+    while exitStatus is None:
+      try:
+        exitStatus = os.waitpid( pid, 0 )[1]
+      except OSError, x:
+        if x.errno != errno.EINTR:
+          break
+    if exitStatus is not None:
+      self.killedStatus[pid] = exitStatus
+    return exitStatus
 
   def pythonCall( self, function, *stArgs, **stKeyArgs ):
     """ call python function :function: with :stArgs: and :stKeyArgs: """
-    
+
     self.log.verbose( 'pythonCall:', function.__name__ )
-    
+
     readFD, writeFD = os.pipe()
     pid = os.fork()
     self.childPID = pid
@@ -306,219 +424,231 @@ class Subprocess:
       os.close( writeFD )
     else:
       os.close( writeFD )
-      readSeq = self.__selectFD( [ readFD ] )
-      if readSeq == False:
-        return S_ERROR( "Can't read from call %s" % ( function.__name__ ) )
+      poller = _Poller()
+      poller.register( readFD )
+      initialTime = time.time()
+      chunks = []
+      dataLength = 0
       try:
-        if len( readSeq ) == 0:
-          self.log.debug( 'Timeout limit reached for pythonCall', function.__name__ )
-          self.__killPid( pid )
-
-          #HACK to avoid python bug
-          # self.wait()
-          retries = 10000
-          while os.waitpid( pid, 0 ) == -1 and retries > 0:
-            time.sleep( 0.001 )
-            retries -= 1
-
-          return S_ERROR( '%d seconds timeout for "%s" call' % ( self.timeout, function.__name__ ) )
-        elif readSeq[0] == readFD:
-          retDict = self.__readFromFD( readFD )
-          os.waitpid( pid, 0 )
-          if retDict[ 'OK' ]:
-            dataStub = retDict[ 'Value' ]
-            if not dataStub:
-              return S_ERROR( "Error decoding data coming from call" )
-            retObj, stubLen = DEncode.decode( dataStub )
-            if stubLen == len( dataStub ):
-              return retObj
-            else:
-              return S_ERROR( "Error decoding data coming from call" )
-          return retDict
+        while True:
+          timeout = None
+          if self.timeout:
+            timeout = initialTime + self.timeout - time.time()
+            if timeout <= 0:
+              self.log.debug( 'Timeout limit reached for pythonCall', function.__name__ )
+              self.__killPid( pid )
+              self.__waitPid( pid )
+              return S_ERROR( '%d seconds timeout for "%s" call' % ( self.timeout, function.__name__ ) )
+          if not poller.poll( timeout ):
+            continue
+          data = os.read( readFD, READ_SIZE )
+          if not data:
+            break
+          chunks.append( data )
+          dataLength += len( data )
+          if dataLength > self.bufferLimit:
+            self.log.error( 'Maximum output buffer length reached' )
+            self.__killPid( pid )
+            self.__waitPid( pid )
+            retDict = S_ERROR( 'Reached maximum allowed length (%d bytes) '
+                               'for called function return value' % self.bufferLimit )
+            retDict[ 'Value' ] = ''.join( chunks )
+            return retDict
+        self.__waitPid( pid )
+        dataStub = ''.join( chunks )
+        if not dataStub:
+          return S_ERROR( "Error decoding data coming from call" )
+        retObj, stubLen = DEncode.decode( dataStub )
+        if stubLen == len( dataStub ):
+          return retObj
+        return S_ERROR( "Error decoding data coming from call" )
       finally:
+        poller.close()
         os.close( readFD )
 
-  def __generateSystemCommandError( self, exitStatus, message ):
-    """ create system command error 
-
-    :param int exitStatus: exist status
-    :param str message: error message
-    :return: S_ERROR with additional 'Value' tuple ( existStatus, stdoutBuf, stderrBuf ) 
-    """
-    retDict = S_ERROR( message )
-    retDict[ 'Value' ] = ( exitStatus,
-                           self.bufferList[0][0],
-                           self.bufferList[1][0] )
-    return retDict
-
-  def __readFromFile( self, fd, baseLength, doAll = True ):
-    """ read from file descriptor :fd: and save it to the dedicated buffer
+  def __startChild( self, cmdSeq, shell, env ):
+    """ start :cmdSeq: with its stdout and stderr piped
 
+    :return: S_OK( Popen object ), S_ERROR with the ( -1, '', error ) Value otherwise
     """
-    try:
-      dataString = ""
-      fn = fd.fileno()
-      rawRead = type( fn ) == types.IntType
-      while fd in select.select( [ fd ], [], [], 1 )[0]:
-        if rawRead:
-          nB = os.read( fn, self.bufferLimit )
-        else:
-          nB = fd.read( 1 )
-        if nB == "":
-          break
-        dataString += nB
-    except Exception, x:
-      self.log.exception( "SUBPROCESS: readFromFile exception" )
-      try:
-        self.log.error( 'Error reading', 'type(nB) =%s' % type( nB ) )
-        self.log.error( 'Error reading', 'nB =%s' % str( nB ) )
-      except Exception:
-        pass
-      return S_ERROR( 'Can not read from output: %s' % str( x ) )
-    if len( dataString ) + baseLength > self.bufferLimit:
-      self.log.error( 'Maximum output buffer length reached' )
-      retDict = S_ERROR( 'Reached maximum allowed length (%d bytes) for called '
-                         'function return value' % self.bufferLimit )
-      retDict[ 'Value' ] = dataString
-      return retDict
-
-    return S_OK( dataString )
-
-  def __readFromSystemCommandOutput( self, fd, bufferIndex ):
-    """ read stdout from file descriptor :fd: """
-    retDict = self.__readFromFile( fd,
-                                   len( self.bufferList[ bufferIndex ][0] ) )
-    if retDict[ 'OK' ]:
-      self.bufferList[ bufferIndex ][0] += retDict[ 'Value' ]
-      if not self.callback == None:
-        while self.__callLineCallback( bufferIndex ):
-          pass
-      return S_OK()
-    else: # buffer size limit reached killing process (see comment on __readFromFile)
-      exitStatus = self.killChild()
-
-      return self.__generateSystemCommandError( 
-                  exitStatus,
-                  "%s for '%s' call" % ( retDict['Message'], self.cmdSeq ) )
-
-  def systemCall( self, cmdSeq, callbackFunction = None, shell = False, env = None ):
-    """ system call (no shell) - execute :cmdSeq: """
-    
-    if shell:
-      self.log.verbose( 'shellCall:', cmdSeq )
-    else:
-      self.log.verbose( 'systemCall:', cmdSeq )
-        
-    self.cmdSeq = cmdSeq
-    self.callback = callbackFunction
     if sys.platform.find( "win" ) == 0:
       closefd = False
     else:
       closefd = True
+    child = None
     try:
-      self.child = subprocess.Popen( self.cmdSeq,
-                                     shell = shell,
-                                     stdout = subprocess.PIPE,
-                                     stderr = subprocess.PIPE,
-                                     close_fds = closefd,
-                                     env = env )
-      self.childPID = self.child.pid
+      child = subprocess.Popen( cmdSeq,
+                                shell = shell,
+                                stdout = subprocess.PIPE,
+                                stderr = subprocess.PIPE,
+                                close_fds = closefd,
+                                env = env )
     except OSError, v:
       retDict = S_ERROR( v )
       retDict['Value'] = ( -1, '' , str( v ) )
       return retDict
     except Exception, x:
       try:
-        self.child.stdout.close()
-        self.child.stderr.close()
+        child.stdout.close()
+        child.stderr.close()
       except Exception:
         pass
       retDict = S_ERROR( x )
       retDict['Value'] = ( -1, '' , str( x ) )
       return retDict
+    return S_OK( child )
 
-    try:
-      self.bufferList = [ [ "", 0 ], [ "", 0 ] ]
-      initialTime = time.time()
+  def systemCall( self, cmdSeq, callbackFunction = None, shell = False, env = None ):
+    """ system call (no shell) - execute :cmdSeq: """
+
+    if shell:
+      self.log.verbose( 'shellCall:', cmdSeq )
+    else:
+      self.log.verbose( 'systemCall:', cmdSeq )
 
-      exitStatus = self.__poll( self.child.pid )
+    self.cmdSeq = cmdSeq
+    self.callback = callbackFunction
+    retDict = self.__startChild( cmdSeq, shell, env )
+    if not retDict['OK']:
+      return retDict
+    self.child = retDict['Value']
+    self.childPID = self.child.pid
+    childOutput = _ChildOutput( self.child, cmdSeq, callbackFunction, self.bufferLimit, self.log )
+    self.__runChildren( [ childOutput ] )
+    return self.__getResult( childOutput )
 
-      while ( 0, 0 ) == exitStatus or None == exitStatus:
-        retDict = self.__readFromCommand()
-        if not retDict[ 'OK' ]:
-          return retDict
+  def systemCalls( self, cmdSeqList, shell = False, env = None ):
+    """ execute the commands of :cmdSeqList: concurrently, the timeout applies to each of them
 
-        if self.timeout and time.time() - initialTime > self.timeout:
-          exitStatus = self.killChild()
-          self.__readFromCommand()
-          return self.__generateSystemCommandError( 
-                      exitStatus,
-                      "Timeout (%d seconds) for '%s' call" %
-                      ( self.timeout, cmdSeq ) )
-        time.sleep( 0.01 )
-        exitStatus = self.__poll( self.child.pid )
+    :return: S_OK( list of the systemCall results in the order of the commands )
+    """
+    children = []
+    results = []
+    for cmdSeq in cmdSeqList:
+      self.log.verbose( 'systemCalls:', cmdSeq )
+      retDict = self.__startChild( cmdSeq, shell, env )
+      if retDict['OK']:
+        children.append( _ChildOutput( retDict['Value'], cmdSeq, None, self.bufferLimit, self.log ) )
+        results.append( children[-1] )
+      else:
+        results.append( retDict )
+    self.__runChildren( children )
+    return S_OK( [ self.__getResult( result ) if isinstance( result, _ChildOutput ) else result
+                   for result in results ] )
+
+  def __getResult( self, childOutput ):
+    """ systemCall return value for :childOutput: """
+    exitStatus = childOutput.exitStatus
+    if exitStatus >= 256:
+      exitStatus /= 256
+    if childOutput.error:
+      retDict = S_ERROR( "%s for '%s' call" % ( childOutput.error, childOutput.cmdSeq ) )
+      retDict[ 'Value' ] = ( exitStatus, childOutput.getOutput( 0 ), childOutput.getOutput( 1 ) )
+      return retDict
+    return S_OK( ( exitStatus, childOutput.getOutput( 0 ), childOutput.getOutput( 1 ) ) )
+
+  def __runChildren( self, children ):
+    """ read the output of the :children: in one poll loop until they exit or time out """
+    poller = _Poller()
+    fdChildren = {}
+    for childOutput in children:
+      for fd in childOutput.fds:
+        poller.register( fd )
+        fdChildren[fd] = childOutput
+    sigchldFDs = self.__hookSIGCHLD()
+    if sigchldFDs:
+      poller.register( sigchldFDs[0] )
+    initialTime = time.time()
+    # The first pass does not wait, a child may have exited before SIGCHLD was caught
+    idleWait = 0
+    running = list( children )
+    try:
+      while running:
+        if sigchldFDs and idleWait:
+          # Woken up by the output or the exit of a child
+          waitTime = None
+        else:
+          waitTime = idleWait
+        if self.timeout:
+          # Slightly after the timeout, poll rounds down to the millisecond
+          deadline = initialTime + self.timeout - time.time() + 0.01
+          if waitTime is None or deadline < waitTime:
+            waitTime = deadline
+        readyFDs = poller.poll( waitTime )
+        if readyFDs or not idleWait:
+          idleWait = 0.01
+        else:
+          idleWait = min( 2 * idleWait, MAX_IDLE_WAIT )
+        for fd in readyFDs:
+          if sigchldFDs and fd == sigchldFDs[0]:
+            os.read( fd, READ_SIZE )
+          elif fd in fdChildren:
+            childOutput = fdChildren[fd]
+            if not childOutput.read( fd ):
+              poller.unregister( fd )
+              del fdChildren[fd]
+              del childOutput.fds[fd]
+              if childOutput.error:
+                # buffer size limit reached or read error, killing the process
+                childOutput.exitStatus = self.__killProcessTree( childOutput.pid )
+        for childOutput in list( running ):
+          if childOutput.exitStatus is None:
+            # Never blocking, a child closing its pipes may still be running until the timeout
+            childOutput.exitStatus = self.__waitPid( childOutput.pid, os.WNOHANG )
+          if childOutput.exitStatus is None and self.timeout and time.time() - initialTime > self.timeout:
+            childOutput.exitStatus = self.__killProcessTree( childOutput.pid )
+            childOutput.error = "Timeout (%d seconds)" % self.timeout
+          if childOutput.exitStatus is not None:
+            if childOutput.fds and not childOutput.error:
+              # Whatever the child wrote before exiting, its descendants may keep the pipes open
+              childOutput.drain()
+            for fd in childOutput.fds.keys():
+              poller.unregister( fd )
+              del fdChildren[fd]
+            running.remove( childOutput )
+    finally:
+      poller.close()
+      self.__unhookSIGCHLD( sigchldFDs )
+      for childOutput in children:
+        childOutput.close()
 
-      self.__readFromCommand()
+  def __hookSIGCHLD( self ):
+    """ in the main thread, make SIGCHLD wake up the poll loop through a pipe
 
-      if exitStatus:
-        exitStatus = exitStatus[1]
+    :return: ( read fd, write fd ) of the pipe, None if SIGCHLD can't be used
+    """
+    if not isinstance( threading.currentThread(), threading._MainThread ):
+      return None
+    try:
+      if signal.getsignal( signal.SIGCHLD ) != signal.SIG_DFL:
+        return None
+      sigchldFDs = os.pipe()
+      for fd in sigchldFDs:
+        fcntl.fcntl( fd, fcntl.F_SETFL, fcntl.fcntl( fd, fcntl.F_GETFL ) | os.O_NONBLOCK )
+      def wakeUp( signum, frame ):
+        try:
+          os.write( sigchldFDs[1], "x" )
+        except OSError:
+          pass
+      signal.signal( signal.SIGCHLD, wakeUp )
+      signal.siginterrupt( signal.SIGCHLD, False )
+    except Exception:
+      self.log.exception( 'Can not catch SIGCHLD' )
+      return None
+    return sigchldFDs
 
-      if exitStatus >= 256:
-        exitStatus /= 256
-      return S_OK( ( exitStatus, self.bufferList[0][0], self.bufferList[1][0] ) )
-    finally:
-      try:
-        self.child.stdout.close()
-        self.child.stderr.close()
-      except Exception:
-        pass
+  def __unhookSIGCHLD( self, sigchldFDs ):
+    """ restore the default SIGCHLD handler """
+    if not sigchldFDs:
+      return
+    signal.signal( signal.SIGCHLD, signal.SIG_DFL )
+    for fd in sigchldFDs:
+      os.close( fd )
 
   def getChildPID( self ):
     """ child pid getter """
     return self.childPID
 
-  def __readFromCommand( self, isLast = False ):
-    """ read child stdout and stderr """
-    fdList = []
-    for i in ( self.child.stdout, self.child.stderr ):
-      try:
-        if not i.closed:
-          fdList.append( i.fileno() )
-      except Exception:
-        self.log.exception( "SUBPROCESS: readFromCommand exception" )
-    readSeq = self.__selectFD( fdList, True )
-    if readSeq == False:
-      return S_OK()
-    if self.child.stdout.fileno() in readSeq:
-      retDict = self.__readFromSystemCommandOutput( self.child.stdout, 0 )
-      if not retDict[ 'OK' ]:
-        return retDict
-    if self.child.stderr.fileno() in readSeq:
-      retDict = self.__readFromSystemCommandOutput( self.child.stderr, 1 )
-      if not retDict[ 'OK' ]:
-        return retDict
-    return S_OK()
-
-  def __callLineCallback( self, bufferIndex ):
-    """ line callback execution """
-    nextLineIndex = self.bufferList[ bufferIndex ][0][ self.bufferList[ bufferIndex ][1]: ].find( "\n" )
-    if nextLineIndex > -1:
-      try:
-        self.callback( bufferIndex, self.bufferList[ bufferIndex ][0][
-                        self.bufferList[ bufferIndex ][1]:
-                        self.bufferList[ bufferIndex ][1] + nextLineIndex ] )
-        #Each line processed is taken out of the buffer to prevent the limit from killing us
-        nL = self.bufferList[ bufferIndex ][1] + nextLineIndex + 1
-        self.bufferList[ bufferIndex ][0] = self.bufferList[ bufferIndex ][0][ nL: ]
-        self.bufferList[ bufferIndex ][1] = 0
-      except Exception:
-        self.log.exception( 'Exception while calling callback function',
-                           '%s' % self.callback.__name__ )
-        self.log.showStack()
-
-      return True
-    return False
-
 def systemCall( timeout, cmdSeq, callbackFunction = None, env = None, bufferLimit = 52428800 ):
   """
      Use SubprocessExecutor class to execute cmdSeq (it can be a string or a sequence)
@@ -559,6 +689,14 @@ def shellCall( timeout, cmdSeq, callbackFunction = None, env = None, bufferLimit
                                   shell = True )
   return result
 
+def systemCalls( timeout, cmdSeqList, env = None, shell = False, bufferLimit = 52428800 ):
+  """
+     Use SubprocessExecutor class to execute concurrently the commands of cmdSeqList
+     with a timeout wrapper, returns the list of their systemCall results
+  """
+  spObject = Subprocess( timeout, bufferLimit = bufferLimit )
+  return spObject.systemCalls( cmdSeqList, shell = shell, env = env )
+
 def pythonCall( timeout, function, *stArgs, **stKeyArgs ):
   """
      Use SubprocessExecutor class to execute function with provided arguments,
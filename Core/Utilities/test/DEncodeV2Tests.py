@@ -0,0 +1,74 @@
+########################################################################
+# $HeadURL $
+# File: DEncodeV2Tests.py
+########################################################################
+
+""" :mod: DEncodeV2Tests
+    =======================
+
+    .. module: DEncodeV2Tests
+    :synopsis: test cases for DEncodeV2
+
+    test cases for the binary DEncode v2 codec
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import datetime
+import unittest
+## SUT
+from DIRAC.Core.Utilities import DEncodeV2, DEncode
+
+########################################################################
+class DEncodeV2TestCase( unittest.TestCase ):
+  """
+  .. class:: DEncodeV2TestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.values = [ 0, 1, -1, 127, -128, 128, 40000, -40000, 2 ** 31, -2 ** 40, 2 ** 70,
+                    long( 3 ), 1.5, -2.0e-10, True, False, None, "", "a" * 300,
+                    u"\xe1rbol", datetime.datetime( 2013, 4, 5, 6, 7, 8, 9 ),
+                    datetime.date( 2013, 4, 5 ), datetime.time( 6, 7, 8, 9 ),
+                    [ 1, "2", [ 3 ] ], ( 1, ( 2, ), [] ),
+                    { 'OK' : True, 'Value' : { '/lfn/a' : { 'SE-1' : 'pfn', 'SE-2' : 'pfn' },
+                                               '/lfn/b' : { 'SE-1' : 'pfn', 'SE-2' : 'pfn' } },
+                      3 : ( 4, None ) } ]
+
+  def testRoundTrip( self ):
+    """ encode/decode of all the supported types """
+    for value in self.values:
+      decoded = DEncodeV2.decode( DEncodeV2.encode( value ) )[0]
+      self.assertEqual( decoded, value )
+      self.assertEqual( type( decoded ), type( value ) )
+
+  def testMemoryView( self ):
+    """ decode from a memoryview """
+    for value in self.values:
+      data = DEncodeV2.encode( value )
+      self.assertEqual( DEncodeV2.decode( memoryview( bytearray( data ) ) ), ( value, len( data ) ) )
+
+  def testKeyInterning( self ):
+    """ repeated keys are only sent once """
+    data = DEncodeV2.encode( [ { 'SomeLongKeyName' : i } for i in range( 10 ) ] )
+    self.assertEqual( data.count( 'SomeLongKeyName' ), 1 )
+    self.assertEqual( DEncodeV2.encode( S_OKLike() ).find( 'Value' ), -1 )
+
+  def testAutoDetection( self ):
+    """ DEncode.decode understands v2 streams """
+    for value in self.values:
+      self.assertEqual( DEncode.decode( DEncodeV2.encode( value ) )[0], value )
+    self.assertFalse( DEncodeV2.isV2( DEncode.encode( self.values ) ) )
+
+def S_OKLike():
+  """ a return structure """
+  return { 'OK' : True, 'Value' : 1 }
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( DEncodeV2TestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
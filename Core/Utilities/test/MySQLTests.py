@@ -0,0 +1,126 @@
+########################################################################
+# $HeadURL $
+# File: MySQLTests.py
+########################################################################
+
+""" :mod: MySQLTests
+    =======================
+
+    .. module: MySQLTests
+    :synopsis: test cases for the MySQL statement parameters
+
+    test cases for the statement templates with params of MySQL, the
+    statements are built locally, no server is needed
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+from DIRAC import S_OK, gLogger
+## SUT
+from DIRAC.Core.Utilities.MySQL import MySQL, _buildStatement
+
+class FakeCursor( object ):
+
+  def __init__( self, statements ):
+    self.statements = statements
+
+  def execute( self, statement ):
+    self.statements.append( statement )
+    return 1
+
+  def close( self ):
+    pass
+
+class FakeConnection( object ):
+
+  def __init__( self ):
+    self.statements = []
+
+  def cursor( self ):
+    return FakeCursor( self.statements )
+
+class StatementsMySQL( MySQL ):
+  """ MySQL keeping the executed statements """
+
+  def __init__( self ):
+    self.log = gLogger.getSubLogger( 'StatementsMySQL' )
+    self.logger = self.log
+    self.connection = FakeConnection()
+
+  def _MySQL__getConnection( self, conn = None, trial = 0 ):
+    return S_OK( self.connection )
+
+########################################################################
+class BuildStatementTestCase( unittest.TestCase ):
+  """
+  .. class:: BuildStatementTestCase
+
+  """
+
+  def testLiterals( self ):
+    """ params are put in the placeholders as literals """
+    self.assertEqual( _buildStatement( "SELECT a FROM T WHERE b=%s AND c IN %s AND d LIKE 'x%%'",
+                                       [ 1, [ 'x', 2.5 ] ] ),
+                      "SELECT a FROM T WHERE b=1 AND c IN ( \"x\", 2.5 ) AND d LIKE 'x%'" )
+    self.assertEqual( _buildStatement( "UPDATE T SET a=%s, b=%s WHERE c IN %s", [ None, True, [] ] ),
+                      "UPDATE T SET a=NULL, b=True WHERE c IN ( NULL )" )
+    self.assertEqual( _buildStatement( "SELECT %s", [ 'a"b\'c' ] ), 'SELECT "a\\"b\\\'c"' )
+    self.assertRaises( ValueError, _buildStatement, "SELECT %s, %s", [ 1 ] )
+
+  def testSQLFunctions( self ):
+    """ strings are quoted even if they look like SQL functions """
+    self.assertEqual( _buildStatement( "UPDATE T SET a=1 WHERE b=%s", [ "UTC_TIMESTAMP() OR 1=1" ] ),
+                      'UPDATE T SET a=1 WHERE b="UTC_TIMESTAMP() OR 1=1"' )
+
+########################################################################
+class UpdateManyTestCase( unittest.TestCase ):
+  """
+  .. class:: UpdateManyTestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.db = StatementsMySQL()
+
+  def testMultiRow( self ):
+    """ INSERT and REPLACE rows are sent in statements of up to maxRows rows """
+    result = self.db._updateMany( "INSERT INTO T ( a, b ) VALUES ( %s, UTC_TIMESTAMP() )",
+                                  [ [ 1 ], [ 2 ], [ 3 ] ], maxRows = 2 )
+    self.assertEqual( result, S_OK( 2 ) )
+    self.assertEqual( self.db.connection.statements,
+                      [ "INSERT INTO T ( a, b ) VALUES ( 1, UTC_TIMESTAMP() ),( 2, UTC_TIMESTAMP() )",
+                        "INSERT INTO T ( a, b ) VALUES ( 3, UTC_TIMESTAMP() )" ] )
+
+  def testOnDuplicateKeyUpdate( self ):
+    """ the ON DUPLICATE KEY UPDATE clause is written once, after the rows """
+    result = self.db._updateMany( "INSERT INTO T ( a, b ) VALUES (%s,%s) ON DUPLICATE KEY UPDATE b=VALUES(b)",
+                                  [ [ 1, 'x' ], [ 2, 'y' ] ] )
+    self.assertTrue( result['OK'] )
+    self.assertEqual( self.db.connection.statements,
+                      [ 'INSERT INTO T ( a, b ) VALUES (1,"x"),(2,"y") ON DUPLICATE KEY UPDATE b=VALUES(b)' ] )
+
+  def testOneByOne( self ):
+    """ the other templates are executed for each params list """
+    self.db._updateMany( "UPDATE T SET a=%s WHERE b=%s", [ [ 1, 'x' ], [ 2, 'y' ] ] )
+    self.db._updateMany( "INSERT INTO T ( a, b ) VALUES ( %s, ')' ) ON DUPLICATE KEY UPDATE b=%s",
+                         [ [ 1, 'x' ] ] )
+    self.db._updateMany( "INSERT INTO T ( a ) SELECT a FROM U WHERE b=%s", [ [ 1 ] ] )
+    self.assertEqual( self.db.connection.statements,
+                      [ 'UPDATE T SET a=1 WHERE b="x"', 'UPDATE T SET a=2 WHERE b="y"',
+                        'INSERT INTO T ( a, b ) VALUES ( 1, \')\' ) ON DUPLICATE KEY UPDATE b="x"',
+                        'INSERT INTO T ( a ) SELECT a FROM U WHERE b=1' ] )
+
+  def testInvalidParams( self ):
+    """ nothing is executed if a params list does not match the template """
+    self.assertFalse( self.db._updateMany( "INSERT INTO T ( a, b ) VALUES ( %s, %s )", [ [ 1, 2 ], [ 3 ] ] )['OK'] )
+    self.assertEqual( self.db.connection.statements, [] )
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( BuildStatementTestCase )
+  SUITE.addTest( TESTLOADER.loadTestsFromTestCase( UpdateManyTestCase ) )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
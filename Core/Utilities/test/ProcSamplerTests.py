@@ -0,0 +1,102 @@
+########################################################################
+# $HeadURL $
+# File: ProcSamplerTests.py
+########################################################################
+
+""" :mod: ProcSamplerTests
+    =======================
+
+    .. module: ProcSamplerTests
+    :synopsis: test cases for ProcSampler
+
+    test cases for the /proc sampler using a fake /proc tree
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import os
+import shutil
+import tempfile
+import unittest
+## SUT
+from DIRAC.Core.Utilities.ProcSampler import ProcSampler
+
+########################################################################
+class ProcSamplerTestCase( unittest.TestCase ):
+  """
+  .. class:: ProcSamplerTestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.procPath = tempfile.mkdtemp()
+    self.sampler = ProcSampler( self.procPath )
+    self.ticks = self.sampler.clockTicks
+    self.pageSize = self.sampler.pageSize
+    #pid : ( name, ppid, pgrp, ticks )
+    self.procs = { 1 : ( 'init', 0, 1, 500 ),
+                   100 : ( 'job wrapper', 1, 100, 100 ),
+                   101 : ( 'app (x)', 100, 100, 200 ),
+                   102 : ( 'sh', 101, 100, 300 ),
+                   103 : ( 'daemon', 1, 100, 400 ),
+                   104 : ( 'other', 1, 104, 800 ) }
+    for pid, ( name, ppid, pgrp, ticks ) in self.procs.items():
+      self.writeProc( pid, name, ppid, pgrp, ticks )
+    self.writeFile( 'loadavg', '1.50 0.80 0.40 2/300 12345\n' )
+    self.writeFile( 'meminfo', 'MemTotal:  1000 kB\nMemFree:  200 kB\nBuffers:  100 kB\nCached:  300 kB\n' )
+    os.mkdir( os.path.join( self.procPath, 'self' ) )
+
+  def tearDown( self ):
+    """ clean up """
+    shutil.rmtree( self.procPath )
+
+  def writeFile( self, name, data ):
+    """ write a file in the fake /proc """
+    procFile = open( os.path.join( self.procPath, name ), 'w' )
+    procFile.write( data )
+    procFile.close()
+
+  def writeProc( self, pid, name, ppid, pgrp, ticks ):
+    """ write a /proc/pid/stat file """
+    procDir = os.path.join( self.procPath, str( pid ) )
+    if not os.path.isdir( procDir ):
+      os.mkdir( procDir )
+    fields = [ 'S', ppid, pgrp ] + [ 0 ] * 8 + [ ticks, 0, 0, 0 ] + [ 0 ] * 5 + [ 4096 * pid, 10 ] + [ 0 ] * 20
+    self.writeFile( os.path.join( str( pid ), 'stat' ), '%s (%s) %s\n' % ( pid, name, " ".join( [ str( f ) for f in fields ] ) ) )
+
+  def testUsage( self ):
+    """ subtree with children and orphans of the same process group """
+    result = self.sampler.getUsage( 100 )
+    self.assertTrue( result['OK'] )
+    self.assertEqual( sorted( result['Value']['PIDs'] ), [ 100, 101, 102, 103 ] )
+    self.assertAlmostEqual( result['Value']['CPU'], 1000 / self.ticks )
+    self.assertEqual( result['Value']['Vsize'], 4096 * ( 100 + 101 + 102 + 103 ) )
+    self.assertEqual( result['Value']['RSS'], 40 * self.pageSize )
+    self.assertEqual( self.sampler.history[-1].processes[ 101 ][ -1 ], 'app (x)' )
+    self.assertFalse( self.sampler.getUsage( 999 )['OK'] )
+
+  def testRate( self ):
+    """ CPU rate between two samples """
+    self.assertFalse( self.sampler.getCPURate( 100 )['OK'] )
+    self.sampler.sample()
+    self.assertTrue( self.sampler.sample( maxAge = 60 )['Value'] is self.sampler.history[-1] )
+    self.sampler.history[-1].time -= 10
+    self.writeProc( 102, 'sh', 101, 100, 300 + int( 5 * self.ticks ) )
+    self.sampler.sample()
+    result = self.sampler.getCPURate( 100 )
+    self.assertTrue( result['OK'] )
+    self.assertAlmostEqual( result['Value'], 0.5, 1 )
+
+  def testNode( self ):
+    """ load average and memory """
+    self.assertEqual( self.sampler.getLoadAverage()['Value'], 1.5 )
+    self.assertEqual( self.sampler.getMemoryUsed()['Value'], 400 )
+    self.assertTrue( self.sampler.getDiskSpace( self.procPath )['OK'] )
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( ProcSamplerTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
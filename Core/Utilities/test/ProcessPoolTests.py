@@ -55,6 +55,11 @@ def CallableFunc( taskID, timeWait, raiseException = False ):
     raise Exception( "testException" )
   return timeWait
 
+def PidFunc( taskID, timeWait ):
+  """ global function returning the pid of the worker """
+  time.sleep( timeWait )
+  return os.getpid()
+
 class CallableClass( object ):
   """ callable class to be executed in task """
 
@@ -362,6 +367,83 @@ class TaskTimeOutTests( unittest.TestCase ):
     ## unlock
     gLock.release()
 
+########################################################################
+class SlotsTests( unittest.TestCase ):
+  """
+  .. class:: SlotsTests
+
+  test case for the ProcessPool slots and workers recycling
+  """
+
+  def setUp( self ):
+    """c'tor
+
+    :param self: self reference
+    """
+    self.results = {}
+
+  def poolCallback( self, taskID, taskResult ):
+    self.results[taskID] = taskResult
+
+  def waitResults( self, count ):
+    """ the slot is released before the callback is called """
+    end = time.time() + 5
+    while len( self.results ) < count and time.time() < end:
+      time.sleep( 0.05 )
+    return len( self.results ) >= count
+
+  def testWaitFreeSlot( self ):
+    """ waitFreeSlot blocks until a task is done """
+    processPool = ProcessPool( 1, 2, 4, poolCallback = self.poolCallback )
+    processPool.daemonize()
+    for i in range( 2 ):
+      self.assertTrue( processPool.createAndQueueTask( PidFunc, taskID = i, args = ( i, 2 ),
+                                                       usePoolCallbacks = True )["OK"] )
+    ## queued tasks take their slots at once
+    self.assertEqual( processPool.getFreeSlots(), 0 )
+    self.assertFalse( processPool.waitFreeSlot( 0.1 )["OK"] )
+    start = time.time()
+    self.assertTrue( processPool.waitFreeSlot( 30 )["OK"] )
+    self.assertTrue( time.time() - start < 10 )
+    self.assertTrue( self.waitResults( 1 ) )
+    processPool.finalize( 2 )
+
+  def testRecycling( self ):
+    """ a worker is replaced after maxTasksPerWorker tasks """
+    processPool = ProcessPool( 1, 1, 4, poolCallback = self.poolCallback, maxTasksPerWorker = 2 )
+    processPool.daemonize()
+    for i in range( 4 ):
+      self.assertTrue( processPool.waitFreeSlot( 30 )["OK"] )
+      self.assertTrue( processPool.createAndQueueTask( PidFunc, taskID = i, args = ( i, 0 ),
+                                                       usePoolCallbacks = True )["OK"] )
+    self.assertTrue( processPool.waitFreeSlot( 30 )["OK"] )
+    self.assertTrue( self.waitResults( 4 ) )
+    processPool.finalize( 2 )
+    self.assertEqual( sorted( self.results ), range( 4 ) )
+    pids = [ self.results[i] for i in range( 4 ) ]
+    self.assertEqual( pids[0], pids[1] )
+    self.assertEqual( pids[2], pids[3] )
+    self.assertNotEqual( pids[0], pids[2] )
+
+  def testTimeOutSlot( self ):
+    """ the slot of a timed out task is released before its worker kills itself """
+    processPool = ProcessPool( 1, 1, 4, poolCallback = self.poolCallback )
+    processPool.daemonize()
+    self.assertTrue( processPool.createAndQueueTask( PidFunc, taskID = 0, args = ( 0, 60 ), timeOut = 1,
+                                                     usePoolCallbacks = True )["OK"] )
+    ## the worker waits timeOut + 10 seconds for the task
+    self.assertTrue( processPool.waitFreeSlot( 30 )["OK"] )
+    self.assertTrue( self.waitResults( 1 ) )
+    self.assertFalse( self.results[0]["OK"] )
+    ## a fresh worker takes the next task
+    self.assertTrue( processPool.createAndQueueTask( PidFunc, taskID = 1, args = ( 1, 0 ),
+                                                     usePoolCallbacks = True )["OK"] )
+    self.assertTrue( processPool.waitFreeSlot( 30 )["OK"] )
+    self.assertEqual( processPool.getFreeSlots(), 1 )
+    self.assertTrue( self.waitResults( 2 ) )
+    self.assertTrue( self.results[1] )
+    processPool.finalize( 2 )
+
 
 ## SUT suite execution
 if __name__ == "__main__":
@@ -370,6 +452,7 @@ if __name__ == "__main__":
   suitePPCT = testLoader.loadTestsFromTestCase( ProcessPoolCallbacksTests )  
   suiteTCT = testLoader.loadTestsFromTestCase( TaskCallbacksTests )
   suiteTTOT = testLoader.loadTestsFromTestCase( TaskTimeOutTests )
-  suite = unittest.TestSuite( [ suitePPCT, suiteTCT, suiteTTOT ] )
+  suiteST = testLoader.loadTestsFromTestCase( SlotsTests )
+  suite = unittest.TestSuite( [ suitePPCT, suiteTCT, suiteTTOT, suiteST ] )
   unittest.TextTestRunner(verbosity=3).run(suite)
 
@@ -25,8 +25,9 @@ __RCSID__ = "$Id $"
 ## imports 
 import unittest
 import time
+import threading
 ## SUT
-from DIRAC.Core.Utilities.Subprocess import systemCall, shellCall, pythonCall
+from DIRAC.Core.Utilities.Subprocess import systemCall, shellCall, pythonCall, systemCalls
 
 ########################################################################
 class SubprocessTests(unittest.TestCase):
@@ -81,6 +82,52 @@ class SubprocessTests(unittest.TestCase):
     ret = pythonCall( self.timeout, pyfunc, "Krzysztof" )
     self.assertFalse( ret['OK'] )
 
+  def testClosedOutputTimeout( self ):
+    """ a child closing its stdout and stderr is still killed at the timeout """
+    results = []
+    def call():
+      start = time.time()
+      results.append( ( shellCall( self.timeout, "exec >&- 2>&-; sleep 15" ), time.time() - start ) )
+    ## main thread, woken up by SIGCHLD
+    call()
+    ## another thread, polling
+    thread = threading.Thread( target = call )
+    thread.start()
+    thread.join()
+    for ret, duration in results:
+      self.assertFalse( ret['OK'] )
+      self.assertTrue( duration < self.timeout + 2 )
+
+  def testOutput( self ):
+    """ output and callback """
+    lines = []
+    def callback( pipeId, line ):
+      lines.append( ( pipeId, line ) )
+
+    ret = shellCall( 0, "echo out; echo err >&2; printf tail" )
+    self.assertEqual( ret, {'OK': True, 'Value': (0, 'out\ntail', 'err\n') } )
+
+    ## callback gets the full lines, the rest is returned
+    ret = shellCall( 0, "echo out; echo err >&2; printf tail", callbackFunction = callback )
+    self.assertEqual( ret, {'OK': True, 'Value': (0, 'tail', '') } )
+    self.assertEqual( sorted( lines ), [ (0, 'out'), (1, 'err') ] )
+
+    ## exit code and buffer limit
+    ret = shellCall( 0, "exit 3" )
+    self.assertEqual( ret['Value'][0], 3 )
+    ret = shellCall( 0, "yes", bufferLimit = 1000 )
+    self.assertFalse( ret['OK'] )
+
+  def testSystemCalls( self ):
+    """ several commands at once """
+    start = time.time()
+    ret = systemCalls( self.timeout, [ [ "sleep", "1" ], [ "echo", "a" ], self.cmd ] )
+    self.assertTrue( ret['OK'] )
+    self.assertEqual( ret['Value'][0], {'OK': True, 'Value': (0, '', '') } )
+    self.assertEqual( ret['Value'][1], {'OK': True, 'Value': (0, 'a\n', '') } )
+    self.assertFalse( ret['Value'][2]['OK'] )
+    self.assertTrue( time.time() - start < self.timeout + 2 )
+
 ## tests execution
 if __name__ == "__main__":
   gTestLoader = unittest.TestLoader()
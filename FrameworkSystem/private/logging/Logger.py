@@ -6,7 +6,6 @@ __RCSID__ = "$Id$"
 
 import sys
 import traceback
-import inspect
 from DIRAC.FrameworkSystem.private.logging.LogLevels import LogLevels
 from DIRAC.FrameworkSystem.private.logging.Message import Message
 from DIRAC.Core.Utilities import Time, List
@@ -22,11 +21,15 @@ class Logger:
 
   def __init__( self ):
     self._minLevel = 0
+    #Level used to discard messages before building them. Subloggers take it from their master
+    self._effectiveMinLevel = 0
     self._showCallingFrame = False
     self._systemName = False
     self._outputList = []
     self._subLoggersDict = {}
     self._logLevels = LogLevels()
+    self._levelValues = dict( [ ( levelName, abs( self._logLevels.getLevelValue( levelName ) ) ) \
+                                for levelName in self._logLevels.getLevels() ] )
     self.__backendOptions = { 'showHeaders' : True, 'showThreads' : False, 'Color' : True }
     self.__preinitialize()
     self.__initialized = False
@@ -54,6 +57,7 @@ class Logger:
     self._systemName = "Framework"
     self.registerBackends( [ 'stdout' ] )
     self._minLevel = self._logLevels.getLevelValue( "NOTICE" )
+    self._updateEffectiveLevel()
     #HACK to take into account dev levels before the command line if fully parsed
     debLevs = 0
     for arg in sys.argv:
@@ -125,85 +129,90 @@ class Logger:
     levelName = levelName.upper()
     if levelName in self._logLevels.getLevels():
       self._minLevel = abs( self._logLevels.getLevelValue( levelName ) )
+      self._updateEffectiveLevel()
       return True
     return False
 
+  def _updateEffectiveLevel( self ):
+    """
+    Recalculate the level used to discard messages and push it to the subloggers
+    """
+    self._effectiveMinLevel = self._minLevel
+    for subLogger in self._subLoggersDict.values():
+      subLogger._updateEffectiveLevel()
+
   def getLevel( self ):
     return self._logLevels.getLevel( self._minLevel )
 
   def shown( self, levelName ):
+    """
+    Check if messages of a level would be shown. Useful to avoid generating expensive messages
+    """
     levelName = levelName.upper()
-    if levelName in self._logLevels.getLevels():
-      return self._logLevels.getLevelValue( levelName ) <= levelName
+    if levelName in self._levelValues:
+      return self._levelValues[ levelName ] >= self._effectiveMinLevel
     return False
 
   def getName( self ):
     return self._systemName
 
-  def always( self, sMsg, sVarMsg = '' ):
+  def __sendMessage( self, level, sMsg, sVarMsg, formatArgs ):
+    """
+    Build and process a message once it's known that it will be shown.
+    If formatArgs are given sVarMsg is formatted with them, so callers don't pay for
+    the formatting of messages that are discarded
+    """
+    if formatArgs:
+      try:
+        sVarMsg = sVarMsg % formatArgs
+      except Exception:
+        sVarMsg = "%s %s" % ( sVarMsg, formatArgs )
     messageObject = Message( self._systemName,
-                             self._logLevels.always,
+                             level,
                              Time.dateTime(),
                              sMsg,
                              sVarMsg,
-                             self.__discoverCallingFrame() )
+                             self.__discoverCallingFrame( 3 ) )
     return self.processMessage( messageObject )
 
-  def notice( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.notice,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def always( self, sMsg, sVarMsg = '', *formatArgs ):
+    if self._levelValues[ 'ALWAYS' ] < self._effectiveMinLevel:
+      return True
+    return self.__sendMessage( self._logLevels.always, sMsg, sVarMsg, formatArgs )
 
-  def info( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.info,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def notice( self, sMsg, sVarMsg = '', *formatArgs ):
+    if self._levelValues[ 'NOTICE' ] < self._effectiveMinLevel:
+      return True
+    return self.__sendMessage( self._logLevels.notice, sMsg, sVarMsg, formatArgs )
 
-  def verbose( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.verbose,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def info( self, sMsg, sVarMsg = '', *formatArgs ):
+    if self._levelValues[ 'INFO' ] < self._effectiveMinLevel:
+      return True
+    return self.__sendMessage( self._logLevels.info, sMsg, sVarMsg, formatArgs )
 
-  def debug( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.debug,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def verbose( self, sMsg, sVarMsg = '', *formatArgs ):
+    if self._levelValues[ 'VERB' ] < self._effectiveMinLevel:
+      return True
+    return self.__sendMessage( self._logLevels.verbose, sMsg, sVarMsg, formatArgs )
 
-  def warn( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.warn,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def debug( self, sMsg, sVarMsg = '', *formatArgs ):
+    if self._levelValues[ 'DEBUG' ] < self._effectiveMinLevel:
+      return True
+    return self.__sendMessage( self._logLevels.debug, sMsg, sVarMsg, formatArgs )
 
-  def error( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.error,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def warn( self, sMsg, sVarMsg = '', *formatArgs ):
+    if self._levelValues[ 'WARN' ] < self._effectiveMinLevel:
+      return True
+    return self.__sendMessage( self._logLevels.warn, sMsg, sVarMsg, formatArgs )
+
+  def error( self, sMsg, sVarMsg = '', *formatArgs ):
+    if self._levelValues[ 'ERROR' ] < self._effectiveMinLevel:
+      return True
+    return self.__sendMessage( self._logLevels.error, sMsg, sVarMsg, formatArgs )
 
   def exception( self, sMsg = "", sVarMsg = '', lException = False, lExcInfo = False ):
+    if self._levelValues[ 'EXCEPT' ] < self._effectiveMinLevel:
+      return True
     if sVarMsg:
       sVarMsg += "\n%s" % self.__getExceptionString( lException, lExcInfo )
     else:
@@ -216,16 +225,14 @@ class Logger:
                              self.__discoverCallingFrame() )
     return self.processMessage( messageObject )
 
-  def fatal( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.fatal,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def fatal( self, sMsg, sVarMsg = '', *formatArgs ):
+    if self._levelValues[ 'FATAL' ] < self._effectiveMinLevel:
+      return True
+    return self.__sendMessage( self._logLevels.fatal, sMsg, sVarMsg, formatArgs )
 
   def showStack( self ):
+    if self._levelValues[ 'DEBUG' ] < self._effectiveMinLevel:
+      return
     messageObject = Message( self._systemName,
                              self._logLevels.debug,
                              Time.dateTime(),
@@ -243,7 +250,7 @@ class Logger:
   #S_OK()
 
   def __testLevel( self, sLevel ):
-    return abs( self._logLevels.getLevelValue( sLevel ) ) >= self._minLevel
+    return self._levelValues[ sLevel ] >= self._minLevel
 
   def _processMessage( self, messageObject ):
     for backend in self._backendsDict:
@@ -282,12 +289,10 @@ class Logger:
                          stack )
 
 
-  def __discoverCallingFrame( self ):
-    if self.__testLevel( self._logLevels.debug ) and self._showCallingFrame:
-      oActualFrame = inspect.currentframe()
-      lOuterFrames = inspect.getouterframes( oActualFrame )
-      lCallingFrame = lOuterFrames[2]
-      return "%s:%s" % ( lCallingFrame[1].replace( sys.path[0], "" )[1:], lCallingFrame[2] )
+  def __discoverCallingFrame( self, frameDepth = 2 ):
+    if self._showCallingFrame and self._levelValues[ 'DEBUG' ] >= self._effectiveMinLevel:
+      oCallingFrame = sys._getframe( frameDepth )
+      return "%s:%s" % ( oCallingFrame.f_code.co_filename.replace( sys.path[0], "" )[1:], oCallingFrame.f_lineno )
     else:
       return ""
 
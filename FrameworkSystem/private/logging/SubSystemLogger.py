@@ -8,15 +8,22 @@ from DIRAC.FrameworkSystem.Client.Logger import Logger
 class SubSystemLogger( Logger ):
 
   def __init__( self, subName, masterLogger, child = True ):
+    #Needed by _updateEffectiveLevel while initializing
+    self.__masterLogger = masterLogger
     Logger.__init__( self )
     self.__child = child
     for attrName in dir( masterLogger ):
       attrValue = getattr( masterLogger, attrName )
       if type( attrValue ) == types.StringType:
         setattr( self, attrName, attrValue )
-    self.__masterLogger = masterLogger
     self._subName = subName
 
+  def _updateEffectiveLevel( self ):
+    #Messages are filtered by the master logger so its level is the one that counts
+    self._effectiveMinLevel = self.__masterLogger._effectiveMinLevel
+    for subLogger in self._subLoggersDict.values():
+      subLogger._updateEffectiveLevel()
+
   def processMessage( self, messageObject ):
     if self.__child:
       messageObject.setSubSystemName( self._subName )
@@ -0,0 +1,317 @@
+# $HeadURL$
+"""
+  RingBufferManager is the embedded alternative to the RRDManager. Each activity is
+  kept in a fixed size file mapped in memory, holding one value per bucket in a ring
+  indexed by ( bucketTime / bucketLength ) % numBuckets. Updates and reads are done
+  in process with numpy, and plots are drawn with DIRAC.Core.Utilities.Graphs, so
+  no rrdtool process is forked.
+
+  It has the same interface as the RRDManager and uses the activity file names
+  registered in the MonitoringCatalog, with the .ring extension instead of .rrd.
+"""
+__RCSID__ = "$Id$"
+
+import os
+import os.path
+import math
+import mmap
+try:
+  import hashlib as md5
+except:
+  import md5
+import numpy
+from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC.Core.Utilities import Time
+from DIRAC.Core.Utilities.ThreadSafe import Synchronizer
+
+gRingSynchro = Synchronizer()
+
+class RingBufferManager:
+
+  #Graph size, width and height in pixels for each plot size
+  __sizesList = [ [ 'small', 450, 330 ], [ 'small', 600, 400 ], [ 'normal', 800, 600 ], [ 'large', 1000, 700 ] ]
+  #Same retention as the RRD archives: one year at full resolution
+  __retention = 31536000
+  __header = numpy.dtype( [ ( 'magic', 'S4' ),
+                            ( 'type', '<i4' ),
+                            ( 'bucketLength', '<i8' ),
+                            ( 'numBuckets', '<i8' ),
+                            ( 'lastUpdate', '<i8' ) ] )
+  __magic = "DRB1"
+  __types = ( 'mean', 'sum', 'acum', 'rate' )
+
+  def __init__( self, rrdLocation, graphLocation ):
+    """
+    Initialize RingBufferManager
+    """
+    self.rrdLocation = rrdLocation
+    self.graphLocation = graphLocation
+    self.log = gLogger.getSubLogger( "RingBufferManager" )
+    for path in ( self.rrdLocation, self.graphLocation ):
+      try:
+        os.makedirs( path )
+      except:
+        pass
+
+  def __getFilePath( self, rrdFile ):
+    """
+    Get the ring file path for an activity file
+    """
+    return "%s/%s.ring" % ( self.rrdLocation, os.path.splitext( rrdFile )[0] )
+
+  def existsRRDFile( self, rrdFile ):
+    return os.path.isfile( self.__getFilePath( rrdFile ) )
+
+  def getGraphLocation( self ):
+    """
+    Set the location for graph files
+    """
+    return self.graphLocation
+
+  def getCurrentBucketTime( self, bucketLength ):
+    """
+    Get current time "bucketized"
+    """
+    return self.bucketize( Time.toEpoch(), bucketLength )
+
+  def bucketize( self, secs, bucketLength ):
+    """
+    Bucketize a time (in secs)
+    """
+    secs = int( secs )
+    return secs - secs % bucketLength
+
+  def __map( self, filePath, writable = False ):
+    """
+    Map a ring file. Returns the mmap, the header and the ring arrays, that must
+    not be used once the mmap is closed
+    """
+    fd = os.open( filePath, writable and os.O_RDWR or os.O_RDONLY )
+    try:
+      fileMap = mmap.mmap( fd, 0, access = writable and mmap.ACCESS_WRITE or mmap.ACCESS_READ )
+    finally:
+      os.close( fd )
+    header = numpy.frombuffer( fileMap, dtype = self.__header, count = 1 )
+    if header[ 'magic' ][0] != self.__magic:
+      fileMap.close()
+      raise ValueError( "%s is not a ring buffer file" % filePath )
+    ring = numpy.frombuffer( fileMap, dtype = '<f8', offset = self.__header.itemsize,
+                             count = int( header[ 'numBuckets' ][0] ) )
+    return fileMap, header, ring
+
+  @gRingSynchro
+  def create( self, type, rrdFile, bucketLength ):
+    """
+    Create a ring file
+    """
+    filePath = self.__getFilePath( rrdFile )
+    if os.path.isfile( filePath ):
+      return S_OK()
+    if type not in self.__types:
+      return S_ERROR( "Unknown activity type %s" % type )
+    try:
+      os.makedirs( os.path.dirname( filePath ) )
+    except:
+      pass
+    self.log.info( "Creating ring file %s" % filePath )
+    bucketLength = int( bucketLength )
+    numBuckets = self.__retention / bucketLength
+    header = numpy.zeros( 1, dtype = self.__header )
+    header[ 'magic' ] = self.__magic
+    header[ 'type' ] = self.__types.index( type )
+    header[ 'bucketLength' ] = bucketLength
+    header[ 'numBuckets' ] = numBuckets
+    #Start GMT(now) - 1 day
+    header[ 'lastUpdate' ] = self.getCurrentBucketTime( bucketLength ) - 86400
+    tmpPath = "%s.tmp" % filePath
+    try:
+      fd = file( tmpPath, "wb" )
+      try:
+        fd.write( header.tostring() )
+        #Sparse file, unwritten buckets read as 0
+        fd.truncate( self.__header.itemsize + numBuckets * 8 )
+      finally:
+        fd.close()
+      os.rename( tmpPath, filePath )
+    except Exception, e:
+      return S_ERROR( "Cannot create ring file %s: %s" % ( filePath, str( e ) ) )
+    return S_OK()
+
+  @gRingSynchro
+  def update( self, type, rrdFile, bucketLength, valuesList, lastUpdate = 0 ):
+    """
+    Add marks to a ring file. Buckets between the last update and the new marks
+    are set to 0, as the RRDManager does, to keep the means valid
+    """
+    filePath = self.__getFilePath( rrdFile )
+    self.log.info( "Updating ring file", filePath )
+    try:
+      fileMap, header, ring = self.__map( filePath, writable = True )
+    except Exception, e:
+      return S_ERROR( "Cannot open ring file %s: %s" % ( filePath, str( e ) ) )
+    try:
+      bucketLength = int( header[ 'bucketLength' ][0] )
+      numBuckets = len( ring )
+      lastUpdateTime = int( header[ 'lastUpdate' ][0] )
+      times = numpy.array( [ entry[0] for entry in valuesList ], dtype = numpy.int64 )
+      times -= times % bucketLength
+      values = numpy.array( [ entry[1] for entry in valuesList ], dtype = numpy.float64 )
+      newer = times > lastUpdateTime
+      if not newer.all():
+        self.log.verbose( "Ignoring %s marks older than the last update in %s" % ( len( times ) - newer.sum(), rrdFile ) )
+        times = times[ newer ]
+        values = values[ newer ]
+      if not len( times ):
+        return S_OK( lastUpdateTime )
+      newLastUpdate = int( times.max() )
+      #Zero the buckets since the last update, at most the whole ring
+      gap = numpy.arange( max( lastUpdateTime + bucketLength, newLastUpdate - ( numBuckets - 1 ) * bucketLength ),
+                          newLastUpdate + bucketLength, bucketLength, dtype = numpy.int64 )
+      ring[ ( gap / bucketLength ) % numBuckets ] = 0
+      ring[ ( times / bucketLength ) % numBuckets ] = values
+      header[ 'lastUpdate' ] = newLastUpdate
+    finally:
+      #No msync: the pages are shared, the kernel writes them back
+      del header, ring
+      fileMap.close()
+    return S_OK( newLastUpdate )
+
+  @gRingSynchro
+  def __readBuckets( self, rrdFile, fromSecs, toSecs ):
+    """
+    Read the values of the buckets between two times. Buckets out of the ring or
+    not yet updated are 0
+    """
+    filePath = self.__getFilePath( rrdFile )
+    try:
+      fileMap, header, ring = self.__map( filePath )
+    except Exception, e:
+      return S_ERROR( "Cannot open ring file %s: %s" % ( filePath, str( e ) ) )
+    try:
+      bucketLength = int( header[ 'bucketLength' ][0] )
+      numBuckets = len( ring )
+      lastUpdateTime = int( header[ 'lastUpdate' ][0] )
+      times = numpy.arange( self.bucketize( fromSecs, bucketLength ), toSecs, bucketLength, dtype = numpy.int64 )
+      values = ring[ ( times / bucketLength ) % numBuckets ]
+    finally:
+      del header, ring
+      fileMap.close()
+    values[ ( times > lastUpdateTime ) | ( times <= lastUpdateTime - numBuckets * bucketLength ) ] = 0
+    values[ numpy.isnan( values ) ] = 0
+    return S_OK( ( times, values ) )
+
+  def getSeries( self, activity, fromSecs, toSecs, maxPoints ):
+    """
+    Get the consolidated values of an activity as { epoch : value } with at most
+    maxPoints points. Consecutive buckets are averaged for mean and rate
+    activities, added for sum ones and accumulated for acum ones
+    """
+    bucketLength = activity.getBucketLength()
+    retVal = self.__readBuckets( activity.getFile(), fromSecs, toSecs )
+    if not retVal[ 'OK' ]:
+      return retVal
+    times, values = retVal[ 'Value' ]
+    scaleFactor = max( 1, int( math.ceil( len( times ) / float( maxPoints ) ) ) )
+    activity.setBucketScaleFactor( scaleFactor )
+    if not len( times ):
+      return S_OK( {} )
+    padding = -len( values ) % scaleFactor
+    values = numpy.concatenate( ( values, numpy.zeros( padding ) ) ).reshape( -1, scaleFactor )
+    times = times[ ::scaleFactor ]
+    acType = activity.getType()
+    if acType == "mean":
+      values = values.mean( axis = 1 )
+    elif acType == "rate":
+      values = values.mean( axis = 1 ) / bucketLength
+    elif acType == "sum":
+      values = values.sum( axis = 1 )
+    elif acType == "acum":
+      values = values.sum( axis = 1 ).cumsum()
+    return S_OK( dict( zip( times.tolist(), values.tolist() ) ) )
+
+  def __generateName( self, *args, **kwargs ):
+    """
+    Generate a random name
+    """
+    m = md5.md5()
+    m.update( str( args ) )
+    m.update( str( kwargs ) )
+    return m.hexdigest()
+
+  def __graph( self, graphFilename, data, stackActivities, size, metadata ):
+    """
+    Draw the plot with the Graphs package
+    """
+    from DIRAC.Core.Utilities.Graphs import lineGraph, curveGraph
+    graphSize, width, height = self.__sizesList[ size ]
+    metadata[ 'graph_size' ] = graphSize
+    metadata[ 'width' ] = width
+    metadata[ 'height' ] = height
+    metadata[ 'legend_width' ] = width - 20
+    metadata[ 'subtitle' ] = "From %s to %s" % ( Time.fromEpoch( metadata[ 'starttime' ] ),
+                                                 Time.fromEpoch( metadata[ 'endtime' ] ) )
+    filePath = "%s/%s" % ( self.graphLocation, graphFilename )
+    try:
+      if stackActivities:
+        lineGraph( data, filePath, **metadata )
+      else:
+        curveGraph( data, filePath, marker = 'None', markersize = 0, **metadata )
+    except Exception, e:
+      self.log.exception( "Cannot generate plot", graphFilename )
+      return S_ERROR( "Cannot generate plot %s: %s" % ( graphFilename, str( e ) ) )
+    return S_OK( graphFilename )
+
+  def groupPlot( self, fromSecs, toSecs, activitiesList, stackActivities, size, graphFilename = "" ):
+    """
+    Generate a group plot
+    """
+    if not graphFilename:
+      graphFilename = "%s.png" % self.__generateName( fromSecs,
+                                                    toSecs,
+                                                    activitiesList,
+                                                    stackActivities
+                                                    )
+    maxPoints = self.__sizesList[ size ][1]
+    data = {}
+    activitiesList.sort()
+    for activity in activitiesList:
+      retVal = self.getSeries( activity, fromSecs, toSecs, maxPoints )
+      if not retVal[ 'OK' ]:
+        return retVal
+      label = activity.getLabel()
+      while label in data:
+        label += " "
+      data[ label ] = retVal[ 'Value' ]
+    metadata = { 'title' : activitiesList[ 0 ].getGroupLabel(),
+                 'starttime' : fromSecs,
+                 'endtime' : toSecs,
+                 'span' : activitiesList[ 0 ].getBucketLength() * activitiesList[ 0 ].scaleFactor }
+    return self.__graph( graphFilename, data, stackActivities, size, metadata )
+
+  def plot( self, fromSecs, toSecs, activity, stackActivities , size, graphFilename = "" ):
+    """
+    Generate a non grouped plot
+    """
+    if not graphFilename:
+      graphFilename = "%s.png" % self.__generateName( fromSecs,
+                                                    toSecs,
+                                                    activity,
+                                                    stackActivities
+                                                    )
+    retVal = self.getSeries( activity, fromSecs, toSecs, self.__sizesList[ size ][1] )
+    if not retVal[ 'OK' ]:
+      return retVal
+    metadata = { 'title' : activity.getLabel(),
+                 'ylabel' : activity.getUnit(),
+                 'starttime' : fromSecs,
+                 'endtime' : toSecs,
+                 'span' : activity.getBucketLength() * activity.scaleFactor,
+                 'legend' : False }
+    return self.__graph( graphFilename, { activity.getLabel() : retVal[ 'Value' ] },
+                         stackActivities, size, metadata )
+
+  def deleteRRD( self, rrdFile ):
+    try:
+      os.unlink( self.__getFilePath( rrdFile ) )
+    except Exception, e:
+      self.log.error( "Could not delete ring file", "%s: %s" % ( rrdFile, str( e ) ) )
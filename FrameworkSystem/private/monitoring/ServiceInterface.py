@@ -2,6 +2,7 @@
 __RCSID__ = "$Id$"
 import DIRAC
 from DIRAC import gLogger, rootPath, gConfig
+from DIRAC.ConfigurationSystem.Client.PathFinder import getServiceSection
 from DIRAC.FrameworkSystem.private.monitoring.RRDManager import RRDManager
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.Utilities import DEncode, List
@@ -19,8 +20,12 @@ class ServiceInterface:
 
   def __createRRDManager( self ):
     """
-    Generate an RRDManager
+    Generate an RRDManager, or a RingBufferManager if it is the configured backend
     """
+    backend = gConfig.getValue( "%s/Backend" % getServiceSection( "Framework/Monitoring" ), "rrdtool" )
+    if backend.lower() == "ringbuffer":
+      from DIRAC.FrameworkSystem.private.monitoring.RingBufferManager import RingBufferManager
+      return RingBufferManager( self.rrdPath, self.plotsPath )
     return RRDManager( self.rrdPath, self.plotsPath )
 
   def __createCatalog( self ):
@@ -44,7 +49,7 @@ class ServiceInterface:
     from DIRAC.FrameworkSystem.DB.ComponentMonitoringDB import ComponentMonitoringDB
 
     self.dataPath = dataPath
-    self.plotCache = PlotCache( RRDManager( self.rrdPath, self.plotsPath ) )
+    self.plotCache = PlotCache( self.__createRRDManager() )
     self.srvUp = True
     try:
       self.compmonDB = ComponentMonitoringDB()
@@ -0,0 +1,100 @@
+########################################################################
+# $HeadURL $
+# File: RingBufferManagerTests.py
+########################################################################
+
+""" :mod: RingBufferManagerTests
+    =======================
+
+    .. module: RingBufferManagerTests
+    :synopsis: test cases for RingBufferManager
+
+    test cases for the memory mapped ring buffer monitoring backend
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import os
+import shutil
+import tempfile
+import unittest
+## SUT
+from DIRAC.FrameworkSystem.private.monitoring.RingBufferManager import RingBufferManager
+
+class FakeActivity( object ):
+  """ Activity look alike """
+
+  def __init__( self, acType, rrdFile, bucketLength ):
+    self.acType = acType
+    self.rrdFile = rrdFile
+    self.bucketLength = bucketLength
+    self.scaleFactor = 1
+
+  def getType( self ):
+    return self.acType
+
+  def getFile( self ):
+    return self.rrdFile
+
+  def getBucketLength( self ):
+    return self.bucketLength
+
+  def setBucketScaleFactor( self, scaleFactor ):
+    self.scaleFactor = scaleFactor
+
+########################################################################
+class RingBufferManagerTestCase( unittest.TestCase ):
+  """
+  .. class:: RingBufferManagerTestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.dataPath = tempfile.mkdtemp()
+    self.manager = RingBufferManager( os.path.join( self.dataPath, "rrd" ), os.path.join( self.dataPath, "plots" ) )
+    self.start = self.manager.getCurrentBucketTime( 60 ) - 3600
+
+  def tearDown( self ):
+    """ clean up """
+    shutil.rmtree( self.dataPath )
+
+  def testUpdate( self ):
+    """ marks are stored in their buckets, gaps are zeroed """
+    self.assertFalse( self.manager.existsRRDFile( "ab/abcd.rrd" ) )
+    self.assertTrue( self.manager.create( "mean", "ab/abcd.rrd", 60 )['OK'] )
+    self.assertTrue( self.manager.existsRRDFile( "ab/abcd.rrd" ) )
+    result = self.manager.update( "mean", "ab/abcd.rrd", 60, [ ( self.start, 1 ), ( self.start + 125, 3 ) ] )
+    self.assertTrue( result['OK'] )
+    self.assertEqual( result['Value'], self.start + 120 )
+    #Older marks are ignored
+    result = self.manager.update( "mean", "ab/abcd.rrd", 60, [ ( self.start + 60, 10 ) ] )
+    self.assertEqual( result['Value'], self.start + 120 )
+    activity = FakeActivity( "mean", "ab/abcd.rrd", 60 )
+    series = self.manager.getSeries( activity, self.start, self.start + 240, 100 )['Value']
+    self.assertEqual( series, { self.start : 1, self.start + 60 : 0, self.start + 120 : 3, self.start + 180 : 0 } )
+    self.manager.deleteRRD( "ab/abcd.rrd" )
+    self.assertFalse( self.manager.existsRRDFile( "ab/abcd.rrd" ) )
+
+  def testConsolidation( self ):
+    """ buckets are consolidated by activity type """
+    marks = [ ( self.start + i * 60, i ) for i in range( 6 ) ]
+    expected = { "mean" : [ 0.5, 2.5, 4.5 ], "sum" : [ 1, 5, 9 ], "rate" : [ 0.5 / 60, 2.5 / 60, 4.5 / 60 ],
+                 "acum" : [ 1, 6, 15 ] }
+    for acType in expected:
+      rrdFile = "ab/%s.rrd" % acType
+      self.manager.create( acType, rrdFile, 60 )
+      self.manager.update( acType, rrdFile, 60, marks )
+      activity = FakeActivity( acType, rrdFile, 60 )
+      series = self.manager.getSeries( activity, self.start, self.start + 360, 3 )['Value']
+      self.assertEqual( activity.scaleFactor, 2 )
+      self.assertEqual( sorted( series ), [ self.start, self.start + 120, self.start + 240 ] )
+      for epoch, value in zip( sorted( series ), expected[ acType ] ):
+        self.assertAlmostEqual( series[ epoch ], value )
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( RingBufferManagerTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
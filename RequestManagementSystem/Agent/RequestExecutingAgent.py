@@ -75,6 +75,8 @@ class RequestExecutingAgent( AgentModule ):
   __poolTimeout = 900
   # # ProcessPool sleep time
   __poolSleep = 5
+  # # tasks executed by a ProcessPool worker before it is replaced
+  __maxTasksPerProcess = 100
   # # placeholder for RequestClient instance
   __requestClient = None
   # # Size of the bulk if use of getRequests. If 0, use getRequest
@@ -97,6 +99,8 @@ class RequestExecutingAgent( AgentModule ):
     self.log.info( "ProcessPool timeout = %d seconds" % self.__poolTimeout )
     self.__poolSleep = int( self.am_getOption( "ProcessPoolSleep", self.__poolSleep ) )
     self.log.info( "ProcessPool sleep time = %d seconds" % self.__poolSleep )
+    self.__maxTasksPerProcess = int( self.am_getOption( "MaxTasksPerProcess", self.__maxTasksPerProcess ) )
+    self.log.info( "ProcessPool tasks per process = %d" % self.__maxTasksPerProcess )
     self.__taskTimeout = int( self.am_getOption( "ProcessTaskTimeout", self.__taskTimeout ) )
     self.log.info( "ProcessTask timeout = %d seconds" % self.__taskTimeout )
     self.__bulkRequest = self.am_getOption( "BulkRequest", 0 )
@@ -170,7 +174,8 @@ class RequestExecutingAgent( AgentModule ):
                                         maxProcess,
                                         queueSize,
                                         poolCallback = self.resultCallback,
-                                        poolExceptionCallback = self.exceptionCallback )
+                                        poolExceptionCallback = self.exceptionCallback,
+                                        maxTasksPerWorker = self.__maxTasksPerProcess )
       self.__processPool.daemonize()
     return self.__processPool
 
@@ -282,14 +287,15 @@ class RequestExecutingAgent( AgentModule ):
 
         looping = 0
         while True:
-          if not self.processPool().getFreeSlots():
+          # # returns as soon as a running task is done
+          freeSlot = self.processPool().waitFreeSlot( timeout = self.__poolSleep )
+          if not freeSlot["OK"]:
             if not looping:
-              self.log.info( "No free slots available in processPool, will wait %d seconds to proceed" % self.__poolSleep )
-            time.sleep( self.__poolSleep )
+              self.log.info( "No free slots available in processPool, waiting" )
             looping += 1
           else:
             if looping:
-              self.log.info( "Free slot found after %d seconds" % looping * self.__poolSleep )
+              self.log.info( "Free slot found after %d seconds" % ( looping * self.__poolSleep ) )
             looping = 0
             self.log.info( "spawning task for request '%s/%s'" % ( request.RequestID, request.RequestName ) )
             timeOut = self.getTimeout( request )
@@ -310,8 +316,6 @@ class RequestExecutingAgent( AgentModule ):
               gMonitor.addMark( "Processed", 1 )
               # # update request counter
               taskCounter += 1
-              # # task created, a little time kick to proceed
-              time.sleep( 0.1 )
               break
 
     # # clean return
@@ -39,7 +39,19 @@ class RequestTask( object ):
   .. class:: RequestTask
 
   request's processing task
+
+  ProcessPool workers execute many tasks, so what does not depend on the request
+  (shifter proxies, monitoring setup, handler classes) is kept at the class level
+  and shared by all the tasks run in the same process
   """
+  # # shifter proxies cache lifetime in seconds, proxies are downloaded with 1200 s left
+  __shifterCacheLifetime = 600
+  # # shifter proxies cache: ( expiration time, managers dict )
+  __shifterCache = ( 0, {} )
+  # # gMonitor initialized in this process
+  __monitorReady = False
+  # # plugin path -> handler class
+  __handlerClasses = {}
 
   def __init__( self, requestJSON, handlersDict, csPath, agentName, standalone = False ):
     """c'tor
@@ -61,29 +73,40 @@ class RequestTask( object ):
     self.handlers = {}
     # # own sublogger
     self.log = gLogger.getSubLogger( "pid_%s/%s" % ( os.getpid(), self.request.RequestName ) )
-    # # get shifters info
+    # # shifters info, filled in setupProxy
     self.__managersDict = {}
-    shifterProxies = self.__setupManagerProxies()
-    if not shifterProxies["OK"]:
-      self.log.error( shifterProxies["Message"] )
-
-    # # initialize gMonitor
-    gMonitor.setComponentType( gMonitor.COMPONENT_AGENT )
-    gMonitor.setComponentName( self.agentName )
-    gMonitor.initialize()
 
-    # # own gMonitor activities
-    gMonitor.registerActivity( "RequestAtt", "Requests processed",
-                               "RequestExecutingAgent", "Requests/min", gMonitor.OP_SUM )
-    gMonitor.registerActivity( "RequestFail", "Requests failed",
-                               "RequestExecutingAgent", "Requests/min", gMonitor.OP_SUM )
-    gMonitor.registerActivity( "RequestOK", "Requests done",
-                               "RequestExecutingAgent", "Requests/min", gMonitor.OP_SUM )
+    if not RequestTask.__monitorReady:
+      # # initialize gMonitor
+      gMonitor.setComponentType( gMonitor.COMPONENT_AGENT )
+      gMonitor.setComponentName( self.agentName )
+      gMonitor.initialize()
+
+      # # own gMonitor activities
+      gMonitor.registerActivity( "RequestAtt", "Requests processed",
+                                 "RequestExecutingAgent", "Requests/min", gMonitor.OP_SUM )
+      gMonitor.registerActivity( "RequestFail", "Requests failed",
+                                 "RequestExecutingAgent", "Requests/min", gMonitor.OP_SUM )
+      gMonitor.registerActivity( "RequestOK", "Requests done",
+                                 "RequestExecutingAgent", "Requests/min", gMonitor.OP_SUM )
+      RequestTask.__monitorReady = True
 
     self.requestClient = ReqClient()
 
   def __setupManagerProxies( self ):
-    """ setup grid proxy for all defined managers """
+    """ setup grid proxy for all defined managers, reusing the ones set up by a previous task
+        in this process for a while """
+    expiration, managersDict = RequestTask.__shifterCache
+    if time.time() < expiration:
+      self.__managersDict = dict( managersDict )
+      return S_OK()
+    result = self.__downloadManagerProxies()
+    if result["OK"]:
+      RequestTask.__shifterCache = ( time.time() + self.__shifterCacheLifetime, dict( self.__managersDict ) )
+    return result
+
+  def __downloadManagerProxies( self ):
+    """ download grid proxy for all defined managers """
     oHelper = Operations()
     shifters = oHelper.getSections( "Shifter" )
     if not shifters["OK"]:
@@ -192,6 +215,8 @@ class RequestTask( object ):
     """
     if "/" in pluginPath:
       pluginPath = ".".join( [ chunk for chunk in pluginPath.split( "/" ) if chunk ] )
+    if pluginPath in RequestTask.__handlerClasses:
+      return RequestTask.__handlerClasses[pluginPath]
     pluginName = pluginPath.split( "." )[-1]
     if pluginName not in globals():
       mod = __import__( pluginPath, globals(), fromlist = [ pluginName ] )
@@ -203,6 +228,7 @@ class RequestTask( object ):
     for key, status in ( ( "Att", "Attempted" ), ( "OK", "Successful" ) , ( "Fail", "Failed" ) ):
       gMonitor.registerActivity( "%s%s" % ( pluginName, key ), "%s operations %s" % ( pluginName, status ),
                                  "RequestExecutingAgent", "Operations/min", gMonitor.OP_SUM )
+    RequestTask.__handlerClasses[pluginPath] = pluginClassObj
     # # return an instance
     return pluginClassObj
 
@@ -15,6 +15,7 @@ from DIRAC.Core.Utilities.ThreadPool                            import ThreadPoo
 from DIRAC.ResourceStatusSystem.Client.ResourceStatusClient     import ResourceStatusClient
 from DIRAC.ResourceStatusSystem.Client.ResourceManagementClient import ResourceManagementClient
 from DIRAC.ResourceStatusSystem.PolicySystem.PEP                import PEP
+from DIRAC.ResourceStatusSystem.Utilities.CommandResultCache    import CommandResultCache
 from DIRAC.WorkloadManagementSystem.DB.PilotAgentsDB            import PilotAgentsDB
 
 
@@ -48,6 +49,8 @@ class ElementInspectorAgent( AgentModule ):
                      'Error'    : 5
                      }
   
+  # ResourceManagementDB cache tables read by the commands, fetched once per cycle
+  __cacheTables = [ 'DowntimeCache', 'JobCache', 'PilotCache', 'SpaceTokenOccupancyCache' ]
   
   def __init__( self, *args, **kwargs ):
     """ c'tor
@@ -60,6 +63,8 @@ class ElementInspectorAgent( AgentModule ):
     self.elementsToBeChecked = None
     self.threadPool          = None
     self.rsClient            = None
+    self.rmClient            = None
+    self.cacheTables         = []
     self.clients             = {}
 
 
@@ -72,9 +77,11 @@ class ElementInspectorAgent( AgentModule ):
        
     self.elementType = self.am_getOption( 'elementType', self.elementType )   
     self.rsClient    = ResourceStatusClient()
+    self.rmClient    = ResourceManagementClient()
+    self.cacheTables = self.am_getOption( 'cacheTables', self.__cacheTables )
 
     self.clients[ 'ResourceStatusClient' ]     = self.rsClient
-    self.clients[ 'ResourceManagementClient' ] = ResourceManagementClient()
+    self.clients[ 'ResourceManagementClient' ] = self.rmClient
     self.clients[ 'PilotsDB' ]                 = PilotAgentsDB() 
 
     if not self.elementType:
@@ -111,6 +118,16 @@ class ElementInspectorAgent( AgentModule ):
             
     self.log.info( 'Needed %d threads to process %d elements' % ( numberOfThreads, queueSize ) )
     
+    # The commands of all the elements read the cache tables from memory, 
+    # fetched once for the whole batch
+    rmCache = None
+    if queueSize and self.cacheTables:
+      rmCache    = CommandResultCache( self.rmClient )
+      prefetched = rmCache.prefetch( self.cacheTables )
+      for tableName, message in prefetched[ 'Value' ].items():
+        self.log.warn( 'Could not prefetch %s' % tableName, message )
+      self.clients[ 'ResourceManagementClient' ] = rmCache
+    
     for _x in xrange( numberOfThreads ):
       jobUp = self.threadPool.generateJobAndQueueIt( self._execute )
       if not jobUp[ 'OK' ]:
@@ -121,6 +138,10 @@ class ElementInspectorAgent( AgentModule ):
     self.elementsToBeChecked.join()
     self.log.info( 'done')  
     
+    if rmCache is not None:
+      self.log.info( 'Command results cache: %d hits, %d misses' % ( rmCache.hits, rmCache.misses ) )
+      self.clients[ 'ResourceManagementClient' ] = self.rmClient
+    
     return S_OK()
 
 
@@ -0,0 +1,256 @@
+# $HeadURL:  $
+''' CommandResultCache
+
+  Per cycle, in memory view of the ResourceManagementDB cache tables, to be
+  used by the commands instead of the ResourceManagementClient.
+
+'''
+
+import inspect
+import threading
+
+from datetime import datetime
+
+from DIRAC import S_OK
+
+__RCSID__ = '$Id:  $'
+
+# Prefixes of the ResourceManagementClient methods, followed by the table name
+_QUERY_TYPES = ( 'select', 'insert', 'update', 'delete', 'addOrModify', 'addIfNotThere' )
+# Meta keys the in memory select understands
+_SELECT_META = ( 'columns', 'order', 'limit', 'older', 'newer' )
+
+def _splitMethodName( methodName ):
+  '''
+    Returns ( queryType, tableName ) for a ResourceManagementClient method name,
+    or ( None, None ) if it is not one of the table methods.
+  '''
+  for queryType in _QUERY_TYPES:
+    if methodName.startswith( queryType ) and methodName[ len( queryType ) : ][ :1 ].isupper():
+      return queryType, methodName[ len( queryType ) : ]
+  return None, None
+
+def _normalize( value ):
+  '''
+    Value as compared by MySQL in a WHERE clause: strings are case insensitive,
+    everything else is compared as its string representation.
+  '''
+  if isinstance( value, basestring ):
+    return value.lower()
+  return str( value )
+
+def _bindArguments( method, args, kwargs ):
+  '''
+    Returns the arguments of a call to the client method by name, defaults
+    included, or None if the method signature cannot be emulated. Raises
+    TypeError as the method does for arguments it does not accept.
+  '''
+  argSpec = inspect.getargspec( method )
+  if argSpec.varargs or argSpec.keywords:
+    return None
+  callArgs = inspect.getcallargs( method, *args, **kwargs )
+  if inspect.ismethod( method ) and method.im_self is not None:
+    del callArgs[ argSpec.args[ 0 ] ]
+  return callArgs
+
+def _timeValue( value ):
+  '''
+    Value usable to compare two timestamps.
+  '''
+  if isinstance( value, datetime ):
+    return str( value.replace( microsecond = 0 ) )
+  return str( value )
+
+class CommandResultCache( object ):
+  '''
+    CommandResultCache wraps a ResourceManagementClient. The cache tables are
+    fetched with one query each ( prefetch ), and the selectXxx methods called by
+    the commands on those tables are answered from memory. The answers are
+    memoized by ( table, arguments ), so elements sharing a site, a downtime or a
+    CE share the result. The arguments are bound through the signature of the
+    client method, so positional and keyword calls are answered alike and the
+    arguments the client does not accept raise TypeError. Any write on a
+    prefetched table makes it to be fetched again on the next read. Everything
+    else is delegated to the wrapped client.
+
+    It is meant to live for one agent cycle:
+
+     >>> rmCache = CommandResultCache( ResourceManagementClient() )
+     >>> rmCache.prefetch( [ 'DowntimeCache', 'JobCache' ] )
+     >>> clients[ 'ResourceManagementClient' ] = rmCache
+  '''
+
+  def __init__( self, rmClient ):
+    '''
+      Constructor
+    '''
+    self.rmClient = rmClient
+    # tableName -> ( columns, rows ), rows being lists of tuples
+    self.__tables  = {}
+    # tables to be fetched again on the next read
+    self.__stale   = set()
+    # ( tableName, arguments ) -> result
+    self.__results = {}
+    self.__lock    = threading.Lock()
+    self.hits      = 0
+    self.misses    = 0
+
+  def prefetch( self, tableNames ):
+    '''
+      Fetches the whole tables, one query per table. Tables that cannot be
+      fetched are left to the ResourceManagementClient.
+    '''
+    failed = {}
+    for tableName in tableNames:
+      result = self.__fetch( tableName )
+      if not result[ 'OK' ]:
+        failed[ tableName ] = result[ 'Message' ]
+    return S_OK( failed )
+
+  def __fetch( self, tableName ):
+    '''
+      Reads a whole table from the ResourceManagementClient.
+    '''
+    result = getattr( self.rmClient, 'select%s' % tableName )()
+    if not result[ 'OK' ]:
+      return result
+    self.__lock.acquire()
+    try:
+      self.__tables[ tableName ] = ( list( result[ 'Columns' ] ), list( result[ 'Value' ] ) )
+      self.__stale.discard( tableName )
+      for key in [ key for key in self.__results if key[ 0 ] == tableName ]:
+        del self.__results[ key ]
+    finally:
+      self.__lock.release()
+    return S_OK()
+
+  def __invalidate( self, tableName ):
+    '''
+      Marks a table to be fetched again.
+    '''
+    self.__lock.acquire()
+    try:
+      self.__stale.add( tableName )
+    finally:
+      self.__lock.release()
+
+  def __getattr__( self, methodName ):
+    '''
+      Delegates to the ResourceManagementClient, answering the selects on the
+      prefetched tables from memory.
+    '''
+    method = getattr( self.rmClient, methodName )
+    queryType, tableName = _splitMethodName( methodName )
+    if tableName is None or tableName not in self.__tables:
+      return method
+    if queryType == 'select':
+      return lambda *args, **kwargs: self.__select( tableName, method, args, kwargs )
+
+    def write( *args, **kwargs ):
+      ''' write on the table and fetch it again on the next read '''
+      try:
+        return method( *args, **kwargs )
+      finally:
+        self.__invalidate( tableName )
+    return write
+
+  def __select( self, tableName, method, args, kwargs ):
+    '''
+      Selects rows from memory, with the same semantics as the DB select.
+    '''
+    callArgs = _bindArguments( method, args, kwargs )
+    if callArgs is None:
+      return method( *args, **kwargs )
+    meta = callArgs.get( 'meta' ) or {}
+    if set( meta ) - set( _SELECT_META ):
+      # Options we do not emulate
+      return method( *args, **kwargs )
+
+    if tableName in self.__stale:
+      result = self.__fetch( tableName )
+      if not result[ 'OK' ]:
+        return method( *args, **kwargs )
+
+    key = ( tableName, repr( sorted( callArgs.items() ) ) )
+    result = self.__results.get( key )
+    if result is not None:
+      self.hits += 1
+      return self.__copyResult( result )
+    self.misses += 1
+
+    columns, rows = self.__tables[ tableName ]
+    # Column names are case insensitive, as in MySQL
+    positions = dict( [ ( columns[ position ].lower(), position ) for position in range( len( columns ) ) ] )
+    conditions = []
+    for argName, argValue in callArgs.items():
+      if argName == 'meta' or argValue is None:
+        continue
+      if not argName.lower() in positions:
+        return method( *args, **kwargs )
+      if not isinstance( argValue, list ):
+        argValue = [ argValue ]
+      conditions.append( ( positions[ argName.lower() ], set( [ _normalize( value ) for value in argValue ] ) ) )
+
+    timeCondition = None
+    for metaKey in ( 'older', 'newer' ):
+      if metaKey in meta:
+        field, limitValue = meta[ metaKey ]
+        if not field.lower() in positions:
+          return method( *args, **kwargs )
+        timeCondition = ( metaKey, positions[ field.lower() ], _timeValue( limitValue ) )
+        break
+
+    selected = []
+    for row in rows:
+      for position, values in conditions:
+        if _normalize( row[ position ] ) not in values:
+          break
+      else:
+        if timeCondition:
+          metaKey, position, limitValue = timeCondition
+          rowValue = _timeValue( row[ position ] )
+          if metaKey == 'older' and not rowValue < limitValue:
+            continue
+          if metaKey == 'newer' and not rowValue >= limitValue:
+            continue
+        selected.append( row )
+
+    if 'order' in meta:
+      orderColumns = meta[ 'order' ]
+      if not isinstance( orderColumns, list ):
+        orderColumns = [ orderColumns ]
+      for orderColumn in reversed( orderColumns ):
+        if not orderColumn.lower() in positions:
+          return method( *args, **kwargs )
+        position = positions[ orderColumn.lower() ]
+        selected.sort( key = lambda row: row[ position ] )
+
+    outColumns = columns
+    if 'columns' in meta:
+      outColumns = meta[ 'columns' ]
+      if not isinstance( outColumns, list ):
+        outColumns = [ outColumns ]
+      if [ column for column in outColumns if not column.lower() in positions ]:
+        return method( *args, **kwargs )
+      outPositions = [ positions[ column.lower() ] for column in outColumns ]
+      selected = [ tuple( [ row[ position ] for position in outPositions ] ) for row in selected ]
+
+    if 'limit' in meta and meta[ 'limit' ]:
+      selected = selected[ : int( meta[ 'limit' ] ) ]
+
+    result = S_OK( selected )
+    result[ 'Columns' ] = list( outColumns )
+    self.__results[ key ] = result
+    return self.__copyResult( result )
+
+  @staticmethod
+  def __copyResult( result ):
+    '''
+      Copy of a memoized result, the callers may modify it.
+    '''
+    copied = S_OK( list( result[ 'Value' ] ) )
+    copied[ 'Columns' ] = list( result[ 'Columns' ] )
+    return copied
+
+################################################################################
+#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF
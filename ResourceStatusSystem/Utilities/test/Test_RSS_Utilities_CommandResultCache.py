@@ -0,0 +1,159 @@
+# $HeadURL:  $
+''' Test_RSS_Utilities_CommandResultCache
+
+'''
+
+import unittest
+
+from datetime import datetime, timedelta
+
+import DIRAC.ResourceStatusSystem.Utilities.CommandResultCache as moduleTested
+
+__RCSID__ = '$Id:  $'
+
+################################################################################
+
+class FakeResourceManagementClient( object ):
+  ''' ResourceManagementClient look alike with the JobCache, DowntimeCache,
+      SpaceTokenOccupancyCache and PilotCache tables
+  '''
+
+  def __init__( self ):
+    self.columns = [ 'Site', 'MaskStatus', 'Efficiency', 'Status', 'LastCheckTime' ]
+    now = datetime.utcnow()
+    self.rows    = [ [ 'LCG.CERN.ch', 'Active', 0.9, 'Fine', now ],
+                     [ 'LCG.PIC.es', 'Active', 0.5, 'Bad', now - timedelta( hours = 2 ) ],
+                     [ 'LCG.RAL.uk', 'Banned', 0.0, 'Bad', now ] ]
+    self.calls   = []
+    self.downtimeColumns = [ 'DowntimeID', 'Element', 'Name', 'Severity', 'GOCDBServiceType' ]
+    self.downtimeRows    = [ [ '1', 'Resource', 'srm.cern.ch', 'OUTAGE', 'SRM' ],
+                             [ '2', 'Resource', 'srm.cern.ch', 'OUTAGE', 'SRM.nearline' ] ]
+    self.tokenColumns    = [ 'Endpoint', 'Token', 'Total', 'Guaranteed', 'Free', 'LastCheckTime' ]
+    self.tokenRows       = [ [ 'srm://srm.cern.ch', 'DISK', 10, 10, 5, now ],
+                             [ 'srm://srm.cern.ch', 'TAPE', 10, 10, 1, now ] ]
+
+  def selectJobCache( self, site = None, maskStatus = None, efficiency = None,
+                      status = None, lastCheckTime = None, meta = None ):
+    self.calls.append( ( 'selectJobCache', site, meta ) )
+    rows = [ row for row in self.rows if site is None or row[ 0 ] == site ]
+    return { 'OK' : True, 'Value' : rows, 'Columns' : self.columns }
+
+  def selectDowntimeCache( self, downtimeID = None, element = None, name = None,
+                           severity = None, gocdbServiceType = None, meta = None ):
+    self.calls.append( ( 'selectDowntimeCache', name, meta ) )
+    return { 'OK' : True, 'Value' : self.downtimeRows, 'Columns' : self.downtimeColumns }
+
+  def selectSpaceTokenOccupancyCache( self, endpoint = None, token = None, total = None,
+                                      guaranteed = None, free = None, lastCheckTime = None,
+                                      meta = None ):
+    self.calls.append( ( 'selectSpaceTokenOccupancyCache', endpoint, meta ) )
+    return { 'OK' : True, 'Value' : self.tokenRows, 'Columns' : self.tokenColumns }
+
+  def selectPilotCache( self, site = None, cE = None, status = None, lastCheckTime = None,
+                        meta = None ):
+    self.calls.append( ( 'selectPilotCache', cE, meta ) )
+    return { 'OK' : True, 'Value' : [], 'Columns' : [ 'Site', 'CE', 'Timespan', 'Status', 'LastCheckTime' ] }
+
+  def addOrModifyJobCache( self, site = None, maskStatus = None, efficiency = None,
+                           status = None ):
+    self.calls.append( ( 'addOrModifyJobCache', site ) )
+    self.rows.append( [ site, maskStatus, efficiency, status, datetime.utcnow() ] )
+    return { 'OK' : True, 'Value' : 1 }
+
+  def selectPolicyResult( self, name = None ):
+    self.calls.append( ( 'selectPolicyResult', name ) )
+    return { 'OK' : True, 'Value' : [], 'Columns' : [] }
+
+class CommandResultCache_TestCase( unittest.TestCase ):
+
+  def setUp( self ):
+    '''
+    Setup
+    '''
+    self.rmClient  = FakeResourceManagementClient()
+    self.testClass = moduleTested.CommandResultCache
+
+  def tearDown( self ):
+    '''
+    TearDown
+    '''
+    del self.rmClient
+    del self.testClass
+
+################################################################################
+# Tests
+
+class CommandResultCache_Success( CommandResultCache_TestCase ):
+
+  def test_prefetch( self ):
+    ''' one query per table, selects answered from memory
+    '''
+    cache = self.testClass( self.rmClient )
+    res = cache.prefetch( [ 'JobCache' ] )
+    self.assertEqual( True, res[ 'OK' ] )
+    self.assertEqual( 1, len( self.rmClient.calls ) )
+
+    res = cache.selectJobCache( site = 'lcg.cern.ch' )
+    self.assertEqual( True, res[ 'OK' ] )
+    self.assertEqual( 1, len( res[ 'Value' ] ) )
+    self.assertEqual( self.rmClient.columns, res[ 'Columns' ] )
+
+    res = cache.selectJobCache( status = [ 'Bad' ], meta = { 'columns' : [ 'Site' ], 'order' : 'Site' } )
+    self.assertEqual( [ ( 'LCG.PIC.es', ), ( 'LCG.RAL.uk', ) ], res[ 'Value' ] )
+
+    lastValid = datetime.utcnow() - timedelta( hours = 1 )
+    res = cache.selectJobCache( meta = { 'older' : ( 'LastCheckTime', lastValid ) } )
+    self.assertEqual( [ 'LCG.PIC.es' ], [ row[ 0 ] for row in res[ 'Value' ] ] )
+
+    cache.selectJobCache( site = 'lcg.cern.ch' )
+    self.assertEqual( 1, len( self.rmClient.calls ) )
+    self.assertEqual( 1, cache.hits )
+
+  def test_delegation( self ):
+    ''' other tables are read from the client, writes refresh the table
+    '''
+    cache = self.testClass( self.rmClient )
+    cache.prefetch( [ 'JobCache' ] )
+
+    cache.selectPolicyResult( name = 'X' )
+    self.assertEqual( ( 'selectPolicyResult', 'X' ), self.rmClient.calls[ -1 ] )
+
+    self.assertEqual( [], cache.selectJobCache( site = 'LCG.IN2P3.fr' )[ 'Value' ] )
+    cache.addOrModifyJobCache( site = 'LCG.IN2P3.fr', maskStatus = 'Active', efficiency = 1.0,
+                               status = 'Fine' )
+    self.assertEqual( 1, len( cache.selectJobCache( site = 'LCG.IN2P3.fr' )[ 'Value' ] ) )
+    self.assertEqual( 4, len( self.rmClient.calls ) )
+
+    # not emulated options go to the client
+    cache.selectJobCache( site = 'LCG.CERN.ch', meta = { 'onlyUniqueKeys' : True } )
+    self.assertEqual( 'selectJobCache', self.rmClient.calls[ -1 ][ 0 ] )
+
+  def test_commandCalls( self ):
+    ''' the selects are called as the commands call them
+    '''
+    cache = self.testClass( self.rmClient )
+    cache.prefetch( [ 'JobCache', 'DowntimeCache', 'SpaceTokenOccupancyCache', 'PilotCache' ] )
+    self.assertEqual( 4, len( self.rmClient.calls ) )
+
+    # JobCommand, positional site
+    res = cache.selectJobCache( 'LCG.CERN.ch' )
+    self.assertEqual( [ 'LCG.CERN.ch' ], [ row[ 0 ] for row in res[ 'Value' ] ] )
+    self.assertEqual( 1, len( cache.selectJobCache( site = 'LCG.CERN.ch' )[ 'Value' ] ) )
+    self.assertEqual( 1, cache.hits )
+
+    # SpaceTokenOccupancyCommand, positional endpoint and token
+    res = cache.selectSpaceTokenOccupancyCache( 'srm://srm.cern.ch', 'TAPE' )
+    self.assertEqual( [ 1 ], [ row[ 4 ] for row in res[ 'Value' ] ] )
+
+    # DowntimeCommand, gocdbServiceType is the GOCDBServiceType column
+    res = cache.selectDowntimeCache( element = 'Resource', name = 'srm.cern.ch',
+                                     gocdbServiceType = 'SRM' )
+    self.assertEqual( [ '1' ], [ row[ 0 ] for row in res[ 'Value' ] ] )
+
+    # PilotCommand, timespan is a column but not an argument of the client
+    self.assertRaises( TypeError, cache.selectPilotCache, cE = 'ce.cern.ch', timespan = 3600 )
+
+    self.assertEqual( 4, len( self.rmClient.calls ) )
+
+################################################################################
+#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF
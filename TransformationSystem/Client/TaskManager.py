@@ -4,7 +4,7 @@ __RCSID__ = "$Id$"
 
 COMPONENT_NAME = 'TaskManager'
 
-import time, types, os
+import time, types, os, re, shutil, tempfile
 
 from DIRAC                                                      import S_OK, S_ERROR, gLogger
 from DIRAC.Core.Security.ProxyInfo                              import getProxyInfo
@@ -25,6 +25,68 @@ from DIRAC.ConfigurationSystem.Client.Helpers.Registry          import getDNForU
 def _requestName( transID, taskID ):
   return str( transID ).zfill( 8 ) + '_' + str( taskID ).zfill( 8 )
 
+# Task parameter values that can be put in a workflow template: no white spaces, quotes
+# or characters with a meaning in the JDL, in the XML or on the dirac-jobexec command line
+_TEMPLATE_VALUE_RE = re.compile( r'^[^\s"\'=`$\\<>&\[\]@{},]+$' )
+
+class WorkflowTemplate( object ):
+  ''' A transformation workflow parsed once, with place holders for the parameters
+      changing from one task to the other. The tasks share its XML description and
+      get their parameter values from the dirac-jobexec command line.
+  '''
+
+  def __init__( self, job, site, paramNames ):
+    self.job = job
+    self.site = site
+    self.paramNames = paramNames
+    self.xml = job._toXML()
+    jdl = job._toJDL()
+    argStart = jdl.find( 'Arguments = "' ) + len( 'Arguments = "' )
+    argEnd = jdl.find( '"', argStart )
+    self.jdl = jdl[:argEnd] + '@@ARGUMENTS@@' + jdl[argEnd:]
+    self.destinations = {}
+
+  def setDestination( self, sites ):
+    ''' Check the sites only once
+    '''
+    if tuple( sites ) not in self.destinations:
+      self.destinations[tuple( sites )] = self.job.setDestination( sites )
+    return self.destinations[tuple( sites )]
+
+  def getXML( self, values ):
+    ''' The workflow XML description of one task
+    '''
+    xml = self.xml
+    for name in self.paramNames:
+      xml = xml.replace( '@@%s@@' % name, values[name] )
+    return xml
+
+  def getJDL( self, values ):
+    ''' The JDL of one task, following the ';' rule of Job._toJDL()
+    '''
+    jdl = self.jdl
+    arguments = []
+    for name in self.paramNames:
+      value = values[name]
+      if ';' in value and name != 'GridRequirements':
+        jdlValue = '{%s}' % ','.join( ['"%s"' % item for item in value.split( ';' )] )
+      else:
+        jdlValue = '"%s"' % value
+      jdl = jdl.replace( '"@@%s@@"' % name, jdlValue )
+      # ';' ends a JDL attribute, dirac-jobexec turns {a,b} into a;b
+      if ';' in value:
+        value = '{%s}' % value.replace( ';', ',' )
+      arguments.append( " -p '%s=%s'" % ( name, value ) )
+    return jdl.replace( '@@ARGUMENTS@@', ''.join( arguments ) )
+
+class TemplateTask( object ):
+  ''' A job prepared from a workflow template
+  '''
+
+  def __init__( self, template, jdl ):
+    self.template = template
+    self.jdl = jdl
+
 class TaskBase( object ):
   ''' The other classes inside here inherits from this one.
   '''
@@ -290,10 +352,14 @@ class WorkflowTasks( TaskBase ):
   '''
 
   def __init__( self, transClient = None, logger = None, submissionClient = None, jobMonitoringClient = None,
-                outputDataModule = None, jobClass = None, opsH = None ):
+                outputDataModule = None, jobClass = None, opsH = None, bulkSubmissionFlag = None ):
     ''' Generates some default objects.
         jobClass is by default "DIRAC.Interfaces.API.Job.Job". An extension of it also works:
         VOs can pass in their job class extension, if present
+        With the bulkSubmissionFlag the tasks are prepared from a workflow template and submitted
+        together, the default comes from the Transformations/BulkSubmission Operations option.
+        The templates set the task parameters as _handleInputs() and _handleRest() do, the
+        extensions overriding these methods get their tasks prepared one by one
     '''
 
     if not logger:
@@ -326,6 +392,15 @@ class WorkflowTasks( TaskBase ):
     else:
       self.outputDataModule = outputDataModule
 
+    if bulkSubmissionFlag is None:
+      self.bulkSubmissionFlag = self.opsH.getValue( "Transformations/BulkSubmission", False )
+    else:
+      self.bulkSubmissionFlag = bulkSubmissionFlag
+    self.bulkSubmissionSize = self.opsH.getValue( "Transformations/BulkSubmissionSize", 100 )
+
+    # ( transBody, transID, owner, ownerGroup, ownerDN, paramNames ) -> WorkflowTemplate
+    self.workflowTemplates = {}
+    self.maxWorkflowTemplates = 50
 
   def prepareTransformationTasks( self, transBody, taskDict, owner = '', ownerGroup = '', ownerDN = '' ):
     ''' Prepare tasks, given a taskDict, that is created (with some manipulation) by the DB
@@ -345,61 +420,167 @@ class WorkflowTasks( TaskBase ):
         return res
       ownerDN = res['Value'][0]
 
+    if self.bulkSubmissionFlag:
+      if self.__useWorkflowTemplates():
+        return self._prepareTransformationTasksFromTemplate( transBody, taskDict, owner, ownerGroup, ownerDN )
+      self.log.verbose( 'Input or parameter handling overridden, the tasks are not prepared from templates' )
+
+    for taskNumber in sorted( taskDict ):
+      self._prepareTransformationTask( transBody, taskNumber, taskDict[taskNumber], owner, ownerGroup, ownerDN )
+    return S_OK( taskDict )
+
+  def _prepareTransformationTask( self, transBody, taskNumber, paramsDict, owner, ownerGroup, ownerDN ):
+    ''' Prepare one task from its own copy of the workflow
+    '''
+    oJob = self.jobClass( transBody )
+    site = oJob.workflow.findParameter( 'Site' ).getValue()
+    paramsDict['Site'] = site
+    transID = paramsDict['TransformationID']
+    self.log.verbose( 'Setting job owner:group to %s:%s' % ( owner, ownerGroup ) )
+    oJob.setOwner( owner )
+    oJob.setOwnerGroup( ownerGroup )
+    oJob.setOwnerDN( ownerDN )
+    transGroup = str( transID ).zfill( 8 )
+    self.log.verbose( 'Adding default transformation group of %s' % ( transGroup ) )
+    oJob.setJobGroup( transGroup )
+    constructedName = str( transID ).zfill( 8 ) + '_' + str( taskNumber ).zfill( 8 )
+    self.log.verbose( 'Setting task name to %s' % constructedName )
+    oJob.setName( constructedName )
+    oJob._setParamValue( 'PRODUCTION_ID', str( transID ).zfill( 8 ) )
+    oJob._setParamValue( 'JOB_ID', str( taskNumber ).zfill( 8 ) )
+    inputData = None
+
+    self.log.debug( 'TransID: %s, TaskID: %s, paramsDict: %s' % ( transID, taskNumber, str( paramsDict ) ) )
+
+    # These helper functions do the real job
+    sites = self._handleDestination( paramsDict )
+    if not sites:
+      self.log.error( 'Could not get a list a sites' )
+      paramsDict['TaskObject'] = ''
+      return
+    else:
+      self.log.verbose( 'Setting Site: ', str( sites ) )
+      res = oJob.setDestination( sites )
+      if not res['OK']:
+        self.log.error( 'Could not set the site: %s' % res['Message'] )
+        return
+
+    self._handleInputs( oJob, paramsDict )
+    self._handleRest( oJob, paramsDict )
+
+    hospitalTrans = [int( x ) for x in self.opsH.getValue( "Hospital/Transformations", [] )]
+    if int( transID ) in hospitalTrans:
+      self._handleHospital( oJob )
+
+    paramsDict['TaskObject'] = ''
+    if self.outputDataModule:
+      res = self.getOutputData( {'Job':oJob._toXML(), 'TransformationID':transID,
+                                 'TaskID':taskNumber, 'InputData':inputData},
+                                moduleLocation = self.outputDataModule )
+      if not res ['OK']:
+        self.log.error( "Failed to generate output data", res['Message'] )
+        return
+      for name, output in res['Value'].items():
+        oJob._addJDLParameter( name, ';'.join( output ) )
+    paramsDict['TaskObject'] = self.jobClass( oJob._toXML() )
+
+  def _prepareTransformationTasksFromTemplate( self, transBody, taskDict, owner, ownerGroup, ownerDN ):
+    ''' Prepare the tasks from workflow templates: the workflow is parsed once per set of task
+        parameter names and the task values are substituted in its XML and JDL descriptions.
+        The inputs and the other parameters are handled as by the WorkflowTasks _handleInputs() and
+        _handleRest(), it is not used if they are overridden.
+        Hospital tasks and tasks with values that can't be substituted are prepared one by one.
+    '''
+    hospitalTrans = [int( x ) for x in self.opsH.getValue( "Hospital/Transformations", [] )]
     for taskNumber in sorted( taskDict ):
-      oJob = self.jobClass( transBody )
       paramsDict = taskDict[taskNumber]
-      site = oJob.workflow.findParameter( 'Site' ).getValue()
-      paramsDict['Site'] = site
       transID = paramsDict['TransformationID']
-      self.log.verbose( 'Setting job owner:group to %s:%s' % ( owner, ownerGroup ) )
-      oJob.setOwner( owner )
-      oJob.setOwnerGroup( ownerGroup )
-      oJob.setOwnerDN( ownerDN )
-      transGroup = str( transID ).zfill( 8 )
-      self.log.verbose( 'Adding default transformation group of %s' % ( transGroup ) )
-      oJob.setJobGroup( transGroup )
-      constructedName = str( transID ).zfill( 8 ) + '_' + str( taskNumber ).zfill( 8 )
-      self.log.verbose( 'Setting task name to %s' % constructedName )
-      oJob.setName( constructedName )
-      oJob._setParamValue( 'PRODUCTION_ID', str( transID ).zfill( 8 ) )
-      oJob._setParamValue( 'JOB_ID', str( taskNumber ).zfill( 8 ) )
-      inputData = None
-
-      self.log.debug( 'TransID: %s, TaskID: %s, paramsDict: %s' % ( transID, taskNumber, str( paramsDict ) ) )
-
-      # These helper functions do the real job
+      values = {'JobName':_requestName( transID, taskNumber ), 'JOB_ID':str( taskNumber ).zfill( 8 )}
+      inputData = paramsDict.get( 'InputData' )
+      if inputData:
+        if type( inputData ) == types.ListType:
+          inputData = ';'.join( ['LFN:' + lfn.replace( 'LFN:', '' ) for lfn in inputData] )
+        values['InputData'] = inputData
+      for paramName, paramValue in paramsDict.items():
+        if paramName not in ( 'InputData', 'Site', 'TargetSE', 'TaskObject' ) and paramValue:
+          values[paramName] = str( paramValue )
+      if int( transID ) in hospitalTrans or not self.__isTemplateValid( values ):
+        self._prepareTransformationTask( transBody, taskNumber, paramsDict, owner, ownerGroup, ownerDN )
+        continue
+
+      template = self.__getWorkflowTemplate( transBody, transID, owner, ownerGroup, ownerDN, values.keys() + ['Site'] )
+      paramsDict['Site'] = template.site
       sites = self._handleDestination( paramsDict )
       if not sites:
         self.log.error( 'Could not get a list a sites' )
-        taskDict[taskNumber]['TaskObject'] = ''
+        paramsDict['TaskObject'] = ''
         continue
-      else:
-        self.log.verbose( 'Setting Site: ', str( sites ) )
-        res = oJob.setDestination( sites )
-        if not res['OK']:
-          self.log.error( 'Could not set the site: %s' % res['Message'] )
-          continue
-
-      self._handleInputs( oJob, paramsDict )
-      self._handleRest( oJob, paramsDict )
-
-      hospitalTrans = [int( x ) for x in self.opsH.getValue( "Hospital/Transformations", [] )]
-      if int( transID ) in hospitalTrans:
-        self._handleHospital( oJob )
+      res = template.setDestination( sites )
+      if not res['OK']:
+        self.log.error( 'Could not set the site: %s' % res['Message'] )
+        continue
+      values['Site'] = ';'.join( sites )
 
-      taskDict[taskNumber]['TaskObject'] = ''
+      paramsDict['TaskObject'] = ''
       if self.outputDataModule:
-        res = self.getOutputData( {'Job':oJob._toXML(), 'TransformationID':transID,
-                                   'TaskID':taskNumber, 'InputData':inputData},
+        res = self.getOutputData( {'Job':template.getXML( values ), 'TransformationID':transID,
+                                   'TaskID':taskNumber, 'InputData':None},
                                   moduleLocation = self.outputDataModule )
         if not res ['OK']:
           self.log.error( "Failed to generate output data", res['Message'] )
           continue
-        for name, output in res['Value'].items():
-          oJob._addJDLParameter( name, ';'.join( output ) )
-      taskDict[taskNumber]['TaskObject'] = self.jobClass( oJob._toXML() )
+        if res['Value']:
+          for name, output in res['Value'].items():
+            values[name] = ';'.join( output )
+          template = self.__getWorkflowTemplate( transBody, transID, owner, ownerGroup, ownerDN, values.keys() )
+
+      if not self.__isTemplateValid( values ):
+        self._prepareTransformationTask( transBody, taskNumber, paramsDict, owner, ownerGroup, ownerDN )
+        continue
+      paramsDict['TaskObject'] = TemplateTask( template, template.getJDL( values ) )
     return S_OK( taskDict )
 
+  def __useWorkflowTemplates( self ):
+    ''' The templates only reproduce the WorkflowTasks _handleInputs() and _handleRest()
+    '''
+    for methodName in ( '_handleInputs', '_handleRest' ):
+      if getattr( self.__class__, methodName ).im_func is not getattr( WorkflowTasks, methodName ).im_func:
+        return False
+    return True
+
+  def __isTemplateValid( self, values ):
+    for value in values.values():
+      if not _TEMPLATE_VALUE_RE.match( value ):
+        return False
+    return True
+
+  def __getWorkflowTemplate( self, transBody, transID, owner, ownerGroup, ownerDN, paramNames ):
+    ''' Get the workflow template with place holders for the given task parameters
+    '''
+    paramNames = tuple( sorted( paramNames ) )
+    templateKey = ( transBody, transID, owner, ownerGroup, ownerDN, paramNames )
+    if templateKey in self.workflowTemplates:
+      return self.workflowTemplates[templateKey]
+    if len( self.workflowTemplates ) >= self.maxWorkflowTemplates:
+      self.workflowTemplates = {}
+
+    oJob = self.jobClass( transBody )
+    site = oJob.workflow.findParameter( 'Site' ).getValue()
+    self.log.verbose( 'Setting job owner:group to %s:%s' % ( owner, ownerGroup ) )
+    oJob.setOwner( owner )
+    oJob.setOwnerGroup( ownerGroup )
+    oJob.setOwnerDN( ownerDN )
+    oJob.setJobGroup( str( transID ).zfill( 8 ) )
+    oJob.setName( '@@JobName@@' )
+    oJob._setParamValue( 'PRODUCTION_ID', str( transID ).zfill( 8 ) )
+    oJob._setParamValue( 'JOB_ID', '@@JOB_ID@@' )
+    for name in paramNames:
+      if name not in ( 'JobName', 'JOB_ID' ):
+        oJob._addJDLParameter( name, '@@%s@@' % name )
+    template = WorkflowTemplate( oJob, site, paramNames )
+    self.workflowTemplates[templateKey] = template
+    return template
+
   #############################################################################
 
   def _handleDestination( self, paramsDict, getSitesForSE = None ):
@@ -487,16 +668,20 @@ class WorkflowTasks( TaskBase ):
     return module.execute()
 
   def submitTransformationTasks( self, taskDict ):
-    """ Submit jobs one by one
+    """ Submit jobs one by one, the ones prepared from the same workflow template together
     """
     submitted = 0
     failed = 0
     startTime = time.time()
+    templateTasks = {}
     for taskID in sorted( taskDict ):
       if not taskDict[taskID]['TaskObject']:
         taskDict[taskID]['Success'] = False
         failed += 1
         continue
+      if isinstance( taskDict[taskID]['TaskObject'], TemplateTask ):
+        templateTasks.setdefault( taskDict[taskID]['TaskObject'].template, [] ).append( taskID )
+        continue
       res = self.submitTaskToExternal( taskDict[taskID]['TaskObject'] )
       if res['OK']:
         taskDict[taskID]['ExternalID'] = res['Value']
@@ -506,6 +691,25 @@ class WorkflowTasks( TaskBase ):
         self.log.error( "Failed to submit task to WMS", res['Message'] )
         taskDict[taskID]['Success'] = False
         failed += 1
+    for template, taskIDs in templateTasks.items():
+      for start in range( 0, len( taskIDs ), self.bulkSubmissionSize ):
+        bulkTaskIDs = taskIDs[start:start + self.bulkSubmissionSize]
+        res = self.__submitTemplateTasks( template, [taskDict[taskID]['TaskObject'].jdl for taskID in bulkTaskIDs] )
+        if res['OK']:
+          jobIDs = res['Value']
+          for error in res.get( 'FailedJobs', {} ).values():
+            self.log.error( "Failed to submit task to WMS", error )
+        else:
+          self.log.error( "Failed to submit tasks to WMS", res['Message'] )
+          jobIDs = [None] * len( bulkTaskIDs )
+        for taskID, jobID in zip( bulkTaskIDs, jobIDs ):
+          if jobID:
+            taskDict[taskID]['ExternalID'] = jobID
+            taskDict[taskID]['Success'] = True
+            submitted += 1
+          else:
+            taskDict[taskID]['Success'] = False
+            failed += 1
     self.log.info( 'submitTransformationTasks: Submitted %d tasks to WMS in %.1f seconds' % ( submitted,
                                                                                             time.time() - startTime ) )
     if failed:
@@ -515,6 +719,13 @@ class WorkflowTasks( TaskBase ):
   def submitTaskToExternal( self, job ):
     """ Submits a single job to the WMS.
     """
+    if isinstance( job, TemplateTask ):
+      res = self.__submitTemplateTasks( job.template, [job.jdl] )
+      if not res['OK']:
+        return res
+      if not res['Value'][0]:
+        return S_ERROR( res['FailedJobs'].values()[0] )
+      return S_OK( res['Value'][0] )
     if type( job ) in types.StringTypes:
       try:
         oJob = self.jobClass( job )
@@ -535,6 +746,20 @@ class WorkflowTasks( TaskBase ):
     os.remove( "jobDescription.xml" )
     return res
 
+  def __submitTemplateTasks( self, template, jdls ):
+    """ Submits jobs of the same workflow template to the WMS in one go, the workflow
+        description is uploaded once for all of them
+    """
+    tmpDir = tempfile.mkdtemp()
+    try:
+      workflowFileName = os.path.join( tmpDir, "jobDescription.xml" )
+      workflowFile = open( workflowFileName, 'w' )
+      workflowFile.write( template.xml )
+      workflowFile.close()
+      return self.submissionClient.submitJobs( jdls, sharedSandbox = [workflowFileName] )
+    finally:
+      shutil.rmtree( tmpDir, True )
+
   def updateTransformationReservedTasks( self, taskDicts ):
     requestNames = []
     for taskDict in taskDicts:
@@ -51,6 +51,7 @@ class TransformationClient( Client, FileCatalogueBase ):
 
           getFileSummary(lfns)
           exists(lfns)
+          filterFiles(lfns)
 
       Web monitoring tools
 
@@ -12,6 +12,36 @@ def getSitesForSE( ses ):
   else:
     return {'OK':True, 'Value':['Site3']}
 
+class FakeJob( object ):
+  """ Job look alike keeping the workflow parameters in a dictionary
+  """
+  def __init__( self, xml = '' ):
+    self.xml = xml
+    self.params = {'Site':'ANY'}
+    self.workflow = Mock()
+    self.workflow.findParameter.return_value.getValue.return_value = 'ANY'
+
+  def setOwner( self, owner ):
+    self.params['Owner'] = owner
+  setOwnerGroup = setOwnerDN = setJobGroup = lambda self, value: None
+
+  def setName( self, name ):
+    self.params['JobName'] = name
+
+  def _setParamValue( self, name, value ):
+    self.params[name] = value
+  _addJDLParameter = _setParamValue
+
+  def setDestination( self, sites ):
+    return {'OK':True}
+
+  def _toXML( self ):
+    return ''.join( ['<%s>%s</%s>' % ( name, self.params[name], name ) for name in sorted( self.params )] )
+
+  def _toJDL( self ):
+    return '    Arguments = "jobDescription.xml";\n' + \
+           '\n'.join( ['    %s = "%s";' % ( name, self.params[name] ) for name in sorted( self.params )] )
+
 #############################################################################
 
 class ClientsTestCase( unittest.TestCase ):
@@ -109,6 +139,60 @@ class WorkflowTasksSuccess( ClientsTestCase ):
     res = self.wfTasks._handleDestination( {'Site':'Site1', 'TargetSE':'pluto'}, getSitesForSE )
     self.assertEqual( res, [] )
 
+  def test_bulkSubmission( self ):
+    wfTasks = WorkflowTasks( transClient = self.mockTransClient,
+                             submissionClient = self.WMSClientMock,
+                             jobMonitoringClient = self.jobMonitoringClient,
+                             outputDataModule = "mock",
+                             jobClass = FakeJob,
+                             bulkSubmissionFlag = True )
+    wfTasks.getOutputData = Mock()
+    wfTasks.getOutputData.return_value = {'OK':True, 'Value':{'ProductionOutputData':['/a/b.dst', '/a/c.dst']}}
+    taskDict = {1:{'TransformationID':1, 'a1':'aa1', 'InputData':['a1', 'a2']},
+                2:{'TransformationID':1, 'a1':'aa2', 'InputData':'LFN:a3'},
+                3:{'TransformationID':1, 'a1':'a b'}}
+
+    res = wfTasks.prepareTransformationTasks( 'body', taskDict, 'test_user', 'test_group', 'test_DN' )
+    self.assert_( res['OK'] )
+    jdl = taskDict[1]['TaskObject'].jdl
+    self.assert_( 'InputData = {"LFN:a1","LFN:a2"};' in jdl )
+    self.assert_( 'JobName = "00000001_00000001";' in jdl )
+    self.assert_( 'ProductionOutputData = {"/a/b.dst","/a/c.dst"};' in jdl )
+    self.assert_( "-p 'JOB_ID=00000001'" in jdl )
+    self.assert_( "-p 'InputData={LFN:a1,LFN:a2}'" in jdl )
+    self.assert_( 'JobName = "00000001_00000002";' in taskDict[2]['TaskObject'].jdl )
+    self.assertEqual( taskDict[1]['TaskObject'].template, taskDict[2]['TaskObject'].template )
+    self.assertEqual( len( wfTasks.workflowTemplates ), 2 )
+    # Values with spaces can't go through the template
+    self.assert_( isinstance( taskDict[3]['TaskObject'], FakeJob ) )
+
+    self.WMSClientMock.submitJobs.return_value = {'OK':True, 'Value':[11, None], 'FailedJobs':{1:'Error'}}
+    self.WMSClientMock.submitJob.return_value = {'OK':True, 'Value':13}
+    res = wfTasks.submitTransformationTasks( taskDict )
+    self.assert_( res['OK'] )
+    self.assertEqual( self.WMSClientMock.submitJobs.call_count, 1 )
+    self.assertEqual( [taskDict[taskID]['Success'] for taskID in ( 1, 2, 3 )], [True, False, True] )
+    self.assertEqual( taskDict[1]['ExternalID'], 11 )
+
+  def test_bulkSubmissionOverriddenHooks( self ):
+    class VOWorkflowTasks( WorkflowTasks ):
+      def _handleRest( self, oJob, paramsDict ):
+        WorkflowTasks._handleRest( self, oJob, paramsDict )
+        oJob._addJDLParameter( 'VOParameter', 'vo' )
+    wfTasks = VOWorkflowTasks( transClient = self.mockTransClient,
+                               submissionClient = self.WMSClientMock,
+                               jobMonitoringClient = self.jobMonitoringClient,
+                               outputDataModule = '',
+                               jobClass = FakeJob,
+                               bulkSubmissionFlag = True )
+    taskDict = {1:{'TransformationID':1, 'a1':'aa1'}}
+    res = wfTasks.prepareTransformationTasks( 'body', taskDict, 'test_user', 'test_group', 'test_DN' )
+    self.assert_( res['OK'] )
+    # Prepared one by one, with the VO parameter
+    self.assert_( isinstance( taskDict[1]['TaskObject'], FakeJob ) )
+    self.assert_( '<VOParameter>vo</VOParameter>' in taskDict[1]['TaskObject'].xml )
+    self.assertEqual( wfTasks.workflowTemplates, {} )
+
 #############################################################################
 
 class RequestTasksSuccess( ClientsTestCase ):
@@ -17,6 +17,7 @@ from DIRAC.Core.Utilities.List                            import stringListToStr
 from DIRAC.Core.Utilities.Shifter                         import setupShifterProxyInEnv
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations  import Operations
 from DIRAC.Core.Utilities.Subprocess                      import pythonCall
+from DIRAC.TransformationSystem.private.FileFilterIndex   import FileFilterIndex
 
 __RCSID__ = "$Id$"
 
@@ -37,7 +38,7 @@ class TransformationDB( DB ):
       DB.__init__( self, 'TransformationDB', 'Transformation/TransformationDB', maxQueueSize )
 
     self.lock = threading.Lock()
-    self.filters = ()
+    self.filterIndex = FileFilterIndex()
     res = self.__updateFilters()
     if not res['OK']:
       gLogger.fatal( "Failed to create filters" )
@@ -354,7 +355,9 @@ class TransformationDB( DB ):
     self.lock.release()
     # If the transformation has an input data specification
     if fileMask:
-      self.filters.append( ( transID, re.compile( fileMask ) ) )
+      res = self.filterIndex.setFilter( transID, fileMask )
+      if not res['OK']:
+        gLogger.error( "Failed to add the filter of transformation %d" % transID, res['Message'] )
 
     if inheritedFrom:
       res = self._getTransformationID( inheritedFrom, connection = connection )
@@ -533,15 +536,16 @@ class TransformationDB( DB ):
 
   def __updateFilters( self, connection = False ):
     ''' Get filters for all defined input streams in all the transformations.
-        If transID argument is given, get filters only for this transformation.
+        The general filter has the transformation ID 0.
     '''
-    resultList = []
+    filterIndex = FileFilterIndex()
     # Define the general filter first
     self.database_name = self.__class__.__name__
     value = Operations().getValue( 'InputDataFilter/%sFilter' % self.database_name, '' )
     if value:
-      refilter = re.compile( value )
-      resultList.append( ( 0, refilter ) )
+      res = filterIndex.setFilter( 0, value )
+      if not res['OK']:
+        return res
     # Per transformation filters
     req = "SELECT TransformationID,FileMask FROM Transformations;"
     res = self._query( req, connection )
@@ -549,23 +553,17 @@ class TransformationDB( DB ):
       return res
     for transID, mask in res['Value']:
       if mask:
-        refilter = re.compile( mask )
-        resultList.append( ( transID, refilter ) )
-    self.filters = resultList
-    return S_OK( resultList )
-
-  def __filterFile( self, lfn, filters = None ):
-    '''Pass the input file through a supplied filter or those currently active '''
-    result = []
-    if filters:
-      for transID, refilter in filters:
-        if refilter.search( lfn ):
-          result.append( transID )
-    else:
-      for transID, refilter in self.filters:
-        if refilter.search( lfn ):
-          result.append( transID )
-    return result
+        res = filterIndex.setFilter( transID, mask )
+        if not res['OK']:
+          gLogger.error( "Failed to add the filter of transformation %d" % transID, res['Message'] )
+    self.filterIndex = filterIndex
+    return S_OK( filterIndex.getTransformations() )
+
+  def filterFiles( self, lfns ):
+    ''' Get the transformations whose filter each of the LFNs passes, the general filter
+        has the transformation ID 0
+    '''
+    return S_OK( self.filterIndex.filterFiles( lfns ) )
 
   ###########################################################################
   #
@@ -581,6 +579,10 @@ class TransformationDB( DB ):
     message = ''
     if paramName in self.TRANSPARAMS:
       res = self.__updateTransformationParameter( transID, paramName, paramValue, connection = connection )
+      if res['OK'] and paramName == 'FileMask':
+        result = self.filterIndex.setFilter( transID, paramValue )
+        if not result['OK']:
+          gLogger.error( "Failed to update the filter of transformation %d" % transID, result['Message'] )
       if res['OK']:
         pv = self._escapeString( paramValue )
         if not pv['OK']:
@@ -869,11 +871,8 @@ class TransformationDB( DB ):
   def __addExistingFiles( self, transID, connection = False ):
     ''' Add files that already exist in the DataFiles table to the transformation specified by the transID
     '''
-    for tID, _filter in self.filters:
-      if tID == transID:
-        filters = [( tID, filter )]
-        break
-    if not filters:
+    refilter = self.filterIndex.getFilter( transID )
+    if not refilter:
       return S_ERROR( 'No filters defined for transformation %d' % transID )
     res = self.__getAllFileIDs( connection = connection )
     if not res['OK']:
@@ -881,7 +880,7 @@ class TransformationDB( DB ):
     fileIDs, _lfnFilesIDs = res['Value']
     passFilter = []
     for fileID, lfn in fileIDs.items():
-      if self.__filterFile( lfn, filters ):
+      if refilter.search( lfn ):
         passFilter.append( fileID )
     return self.__addFilesToTransformation( transID, passFilter, connection = connection )
 
@@ -1607,9 +1606,7 @@ class TransformationDB( DB ):
     res = self.__deleteTransformation( transID, connection = connection )
     if not res['OK']:
       return res
-    res = self.__updateFilters()
-    if not res['OK']:
-      return res
+    self.filterIndex.removeFilter( transID )
     return S_OK()
 
   def __removeTransformationTask( self, transID, taskID, connection = False ):
@@ -1685,8 +1682,8 @@ class TransformationDB( DB ):
     # Determine which files pass the filters and are to be added to transformations
     transFiles = {}
     filesToAdd = []
-    for lfn in fileDicts.keys():
-      fileTrans = self.__filterFile( lfn )
+    lfnTrans = self.filterIndex.filterFiles( fileDicts.keys() )
+    for lfn, fileTrans in lfnTrans.items():
       if not ( fileTrans or force ):
         successful[lfn] = True
       else:
@@ -341,6 +341,13 @@ class TransformationManagerHandler( RequestHandler ):
     res = database.addFile( fileDicts, force = force )
     return self._parseRes( res )
 
+  types_filterFiles = [ListType]
+  def export_filterFiles( self, lfns ):
+    """ Interface provides [ LFN1, LFN2, ... ], returns { LFN1 : [ TransID1, ... ], ... }
+    """
+    res = database.filterFiles( lfns )
+    return self._parseRes( res )
+
   types_removeFile = [ListType]
   def export_removeFile( self, lfns ):
     """ Interface provides [ LFN1, LFN2, ... ]
@@ -0,0 +1,269 @@
+""" Index of the transformation FileMask filters used by the TransformationDB
+
+    Instead of searching each LFN with the FileMask regular expression of every
+    transformation, the masks are indexed by the literal string an LFN has to
+    contain to match them, taken from the beginning of the mask. The literals are
+    kept in two prefix trees: one for the masks anchored with '^', walked from the
+    start of the LFN only, and one for the other masks, walked from every position.
+    Only the masks found on the way are searched. Transformations with the same mask
+    share one compiled expression, and the masks of a tree node are first checked
+    together with a combined alternation expression.
+
+    A mask with top level alternatives is indexed with the literal of each of them.
+    Masks without a usable literal (inline flags, alternatives starting with a
+    wildcard...) are searched for every LFN, as before.
+"""
+
+__RCSID__ = "$Id$"
+
+import re
+import threading
+from DIRAC import gLogger, S_OK, S_ERROR
+
+# Characters with a special meaning in a regular expression
+REGEX_SPECIAL = '.^$*+?{}[]\\|()'
+
+class MaskEntry( object ):
+  """ One compiled mask and the transformations using it """
+
+  def __init__( self, mask, regex ):
+    self.mask = mask
+    self.regex = regex
+    self.transIDs = set()
+    self.nodes = []
+
+class TreeNode( object ):
+  """ Prefix tree node, with the masks whose literal ends here """
+
+  def __init__( self ):
+    self.children = {}
+    # mask -> MaskEntry
+    self.masks = {}
+    # Alternation of the combinable masks of the node, None if to be compiled
+    self.combined = None
+
+def _splitAlternatives( mask ):
+  """ Split the mask on the '|' outside of any group or character class
+  """
+  alternatives = []
+  depth = 0
+  inClass = False
+  start = 0
+  index = 0
+  while index < len( mask ):
+    char = mask[index]
+    if char == '\\':
+      index += 2
+      continue
+    if inClass:
+      if char == ']':
+        inClass = False
+    elif char == '[':
+      inClass = True
+      # A ']' right after '[' or '[^' is part of the class
+      if mask[index + 1:index + 2] == '^':
+        index += 1
+      if mask[index + 1:index + 2] == ']':
+        index += 1
+    elif char == '(':
+      depth += 1
+    elif char == ')':
+      depth -= 1
+    elif char == '|' and not depth:
+      alternatives.append( mask[start:index] )
+      start = index + 1
+    index += 1
+  alternatives.append( mask[start:] )
+  return alternatives
+
+def getMaskLiterals( mask ):
+  """ Get for each top level alternative of the mask the literal string that any string
+      matching it contains, and whether it has to be at the beginning of the string.
+      An empty literal means that any string can match.
+  """
+  if '(?' in mask.replace( '(?:', '' ):
+    return [ ( False, '' ) ]
+  return [ _getLiteral( alternative ) for alternative in _splitAlternatives( mask ) ]
+
+def _getLiteral( mask ):
+  """ Literal at the beginning of one alternative
+  """
+  anchored = mask.startswith( '^' )
+  index = 1 if anchored else 0
+  literal = []
+  while index < len( mask ):
+    char = mask[index]
+    step = 1
+    if char == '\\':
+      # Only the escaped punctuation is literal, \d, \w... are classes
+      if index + 1 == len( mask ) or mask[index + 1].isalnum():
+        break
+      char = mask[index + 1]
+      step = 2
+    elif char in REGEX_SPECIAL:
+      break
+    # The character is optional if followed by one of these quantifiers
+    if mask[index + step:index + step + 1] in ( '*', '?', '{' ):
+      break
+    literal.append( char )
+    index += step
+  return anchored, ''.join( literal )
+
+def _isCombinable( mask ):
+  """ Masks with inline flags or back references can't be put in an alternation
+  """
+  return '(?' not in mask.replace( '(?:', '' ) and not re.search( r'\\\d', mask )
+
+class FileFilterIndex( object ):
+
+  def __init__( self ):
+    self.__log = gLogger.getSubLogger( "FileFilterIndex" )
+    self.__lock = threading.Lock()
+    # transID -> mask
+    self.__transMasks = {}
+    # mask -> MaskEntry
+    self.__masks = {}
+    self.__anchoredTree = TreeNode()
+    self.__floatingTree = TreeNode()
+    # Masks without literal, searched for all the LFNs
+    self.__anyNode = TreeNode()
+
+  def setFilter( self, transID, mask ):
+    """ Set the FileMask of a transformation, an empty mask removes its filter
+    """
+    regex = None
+    if mask:
+      try:
+        regex = re.compile( mask )
+      except re.error, x:
+        return S_ERROR( "Invalid FileMask %s: %s" % ( mask, str( x ) ) )
+    self.__lock.acquire()
+    try:
+      self.__removeFilter( transID )
+      if not mask:
+        return S_OK()
+      if mask not in self.__masks:
+        entry = MaskEntry( mask, regex )
+        literals = getMaskLiterals( mask )
+        if [ literal for _anchored, literal in literals if not literal ]:
+          entry.nodes.append( self.__anyNode )
+        else:
+          for anchored, literal in literals:
+            node = self.__anchoredTree if anchored else self.__floatingTree
+            for char in literal:
+              node = node.children.setdefault( char, TreeNode() )
+            entry.nodes.append( node )
+        for node in entry.nodes:
+          node.masks[mask] = entry
+          node.combined = None
+        self.__masks[mask] = entry
+      self.__masks[mask].transIDs.add( transID )
+      self.__transMasks[transID] = mask
+    finally:
+      self.__lock.release()
+    return S_OK()
+
+  def removeFilter( self, transID ):
+    """ Remove the filter of a transformation
+    """
+    self.__lock.acquire()
+    try:
+      self.__removeFilter( transID )
+    finally:
+      self.__lock.release()
+
+  def __removeFilter( self, transID ):
+    mask = self.__transMasks.pop( transID, None )
+    if mask is None:
+      return
+    entry = self.__masks[mask]
+    entry.transIDs.discard( transID )
+    if not entry.transIDs:
+      del self.__masks[mask]
+      for node in entry.nodes:
+        node.masks.pop( mask, None )
+        node.combined = None
+
+  def getFilter( self, transID ):
+    """ Get the compiled FileMask of a transformation, None if it has no filter
+    """
+    self.__lock.acquire()
+    try:
+      mask = self.__transMasks.get( transID )
+      if mask is None:
+        return None
+      return self.__masks[mask].regex
+    finally:
+      self.__lock.release()
+
+  def getTransformations( self ):
+    """ Get the IDs of the transformations with a filter
+    """
+    return self.__transMasks.keys()
+
+  def filterFile( self, lfn ):
+    """ Get the sorted IDs of the transformations whose filter the LFN passes
+    """
+    self.__lock.acquire()
+    try:
+      return self.__filterFile( lfn )
+    finally:
+      self.__lock.release()
+
+  def filterFiles( self, lfns ):
+    """ Get for each LFN the sorted IDs of the transformations whose filter it passes
+    """
+    result = {}
+    self.__lock.acquire()
+    try:
+      for lfn in lfns:
+        result[lfn] = self.__filterFile( lfn )
+    finally:
+      self.__lock.release()
+    return result
+
+  def __filterFile( self, lfn ):
+    transIDs = set()
+    searched = set()
+    nodes = {}
+    if self.__anyNode.masks:
+      nodes[id( self.__anyNode )] = self.__anyNode
+    self.__walkTree( self.__anchoredTree, lfn, 0, nodes )
+    floatingChildren = self.__floatingTree.children
+    if floatingChildren:
+      for start in range( len( lfn ) ):
+        if lfn[start] in floatingChildren:
+          self.__walkTree( self.__floatingTree, lfn, start, nodes )
+    for node in nodes.values():
+      if len( node.masks ) > 1:
+        if node.combined is None:
+          node.combined = self.__combineMasks( node.masks.keys() )
+        if node.combined and not node.combined.search( lfn ):
+          continue
+      for mask, entry in node.masks.items():
+        if mask not in searched:
+          searched.add( mask )
+          if entry.regex.search( lfn ):
+            transIDs.update( entry.transIDs )
+    return sorted( transIDs )
+
+  def __walkTree( self, node, lfn, start, nodes ):
+    """ Collect the nodes with masks on the path of lfn[start:]
+    """
+    for char in lfn[start:]:
+      node = node.children.get( char )
+      if node is None:
+        return
+      if node.masks:
+        nodes[id( node )] = node
+
+  def __combineMasks( self, masks ):
+    """ Alternation of the masks used to skip all of them at once, False if
+        they can't be combined
+    """
+    if not [ mask for mask in masks if not _isCombinable( mask ) ]:
+      try:
+        return re.compile( '|'.join( [ '(?:%s)' % mask for mask in masks ] ) )
+      except re.error, x:
+        self.__log.verbose( "Failed to combine masks", str( x ) )
+    return False
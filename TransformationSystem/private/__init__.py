@@ -0,0 +1 @@
+""" DIRAC.TransformationSystem.private package """
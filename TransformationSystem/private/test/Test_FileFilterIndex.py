@@ -0,0 +1,78 @@
+import unittest, re
+
+from DIRAC.TransformationSystem.private.FileFilterIndex import FileFilterIndex, getMaskLiterals
+
+MASKS = {1:'/lhcb/MC/2012/.*DST$',
+         2:'^/lhcb/data/2012/RAW/FULL/LHCb/COLLISION12/1147\d\d/',
+         3:'/lhcb/MC/2012/.*DST$',
+         4:'.*\.raw',
+         5:'/lhcb/data/|/lhcb/MC/2011/',
+         6:'(?i)/LHCB/MC/2012/',
+         7:'BHADRON',
+         8:'^/lhcb/MC/2012/00012345/DSTs?/',
+         9:'/(lhcb)/MC/\\1',
+         10:'/lhcb/MC/2012/[0-9]+/ALLSTREAMS'}
+
+LFNS = ['/lhcb/MC/2012/00012345/DST/00012345_00000001_1.allstreams.dst',
+        '/lhcb/MC/2012/00012345/ALLSTREAMS.DST/00012345_00000001_1.allstreams.dst',
+        '/lhcb/MC/2012/00012345/DSTs/00012345_00000001_1.bhadron.mdst',
+        '/lhcb/data/2012/RAW/FULL/LHCb/COLLISION12/114753/114753_0000000062.raw',
+        '/lhcb/data/2012/RAW/FULL/LHCb/COLLISION12/124753/124753_0000000062.raw',
+        '/lhcb/user/a/auser/lhcb/MC/2012/BHADRON.DST',
+        '/lhcb/MC/2011/00011111/ALLSTREAMS.DST/00011111_00000001_1.allstreams.dst',
+        '/lhcb/MC/lhcb/file']
+
+#############################################################################
+
+class FileFilterIndexTestCase( unittest.TestCase ):
+  """ Base class for the FileFilterIndex test cases
+  """
+  def setUp( self ):
+    self.index = FileFilterIndex()
+    for transID, mask in MASKS.items():
+      self.assert_( self.index.setFilter( transID, mask )['OK'] )
+
+  def bruteForce( self, masks, lfn ):
+    return sorted( [transID for transID, mask in masks.items() if re.search( mask, lfn )] )
+
+#############################################################################
+
+class FileFilterIndexSuccess( FileFilterIndexTestCase ):
+
+  def test_getMaskLiterals( self ):
+    self.assertEqual( getMaskLiterals( '^/lhcb/data/2012/RAW/\d+' ), [( True, '/lhcb/data/2012/RAW/' )] )
+    self.assertEqual( getMaskLiterals( '/lhcb/MC/2012/.*DST$' ), [( False, '/lhcb/MC/2012/' )] )
+    self.assertEqual( getMaskLiterals( '/lhcb/MC\.2012/DSTs?' ), [( False, '/lhcb/MC.2012/DST' )] )
+    self.assertEqual( getMaskLiterals( 'ab+c' ), [( False, 'ab' )] )
+    self.assertEqual( getMaskLiterals( '^/a/|/b/' ), [( True, '/a/' ), ( False, '/b/' )] )
+    self.assertEqual( getMaskLiterals( '/a/(b|c)' ), [( False, '/a/' )] )
+    self.assertEqual( getMaskLiterals( '[|]/a/' ), [( False, '' )] )
+    self.assertEqual( getMaskLiterals( '(?i)/a/' ), [( False, '' )] )
+
+  def test_filterFiles( self ):
+    res = self.index.filterFiles( LFNS )
+    for lfn in LFNS:
+      self.assertEqual( res[lfn], self.bruteForce( MASKS, lfn ) )
+    self.assertEqual( self.index.filterFile( LFNS[0] ), [6, 8] )
+    self.assertEqual( self.index.filterFile( LFNS[5] ), [1, 3, 6, 7] )
+
+  def test_updateFilters( self ):
+    masks = dict( MASKS )
+    self.index.setFilter( 3, '/lhcb/MC/2012/00012345/' )
+    masks[3] = '/lhcb/MC/2012/00012345/'
+    self.index.removeFilter( 1 )
+    del masks[1]
+    self.index.setFilter( 7, '' )
+    del masks[7]
+    for lfn in LFNS:
+      self.assertEqual( self.index.filterFile( lfn ), self.bruteForce( masks, lfn ) )
+    self.assertEqual( self.index.getFilter( 3 ).pattern, '/lhcb/MC/2012/00012345/' )
+    self.assertEqual( self.index.getFilter( 1 ), None )
+    self.assertEqual( sorted( self.index.getTransformations() ), sorted( masks ) )
+    self.assertFalse( self.index.setFilter( 11, '/lhcb/(' )['OK'] )
+
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase( FileFilterIndexTestCase )
+  suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( FileFilterIndexSuccess ) )
+  testResult = unittest.TextTestRunner( verbosity = 2 ).run( suite )
@@ -114,15 +114,17 @@ for the agent restart
     self.log.info( '%s Running jobs will be checked for being stalled' % ( len( jobs ) ) )
     jobs.sort()
 # jobs = jobs[:10] #for debugging
+    stalledJobs = []
     for job in jobs:
       result = self.__getStalledJob( job, stalledTime )
       if result['OK']:
         self.log.verbose( 'Updating status to Stalled for job %s' % ( job ) )
-        self.__updateJobStatus( job, 'Stalled' )
+        stalledJobs.append( job )
         stalledCounter += 1
       else:
         self.log.verbose( result['Message'] )
         runningCounter += 1
+    self.__updateJobsStatus( stalledJobs, 'Stalled' )
 
     self.log.info( 'Total jobs: %s, Stalled job count: %s, Running job count: %s' %
                    ( len( jobs ), stalledCounter, runningCounter ) )
@@ -143,6 +145,9 @@ for the agent restart
       jobs = result['Value']
       self.log.info( '%s Stalled jobs will be checked for failure' % ( len( jobs ) ) )
 
+      # minor status -> [ job ]
+      failedJobs = {}
+      error = None
       for job in jobs:
 
         # Check if the job pilot is lost
@@ -150,28 +155,29 @@ for the agent restart
         if result['OK']:
           pilotStatus = result['Value']
           if pilotStatus != "Running":
-            result = self.__updateJobStatus( job, 'Failed',
-                                             "Job stalled: pilot not running" )
-            failedCounter += 1
-            result = self.__sendAccounting( job )
-            if not result['OK']:
-              self.log.error( 'Failed to send accounting', result['Message'] )
-              break
+            failedJobs.setdefault( "Job stalled: pilot not running", [] ).append( job )
             continue
 
         result = self.__getLatestUpdateTime( job )
         if not result['OK']:
-          return result
+          error = result
+          break
         currentTime = toEpoch()
         lastUpdate = result['Value']
         elapsedTime = currentTime - lastUpdate
         if elapsedTime > failedTime:
-          self.__updateJobStatus( job, 'Failed', 'Stalling for more than %d sec' % failedTime )
-          failedCounter += 1
+          failedJobs.setdefault( 'Stalling for more than %d sec' % failedTime, [] ).append( job )
+
+      for minor, failedList in failedJobs.items():
+        self.__updateJobsStatus( failedList, 'Failed', minor )
+        failedCounter += len( failedList )
+        for job in failedList:
           result = self.__sendAccounting( job )
           if not result['OK']:
             self.log.error( 'Failed to send accounting', result['Message'] )
             break
+      if error:
+        return error
 
     recoverCounter = 0
 
@@ -273,29 +279,30 @@ the stalledTime limit.
       return S_OK( latestUpdate )
 
   #############################################################################
-  def __updateJobStatus( self, job, status, minorstatus = None ):
-    """ This method updates the job status in the JobDB, this should only be
-used to fail jobs due to the optimizer chain.
+  def __updateJobsStatus( self, jobs, status, minorstatus = None ):
+    """ This method updates the status of the jobs in the JobDB with one statement
+and adds their logging records with one insert.
 """
-    self.log.verbose( "self.jobDB.setJobAttribute(%s,'Status','%s',update=True)" % ( job, status ) )
+    if not jobs:
+      return S_OK()
+    self.log.verbose( "self.jobDB.setJobsStatus(%s,'%s','%s',update=True)" % ( jobs, status, minorstatus ) )
 
     if self.am_getOption( 'Enable', True ):
-      result = self.jobDB.setJobAttribute( job, 'Status', status, update = True )
+      result = self.jobDB.setJobsStatus( jobs, status, minorstatus, update = True )
     else:
       result = S_OK( 'DisabledMode' )
+    if not result['OK']:
+      self.log.warn( result )
 
-    if result['OK']:
-      if minorstatus:
-        self.log.verbose( "self.jobDB.setJobAttribute(%s,'MinorStatus','%s',update=True)" % ( job, minorstatus ) )
-        result = self.jobDB.setJobAttribute( job, 'MinorStatus', minorstatus, update = True )
-
+    minorDict = {}
     if not minorstatus: #Retain last minor status for stalled jobs
-      result = self.jobDB.getJobAttributes( job, ['MinorStatus'] )
+      result = self.jobDB.getAttributesForJobList( jobs, ['MinorStatus'] )
       if result['OK']:
-        minorstatus = result['Value']['MinorStatus']
+        minorDict = dict( [ ( job, attrDict['MinorStatus'] ) for job, attrDict in result['Value'].items() ] )
 
     logStatus = status
-    result = self.logDB.addLoggingRecord( job, status = logStatus, minor = minorstatus, source = 'StalledJobAgent' )
+    result = self.logDB.addLoggingRecords( [ ( job, logStatus, minorstatus or minorDict.get( int( job ), 'idem' ),
+                                               'idem', '', 'StalledJobAgent' ) for job in jobs ] )
     if not result['OK']:
       self.log.warn( result )
 
@@ -511,18 +518,22 @@ used to fail jobs due to the optimizer chain.
       return S_OK()
 
     # Remove those with Minor Status "Pending Requests"
-    for jobID in jobIDs:
-      result = self.jobDB.getJobAttributes( jobID, ['Status','MinorStatus'] )
-      if not result['OK']:
-        self.log.error( 'Failed to get job attributes', result['Message'] )
-        continue
-      if result['Value']['Status'] != "Completed":
+    result = self.jobDB.getAttributesForJobList( jobIDs, ['Status','MinorStatus'] )
+    if not result['OK']:
+      self.log.error( 'Failed to get job attributes', result['Message'] )
+      return result
+    failedJobs = []
+    for jobID in sorted( result['Value'] ):
+      attrDict = result['Value'][jobID]
+      if attrDict['Status'] != "Completed":
         continue
-      if result['Value']['MinorStatus'] == "Pending Requests":
+      if attrDict['MinorStatus'] == "Pending Requests":
         continue
+      failedJobs.append( jobID )
 
-      result = self.__updateJobStatus( jobID, 'Failed',
-                                       "Job died during finalization" )
+    result = self.__updateJobsStatus( failedJobs, 'Failed',
+                                      "Job died during finalization" )
+    for jobID in failedJobs:
       result = self.__sendAccounting( jobID )
       if not result['OK']:
         self.log.error( 'Failed to send accounting', result['Message'] )
@@ -97,10 +97,9 @@ class JobReport( object ):
 
     return S_OK()
 
-  def sendStoredStatusInfo( self ):
-    """ Send the job status information stored in the internal cache
+  def __getStoredStatusDict( self ):
+    """ Build the status dictionary to be sent out of the internal cache
     """
-
     statusDict = {}
     for status, minor, dtime in self.jobStatusInfo:
       statusDict[dtime] = { 'Status': status,
@@ -112,7 +111,22 @@ class JobReport( object ):
                             'MinorStatus': '',
                             'ApplicationStatus': appStatus,
                             'Source': self.source }
+    return statusDict
+
+  def __getStoredParameters( self ):
+    """ Build the list of parameters to be sent out of the internal cache
+    """
+    parameters = []
+    for pname, value in self.jobParameters.items():
+      pvalue, _timeStamp = value
+      parameters.append( ( pname, pvalue ) )
+    return parameters
 
+  def sendStoredStatusInfo( self ):
+    """ Send the job status information stored in the internal cache
+    """
+
+    statusDict = self.__getStoredStatusDict()
     if statusDict:
       jobMonitor = RPCClient( 'WorkloadManagement/JobStateUpdate', timeout = 60 )
       result = jobMonitor.setJobStatusBulk( self.jobID, statusDict )
@@ -129,12 +143,7 @@ class JobReport( object ):
     """ Send the job parameters stored in the internal cache
     """
 
-    parameters = []
-    paramDict = {}
-    for pname, value in self.jobParameters.items():
-      pvalue, _timeStamp = value
-      parameters.append( ( pname, pvalue ) )
-
+    parameters = self.__getStoredParameters()
     if parameters:
       jobMonitor = RPCClient( 'WorkloadManagement/JobStateUpdate', timeout = 60 )
       result = jobMonitor.setJobParameters( self.jobID, parameters )
@@ -150,16 +159,38 @@ class JobReport( object ):
       return S_OK( 'Empty' )
 
   def commit( self ):
-    """ Send all the accumulated information
+    """ Send all the accumulated information in a single connection
     """
 
-    success = True
-    result = self.sendStoredStatusInfo()
-    if not result['OK']:
-      success = False
-    result = self.sendStoredJobParameters()
+    statusDict = self.__getStoredStatusDict()
+    parameters = self.__getStoredParameters()
+    if not statusDict and not parameters:
+      return S_OK()
+
+    batch = RPCClient( 'WorkloadManagement/JobStateUpdate', timeout = 60 ).batch()
+    if statusDict:
+      batch.setJobStatusBulk( self.jobID, statusDict )
+    if parameters:
+      batch.setJobParameters( self.jobID, parameters )
+    result = batch.execute()
     if not result['OK']:
-      success = False
+      return S_ERROR( 'Information upload to JobStateUpdate service failed' )
+
+    success = True
+    results = list( result['Value'] )
+    if statusDict:
+      if results.pop( 0 )['OK']:
+        # Empty the internal status containers
+        self.jobStatusInfo = []
+        self.appStatusInfo = []
+      else:
+        success = False
+    if parameters:
+      if results.pop( 0 )['OK']:
+        # Empty the internal parameter container
+        self.jobParameters = {}
+      else:
+        success = False
 
     if success:
       return S_OK()
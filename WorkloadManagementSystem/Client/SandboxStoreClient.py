@@ -11,6 +11,7 @@ try:
   md5 = hashlib
 except:
   import md5
+import gzip
 import tempfile
 import types
 import re
@@ -18,12 +19,38 @@ from DIRAC.Core.DISET.TransferClient import TransferClient
 from DIRAC.Core.DISET.RPCClient import RPCClient
 from DIRAC.Resources.Storage.StorageElement import StorageElement
 from DIRAC.Core.Utilities.ReturnValues import returnSingleResult
-from DIRAC.Core.Utilities.File import getGlobbedTotalSize
+from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC import gLogger, S_OK, S_ERROR, gConfig
 
+class HashingWriter( object ):
+  """
+  File like object that hashes and counts the data while writing it to another file object
+  """
+
+  def __init__( self, fileObj ):
+    self.__fileObj = fileObj
+    self.__md5 = md5.md5()
+    self.__size = 0
+
+  def write( self, data ):
+    self.__md5.update( data )
+    self.__size += len( data )
+    self.__fileObj.write( data )
+
+  def flush( self ):
+    self.__fileObj.flush()
+
+  def hexdigest( self ):
+    return self.__md5.hexdigest()
+
+  def getSize( self ):
+    return self.__size
+
 class SandboxStoreClient( object ):
 
   __validSandboxTypes = ( 'Input', 'Output' )
+  #Codec -> extension of the sandbox file
+  __sandboxCodecs = { 'bz2' : 'tar.bz2', 'gz' : 'tar.gz', 'none' : 'tar' }
   __smdb = None
 
   def __init__( self, rpcClient = None, transferClient = None, **kwargs ):
@@ -70,12 +97,14 @@ class SandboxStoreClient( object ):
 
   # Upload generic sandbox
 
-  def uploadFilesAsSandbox( self, fileList, sizeLimit = 0, assignTo = {} ):
+  def uploadFilesAsSandbox( self, fileList, sizeLimit = 0, assignTo = {}, codec = None ):
     """ Send files in the fileList to a Sandbox service for the given jobID.
         This is the preferable method to upload sandboxes. fileList can contain
         both files and directories
         Parameters:
           - assignTo : Dict containing { 'Job:<jobid>' : '<sbType>', ... }
+          - codec : Compression of the sandbox (bz2, gz or none). By default Sandbox/Codec
+                    from the Operations section or bz2
     """
     errorFiles = []
     files2Upload = []
@@ -87,6 +116,11 @@ class SandboxStoreClient( object ):
     if type( fileList ) not in ( types.TupleType, types.ListType ):
       return S_ERROR( "fileList must be a tuple!" )
 
+    if not codec:
+      codec = Operations().getValue( "Sandbox/Codec", "bz2" )
+    if codec not in self.__sandboxCodecs:
+      return S_ERROR( "Invalid sandbox codec %s" % codec )
+
     for sFile in fileList:
       if re.search( '^lfn:', sFile ) or re.search( '^LFN:', sFile ):
         pass
@@ -105,28 +139,29 @@ class SandboxStoreClient( object ):
     except Exception, e:
       return S_ERROR( "Cannot create temporal file: %s" % str( e ) )
 
-    tf = tarfile.open( name = tmpFilePath, mode = "w|bz2" )
-    for sFile in files2Upload:
-      tf.add( os.path.realpath( sFile ), os.path.basename( sFile ), recursive = True )
-    tf.close()
+    # Compress and hash in one pass
+    result = self.__createSandboxFile( files2Upload, tmpFilePath, codec )
+    if not result[ 'OK' ]:
+      return result
+    sbHash, sbSize = result[ 'Value' ]
 
     if sizeLimit > 0:
       # Evaluate the compressed size of the sandbox
-      if getGlobbedTotalSize( tmpFilePath ) > sizeLimit:
+      if sbSize > sizeLimit:
         result = S_ERROR( "Size over the limit" )
         result[ 'SandboxFileName' ] = tmpFilePath
         return result
 
-    oMD5 = md5.md5()
-    fd = open( tmpFilePath, "rb" )
-    bData = fd.read( 10240 )
-    while bData:
-      oMD5.update( bData )
-      bData = fd.read( 10240 )
-    fd.close()
-
-    transferClient = self.__getTransferClient()
-    result = transferClient.sendFile( tmpFilePath, ( "%s.tar.bz2" % oMD5.hexdigest(), assignTo ) )
+    sbFileName = "%s.%s" % ( sbHash, self.__sandboxCodecs[ codec ] )
+    # The sandbox is identified by its hash. If it's already there don't send it again
+    result = self.__getRPCClient().reuseSandbox( sbFileName, assignTo )
+    if result[ 'OK' ] and result[ 'Value' ]:
+      gLogger.verbose( "Sandbox is already in the store", result[ 'Value' ] )
+    else:
+      if not result[ 'OK' ] and result[ 'Message' ].find( "Unknown method" ) == -1:
+        gLogger.warn( "Cannot check if the sandbox is already stored", result[ 'Message' ] )
+      transferClient = self.__getTransferClient()
+      result = transferClient.sendFile( tmpFilePath, ( sbFileName, assignTo ) )
     result[ 'SandboxFileName' ] = tmpFilePath
     try:
       if result['OK']:
@@ -135,6 +170,33 @@ class SandboxStoreClient( object ):
       pass
     return result
 
+  def __createSandboxFile( self, fileList, filePath, codec ):
+    """ Pack the files into filePath computing the hash of the result on the fly.
+        The gzip header has no time stamp nor file name so the same files always give the same hash
+    """
+    try:
+      fileObj = open( filePath, "wb" )
+      try:
+        hashWriter = HashingWriter( fileObj )
+        gzipObj = None
+        if codec == "bz2":
+          tf = tarfile.open( mode = "w|bz2", fileobj = hashWriter )
+        elif codec == "gz":
+          gzipObj = gzip.GzipFile( filename = "", mode = "wb", compresslevel = 6, fileobj = hashWriter, mtime = 0 )
+          tf = tarfile.open( mode = "w|", fileobj = gzipObj )
+        else:
+          tf = tarfile.open( mode = "w|", fileobj = hashWriter )
+        for sFile in fileList:
+          tf.add( os.path.realpath( sFile ), os.path.basename( sFile ), recursive = True )
+        tf.close()
+        if gzipObj:
+          gzipObj.close()
+      finally:
+        fileObj.close()
+    except Exception, e:
+      return S_ERROR( "Cannot create sandbox file: %s" % str( e ) )
+    return S_OK( ( hashWriter.hexdigest(), hashWriter.getSize() ) )
+
   ##############
   # Download sandbox
 
@@ -130,6 +130,52 @@ class WMSClient( object ):
       gLogger.warn( "Need to upload the proxy" )
     return result
 
+  def submitJobs( self, jdlList, sharedSandbox = None ):
+    """ Submit several jobs specified by their JDL strings to WMS in one call.
+
+        The sharedSandbox files, common to all the jobs, are uploaded once and
+        the InputSandbox entries with the same file name point to the uploaded
+        sandbox. The value is the list of the new job IDs in the order of the
+        JDLs, None for the jobs that could not be submitted.
+    """
+    sharedSandboxRef = ''
+    sharedNames = []
+    if sharedSandbox:
+      if not self.sandboxClient:
+        self.sandboxClient = SandboxStoreClient( useCertificates = self.useCertificates )
+      result = self.sandboxClient.uploadFilesAsSandbox( sharedSandbox )
+      if not result[ 'OK' ]:
+        return result
+      sharedSandboxRef = result[ 'Value' ]
+      sharedNames = [ os.path.basename( sbFile ) for sbFile in sharedSandbox ]
+
+    jdls = []
+    for jdlString in jdlList:
+      jdlString = jdlString.strip()
+      if jdlString.find( "[" ) != 0:
+        jdlString = "[%s]" % jdlString
+      classAdJob = ClassAd( jdlString )
+      if not classAdJob.isOK():
+        return S_ERROR( 'Invalid job JDL' )
+      if sharedNames:
+        inputSandbox = [ isFile for isFile in self.__getInputSandboxEntries( classAdJob )
+                         if os.path.basename( isFile ) not in sharedNames ]
+        inputSandbox.append( sharedSandboxRef )
+        classAdJob.insertAttributeVectorString( "InputSandbox", inputSandbox )
+      result = self.__uploadInputSandbox( classAdJob )
+      if not result['OK']:
+        return result
+      jdls.append( classAdJob.asJDL() )
+
+    if not self.jobManager:
+      self.jobManager = RPCClient( 'WorkloadManagement/JobManager',
+                                    useCertificates = self.useCertificates,
+                                    timeout = self.timeout )
+    result = self.jobManager.submitJobs( jdls )
+    if 'requireProxyUpload' in result and result['requireProxyUpload']:
+      gLogger.warn( "Need to upload the proxy" )
+    return result
+
   def killJob( self, jobID ):
     """ Kill running job.
         jobID can be an integer representing a single DIRAC job ID or a list of IDs
@@ -24,6 +24,7 @@
     setJobParameters()
     setJobJDL()
     setJobStatus()
+    setJobsStatus()
     setInputData()
 
     insertNewJobIntoDB()
@@ -637,15 +638,8 @@ class JobDB( DB ):
 
     resultDict = {}
     if paramList:
-      paramNameList = []
-      for x in paramList:
-        ret = self._escapeString( x )
-        if not ret['OK']:
-          return ret
-        paramNameList.append( ret['Value'] )
-      paramNames = ','.join( paramNameList )
-      cmd = "SELECT Name, Value from JobParameters WHERE JobID=%s and Name in (%s)" % ( e_jobID, paramNames )
-      result = self._query( cmd )
+      cmd = "SELECT Name, Value from JobParameters WHERE JobID=%s and Name in %s"
+      result = self._query( cmd, params = [ str( jobID ), [ str( x ) for x in paramList ] ] )
       if result['OK']:
         if result['Value']:
           for name, value in result['Value']:
@@ -1009,33 +1003,22 @@ class JobDB( DB ):
         The LastUpdate time stamp is refreshed if explicitely requested
     """
 
-    ret = self._escapeString( jobID )
-    if not ret['OK']:
-      return ret
-    jobID = ret['Value']
-
     if len( attrNames ) != len( attrValues ):
       return S_ERROR( 'JobDB.setAttributes: incompatible Argument length' )
 
     # FIXME: Need to check the validity of attrNames
-    attr = []
-    for i in range( len( attrNames ) ):
-      ret = self._escapeString( attrValues[i] )
-      if not ret['OK']:
-        return ret
-      value = ret['Value']
-      attr.append( "%s=%s" % ( attrNames[i], value ) )
+    attr = [ "%s=%%s" % attrName for attrName in attrNames ]
     if update:
       attr.append( "LastUpdateTime=UTC_TIMESTAMP()" )
     if len( attr ) == 0:
       return S_ERROR( 'JobDB.setAttributes: Nothing to do' )
 
-    cmd = 'UPDATE Jobs SET %s WHERE JobID=%s' % ( ', '.join( attr ), jobID )
+    cmd = 'UPDATE Jobs SET %s WHERE JobID=%%s' % ', '.join( attr )
 
     if myDate:
-      cmd += ' AND LastUpdateTime < %s' % myDate
+      cmd += ' AND LastUpdateTime < %s' % str( myDate ).replace( '%', '%%' )
 
-    res = self._update( cmd )
+    res = self._update( cmd, params = [ str( value ) for value in attrValues ] + [ str( jobID ) ] )
     if res['OK']:
       return res
     else:
@@ -1114,22 +1097,70 @@ class JobDB( DB ):
     result = self._update( req )
     return result
 
+#############################################################################
+  def setJobsStatus( self, jobIDList, status = '', minor = '', application = '', appCounter = None,
+                     update = True, maxRows = 1000 ):
+    """ Set the same status to all the jobs in jobIDList with one statement per maxRows jobs.
+        The LastUpdate time stamp is refreshed if update is True
+    """
+    attr = []
+    for name, value in ( ( 'Status', status ), ( 'MinorStatus', minor ),
+                         ( 'ApplicationStatus', application ), ( 'ApplicationNumStatus', appCounter ) ):
+      if value:
+        ret = self._escapeString( value )
+        if not ret['OK']:
+          return ret
+        attr.append( "%s=%s" % ( name, ret['Value'] ) )
+    if update:
+      attr.append( "LastUpdateTime=UTC_TIMESTAMP()" )
+    if not attr or not jobIDList:
+      return S_OK()
+
+    for i in range( 0, len( jobIDList ), maxRows ):
+      cmd = 'UPDATE Jobs SET %s WHERE JobID IN (%s)' % ( ', '.join( attr ),
+                                                        ','.join( [ str( int( jobID ) ) for jobID in jobIDList[i:i + maxRows] ] ) )
+      result = self._update( cmd )
+      if not result['OK']:
+        return S_ERROR( 'JobDB.setJobsStatus: failed to set the status: %s' % result['Message'] )
+    return S_OK()
+
+#############################################################################
+  def setJobsExecTime( self, timeName, jobDateDict, maxRows = 1000 ):
+    """ Set the StartExecTime or EndExecTime time stamp of several jobs, if not yet set.
+        jobDateDict is a {jobID:date} dictionary, the current time being used for
+        the jobs with no date
+    """
+    if timeName not in ( 'StartExecTime', 'EndExecTime' ):
+      return S_ERROR( 'JobDB.setJobsExecTime: unknown time stamp %s' % timeName )
+
+    jobIDList = jobDateDict.keys()
+    for i in range( 0, len( jobIDList ), maxRows ):
+      cases = []
+      for jobID in jobIDList[i:i + maxRows]:
+        date = jobDateDict[jobID]
+        if date:
+          ret = self._escapeString( date )
+          if not ret['OK']:
+            return ret
+          date = ret['Value']
+        else:
+          date = 'UTC_TIMESTAMP()'
+        cases.append( 'WHEN %d THEN %s' % ( int( jobID ), date ) )
+      cmd = 'UPDATE Jobs SET %s=CASE JobID %s END WHERE JobID IN (%s) AND %s IS NULL' % \
+            ( timeName, ' '.join( cases ), ','.join( [ str( int( jobID ) ) for jobID in jobIDList[i:i + maxRows] ] ),
+              timeName )
+      result = self._update( cmd )
+      if not result['OK']:
+        return result
+    return S_OK()
+
 #############################################################################
   def setJobParameter( self, jobID, key, value ):
     """ Set a parameter specified by name,value pair for the job JobID
     """
 
-    ret = self._escapeString( key )
-    if not ret['OK']:
-      return ret
-    e_key = ret['Value']
-    ret = self._escapeString( value )
-    if not ret['OK']:
-      return ret
-    e_value = ret['Value']
-
-    cmd = 'REPLACE JobParameters (JobID,Name,Value) VALUES (%d,%s,%s)' % ( int( jobID ), e_key, e_value )
-    result = self._update( cmd )
+    cmd = 'REPLACE JobParameters (JobID,Name,Value) VALUES (%s,%s,%s)'
+    result = self._update( cmd, params = [ int( jobID ), str( key ), str( value ) ] )
     if not result['OK']:
       result = S_ERROR( 'JobDB.setJobParameter: operation failed.' )
 
@@ -1143,20 +1174,8 @@ class JobDB( DB ):
     if not parameters:
       return S_OK()
 
-    insertValueList = []
-    for name, value in parameters:
-      ret = self._escapeString( name )
-      if not ret['OK']:
-        return ret
-      e_name = ret['Value']
-      ret = self._escapeString( value )
-      if not ret['OK']:
-        return ret
-      e_value = ret['Value']
-      insertValueList.append( '(%s,%s,%s)' % ( jobID, e_name, e_value ) )
-
-    cmd = 'REPLACE JobParameters (JobID,Name,Value) VALUES %s' % ', '.join( insertValueList )
-    result = self._update( cmd )
+    cmd = 'REPLACE JobParameters (JobID,Name,Value) VALUES (%s,%s,%s)'
+    result = self._updateMany( cmd, [ ( int( jobID ), str( name ), str( value ) ) for name, value in parameters ] )
     if not result['OK']:
       return S_ERROR( 'JobDB.setJobParameters: operation failed.' )
 
@@ -2137,6 +2156,86 @@ class JobDB( DB ):
     else:
       return S_ERROR( 'Failed to store some or all the parameters' )
 
+#####################################################################################
+  def setHeartBeatDataBulk( self, heartBeatList, maxRows = 1000 ):
+    """ Add the heart beat data of several jobs. heartBeatList is a list of
+        ( jobID, staticDataDict, dynamicDataDict, heartBeatTime ) tuples, heartBeatTime
+        being the reception time of the heart beat as a string. The jobs are updated
+        with one statement per table and per maxRows rows
+    """
+    if not heartBeatList:
+      return S_OK()
+
+    jobIDs = []
+    paramDict = {}
+    logValueList = []
+    for jobID, staticDataDict, dynamicDataDict, heartBeatTime in heartBeatList:
+      jobID = int( jobID )
+      if jobID not in paramDict:
+        jobIDs.append( jobID )
+        paramDict[jobID] = {}
+      paramDict[jobID].update( staticDataDict )
+      ret = self._escapeString( heartBeatTime )
+      if not ret['OK']:
+        return ret
+      e_time = ret['Value']
+      for key, value in dynamicDataDict.items():
+        result = self._escapeString( key )
+        if not result['OK']:
+          self.log.warn( 'Failed to escape string ' + key )
+          continue
+        e_key = result['Value']
+        result = self._escapeString( value )
+        if not result['OK']:
+          self.log.warn( 'Failed to escape string ' + value )
+          continue
+        e_value = result['Value']
+        logValueList.append( "( %d, %s,%s,%s)" % ( jobID, e_key, e_value, e_time ) )
+
+    ok = True
+    for i in range( 0, len( jobIDs ), maxRows ):
+      # The heart beats may be older than the last status change, a job that
+      # has finished in the meantime must not be set back to Running
+      req = "UPDATE Jobs SET HeartBeatTime=UTC_TIMESTAMP(), " \
+            "Status=CASE WHEN Status IN ('Running','Stalled','Matched') THEN 'Running' ELSE Status END " \
+            "WHERE JobID IN (%s)"
+      result = self._update( req % ','.join( [ str( jobID ) for jobID in jobIDs[i:i + maxRows] ] ) )
+      if not result['OK']:
+        return S_ERROR( 'Failed to set the heart beat time: ' + result['Message'] )
+
+    # Add static data items as job parameters
+    paramValueList = []
+    for jobID in jobIDs:
+      for name, value in paramDict[jobID].items():
+        ret = self._escapeString( name )
+        if not ret['OK']:
+          return ret
+        e_name = ret['Value']
+        ret = self._escapeString( value )
+        if not ret['OK']:
+          return ret
+        paramValueList.append( '(%d,%s,%s)' % ( jobID, e_name, ret['Value'] ) )
+    for i in range( 0, len( paramValueList ), maxRows ):
+      req = 'REPLACE JobParameters (JobID,Name,Value) VALUES %s' % ', '.join( paramValueList[i:i + maxRows] )
+      result = self._update( req )
+      if not result['OK']:
+        ok = False
+        self.log.warn( result['Message'] )
+
+    # Add dynamic data to the job heart beat log
+    for i in range( 0, len( logValueList ), maxRows ):
+      req = "INSERT INTO HeartBeatLoggingInfo (JobID,Name,Value,HeartBeatTime) VALUES "
+      req += ','.join( logValueList[i:i + maxRows] )
+      result = self._update( req )
+      if not result['OK']:
+        ok = False
+        self.log.warn( result['Message'] )
+
+    if ok:
+      return S_OK()
+    else:
+      return S_ERROR( 'Failed to store some or all the parameters' )
+
 #####################################################################################
   def getHeartBeatData( self, jobID ):
     """ Retrieve the job's heart beat data
@@ -2217,6 +2316,27 @@ class JobDB( DB ):
 
     return S_OK( resultDict )
 
+#####################################################################################
+  def getJobCommands( self, status = 'Received' ):
+    """ Get the commands of all the jobs in a given status as a
+        { jobID : { command : arguments } } dictionary
+    """
+    ret = self._escapeString( status )
+    if not ret['OK']:
+      return ret
+    status = ret['Value']
+
+    req = "SELECT JobID, Command, Arguments FROM JobCommands WHERE Status=%s" % status
+    result = self._query( req )
+    if not result['OK']:
+      return result
+
+    resultDict = {}
+    for jobID, command, arguments in result['Value']:
+      resultDict.setdefault( int( jobID ), {} )[command] = arguments
+
+    return S_OK( resultDict )
+
 #####################################################################################
   def setJobCommandStatus( self, jobID, command, status ):
     """ Set the command status
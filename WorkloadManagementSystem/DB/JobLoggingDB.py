@@ -2,8 +2,10 @@
     The following methods are provided
 
     addLoggingRecord()
+    addLoggingRecords()
     getJobLoggingInfo()
     getWMSTimeStamps()
+    getWMSLastTimes()
 """
 
 import time
@@ -78,6 +80,18 @@ class JobLoggingDB( DB ):
     event = 'status/minor/app=%s/%s/%s' % ( status, minor, application )
     self.gLogger.info( "Adding record for job " + str( jobID ) + ": '" + event + "' from " + source )
 
+    _date, time_order = self.__getStatusTime( date )
+
+    cmd = "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, " + \
+          "StatusTime, StatusTimeOrder, StatusSource) VALUES (%d,'%s','%s','%s','%s',%f,'%s')" % \
+           ( int( jobID ), status, minor, application, str( _date ), time_order, source )
+
+    return self._update( cmd )
+
+#############################################################################
+  def __getStatusTime( self, date ):
+    """ Get the datetime and the StatusTimeOrder value of a logging record time stamp
+    """
     if not date:
       # Make the UTC datetime string and float
       _date = Time.dateTime()
@@ -104,12 +118,34 @@ class JobLoggingDB( DB ):
         _date = Time.dateTime()
         epoc = time.mktime( _date.timetuple() ) - MAGIC_EPOC_NUMBER
         time_order = round( epoc, 3 )
+    return _date, time_order
 
-    cmd = "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, " + \
-          "StatusTime, StatusTimeOrder, StatusSource) VALUES (%d,'%s','%s','%s','%s',%f,'%s')" % \
-           ( int( jobID ), status, minor, application, str( _date ), time_order, source )
-
-    return self._update( cmd )
+#############################################################################
+  def addLoggingRecords( self, recordList, maxRows = 1000 ):
+    """ Add several entries to the JobLoggingDB table with one statement per maxRows
+        records. recordList is a list of ( jobID, status, minor, application, date, source )
+        tuples with the same meaning as the addLoggingRecord() arguments
+    """
+    valueList = []
+    for jobID, status, minor, application, date, source in recordList:
+      _date, time_order = self.__getStatusTime( date )
+      escValues = []
+      for value in ( status, minor, application, str( _date ), source ):
+        ret = self._escapeString( value )
+        if not ret['OK']:
+          return ret
+        escValues.append( ret['Value'] )
+      valueList.append( "(%d,%s,%s,%s,%s,%f,%s)" % ( ( int( jobID ), ) + tuple( escValues[:4] ) +
+                                                     ( time_order, escValues[4] ) ) )
+    self.gLogger.info( "Adding %d logging records" % len( valueList ) )
+
+    for i in range( 0, len( valueList ), maxRows ):
+      cmd = "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, " + \
+            "StatusTime, StatusTimeOrder, StatusSource) VALUES %s" % ','.join( valueList[i:i + maxRows] )
+      result = self._update( cmd )
+      if not result['OK']:
+        return result
+    return S_OK( len( valueList ) )
 
 #############################################################################
   def getJobLoggingInfo( self, jobID ):
@@ -188,3 +224,17 @@ class JobLoggingDB( DB ):
       result['LastTime'] = "Unknown"
 
     return S_OK( result )
+
+#############################################################################
+  def getWMSLastTimes( self, jobIDList ):
+    """ Get the time stamp of the latest MajorState transition of several jobs
+        return a {jobID:epoch} dictionary, jobs without logging info are not included
+    """
+    if not jobIDList:
+      return S_OK( {} )
+    cmd = 'SELECT JobID,MAX(StatusTimeOrder) FROM LoggingInfo WHERE JobID IN (%s) GROUP BY JobID' % \
+          ','.join( [ str( int( jobID ) ) for jobID in jobIDList ] )
+    resCmd = self._query( cmd )
+    if not resCmd['OK']:
+      return resCmd
+    return S_OK( dict( [ ( int( jobID ), float( etime ) + MAGIC_EPOC_NUMBER ) for jobID, etime in resCmd['Value'] ] ) )
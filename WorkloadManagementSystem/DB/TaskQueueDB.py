@@ -41,6 +41,7 @@ class TaskQueueDB( DB ):
     self.__opsHelper = Operations()
     self.__ensureInsertionIsSingle = False
     self.__sharesCorrector = SharesCorrector( self.__opsHelper )
+    self.__changeListeners = []
     result = self.__initializeDB()
     if not result[ 'OK' ]:
       raise Exception( "Can't create tables: %s" % result[ 'Message' ] )
@@ -70,6 +71,26 @@ class TaskQueueDB( DB ):
   def getMultiValueMatchFields( self ):
     return self.__multiValueMatchFields
 
+  def addChangeListener( self, listener ):
+    """
+    Register a function to be called as listener( changeType, data ) every time
+    this object modifies the task queues. Change types are:
+      - jobInserted : ( jobId, tqId, priority, realPriority )
+      - jobDeleted : jobId
+      - tqDeleted : tqId
+      - tqPriorities : { tqId : priority }
+      - jobPriorities : { jobId : ( priority, realPriority ) }
+    """
+    if listener not in self.__changeListeners:
+      self.__changeListeners.append( listener )
+
+  def __notifyChange( self, changeType, data ):
+    for listener in self.__changeListeners:
+      try:
+        listener( changeType, data )
+      except Exception, excp:
+        self.log.exception( "Task queue change listener failed for %s" % changeType, lException = excp )
+
   def __getCSOption( self, optionName, defValue ):
     return self.__opsHelper.getValue( "JobScheduling/%s" % optionName, defValue )
 
@@ -399,6 +420,8 @@ class TaskQueueDB( DB ):
       if not result[ 'OK' ]:
         self.log.error( "Error inserting job in TQ", "Job %s TQ %s: %s" % ( jobId, tqId, result[ 'Message' ] ) )
         return result
+      self.__notifyChange( 'jobInserted', ( long( jobId ), tqId, int( jobPriority ),
+                                            self.__hackJobPriority( int( jobPriority ) ) ) )
       if newTQ:
         self.recalculateTQSharesForEntity( tqDefDict[ 'OwnerDN' ], tqDefDict[ 'OwnerGroup' ], connObj = connObj )
     finally:
@@ -770,8 +793,85 @@ class TaskQueueDB( DB ):
       return S_OK( False )
     #Always return S_OK() because job has already been taken out from the TQ
     self.__deleteTQWithDelay.add( tqId, 300, ( tqId, tqOwnerDN, tqOwnerGroup ) )
+    self.__notifyChange( 'jobDeleted', long( jobId ) )
     return S_OK( True )
 
+  def extractJob( self, jobId, tqId, connObj = False ):
+    """
+    Take a job out of a given task queue in a single statement. Only one of the
+    concurrent extractions of the same job can succeed
+    Return S_OK( True/False ) / S_ERROR
+    """
+    retVal = self._update( "DELETE FROM `tq_Jobs` WHERE JobId = %s AND TQId = %s" % ( jobId, tqId ), conn = connObj )
+    if not retVal[ 'OK' ]:
+      return S_ERROR( "Could not extract job %s from task queue %s: %s" % ( jobId, tqId, retVal[ 'Message' ] ) )
+    if retVal[ 'Value' ] == 0:
+      return S_OK( False )
+    self.__deleteTQWithDelay.add( tqId, 300, ( tqId, False, False ) )
+    self.__notifyChange( 'jobDeleted', long( jobId ) )
+    return S_OK( True )
+
+  def getTaskQueuePriorities( self ):
+    """
+    Get the priority of all the task queues
+    Return S_OK( { tqId : priority } ) / S_ERROR
+    """
+    retVal = self._query( "SELECT TQId, Priority FROM `tq_TaskQueues`" )
+    if not retVal[ 'OK' ]:
+      return retVal
+    return S_OK( dict( [ ( row[0], row[1] ) for row in retVal[ 'Value' ] ] ) )
+
+  def getTaskQueueDefinitions( self, tqIdList ):
+    """
+    Get the definition of some task queues with the multi value fields as lists
+    Return S_OK( { tqId : { field : value } } ) / S_ERROR
+    """
+    if not tqIdList:
+      return S_OK( {} )
+    tqCond = ", ".join( [ str( int( tqId ) ) for tqId in tqIdList ] )
+    fields = list( self.__singleValueDefFields ) + [ 'Priority' ]
+    retVal = self._query( "SELECT TQId, %s FROM `tq_TaskQueues` WHERE TQId in ( %s )" % ( ", ".join( fields ), tqCond ) )
+    if not retVal[ 'OK' ]:
+      return retVal
+    tqData = {}
+    for record in retVal[ 'Value' ]:
+      tqDef = dict( zip( fields, record[1:] ) )
+      for field in self.__multiValueDefFields:
+        tqDef[ field ] = []
+      tqData[ record[0] ] = tqDef
+    for field in self.__multiValueDefFields:
+      retVal = self._query( "SELECT TQId, Value FROM `tq_TQTo%s` WHERE TQId in ( %s )" % ( field, tqCond ) )
+      if not retVal[ 'OK' ]:
+        return retVal
+      for tqId, value in retVal[ 'Value' ]:
+        if tqId in tqData:
+          tqData[ tqId ][ field ].append( value )
+    return S_OK( tqData )
+
+  def getTaskQueueJobsSummary( self ):
+    """
+    Get the number of jobs, the highest job id and the sum of job priorities per task queue.
+    Any insertion, deletion or priority change in a task queue changes its summary
+    Return S_OK( { tqId : ( numJobs, maxJobId, sumPriority ) } ) / S_ERROR
+    """
+    retVal = self._query( "SELECT TQId, COUNT( JobId ), MAX( JobId ), SUM( Priority ) FROM `tq_Jobs` GROUP BY TQId" )
+    if not retVal[ 'OK' ]:
+      return retVal
+    return S_OK( dict( [ ( row[0], ( int( row[1] ), long( row[2] ), long( row[3] ) ) ) for row in retVal[ 'Value' ] ] ) )
+
+  def getJobsInTaskQueues( self, tqIdList ):
+    """
+    Get the jobs in some task queues
+    Return S_OK( [ ( jobId, tqId, priority, realPriority ) ] ) / S_ERROR
+    """
+    if not tqIdList:
+      return S_OK( [] )
+    tqCond = ", ".join( [ str( int( tqId ) ) for tqId in tqIdList ] )
+    retVal = self._query( "SELECT JobId, TQId, Priority, RealPriority FROM `tq_Jobs` WHERE TQId in ( %s )" % tqCond )
+    if not retVal[ 'OK' ]:
+      return retVal
+    return S_OK( [ ( long( row[0] ), row[1], int( row[2] ), row[3] ) for row in retVal[ 'Value' ] ] )
+
   def getTaskQueueForJob( self, jobId, connObj = False ):
     """
     Return TaskQueue for a given Job
@@ -868,6 +968,7 @@ class TaskQueueDB( DB ):
           return retVal
       self.recalculateTQSharesForEntity( tqOwnerDN, tqOwnerGroup, connObj = connObj )
       self.log.info( "Deleted empty and enabled TQ %s" % tqId )
+      self.__notifyChange( 'tqDeleted', tqId )
       return S_OK( True )
     return S_OK( False )
 
@@ -904,6 +1005,7 @@ class TaskQueueDB( DB ):
         return retVal
     if delTQ > 0:
       self.recalculateTQSharesForEntity( tqOwnerDN, tqOwnerGroup, connObj = connObj )
+      self.__notifyChange( 'tqDeleted', tqId )
       return S_OK( True )
     return S_OK( False )
 
@@ -1146,6 +1248,7 @@ class TaskQueueDB( DB ):
       tqList = ", ".join( [ str( tqId ) for tqId in prioDict[ prio ] ] )
       updateSQL = "UPDATE `tq_TaskQueues` SET Priority=%.4f WHERE TQId in ( %s )" % ( prio, tqList )
       self._update( updateSQL, conn = connObj )
+    self.__notifyChange( 'tqPriorities', tqDict )
     return S_OK()
 
   def getGroupShares( self ):
@@ -1189,13 +1292,15 @@ class TaskQueueDB( DB ):
     updated = 0
     for prio in prioDict:
       jobsList = prioDict[ prio ]
-      for i in range( maxJobsInQuery, 0, len( jobsList ) ):
+      realPrio = self.__hackJobPriority( prio )
+      for i in range( 0, len( jobsList ), maxJobsInQuery ):
         jobs = ",".join( jobsList[ i : i + maxJobsInQuery ] )
-        updateSQL = "UPDATE `tq_Jobs` SET `Priority`=%s, `RealPriority`=%f WHERE `JobId` in ( %s )" % ( prio, self.__hackJobPriority( prio ), jobs )
+        updateSQL = "UPDATE `tq_Jobs` SET `Priority`=%s, `RealPriority`=%f WHERE `JobId` in ( %s )" % ( prio, realPrio, jobs )
         result = self._update( updateSQL )
         if not result[ 'OK' ]:
           return result
         updated += result[ 'Value' ]
+      self.__notifyChange( 'jobPriorities', dict( [ ( long( jId ), ( prio, realPrio ) ) for jId in jobsList ] ) )
     if not updated:
       return S_OK()
     return self.recalculateTQSharesForAll()
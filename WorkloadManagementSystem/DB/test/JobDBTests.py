@@ -0,0 +1,91 @@
+########################################################################
+# $HeadURL $
+# File: JobDBTests.py
+########################################################################
+
+""" :mod: JobDBTests
+    =======================
+
+    .. module: JobDBTests
+    :synopsis: test cases for the JobDB bulk heart beat update
+
+    test cases for JobDB.setHeartBeatDataBulk, the statements are run
+    on an in memory sqlite database with the tables they use
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import sqlite3
+import unittest
+from DIRAC import S_OK, S_ERROR, gLogger
+## SUT
+from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
+from DIRAC.WorkloadManagementSystem.private.HeartBeatAggregator import HeartBeatAggregator
+
+class SQLiteJobDB( JobDB ):
+  """ JobDB running its statements on sqlite """
+
+  def __init__( self ):
+    self.log = gLogger.getSubLogger( 'SQLiteJobDB' )
+    self.connection = sqlite3.connect( ':memory:' )
+    self.connection.executescript( """
+      CREATE TABLE Jobs ( JobID INTEGER PRIMARY KEY, Status TEXT, HeartBeatTime TEXT );
+      CREATE TABLE JobParameters ( JobID INTEGER, Name TEXT, Value TEXT, PRIMARY KEY ( JobID, Name ) );
+      CREATE TABLE HeartBeatLoggingInfo ( JobID INTEGER, Name TEXT, Value TEXT, HeartBeatTime TEXT );
+      CREATE TABLE JobCommands ( JobID INTEGER, Command TEXT, Arguments TEXT, Status TEXT );
+    """ )
+
+  def _escapeString( self, value ):
+    return S_OK( "'%s'" % str( value ).replace( "'", "''" ) )
+
+  def _update( self, req ):
+    # MySQL dialect
+    req = req.replace( 'UTC_TIMESTAMP()', "datetime( 'now' )" ).replace( 'REPLACE JobParameters', 'REPLACE INTO JobParameters' )
+    try:
+      cursor = self.connection.execute( req )
+    except sqlite3.Error, x:
+      return S_ERROR( str( x ) )
+    return S_OK( cursor.rowcount )
+
+  def getJobCommands( self ):
+    return S_OK( {} )
+
+  def setStatus( self, jobID, status ):
+    self.connection.execute( "UPDATE Jobs SET Status=? WHERE JobID=?", ( status, jobID ) )
+
+  def getStatus( self, jobID ):
+    return self.connection.execute( "SELECT Status FROM Jobs WHERE JobID=?", ( jobID, ) ).fetchone()[0]
+
+########################################################################
+class HeartBeatBulkTestCase( unittest.TestCase ):
+  """
+  .. class:: HeartBeatBulkTestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.jobDB = SQLiteJobDB()
+    for jobID, status in ( ( 1, 'Running' ), ( 2, 'Running' ), ( 3, 'Stalled' ), ( 4, 'Matched' ) ):
+      self.jobDB.connection.execute( "INSERT INTO Jobs VALUES ( ?, ?, NULL )", ( jobID, status ) )
+    self.aggregator = HeartBeatAggregator( self.jobDB, flushPeriod = 1000, maxHeartBeats = 100 )
+
+  def testFinalStatus( self ):
+    """ a job finished before the flush of its heart beat stays finished """
+    for jobID in range( 1, 5 ):
+      self.aggregator.addHeartBeat( jobID, { 'Node' : 'node%s' % jobID }, { 'CPUConsumed' : 10 } )
+    self.jobDB.setStatus( 2, 'Done' )
+    self.assertTrue( self.aggregator.flush()['OK'] )
+    self.assertEqual( [ self.jobDB.getStatus( jobID ) for jobID in range( 1, 5 ) ],
+                      [ 'Running', 'Done', 'Running', 'Running' ] )
+    heartBeats = self.jobDB.connection.execute( "SELECT COUNT(*) FROM Jobs WHERE HeartBeatTime IS NOT NULL" ).fetchone()[0]
+    self.assertEqual( heartBeats, 4 )
+    logged = self.jobDB.connection.execute( "SELECT COUNT(*) FROM HeartBeatLoggingInfo" ).fetchone()[0]
+    self.assertEqual( logged, 4 )
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( HeartBeatBulkTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
@@ -18,6 +18,7 @@ from DIRAC.RequestManagementSystem.Client.ReqClient                 import ReqCl
 from DIRAC.RequestManagementSystem.private.RequestValidator         import RequestValidator
 from DIRAC.WorkloadManagementSystem.Client.SandboxStoreClient       import SandboxStoreClient
 from DIRAC.WorkloadManagementSystem.JobWrapper.WatchdogFactory      import WatchdogFactory
+from DIRAC.WorkloadManagementSystem.private.InputFileCache          import InputFileCache
 from DIRAC.AccountingSystem.Client.Types.Job                        import Job as AccountingJob
 from DIRAC.ConfigurationSystem.Client.PathFinder                    import getSystemSection
 from DIRAC.ConfigurationSystem.Client.Helpers.Registry              import getVOForGroup
@@ -43,6 +44,9 @@ import sys
 import time
 import shutil
 import threading
+import collections
+import gzip
+import hashlib
 import tarfile
 import glob
 import types
@@ -95,6 +99,8 @@ class JobWrapper( object ):
     self.defaultCPUTime = gConfig.getValue( self.section + '/DefaultCPUTime', 600 )
     self.defaultOutputFile = gConfig.getValue( self.section + '/DefaultOutputFile', 'std.out' )
     self.defaultErrorFile = gConfig.getValue( self.section + '/DefaultErrorFile', 'std.err' )
+    self.compressStdOutput = gConfig.getValue( self.section + '/CompressStdOutput', False )
+    self.outputFlushPeriod = gConfig.getValue( self.section + '/OutputFlushPeriod', 10 )
     self.diskSE = gConfig.getValue( self.section + '/DiskSE', ['-disk', '-DST', '-USER'] )
     self.tapeSE = gConfig.getValue( self.section + '/TapeSE', ['-tape', '-RDST', '-RAW'] )
     self.sandboxSizeLimit = gConfig.getValue( self.section + '/OutputSandboxLimit', 1024 * 1024 * 10 )
@@ -108,6 +114,19 @@ class JobWrapper( object ):
     self.defaultOutputPath = ''
     self.dm = DataManager()
     self.fc = FileCatalog()
+    self.inputCache = None
+    inputCacheDir = gConfig.getValue( '/LocalSite/InputCacheDir', '' )
+    if inputCacheDir:
+      # Cache shared by the jobs of the node, size in MB
+      inputCacheSize = gConfig.getValue( '/LocalSite/InputCacheSize', 10240 )
+      inputCache = InputFileCache( inputCacheDir, inputCacheSize * 1024 * 1024 )
+      # Hard links to the cached files, payloads writing to their input files need copies
+      self.inputCacheLinks = gConfig.getValue( '/LocalSite/InputCacheLinks', True )
+      result = inputCache.initialize()
+      if result['OK']:
+        self.inputCache = inputCache
+      else:
+        self.log.warn( 'Input sandbox cache not used', result['Message'] )
     self.log.verbose( '===========================================================================' )
     self.log.verbose( 'SVN version %s' % ( __RCSID__ ) )
     self.log.verbose( self.diracVersion )
@@ -330,7 +349,9 @@ class JobWrapper( object ):
         command += ' ' + jobArguments
       self.log.verbose( 'Execution command: %s' % ( command ) )
       maxPeekLines = self.maxPeekLines
-      exeThread = ExecutionThread( spObject, command, maxPeekLines, outputFile, errorFile, exeEnv )
+      exeThread = ExecutionThread( spObject, command, maxPeekLines, outputFile, errorFile, exeEnv,
+                                   compressOutput = self.compressStdOutput,
+                                   flushPeriod = self.outputFlushPeriod )
       exeThread.start()
       time.sleep( 10 )
       payloadPID = spObject.getChildPID()
@@ -783,6 +804,10 @@ class JobWrapper( object ):
     """
     missing = []
     okFiles = []
+    # The application standard output is written as <StdOutput>.gz if compressed
+    stdOutput = None
+    if self.compressStdOutput:
+      stdOutput = self.jobArgs.get( 'StdOutput', self.defaultOutputFile )
     for i in outputSandbox:
       self.log.verbose( 'Looking at OutputSandbox file/directory/wildcard: %s' % i )
       globList = glob.glob( i )
@@ -804,10 +829,14 @@ class JobWrapper( object ):
           else:
             self.log.warn( 'Could not tar OutputSandbox directory: %s' % check )
             missing.append( check )
+      # The application standard output may have been compressed on the fly
+      if i == stdOutput and not globList and os.path.isfile( '%s.gz' % i ):
+        self.log.verbose( 'Appending %s.gz to OutputSandbox' % i )
+        okFiles.append( '%s.gz' % i )
 
     for i in outputSandbox:
       if not i in okFiles:
-        if not '%s.tar' % i in okFiles:
+        if not '%s.tar' % i in okFiles and not ( i == stdOutput and '%s.gz' % i in okFiles ):
           if not re.search( '\*', i ):
             if not i in missing:
               missing.append( i )
@@ -1029,7 +1058,7 @@ class JobWrapper( object ):
       if registeredISB:
         for isb in registeredISB:
           self.log.info( "Downloading Input SandBox %s" % isb )
-          result = SandboxStoreClient().downloadSandbox( isb )
+          result = self.__downloadSandbox( isb )
           if not result[ 'OK' ]:
             self.__report( 'Running', 'Failed Downloading InputSandbox' )
             return S_ERROR( "Cannot download Input sandbox %s: %s" % ( isb, result[ 'Message' ] ) )
@@ -1040,7 +1069,7 @@ class JobWrapper( object ):
       self.log.info( "Downloading Input SandBox LFNs, number of files to get", len( lfns ) )
       self.__report( 'Running', 'Downloading InputSandbox LFN(s)' )
       lfns = [fname.replace( 'LFN:', '' ).replace( 'lfn:', '' ) for fname in lfns]
-      download = self.dm.getFile( lfns )
+      download = self.__downloadLFNs( lfns )
       if not download['OK']:
         self.log.warn( download )
         self.__report( 'Running', 'Failed Downloading InputSandbox LFN(s)' )
@@ -1074,6 +1103,160 @@ class JobWrapper( object ):
 
     return S_OK( 'InputSandbox downloaded' )
 
+  #############################################################################
+  def __downloadSandbox( self, isb ):
+    """Downloads and unpacks a registered input sandbox, through the node cache if
+       there is one and it is usable.
+    """
+    if self.inputCache:
+      try:
+        result = self.__getSandboxFromCache( isb )
+      except ( IOError, OSError ), x:
+        result = S_ERROR( str( x ) )
+        result['CacheError'] = True
+      if result['OK'] or not result.get( 'CacheError' ):
+        return result
+      self.log.warn( 'Input sandbox cache failed, downloading directly', result['Message'] )
+    return SandboxStoreClient().downloadSandbox( isb )
+
+  #############################################################################
+  def __getSandboxFromCache( self, isb ):
+    """Unpacks the input sandbox from the node cache, after downloading it there if
+       needed. The errors of the cache are flagged with CacheError.
+    """
+    # The sandbox file name is the md5 of its content
+    key = 'SB.%s' % os.path.basename( isb )
+    result = self.inputCache.lock( [ key ] )
+    if not result['OK']:
+      result['CacheError'] = True
+      return result
+    tmpSBDir = None
+    try:
+      tarFileName = self.inputCache.lookup( key )
+      if tarFileName:
+        self.log.info( 'Input sandbox found in the node cache', isb )
+      else:
+        result = SandboxStoreClient().downloadSandbox( isb, unpack = False )
+        if not result['OK']:
+          return result
+        tarFileName = result['Value']
+        tmpSBDir = os.path.dirname( tarFileName )
+        result = self.inputCache.store( key, tarFileName )
+        if result['OK']:
+          tarFileName = result['Value']
+        else:
+          # Unpacked from the download
+          self.log.warn( 'Input sandbox not cached', result['Message'] )
+      try:
+        sandboxSize = 0
+        tarFile = tarfile.open( name = tarFileName, mode = 'r' )
+        for member in tarFile:
+          tarFile.extract( member, path = os.getcwd() )
+          sandboxSize += member.size
+        tarFile.close()
+      except Exception, x:
+        return S_ERROR( 'Could not open bundle: %s' % str( x ) )
+      return S_OK( sandboxSize )
+    finally:
+      self.inputCache.unlock( [ key ] )
+      if tmpSBDir:
+        shutil.rmtree( tmpSBDir, ignore_errors = True )
+
+  #############################################################################
+  def __downloadLFNs( self, lfns ):
+    """Gets the input sandbox LFNs in the current directory, from the node cache if
+       there is one and it is usable.
+    """
+    if self.inputCache:
+      try:
+        result = self.__getLFNsFromCache( lfns )
+      except ( IOError, OSError ), x:
+        result = S_ERROR( str( x ) )
+        result['CacheError'] = True
+      if result['OK'] or not result.get( 'CacheError' ):
+        return result
+      self.log.warn( 'Input sandbox cache failed, downloading directly', result['Message'] )
+    return self.dm.getFile( lfns )
+
+  #############################################################################
+  def __getLFNsFromCache( self, lfns ):
+    """Gets the input sandbox LFNs from the node cache, after downloading the missing
+       ones there. The LFNs are cached under their checksum, those without checksum
+       are downloaded directly. The job executable is copied as the JobWrapper changes
+       its mode, the other files are hard linked unless InputCacheLinks is disabled.
+       The errors of the cache are flagged with CacheError.
+    """
+    result = self.fc.getFileMetadata( lfns )
+    if not result['OK']:
+      return result
+    keys = {}
+    for lfn, metadata in result['Value']['Successful'].items():
+      if metadata.get( 'Checksum' ):
+        keys[lfn] = 'LFN.%s' % hashlib.md5( '%s|%s|%s' % ( lfn, metadata['Checksum'],
+                                                           metadata.get( 'Size' ) ) ).hexdigest()
+    result = self.inputCache.lock( keys.values() )
+    if not result['OK']:
+      result['CacheError'] = True
+      return result
+    tmpDir = None
+    try:
+      missing = [ lfn for lfn in keys if not self.inputCache.lookup( keys[lfn] ) ]
+      if missing:
+        self.log.info( 'Input sandbox LFNs found in the node cache', len( keys ) - len( missing ) )
+        result = self.inputCache.getTempDir()
+        if not result['OK']:
+          result['CacheError'] = True
+          return result
+        tmpDir = result['Value']
+      try:
+        successful = {}
+        failed = {}
+        uncached = [ lfn for lfn in lfns if lfn not in keys ]
+        if uncached:
+          download = self.dm.getFile( uncached )
+          if not download['OK']:
+            return download
+          successful.update( download['Value']['Successful'] )
+          failed.update( download['Value']['Failed'] )
+        if missing:
+          download = self.dm.getFile( missing, destinationDir = tmpDir )
+          if not download['OK']:
+            return download
+          failed.update( download['Value']['Failed'] )
+          for lfn, localPath in download['Value']['Successful'].items():
+            result = self.inputCache.store( keys[lfn], localPath )
+            if not result['OK']:
+              # Used from the download
+              self.log.warn( 'Input sandbox LFN not cached', result['Message'] )
+              destination = os.path.join( os.getcwd(), os.path.basename( lfn ) )
+              shutil.move( localPath, destination )
+              successful[lfn] = destination
+        executable = os.path.basename( self.jobArgs.get( 'Executable', '' ).strip() )
+        notLinked = []
+        for lfn, key in keys.items():
+          if lfn in failed or lfn in successful:
+            continue
+          fileName = os.path.basename( lfn )
+          copy = not self.inputCacheLinks or fileName == executable
+          result = self.inputCache.linkFile( key, os.path.join( os.getcwd(), fileName ), copy = copy )
+          if result['OK']:
+            successful[lfn] = result['Value']
+          else:
+            self.log.warn( 'Input sandbox LFN not taken from the cache', result['Message'] )
+            notLinked.append( lfn )
+        if notLinked:
+          download = self.dm.getFile( notLinked )
+          if not download['OK']:
+            return download
+          successful.update( download['Value']['Successful'] )
+          failed.update( download['Value']['Failed'] )
+      finally:
+        if tmpDir:
+          self.inputCache.removeTempDir( tmpDir )
+    finally:
+      self.inputCache.unlock( keys.values() )
+    return S_OK( { 'Successful' : successful, 'Failed' : failed } )
+
   #############################################################################
   def finalize( self, arguments ):
     """Perform any final actions to clean up after job execution.
@@ -1320,18 +1503,35 @@ class JobWrapper( object ):
 ###############################################################################
 ###############################################################################
 
+# Size of the application output kept in memory before writing it to the std files
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
 class ExecutionThread( threading.Thread ):
 
   #############################################################################
-  def __init__( self, spObject, cmd, maxPeekLines, stdoutFile, stderrFile, exeEnv ):
+  def __init__( self, spObject, cmd, maxPeekLines, stdoutFile, stderrFile, exeEnv,
+                compressOutput = False, flushPeriod = 10 ):
     threading.Thread.__init__( self )
     self.cmd = cmd
     self.spObject = spObject
-    self.outputLines = []
+    # Only the last lines are kept for the Watchdog peeking
+    self.outputLines = collections.deque( maxlen = maxPeekLines )
+    # Protects the peek lines, the pending lines and the files, used by the flush thread
+    self.outputLock = threading.Lock()
     self.maxPeekLines = maxPeekLines
     self.stdout = stdoutFile
     self.stderr = stderrFile
+    if self.stdout and compressOutput:
+      self.stdout = '%s.gz' % self.stdout
+    self.compressOutput = compressOutput
+    self.flushPeriod = flushPeriod
     self.exeEnv = exeEnv
+    # stdid -> file kept open during the execution
+    self.outputFiles = {}
+    # stdid -> lines not yet written, handed to the files in large chunks
+    self.pendingLines = { 0 : [], 1 : [] }
+    self.pendingSize = 0
+    self.finishedEvent = threading.Event()
 
   #############################################################################
   def run( self ):
@@ -1340,7 +1540,16 @@ class ExecutionThread( threading.Thread ):
     spObject = self.spObject
     start = time.time()
     initialStat = os.times()
-    output = spObject.systemCall( cmd, env = self.exeEnv, callbackFunction = self.sendOutput, shell = True )
+    # Make the output visible from time to time, even when the application is silent
+    flushThread = threading.Thread( target = self.__flushLoop )
+    flushThread.setDaemon( 1 )
+    flushThread.start()
+    try:
+      output = spObject.systemCall( cmd, env = self.exeEnv, callbackFunction = self.sendOutput, shell = True )
+    finally:
+      self.finishedEvent.set()
+      flushThread.join()
+      self.closeOutputFiles()
     EXECUTION_RESULT['Thread'] = output
     timing = time.time() - start
     EXECUTION_RESULT['Timing'] = timing
@@ -1356,33 +1565,95 @@ class ExecutionThread( threading.Thread ):
   def getCurrentPID( self ):
     return self.spObject.getChildPID()
 
+  #############################################################################
+  def __getOutputFile( self, stdid ):
+    """ Open the stdout (stdid = 0) or stderr (stdid = 1) file once, None if not defined
+    """
+    if stdid not in self.outputFiles:
+      fileName = self.stdout if stdid == 0 else self.stderr
+      outputFile = None
+      if fileName:
+        if stdid == 0 and self.compressOutput:
+          outputFile = gzip.GzipFile( fileName, 'ab' )
+        else:
+          outputFile = open( fileName, 'a+' )
+      self.outputFiles[stdid] = outputFile
+    return self.outputFiles[stdid]
+
+  #############################################################################
+  def __flushLoop( self ):
+    while True:
+      self.finishedEvent.wait( self.flushPeriod )
+      if self.finishedEvent.isSet():
+        return
+      try:
+        self.flushOutputFiles()
+      except IOError, x:
+        gLogger.error( 'Failed to write the application output', str( x ) )
+
   #############################################################################
   def sendOutput( self, stdid, line ):
-    if stdid == 0 and self.stdout:
-      outputFile = open( self.stdout, 'a+' )
-      print >> outputFile, line
-      outputFile.close()
-    elif stdid == 1 and self.stderr:
-      errorFile = open( self.stderr, 'a+' )
-      print >> errorFile, line
-      errorFile.close()
-    self.outputLines.append( line )
-    size = len( self.outputLines )
-    if size > self.maxPeekLines:
-      # reduce max size of output peeking
-      self.outputLines.pop( 0 )
+    self.outputLock.acquire()
+    try:
+      if self.__getOutputFile( stdid ):
+        self.pendingLines[stdid].append( line )
+        self.pendingSize += len( line ) + 1
+        if self.pendingSize > OUTPUT_BUFFER_SIZE:
+          self.__writePendingLines()
+      self.outputLines.append( line )
+    finally:
+      self.outputLock.release()
+
+  #############################################################################
+  def __writePendingLines( self ):
+    for stdid, lines in self.pendingLines.items():
+      if lines:
+        self.outputFiles[stdid].write( '\n'.join( lines ) + '\n' )
+        del lines[:]
+    self.pendingSize = 0
+
+  #############################################################################
+  def flushOutputFiles( self ):
+    self.outputLock.acquire()
+    try:
+      self.__writePendingLines()
+      for outputFile in self.outputFiles.values():
+        if outputFile:
+          outputFile.flush()
+    finally:
+      self.outputLock.release()
+
+  #############################################################################
+  def closeOutputFiles( self ):
+    self.outputLock.acquire()
+    try:
+      try:
+        self.__writePendingLines()
+      except IOError, x:
+        gLogger.error( 'Failed to write the application output', str( x ) )
+      for outputFile in self.outputFiles.values():
+        if outputFile:
+          try:
+            outputFile.close()
+          except IOError, x:
+            gLogger.error( 'Failed to close the application output file', str( x ) )
+      self.outputFiles = {}
+    finally:
+      self.outputLock.release()
 
   #############################################################################
   def getOutput( self, lines = 0 ):
-    if self.outputLines:
+    self.outputLock.acquire()
+    try:
+      outputLines = list( self.outputLines )
+    finally:
+      self.outputLock.release()
+    if outputLines:
       # restrict to smaller number of lines for regular
       # peeking by the watchdog
-      # FIXME: this is multithread, thus single line would be better
       if lines:
-        size = len( self.outputLines )
-        cut = size - lines
-        self.outputLines = self.outputLines[cut:]
-      return S_OK( self.outputLines )
+        outputLines = outputLines[-lines:]
+      return S_OK( outputLines )
     return S_ERROR( 'No Job output found' )
 
 def rescheduleFailedJob( jobID, message, jobReport = None ):
@@ -18,6 +18,7 @@ from DIRAC.Core.Utilities.Subprocess                     import shellCall
 from DIRAC                                               import S_OK, S_ERROR
 from DIRAC.Core.Utilities.Os import getDiskSpace
 
+import os
 import string
 import socket
 
@@ -67,32 +68,21 @@ class WatchdogLinux(Watchdog):
   def getLoadAverage(self):
     """Obtains the load average.
     """
-    result = S_OK()
-    comm = '/bin/cat /proc/loadavg'
-    loadAvgDict = shellCall(5,comm)
-    if loadAvgDict['OK']:
-      la = float(string.split(loadAvgDict['Value'][1])[0])
-      result['Value'] = la
-    else:
+    result = self.processMonitor.sampler.getLoadAverage()
+    if not result['OK']:
+      self.log.warn('Could not obtain load average', result['Message'])
       result = S_ERROR('Could not obtain load average')
-      self.log.warn('Could not obtain load average')
       result['Value'] = 0
-
     return result
 
   #############################################################################
   def getMemoryUsed(self):
     """Obtains the memory used.
     """
-    result = S_OK()
-    comm = '/usr/bin/free'
-    memDict = shellCall(5,comm)
-    if memDict['OK']:
-      mem = string.split(memDict['Value'][1]) [8]
-      result['Value'] = float(mem)
-    else:
+    result = self.processMonitor.sampler.getMemoryUsed()
+    if not result['OK']:
+      self.log.warn('Could not obtain memory used', result['Message'])
       result = S_ERROR('Could not obtain memory used')
-      self.log.warn('Could not obtain memory used')
       result['Value'] = 0
     return result
 
@@ -100,13 +90,17 @@ class WatchdogLinux(Watchdog):
   def getDiskSpace(self):
     """Obtains the disk space used.
     """
-    result = S_OK()
-    diskSpace = getDiskSpace()
+    if os.path.realpath('.').startswith('/afs/'):
+      #statvfs does not know about AFS quotas
+      diskSpace = getDiskSpace()
+    else:
+      result = self.processMonitor.sampler.getDiskSpace()
+      diskSpace = result['Value'] if result['OK'] else -1
 
+    result = S_OK()
     if diskSpace == -1:
       result = S_ERROR('Could not obtain disk usage')
       self.log.warn('Could not obtain disk usage')
-      result['Value'] = -1
 
     result['Value'] = float(diskSpace)
     return result
@@ -4,6 +4,7 @@
     The following methods are available in the Service interface
 
     submitJob()
+    submitJobs()
     rescheduleJob()
     deleteJob()
     killJob()
@@ -93,23 +94,12 @@ class JobManagerHandler( RequestHandler ):
     """ Submit a single job to DIRAC WMS
     """
 
-    if self.peerUsesLimitedProxy:
-      return S_ERROR( "Can't submit using a limited proxy! (bad boy!)" )
-
-    # Check job submission permission
-    result = self.jobPolicy.getJobPolicy()
+    result = self.__checkSubmissionRight()
     if not result['OK']:
-      return S_ERROR( 'Failed to get job policies' )
-    policyDict = result['Value']
-    if not policyDict[ RIGHT_SUBMIT ]:
-      return S_ERROR( 'Job submission not authorized' )
+      return result
 
     #jobDesc is JDL for now
-    jobDesc = jobDesc.strip()
-    if jobDesc[0] != "[":
-      jobDesc = "[%s" % jobDesc
-    if jobDesc[-1] != "]":
-      jobDesc = "%s]" % jobDesc
+    jobDesc = self.__normalizeJDL( jobDesc )
 
     result = gJobDB.insertNewJobIntoDB( jobDesc, self.owner, self.ownerDN, self.ownerGroup, self.diracSetup )
     if not result['OK']:
@@ -127,6 +117,68 @@ class JobManagerHandler( RequestHandler ):
     self.__sendJobsToOptimizationMind( [ jobID ] )
     return result
 
+###########################################################################
+  types_submitJobs = [ ListType ]
+  def export_submitJobs( self, jobDescList ):
+    """ Submit several jobs to DIRAC WMS in one call. The value is the list of the
+        new job IDs in the order of the job descriptions, None for the jobs that
+        could not be inserted, whose errors are in the FailedJobs {index:error}
+        dictionary
+    """
+
+    result = self.__checkSubmissionRight()
+    if not result['OK']:
+      return result
+
+    jobIDList = []
+    failedJobs = {}
+    loggingRecords = []
+    for index in range( len( jobDescList ) ):
+      jobDesc = self.__normalizeJDL( jobDescList[index] )
+      result = gJobDB.insertNewJobIntoDB( jobDesc, self.owner, self.ownerDN, self.ownerGroup, self.diracSetup )
+      if not result['OK']:
+        gLogger.warn( 'Failed to insert job', result['Message'] )
+        jobIDList.append( None )
+        failedJobs[index] = result['Message']
+        continue
+      jobIDList.append( result['JobID'] )
+      loggingRecords.append( ( result['JobID'], result['Status'], result['MinorStatus'], 'idem', '', 'JobManager' ) )
+
+    submittedJobs = [ jobID for jobID in jobIDList if jobID ]
+    gLogger.info( '%s jobs added to the JobDB for %s/%s' % ( len( submittedJobs ), self.ownerDN, self.ownerGroup ) )
+
+    result = gJobLoggingDB.addLoggingRecords( loggingRecords )
+    if not result['OK']:
+      gLogger.warn( 'Failed to add the logging records', result['Message'] )
+
+    result = S_OK( jobIDList )
+    result['FailedJobs'] = failedJobs
+    result[ 'requireProxyUpload' ] = self.__checkIfProxyUploadIsRequired()
+    self.__sendJobsToOptimizationMind( submittedJobs )
+    return result
+
+###########################################################################
+  def __checkSubmissionRight( self ):
+    if self.peerUsesLimitedProxy:
+      return S_ERROR( "Can't submit using a limited proxy! (bad boy!)" )
+
+    # Check job submission permission
+    result = self.jobPolicy.getJobPolicy()
+    if not result['OK']:
+      return S_ERROR( 'Failed to get job policies' )
+    policyDict = result['Value']
+    if not policyDict[ RIGHT_SUBMIT ]:
+      return S_ERROR( 'Job submission not authorized' )
+    return S_OK()
+
+  def __normalizeJDL( self, jobDesc ):
+    jobDesc = jobDesc.strip()
+    if jobDesc[0] != "[":
+      jobDesc = "[%s" % jobDesc
+    if jobDesc[-1] != "]":
+      jobDesc = "%s]" % jobDesc
+    return jobDesc
+
 ###########################################################################
   def __checkIfProxyUploadIsRequired( self ):
     result = gProxyManager.userHasProxy( self.ownerDN, self.ownerGroup, validSeconds = 18000 )
@@ -17,13 +17,16 @@ from types import StringType, IntType, LongType, ListType, DictType
 # from types import *
 import time
 from DIRAC.Core.DISET.RequestHandler import RequestHandler
-from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC import gLogger, gConfig, S_OK, S_ERROR
+from DIRAC.Core.Utilities import Time
 from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
 from DIRAC.WorkloadManagementSystem.DB.JobLoggingDB import JobLoggingDB
+from DIRAC.WorkloadManagementSystem.private.HeartBeatAggregator import HeartBeatAggregator
 
 # This is a global instance of the JobDB class
 jobDB = False
 logDB = False
+heartBeatAggregator = False
 
 JOB_FINAL_STATES = ['Done', 'Completed', 'Failed']
 
@@ -31,8 +34,14 @@ def initializeJobStateUpdateHandler( serviceInfo ):
 
   global jobDB
   global logDB
+  global heartBeatAggregator
   jobDB = JobDB()
   logDB = JobLoggingDB()
+  cfgPath = serviceInfo['serviceSectionPath']
+  flushPeriod = gConfig.getValue( '%s/HeartBeatFlushPeriod' % cfgPath, 5 )
+  if flushPeriod > 0:
+    heartBeatAggregator = HeartBeatAggregator( jobDB, flushPeriod,
+                                               gConfig.getValue( '%s/MaxBufferedHeartBeats' % cfgPath, 1000 ) )
   return S_OK()
 
 class JobStateUpdateHandler( RequestHandler ):
@@ -90,10 +99,36 @@ class JobStateUpdateHandler( RequestHandler ):
   def export_setJobsStatus( self, jobIDs, status, minorStatus, source = 'Unknown', datetime = None ):
     """ Set the major and minor status for job specified by its JobId.
         Set optionally the status date and source component which sends the
-        status information.
+        status information. All the jobs are updated together, the errors
+        are only logged.
     """
+    jobIDs = [ int( jobID ) for jobID in jobIDs ]
+    # Do not update the LastUpdate time stamp if setting the Stalled status
+    result = jobDB.setJobsStatus( jobIDs, status, minorStatus, update = ( status != "Stalled" ) )
+    if not result['OK']:
+      gLogger.error( 'Failed to set the status of %d jobs' % len( jobIDs ), result['Message'] )
+      return S_OK()
+
+    if status in JOB_FINAL_STATES:
+      result = jobDB.setJobsExecTime( 'EndExecTime', dict.fromkeys( jobIDs ) )
+
+    if status == 'Running' and minorStatus == 'Application':
+      result = jobDB.setJobsExecTime( 'StartExecTime', dict.fromkeys( jobIDs ) )
+
+    result = jobDB.getAttributesForJobList( jobIDs, ['Status', 'MinorStatus'] )
+    if not result['OK']:
+      gLogger.error( 'Failed to get the status of %d jobs' % len( jobIDs ), result['Message'] )
+      return S_OK()
+    attrDict = result['Value']
+
+    records = []
     for jobID in jobIDs:
-      self.__setJobStatus( int( jobID ), status, minorStatus, source, datetime )
+      if jobID in attrDict:
+        records.append( ( jobID, attrDict[jobID]['Status'], attrDict[jobID]['MinorStatus'], 'idem',
+                          datetime, source ) )
+    result = logDB.addLoggingRecords( records )
+    if not result['OK']:
+      gLogger.error( 'Failed to add the logging records of %d jobs' % len( records ), result['Message'] )
     return S_OK()
 
   def __setJobStatus( self, jobID, status, minorStatus, source, datetime ):
@@ -131,99 +166,122 @@ class JobStateUpdateHandler( RequestHandler ):
         as a key and status information dictionary as values
     """
 
-    status = ""
-    minor = ""
-    application = ""
-    appCounter = ""
-    endDate = ''
-    startDate = ''
-    startFlag = ''
     jobID = int( jobID )
-
-    result = jobDB.getJobAttributes( jobID, ['Status'] )
+    result = self.__setJobsStatusBulk( { jobID : statusDict } )
     if not result['OK']:
       return result
+    if jobID in result['Value']['Failed']:
+      return S_ERROR( result['Value']['Failed'][jobID] )
+    return S_OK()
 
-    if not result['Value']:
-      # if there is no matching Job it returns an empty dictionary
-      return S_ERROR( 'No Matching Job' )
+  ###########################################################################
+  types_setJobsStatusBulk = [DictType]
+  def export_setJobsStatusBulk( self, jobStatusDict ):
+    """ Same as setJobStatusBulk for several jobs at once, jobStatusDict being
+        a {jobID:statusDict} dictionary. Returns the list of Successful jobs
+        and the Failed {jobID:error} dictionary
+    """
+    return self.__setJobsStatusBulk( dict( [ ( int( jobID ), statusDict )
+                                             for jobID, statusDict in jobStatusDict.items() ] ) )
 
-    new_status = result['Value']['Status']
-    if new_status == "Stalled":
-      status = 'Running'
+  def __setJobsStatusBulk( self, jobStatusDict ):
+    """ Apply the status records of several jobs. The final state of each job is
+        evaluated here and the jobs are updated with one statement per resulting state
+    """
+    jobIDs = jobStatusDict.keys()
+    result = jobDB.getAttributesForJobList( jobIDs, ['Status'] )
+    if not result['OK']:
+      return result
+    currentDict = result['Value']
 
     # Get the latest WN time stamps of status updates
-    result = logDB.getWMSTimeStamps( int( jobID ) )
+    result = logDB.getWMSLastTimes( jobIDs )
     if not result['OK']:
       return result
-    lastTime = max( [float( t ) for s, t in result['Value'].items() if s != 'LastTime'] )
-    from DIRAC import Time
-    lastTime = Time.toString( Time.fromEpoch( lastTime ) )
-
-    # Get the last status values
-    dates = sorted( statusDict )
-    # We should only update the status if its time stamp is more recent than the last update
-    for date in [date for date in dates if date >= lastTime]:
-      sDict = statusDict[date]
-      if sDict['Status']:
+    lastTimeDict = result['Value']
+
+    failed = {}
+    # ( status, minor, application, appCounter ) -> [ jobID ]
+    updateDict = {}
+    endDates = {}
+    startDates = {}
+    records = []
+    for jobID in jobIDs:
+      if jobID not in currentDict:
+        # if there is no matching Job it is not in the dictionary
+        failed[jobID] = 'No Matching Job'
+        continue
+      if jobID not in lastTimeDict:
+        failed[jobID] = 'No Logging Info for job %d' % jobID
+        continue
+      statusDict = jobStatusDict[jobID]
+
+      status = ""
+      minor = ""
+      application = ""
+      appCounter = ""
+      startFlag = ''
+      if currentDict[jobID]['Status'] == "Stalled":
+        status = 'Running'
+      lastTime = Time.toString( Time.fromEpoch( lastTimeDict[jobID] ) )
+
+      # Get the last status values
+      dates = sorted( statusDict )
+      # We should only update the status if its time stamp is more recent than the last update
+      for date in [date for date in dates if date >= lastTime]:
+        sDict = statusDict[date]
+        if sDict['Status']:
+          status = sDict['Status']
+          if status in JOB_FINAL_STATES:
+            endDates[jobID] = date
+          if status == "Running":
+            startFlag = 'Running'
+        if sDict['MinorStatus']:
+          minor = sDict['MinorStatus']
+          if minor == "Application" and startFlag == 'Running':
+            startDates[jobID] = date
+        if sDict['ApplicationStatus']:
+          application = sDict['ApplicationStatus']
+        counter = sDict.get( 'ApplicationCounter' )
+        if counter:
+          appCounter = counter
+      updateDict.setdefault( ( status, minor, application, appCounter ), [] ).append( jobID )
+
+      # The JobLoggingDB records
+      for date in dates:
+        sDict = statusDict[date]
         status = sDict['Status']
-        if status in JOB_FINAL_STATES:
-          endDate = date
-        if status == "Running":
-          startFlag = 'Running'
-      if sDict['MinorStatus']:
+        if not status:
+          status = 'idem'
         minor = sDict['MinorStatus']
-        if minor == "Application" and startFlag == 'Running':
-          startDate = date
-      if sDict['ApplicationStatus']:
+        if not minor:
+          minor = 'idem'
         application = sDict['ApplicationStatus']
-      counter = sDict.get( 'ApplicationCounter' )
-      if counter:
-        appCounter = counter
-    attrNames = []
-    attrValues = []
-    if status:
-      attrNames.append( 'Status' )
-      attrValues.append( status )
-    if minor:
-      attrNames.append( 'MinorStatus' )
-      attrValues.append( minor )
-    if application:
-      attrNames.append( 'ApplicationStatus' )
-      attrValues.append( application )
-    if appCounter:
-      attrNames.append( 'ApplicationCounter' )
-      attrValues.append( appCounter )
-    result = jobDB.setJobAttributes( jobID, attrNames, attrValues, update = True )
+        if not application:
+          application = 'idem'
+        else:
+          status = "Running"
+          minor = "Application"
+        records.append( ( jobID, status, minor, application, date, sDict['Source'] ) )
+
+    for ( status, minor, application, appCounter ), jobIDList in updateDict.items():
+      result = jobDB.setJobsStatus( jobIDList, status, minor, application, appCounter, update = True )
+      if not result['OK']:
+        for jobID in jobIDList:
+          failed[jobID] = result['Message']
+
+    endDates = dict( [ ( jobID, date ) for jobID, date in endDates.items() if jobID not in failed ] )
+    if endDates:
+      result = jobDB.setJobsExecTime( 'EndExecTime', endDates )
+    startDates = dict( [ ( jobID, date ) for jobID, date in startDates.items() if jobID not in failed ] )
+    if startDates:
+      result = jobDB.setJobsExecTime( 'StartExecTime', startDates )
+
+    result = logDB.addLoggingRecords( [ record for record in records if record[0] not in failed ] )
     if not result['OK']:
       return result
 
-    if endDate:
-      result = jobDB.setEndExecTime( jobID, endDate )
-    if startDate:
-      result = jobDB.setStartExecTime( jobID, startDate )
-
-    # Update the JobLoggingDB records
-    for date in dates:
-      sDict = statusDict[date]
-      status = sDict['Status']
-      if not status:
-        status = 'idem'
-      minor = sDict['MinorStatus']
-      if not minor:
-        minor = 'idem'
-      application = sDict['ApplicationStatus']
-      if not application:
-        application = 'idem'
-      else:
-        status = "Running"
-        minor = "Application"
-      source = sDict['Source']
-      result = logDB.addLoggingRecord( jobID, status, minor, application, date, source )
-      if not result['OK']:
-        return result
-
-    return S_OK()
+    return S_OK( { 'Successful' : [ jobID for jobID in jobIDs if jobID not in failed ], 'Failed' : failed } )
 
   ###########################################################################
   types_setJobSite = [[StringType, IntType, LongType], StringType]
@@ -316,6 +374,10 @@ class JobStateUpdateHandler( RequestHandler ):
     """ Send a heart beat sign of life for a job jobID
     """
 
+    if heartBeatAggregator:
+      heartBeatAggregator.addHeartBeat( int( jobID ), staticData, dynamicData )
+      return S_OK( heartBeatAggregator.popJobCommands( int( jobID ) ) )
+
     result = jobDB.setHeartBeatData( int( jobID ), staticData, dynamicData )
     if not result['OK']:
       gLogger.warn( 'Failed to set the heart beat data for job %d ' % int( jobID ) )
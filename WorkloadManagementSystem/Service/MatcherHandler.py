@@ -14,7 +14,7 @@ from   types import StringType, DictType, StringTypes
 import threading
 
 from DIRAC.ConfigurationSystem.Client.Helpers          import Registry, Operations
-from DIRAC.Core.DISET.RequestHandler                   import RequestHandler
+from DIRAC.Core.DISET.RequestHandler                   import RequestHandler, getServiceOption
 from DIRAC.Core.Utilities.ClassAd.ClassAdLight         import ClassAd
 from DIRAC                                             import gLogger, S_OK, S_ERROR
 from DIRAC.WorkloadManagementSystem.DB.JobDB           import JobDB
@@ -26,6 +26,7 @@ from DIRAC.Core.Utilities.ThreadScheduler              import gThreadScheduler
 from DIRAC.Core.Security                               import Properties
 from DIRAC.Core.Utilities.DictCache                    import DictCache
 from DIRAC.ResourceStatusSystem.Client.SiteStatus      import SiteStatus
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
 
 DEBUG = 0
 
@@ -35,6 +36,7 @@ gJobDB = False
 gJobLoggingDB = False
 gTaskQueueDB = False
 gPilotAgentsDB = False
+gTaskQueueIndex = False
 
 def initializeMatcherHandler( serviceInfo ):
   """  Matcher Service initialization
@@ -44,6 +46,7 @@ def initializeMatcherHandler( serviceInfo ):
   global gJobLoggingDB
   global gTaskQueueDB
   global gPilotAgentsDB
+  global gTaskQueueIndex
 
   # Create JobDB object and initialize its tables.
   gJobDB = JobDB( checkTables = True )
@@ -56,6 +59,14 @@ def initializeMatcherHandler( serviceInfo ):
   
   gTaskQueueDB   = TaskQueueDB()
 
+  # Optionally match against an in memory copy of the task queues
+  if getServiceOption( serviceInfo, "UseTaskQueueIndex", False ):
+    gTaskQueueIndex = TaskQueueIndex( gTaskQueueDB,
+                                      refreshPeriod = getServiceOption( serviceInfo, "TaskQueueIndexRefreshPeriod", 10 ) )
+    result = gTaskQueueIndex.refresh( force = True )
+    if not result[ 'OK' ]:
+      return result
+
   gMonitor.registerActivity( 'matchTime', "Job matching time",
                              'Matching', "secs" , gMonitor.OP_MEAN, 300 )
   gMonitor.registerActivity( 'matchesDone', "Job Match Request",
@@ -472,7 +483,10 @@ class MatcherHandler( RequestHandler ):
       gLogger.verbose( "%s : %s" % ( key.rjust( 20 ), resourceDict[ key ] ) )
 
     negativeCond = self.__limiter.getNegativeCondForSite( siteName )
-    result = gTaskQueueDB.matchAndGetJob( resourceDict, negativeCond = negativeCond )
+    if gTaskQueueIndex:
+      result = gTaskQueueIndex.matchAndGetJob( resourceDict, negativeCond = negativeCond )
+    else:
+      result = gTaskQueueDB.matchAndGetJob( resourceDict, negativeCond = negativeCond )
 
     if DEBUG:
       print result
@@ -89,33 +89,18 @@ class SandboxStoreHandler( RequestHandler ):
     else:
       assignTo = {}
 
-    extPos = fileId.find( ".tar" )
-    if extPos > -1:
-      extension = fileId[ extPos + 1: ]
-      aHash = fileId[ :extPos ]
-    else:
-      extension = ""
-      aHash = fileId
+    aHash, extension = self.__splitSandboxName( fileId )
     gLogger.info( "Upload requested for %s [%s]" % ( aHash, extension ) )
 
     credDict = self.getRemoteCredentials()
-    sbPath = self.__getSandboxPath( "%s.%s" % ( aHash, extension ) )
-    # Generate the location
-    result = self.__generateLocation( sbPath )
+    result = self.__getSandboxLocation( aHash, extension )
     if not result[ 'OK' ]:
       return result
-    seName, sePFN = result[ 'Value' ]
-
-    result = sandboxDB.getSandboxId( seName, sePFN, credDict[ 'username' ], credDict[ 'group' ] )
-    if result[ 'OK' ]:
+    sbPath, seName, sePFN, sbExists = result[ 'Value' ]
+    if sbExists:
       gLogger.info( "Sandbox already exists. Skipping upload" )
       fileHelper.markAsTransferred()
-      sbURL = "SB:%s|%s" % ( seName, sePFN )
-      assignTo = dict( [ ( key, [ ( sbURL, assignTo[ key ] ) ] ) for key in assignTo ] )
-      result = self.export_assignSandboxesToEntities( assignTo )
-      if not result[ 'OK' ]:
-        return result
-      return S_OK( sbURL )
+      return self.__assignSandbox( seName, sePFN, assignTo )
 
     if self.__useLocalStorage:
       hdPath = self.__sbToHDPath( sbPath )
@@ -156,6 +141,57 @@ class SandboxStoreHandler( RequestHandler ):
       return result
     return S_OK( sbURL )
 
+  def __splitSandboxName( self, fileId ):
+    """
+    Split <hash>.<extension> sandbox names
+    """
+    extPos = fileId.find( ".tar" )
+    if extPos > -1:
+      return fileId[ :extPos ], fileId[ extPos + 1: ]
+    return fileId, ""
+
+  def __getSandboxLocation( self, aHash, extension ):
+    """
+    Get the path, SE and PFN for a sandbox of the remote user and whether it's already registered
+    """
+    credDict = self.getRemoteCredentials()
+    sbPath = self.__getSandboxPath( "%s.%s" % ( aHash, extension ) )
+    # Generate the location
+    result = self.__generateLocation( sbPath )
+    if not result[ 'OK' ]:
+      return result
+    seName, sePFN = result[ 'Value' ]
+    result = sandboxDB.getSandboxId( seName, sePFN, credDict[ 'username' ], credDict[ 'group' ] )
+    return S_OK( ( sbPath, seName, sePFN, result[ 'OK' ] ) )
+
+  def __assignSandbox( self, seName, sePFN, assignTo ):
+    """
+    Assign an existing sandbox to the entities and return its URL
+    """
+    sbURL = "SB:%s|%s" % ( seName, sePFN )
+    assignTo = dict( [ ( key, [ ( sbURL, assignTo[ key ] ) ] ) for key in assignTo ] )
+    result = self.export_assignSandboxesToEntities( assignTo )
+    if not result[ 'OK' ]:
+      return result
+    return S_OK( sbURL )
+
+  types_reuseSandbox = [ types.StringTypes, types.DictType ]
+  def export_reuseSandbox( self, fileId, assignTo ):
+    """
+    Check if the remote user has already uploaded a sandbox with that name (<hash>.<extension>).
+    If so assign it to the entities and return its URL, so the client doesn't have to upload it again.
+    Returns S_OK( False ) if the sandbox is not known
+    """
+    aHash, extension = self.__splitSandboxName( fileId )
+    result = self.__getSandboxLocation( aHash, extension )
+    if not result[ 'OK' ]:
+      return result
+    sbPath, seName, sePFN, sbExists = result[ 'Value' ]
+    if not sbExists:
+      return S_OK( False )
+    gLogger.info( "Sandbox already exists. Reusing it", "SB:%s|%s" % ( seName, sePFN ) )
+    return self.__assignSandbox( seName, sePFN, assignTo )
+
   def transfer_bulkFromClient( self, fileId, token, fileSize, fileHelper ):
     """ Receive files packed into a tar archive by the fileHelper logic.
         token is used for access rights confirmation.
@@ -0,0 +1,152 @@
+########################################################################
+# $HeadURL $
+# File: JobStateUpdateHandlerTests.py
+########################################################################
+
+""" :mod: JobStateUpdateHandlerTests
+    =======================
+
+    .. module: JobStateUpdateHandlerTests
+    :synopsis: test cases for the bulk job status updates
+
+    test cases for the setJobsStatus, setJobsStatusBulk and setJobStatusBulk
+    methods of the JobStateUpdate service, the JobDB and JobLoggingDB are
+    replaced by fakes applying the status updates to a dictionary
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+from DIRAC import S_OK, S_ERROR
+## SUT
+from DIRAC.WorkloadManagementSystem.Service import JobStateUpdateHandler as handlerModule
+from DIRAC.WorkloadManagementSystem.Service.JobStateUpdateHandler import JobStateUpdateHandler
+
+# 2013-01-10 00:00:00 UTC, the dates are days away from it whatever the time zone
+LAST_TIME = 1357776000
+
+class FakeJobDB( object ):
+  """ JobDB look alike keeping the job attributes in a dictionary """
+
+  def __init__( self, jobs ):
+    self.jobs = jobs
+    self.statusCalls = []
+    self.execTimes = {}
+    self.failStatus = False
+
+  def getAttributesForJobList( self, jobIDList, attrList = None ):
+    return S_OK( dict( [ ( jobID, dict( self.jobs[jobID] ) ) for jobID in jobIDList if jobID in self.jobs ] ) )
+
+  def setJobsStatus( self, jobIDList, status = '', minor = '', application = '', appCounter = None,
+                     update = True, maxRows = 1000 ):
+    if self.failStatus:
+      return S_ERROR( 'Lost connection' )
+    self.statusCalls.append( ( sorted( jobIDList ), status, minor, application, update ) )
+    for jobID in jobIDList:
+      for name, value in ( ( 'Status', status ), ( 'MinorStatus', minor ), ( 'ApplicationStatus', application ) ):
+        if value:
+          self.jobs[jobID][name] = value
+    return S_OK()
+
+  def setJobsExecTime( self, timeName, jobDateDict, maxRows = 1000 ):
+    for jobID, date in jobDateDict.items():
+      self.execTimes.setdefault( timeName, {} )[jobID] = date
+    return S_OK()
+
+class FakeJobLoggingDB( object ):
+  """ JobLoggingDB look alike keeping the logging records """
+
+  def __init__( self, lastTimes ):
+    self.lastTimes = lastTimes
+    self.records = []
+
+  def getWMSLastTimes( self, jobIDList ):
+    return S_OK( dict( [ ( jobID, self.lastTimes[jobID] ) for jobID in jobIDList if jobID in self.lastTimes ] ) )
+
+  def addLoggingRecords( self, recordList, maxRows = 1000 ):
+    self.records.extend( recordList )
+    return S_OK( len( recordList ) )
+
+class TestHandler( JobStateUpdateHandler ):
+  """ the service handler without a DISET connection """
+
+  def __init__( self ):
+    pass
+
+def statusRecord( status = '', minor = '', application = '', source = 'JobWrapper' ):
+  """ one entry of a setJobStatusBulk status dictionary """
+  return { 'Status' : status, 'MinorStatus' : minor, 'ApplicationStatus' : application, 'Source' : source }
+
+########################################################################
+class BulkStatusTestCase( unittest.TestCase ):
+  """
+  .. class:: BulkStatusTestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.jobDB = FakeJobDB( { 1 : { 'Status' : 'Running', 'MinorStatus' : 'Input', 'ApplicationStatus' : 'Unknown' },
+                              2 : { 'Status' : 'Running', 'MinorStatus' : 'Input', 'ApplicationStatus' : 'Unknown' },
+                              3 : { 'Status' : 'Stalled', 'MinorStatus' : 'Input', 'ApplicationStatus' : 'Unknown' },
+                              4 : { 'Status' : 'Matched', 'MinorStatus' : 'Assigned', 'ApplicationStatus' : 'Unknown' } } )
+    self.logDB = FakeJobLoggingDB( { 1 : LAST_TIME, 2 : LAST_TIME, 3 : LAST_TIME } )
+    handlerModule.jobDB = self.jobDB
+    handlerModule.logDB = self.logDB
+    self.handler = TestHandler()
+
+  def testStateMachine( self ):
+    """ the last status values more recent than the logging info are set """
+    statusDict = { '2013-01-05 00:00:00' : statusRecord( 'Failed', 'Old' ),
+                   '2013-01-15 00:00:00' : statusRecord( 'Running', 'Application' ),
+                   '2013-01-16 00:00:00' : statusRecord( application = 'Step 1' ),
+                   '2013-01-17 00:00:00' : statusRecord( 'Done', 'Execution Complete' ) }
+    result = self.handler.export_setJobsStatusBulk( { '1' : statusDict, 2 : dict( statusDict ) } )
+    self.assertEqual( result, S_OK( { 'Successful' : [ 1, 2 ], 'Failed' : {} } ) )
+    # One update for the jobs ending in the same state
+    self.assertEqual( self.jobDB.statusCalls, [ ( [ 1, 2 ], 'Done', 'Execution Complete', 'Step 1', True ) ] )
+    self.assertEqual( self.jobDB.jobs[1]['Status'], 'Done' )
+    self.assertEqual( self.jobDB.execTimes, { 'StartExecTime' : { 1 : '2013-01-15 00:00:00', 2 : '2013-01-15 00:00:00' },
+                                              'EndExecTime' : { 1 : '2013-01-17 00:00:00', 2 : '2013-01-17 00:00:00' } } )
+    # All the records are logged, the old one too
+    self.assertEqual( sorted( [ record for record in self.logDB.records if record[0] == 1 ] ),
+                      [ ( 1, 'Done', 'Execution Complete', 'idem', '2013-01-17 00:00:00', 'JobWrapper' ),
+                        ( 1, 'Failed', 'Old', 'idem', '2013-01-05 00:00:00', 'JobWrapper' ),
+                        ( 1, 'Running', 'Application', 'Step 1', '2013-01-16 00:00:00', 'JobWrapper' ),
+                        ( 1, 'Running', 'Application', 'idem', '2013-01-15 00:00:00', 'JobWrapper' ) ] )
+
+  def testStalled( self ):
+    """ a Stalled job sending an update is Running again, its LastUpdateTime is refreshed """
+    result = self.handler.export_setJobsStatusBulk( { 3 : { '2013-01-15 00:00:00' : statusRecord( application = 'Step 2' ) },
+                                                      1 : { '2013-01-05 00:00:00' : statusRecord( 'Stalled' ) } } )
+    self.assertTrue( result['OK'] )
+    self.assertEqual( sorted( self.jobDB.statusCalls ), [ ( [ 1 ], '', '', '', True ),
+                                                          ( [ 3 ], 'Running', '', 'Step 2', True ) ] )
+    self.assertEqual( self.jobDB.jobs[1]['Status'], 'Running' )
+
+  def testFailedJobs( self ):
+    """ unknown jobs and jobs without logging info are reported in Failed """
+    statusDict = { '2013-01-15 00:00:00' : statusRecord( 'Running', 'Application' ) }
+    result = self.handler.export_setJobsStatusBulk( { 1 : statusDict, 4 : statusDict, 5 : statusDict } )
+    self.assertEqual( result['Value']['Successful'], [ 1 ] )
+    self.assertEqual( sorted( result['Value']['Failed'] ), [ 4, 5 ] )
+    self.assertEqual( [ record[0] for record in self.logDB.records ], [ 1 ] )
+    self.assertFalse( self.handler.export_setJobStatusBulk( 5, statusDict )['OK'] )
+    self.assertTrue( self.handler.export_setJobStatusBulk( '2', statusDict )['OK'] )
+
+  def testSetJobsStatus( self ):
+    """ setJobsStatus sets the same status to all the jobs and only logs the errors """
+    self.assertEqual( self.handler.export_setJobsStatus( [ '1', 3 ], 'Stalled', 'Lost', 'StalledJobAgent' ), S_OK() )
+    # The LastUpdateTime is not refreshed when setting the Stalled status
+    self.assertEqual( self.jobDB.statusCalls, [ ( [ 1, 3 ], 'Stalled', 'Lost', '', False ) ] )
+    self.assertEqual( [ record[:4] for record in self.logDB.records ], [ ( 1, 'Stalled', 'Lost', 'idem' ),
+                                                                         ( 3, 'Stalled', 'Lost', 'idem' ) ] )
+    self.jobDB.failStatus = True
+    self.assertEqual( self.handler.export_setJobsStatus( [ 1 ], 'Failed', 'Lost' ), S_OK() )
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( BulkStatusTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
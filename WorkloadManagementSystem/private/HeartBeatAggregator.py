@@ -0,0 +1,128 @@
+""" Buffer of the job heart beats received by the JobStateUpdate service
+
+    The heart beats are kept in memory and written to the JobDB every few seconds
+    with one statement per table for all the buffered jobs, instead of three
+    statements per heart beat. The commands waiting to be sent to the jobs are
+    taken from a snapshot of the JobCommands table refreshed at every flush, so
+    answering a heart beat does not query the DB either.
+
+    Heart beats still in the buffer when the service stops are lost. The JobDB is
+    late by at most one flush period, which is negligible compared to the stalled
+    job detection delays.
+"""
+
+__RCSID__ = "$Id$"
+
+import time
+import threading
+from DIRAC import gLogger, S_OK
+from DIRAC.Core.Utilities import Time
+
+class HeartBeatAggregator( object ):
+
+  def __init__( self, jobDB, flushPeriod = 5, maxHeartBeats = 1000 ):
+    self.__jobDB = jobDB
+    self.__flushPeriod = flushPeriod
+    self.__maxHeartBeats = maxHeartBeats
+    self.__log = gLogger.getSubLogger( "HeartBeatAggregator" )
+    self.__lock = threading.Lock()
+    self.__flushLock = threading.Lock()
+    #[ ( jobID, staticData, dynamicData, receptionTime ) ]
+    self.__heartBeats = []
+    #jobID -> { command : arguments }
+    self.__jobCommands = {}
+    #( jobID, command ) -> time when it was set as Sent in the DB
+    self.__sentCommands = {}
+    self.refreshJobCommands()
+    if flushPeriod > 0:
+      self.__flushThread = threading.Thread( target = self.__flushLoop )
+      self.__flushThread.setDaemon( 1 )
+      self.__flushThread.start()
+
+  def __flushLoop( self ):
+    while True:
+      time.sleep( self.__flushPeriod )
+      try:
+        self.flush()
+        self.refreshJobCommands()
+      except Exception:
+        self.__log.exception( "Error while flushing the heart beats" )
+
+  def addHeartBeat( self, jobID, staticData, dynamicData ):
+    """ Buffer a heart beat. The buffer is flushed if it is full
+    """
+    self.__lock.acquire()
+    try:
+      self.__heartBeats.append( ( int( jobID ), staticData, dynamicData, Time.toString() ) )
+      full = len( self.__heartBeats ) >= self.__maxHeartBeats
+    finally:
+      self.__lock.release()
+    if full:
+      return self.flush()
+    return S_OK()
+
+  def flush( self ):
+    """ Write the buffered heart beats to the JobDB
+    """
+    #Only one flush at a time to keep the heart beats in order
+    self.__flushLock.acquire()
+    try:
+      self.__lock.acquire()
+      try:
+        heartBeats = self.__heartBeats
+        self.__heartBeats = []
+      finally:
+        self.__lock.release()
+      if not heartBeats:
+        return S_OK()
+      result = self.__jobDB.setHeartBeatDataBulk( heartBeats )
+      if not result[ 'OK' ]:
+        self.__log.warn( "Failed to set the heart beat data of %s jobs" % len( heartBeats ), result[ 'Message' ] )
+      else:
+        self.__log.verbose( "Stored %s heart beats" % len( heartBeats ) )
+      return result
+    finally:
+      self.__flushLock.release()
+
+  def refreshJobCommands( self ):
+    """ Take a new snapshot of the commands waiting to be sent
+    """
+    startTime = time.time()
+    result = self.__jobDB.getJobCommands()
+    if not result[ 'OK' ]:
+      self.__log.warn( "Failed to get the job commands", result[ 'Message' ] )
+      return result
+    jobCommands = result[ 'Value' ]
+    self.__lock.acquire()
+    try:
+      for jobID, command in self.__sentCommands.keys():
+        #Commands sent after the query started may still be there
+        if command in jobCommands.get( jobID, {} ):
+          del( jobCommands[ jobID ][ command ] )
+          if not jobCommands[ jobID ]:
+            del( jobCommands[ jobID ] )
+        if self.__sentCommands[ ( jobID, command ) ] < startTime:
+          del( self.__sentCommands[ ( jobID, command ) ] )
+      self.__jobCommands = jobCommands
+    finally:
+      self.__lock.release()
+    return S_OK()
+
+  def popJobCommands( self, jobID ):
+    """ Get the commands to be sent to a job and set them as Sent
+    """
+    self.__lock.acquire()
+    try:
+      jobCommands = self.__jobCommands.pop( int( jobID ), {} )
+    finally:
+      self.__lock.release()
+    for command in jobCommands:
+      result = self.__jobDB.setJobCommandStatus( int( jobID ), command, 'Sent' )
+      if not result[ 'OK' ]:
+        self.__log.warn( "Failed to set the command %s of job %s as Sent" % ( command, jobID ), result[ 'Message' ] )
+      self.__lock.acquire()
+      try:
+        self.__sentCommands[ ( int( jobID ), command ) ] = time.time()
+      finally:
+        self.__lock.release()
+    return jobCommands
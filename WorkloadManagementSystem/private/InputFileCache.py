@@ -0,0 +1,241 @@
+""" Node local cache of the input sandboxes and input LFNs used by the JobWrapper
+
+    Jobs running in the same pilot, or in several pilots of the same node, often
+    use the same input sandbox and auxiliary LFNs. The cache keeps one copy of each
+    of them in a directory shared by the jobs, under a key identifying its content
+    (the md5 in the name of the sandbox, the checksum of the LFN), and the jobs get
+    hard links to it instead of downloading it again. The files are copied if they
+    can't be linked (cache on another file system) or if the job may modify them.
+
+    The cache can be used by several processes at once: a key is locked with flock
+    while its file is downloaded or used, so that only one job downloads it and the
+    others wait for it, and the cache size is kept under its limit by removing the
+    least recently used files that are not locked.
+
+    The cached files are read only, a job writing to its copy of an input file would
+    otherwise modify the cached file through the hard link. This protects the cache
+    only against writes, not against a chmod of the link done by the job owner, so
+    the files which the job is known to modify (its executable) are given as copies
+    and the links can be disabled altogether. A payload opening a linked input file
+    for writing gets a permission error.
+
+    The cache is an optimisation: its errors (directory of another user, full disk)
+    are returned as S_ERROR and the caller falls back to downloading the file.
+"""
+
+__RCSID__ = "$Id$"
+
+import os
+import stat
+import errno
+import fcntl
+import shutil
+import tempfile
+from DIRAC import gLogger, S_OK, S_ERROR
+
+class InputFileCache( object ):
+
+  def __init__( self, cacheDir, maxSize ):
+    """ c'tor
+
+    :param str cacheDir: directory shared by the jobs of the node
+    :param int maxSize: cache size limit in bytes
+    """
+    self.__log = gLogger.getSubLogger( "InputFileCache" )
+    self.cacheDir = os.path.realpath( cacheDir )
+    self.maxSize = maxSize
+    self.__filesDir = os.path.join( self.cacheDir, 'files' )
+    self.__locksDir = os.path.join( self.cacheDir, 'locks' )
+    self.__tmpDir = os.path.join( self.cacheDir, 'tmp' )
+    # key -> open lock file
+    self.__locks = {}
+
+  def initialize( self ):
+    """ Create the cache directories
+    """
+    for directory in ( self.__filesDir, self.__locksDir, self.__tmpDir ):
+      try:
+        os.makedirs( directory )
+      except OSError, x:
+        if x.errno != errno.EEXIST:
+          return S_ERROR( "Cannot create cache directory %s: %s" % ( directory, str( x ) ) )
+    return S_OK()
+
+  def __getPath( self, key ):
+    return os.path.join( self.__filesDir, key )
+
+  def getTempDir( self ):
+    """ Directory to download files to before storing them, on the cache file system
+
+    :return: S_OK( directory path )
+    """
+    try:
+      return S_OK( tempfile.mkdtemp( dir = self.__tmpDir ) )
+    except ( IOError, OSError ), x:
+      return S_ERROR( "Cannot create a temporary directory in the cache: %s" % str( x ) )
+
+  def __openLockFile( self, key ):
+    """ Read only is enough for flock, and works with the lock files of other users
+    """
+    return os.open( os.path.join( self.__locksDir, key ), os.O_RDONLY | os.O_CREAT, 0644 )
+
+  def lock( self, keys ):
+    """ Lock the keys for this process, waiting for the other processes holding them.
+        Nothing is locked in case of error.
+    """
+    locked = []
+    try:
+      # Always in the same order to avoid dead locks
+      for key in sorted( keys ):
+        if key in self.__locks:
+          continue
+        lockFD = self.__openLockFile( key )
+        try:
+          fcntl.flock( lockFD, fcntl.LOCK_EX )
+        except IOError:
+          os.close( lockFD )
+          raise
+        self.__locks[key] = lockFD
+        locked.append( key )
+    except ( IOError, OSError ), x:
+      self.unlock( locked )
+      return S_ERROR( "Cannot lock %s in the cache: %s" % ( key, str( x ) ) )
+    return S_OK()
+
+  def unlock( self, keys ):
+    """ Release the keys locked by this process
+    """
+    for key in keys:
+      lockFD = self.__locks.pop( key, None )
+      if lockFD is not None:
+        # Closing the file releases the lock
+        os.close( lockFD )
+
+  def lookup( self, key ):
+    """ Get the path of the cached file for the key, None if not cached
+    """
+    path = self.__getPath( key )
+    try:
+      # The modification time is the last use for the eviction
+      os.utime( path, None )
+    except OSError, x:
+      if x.errno not in ( errno.EPERM, errno.EACCES ) or not os.path.isfile( path ):
+        return None
+      # Stored by another user, only its last use is not recorded
+    return path
+
+  def store( self, key, filePath ):
+    """ Move a downloaded file to the cache under the key and make room for it
+
+    :return: S_OK( path of the cached file )
+    """
+    path = self.__getPath( key )
+    try:
+      try:
+        os.rename( filePath, path )
+      except OSError, x:
+        if x.errno != errno.EXDEV:
+          raise
+        # Downloaded on another file system, copied next to the cache for an atomic rename
+        tmpDir = tempfile.mkdtemp( dir = self.__tmpDir )
+        tmpPath = os.path.join( tmpDir, key )
+        shutil.copy( filePath, tmpPath )
+        os.rename( tmpPath, path )
+        os.rmdir( tmpDir )
+        os.unlink( filePath )
+      os.chmod( path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH )
+    except ( IOError, OSError ), x:
+      return S_ERROR( "Cannot store %s in the cache: %s" % ( filePath, str( x ) ) )
+    self.__evict()
+    return S_OK( path )
+
+  def linkFile( self, key, destination, copy = False ):
+    """ Make the cached file for the key available as destination, as a hard link
+        or as a writable copy if :copy: is set or the file can't be linked
+
+    :return: S_OK( destination ), S_ERROR if the file is not (or no longer) cached
+    """
+    path = self.lookup( key )
+    if not path:
+      return S_ERROR( "%s is not in the cache" % key )
+    try:
+      if os.path.lexists( destination ):
+        os.unlink( destination )
+    except OSError, x:
+      return S_ERROR( "Cannot replace %s: %s" % ( destination, str( x ) ) )
+    if not copy:
+      try:
+        os.link( path, destination )
+        return S_OK( destination )
+      except OSError, x:
+        if x.errno == errno.ENOENT:
+          return S_ERROR( "%s was removed from the cache" % key )
+        self.__log.verbose( "Cannot link from the cache, copying", str( x ) )
+    try:
+      shutil.copy( path, destination )
+      os.chmod( destination, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH )
+    except ( IOError, OSError ), x:
+      return S_ERROR( "Cannot copy %s from the cache: %s" % ( key, str( x ) ) )
+    return S_OK( destination )
+
+  def removeTempDir( self, tmpDir ):
+    """ Remove a directory given by getTempDir
+    """
+    shutil.rmtree( tmpDir, ignore_errors = True )
+
+  def __isLocked( self, key ):
+    """ Whether a process, this one included, holds the lock of the key
+    """
+    if key in self.__locks:
+      return True
+    try:
+      lockFD = self.__openLockFile( key )
+    except OSError:
+      # Can't tell, kept
+      return True
+    try:
+      try:
+        fcntl.flock( lockFD, fcntl.LOCK_EX | fcntl.LOCK_NB )
+      except IOError:
+        return True
+      return False
+    finally:
+      os.close( lockFD )
+
+  def __evict( self ):
+    """ Remove the least recently used files until the cache is within its size limit,
+        the files whose key is locked are in use and kept
+    """
+    try:
+      globalLockFD = os.open( os.path.join( self.cacheDir, 'cache.lock' ), os.O_RDONLY | os.O_CREAT, 0644 )
+    except OSError, x:
+      self.__log.warn( "Cannot clean the cache", str( x ) )
+      return
+    try:
+      fcntl.flock( globalLockFD, fcntl.LOCK_EX )
+      entries = []
+      totalSize = 0
+      for key in os.listdir( self.__filesDir ):
+        try:
+          fileStat = os.stat( self.__getPath( key ) )
+        except OSError:
+          continue
+        totalSize += fileStat.st_size
+        entries.append( ( fileStat.st_mtime, fileStat.st_size, key ) )
+      entries.sort()
+      for _mtime, size, key in entries:
+        if totalSize <= self.maxSize:
+          break
+        if self.__isLocked( key ):
+          continue
+        # The links already given to the jobs are not affected by the removal
+        try:
+          os.unlink( self.__getPath( key ) )
+          totalSize -= size
+          self.__log.verbose( "Removed from the cache", key )
+        except OSError, x:
+          self.__log.warn( "Cannot remove from the cache", "%s: %s" % ( key, str( x ) ) )
+    except ( IOError, OSError ), x:
+      self.__log.warn( "Cannot clean the cache", str( x ) )
+    finally:
+      os.close( globalLockFD )
@@ -0,0 +1,428 @@
+""" In memory index of the TaskQueueDB used by the Matcher
+
+    The index keeps the task queue definitions, their priorities and the jobs they
+    contain so that the selection of the matching task queues and the choice of the
+    job to give to a pilot are done without querying the DB. Only the extraction of
+    the chosen job is done in the DB, and it is atomic so several Matchers can share
+    the same TaskQueueDB.
+
+    The index is updated with the changes done through the TaskQueueDB object it is
+    attached to and incrementally refreshed from the DB every few seconds to pick up
+    the changes done by other processes (optimizers, job cleaning...)
+"""
+
+__RCSID__ = "$Id$"
+
+import time
+import heapq
+import random
+import threading
+import types
+from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC.Core.Security import Properties, CS
+
+TQ_MIN_SHARE = 0.001
+
+class TaskQueueIndex( object ):
+
+  def __init__( self, taskQueueDB, refreshPeriod = 10 ):
+    self.__tqDB = taskQueueDB
+    self.__refreshPeriod = refreshPeriod
+    self.__maxMatchRetry = 3
+    self.__log = gLogger.getSubLogger( "TaskQueueIndex" )
+    self.__lock = threading.Lock()
+    self.__refreshLock = threading.Lock()
+    self.__lastRefresh = 0
+    self.__loaded = False
+    self.__singleValueDefFields = taskQueueDB.getSingleValueTQDefFields()
+    self.__multiValueDefFields = taskQueueDB.getMultiValueTQDefFields()
+    self.__multiValueMatchFields = taskQueueDB.getMultiValueMatchFields()
+    self.__tagMatchFields = ( 'Tag', )
+    self.__bannedJobMatchFields = ( 'Site', )
+    self.__strictRequireMatchFields = ( 'SubmitPool', 'Platform', 'PilotType', 'Tag' )
+    #tqId -> definition with the multi value fields as sets
+    self.__tqDefs = {}
+    #tqId -> priority
+    self.__tqPriorities = {}
+    #tqId -> { job priority : set( jobIds ) }
+    self.__tqJobs = {}
+    #jobId -> ( tqId, job priority )
+    self.__jobLocation = {}
+    #job priority -> real priority
+    self.__realPriorities = {}
+    #Inverted indexes: field -> { value : set( tqIds ) } and field -> set( tqIds without values )
+    self.__byValue = {}
+    self.__noValue = {}
+    for field in ( 'OwnerGroup', ) + tuple( self.__multiValueDefFields ):
+      self.__byValue[ field ] = {}
+      self.__noValue[ field ] = set()
+    taskQueueDB.addChangeListener( self.__taskQueueDBChanged )
+
+  def __toList( self, value ):
+    if type( value ) in ( types.ListType, types.TupleType ):
+      return list( value )
+    return [ value ]
+
+  #
+  # Index maintenance. All these have to be called with the lock held
+  #
+
+  def __addTaskQueue( self, tqId, tqDef ):
+    self.__removeTaskQueue( tqId )
+    tqDef = dict( tqDef )
+    self.__tqPriorities[ tqId ] = tqDef.pop( 'Priority', 1 )
+    for field in self.__multiValueDefFields:
+      values = frozenset( tqDef.get( field, [] ) )
+      tqDef[ field ] = values
+      if not values:
+        self.__noValue[ field ].add( tqId )
+      for value in values:
+        self.__byValue[ field ].setdefault( value, set() ).add( tqId )
+    self.__byValue[ 'OwnerGroup' ].setdefault( tqDef[ 'OwnerGroup' ], set() ).add( tqId )
+    self.__tqDefs[ tqId ] = tqDef
+    self.__tqJobs.setdefault( tqId, {} )
+
+  def __removeTaskQueue( self, tqId ):
+    if tqId not in self.__tqDefs:
+      return
+    tqDef = self.__tqDefs.pop( tqId )
+    self.__tqPriorities.pop( tqId, None )
+    for field in self.__multiValueDefFields:
+      self.__noValue[ field ].discard( tqId )
+      for value in tqDef[ field ]:
+        self.__discardFromIndex( field, value, tqId )
+    self.__discardFromIndex( 'OwnerGroup', tqDef[ 'OwnerGroup' ], tqId )
+    self.__setTaskQueueJobs( tqId, [] )
+    self.__tqJobs.pop( tqId, None )
+
+  def __discardFromIndex( self, field, value, tqId ):
+    tqIds = self.__byValue[ field ].get( value )
+    if tqIds is None:
+      return
+    tqIds.discard( tqId )
+    if not tqIds:
+      del( self.__byValue[ field ][ value ] )
+
+  def __addJob( self, jobId, tqId, priority, realPriority ):
+    self.__removeJob( jobId )
+    if tqId not in self.__tqJobs:
+      return False
+    self.__tqJobs[ tqId ].setdefault( priority, set() ).add( jobId )
+    self.__jobLocation[ jobId ] = ( tqId, priority )
+    self.__realPriorities[ priority ] = realPriority
+    return True
+
+  def __removeJob( self, jobId ):
+    location = self.__jobLocation.pop( jobId, None )
+    if not location:
+      return
+    tqId, priority = location
+    buckets = self.__tqJobs.get( tqId, {} )
+    if priority in buckets:
+      buckets[ priority ].discard( jobId )
+      if not buckets[ priority ]:
+        del( buckets[ priority ] )
+
+  def __setTaskQueueJobs( self, tqId, jobList ):
+    for jobIds in self.__tqJobs.get( tqId, {} ).values():
+      for jobId in jobIds:
+        self.__jobLocation.pop( jobId, None )
+    if tqId in self.__tqJobs:
+      self.__tqJobs[ tqId ] = {}
+    for jobId, priority, realPriority in jobList:
+      self.__addJob( jobId, tqId, priority, realPriority )
+
+  def __getJobsSummary( self, tqId ):
+    """ Same as TaskQueueDB.getTaskQueueJobsSummary for a TQ in the index
+    """
+    numJobs = 0
+    maxJobId = 0
+    sumPriority = 0
+    for priority, jobIds in self.__tqJobs.get( tqId, {} ).items():
+      numJobs += len( jobIds )
+      maxJobId = max( maxJobId, max( jobIds ) )
+      sumPriority += priority * len( jobIds )
+    return ( numJobs, maxJobId, sumPriority )
+
+  def __taskQueueDBChanged( self, changeType, data ):
+    """ Listener for the changes done through the TaskQueueDB in this process
+    """
+    self.__lock.acquire()
+    try:
+      if changeType == 'jobInserted':
+        jobId, tqId, priority, realPriority = data
+        if not self.__addJob( jobId, tqId, priority, realPriority ):
+          #New TQ. Get its definition in the next match
+          self.__lastRefresh = 0
+      elif changeType == 'jobDeleted':
+        self.__removeJob( data )
+      elif changeType == 'tqDeleted':
+        self.__removeTaskQueue( data )
+      elif changeType == 'tqPriorities':
+        for tqId in data:
+          if tqId in self.__tqPriorities:
+            self.__tqPriorities[ tqId ] = data[ tqId ]
+      elif changeType == 'jobPriorities':
+        for jobId in data:
+          if jobId in self.__jobLocation:
+            priority, realPriority = data[ jobId ]
+            self.__addJob( jobId, self.__jobLocation[ jobId ][0], priority, realPriority )
+    finally:
+      self.__lock.release()
+
+  #
+  # Refresh from the DB
+  #
+
+  def refresh( self, force = False ):
+    """ Refresh the index from the DB if it's older than the refresh period
+    """
+    if not force and time.time() - self.__lastRefresh < self.__refreshPeriod:
+      return S_OK()
+    if not self.__refreshLock.acquire( False ):
+      #Somebody else is refreshing. Use what there is unless the index has never been loaded
+      if self.__loaded:
+        return S_OK()
+      self.__refreshLock.acquire()
+      self.__refreshLock.release()
+      if self.__loaded:
+        return S_OK()
+      return S_ERROR( "Task queue index is not loaded" )
+    try:
+      return self.__refresh()
+    finally:
+      self.__refreshLock.release()
+
+  def __refresh( self ):
+    startTime = time.time()
+    result = self.__tqDB.getTaskQueuePriorities()
+    if not result[ 'OK' ]:
+      return result
+    tqPriorities = result[ 'Value' ]
+    result = self.__tqDB.getTaskQueueJobsSummary()
+    if not result[ 'OK' ]:
+      return result
+    jobsSummary = result[ 'Value' ]
+    self.__lock.acquire()
+    try:
+      newTQs = [ tqId for tqId in tqPriorities if tqId not in self.__tqDefs ]
+      changedTQs = [ tqId for tqId in jobsSummary if tqId in tqPriorities and \
+                     ( tqId not in self.__tqDefs or self.__getJobsSummary( tqId ) != jobsSummary[ tqId ] ) ]
+    finally:
+      self.__lock.release()
+    result = self.__tqDB.getTaskQueueDefinitions( newTQs )
+    if not result[ 'OK' ]:
+      return result
+    tqDefs = result[ 'Value' ]
+    result = self.__tqDB.getJobsInTaskQueues( changedTQs )
+    if not result[ 'OK' ]:
+      return result
+    tqJobs = dict( [ ( tqId, [] ) for tqId in changedTQs ] )
+    for jobId, tqId, priority, realPriority in result[ 'Value' ]:
+      if tqId in tqJobs:
+        tqJobs[ tqId ].append( ( jobId, priority, realPriority ) )
+    self.__lock.acquire()
+    try:
+      for tqId in [ tqId for tqId in self.__tqDefs if tqId not in tqPriorities ]:
+        self.__removeTaskQueue( tqId )
+      for tqId in tqDefs:
+        self.__addTaskQueue( tqId, tqDefs[ tqId ] )
+      for tqId in tqPriorities:
+        if tqId in self.__tqPriorities:
+          self.__tqPriorities[ tqId ] = tqPriorities[ tqId ]
+      for tqId in self.__tqJobs:
+        if tqId not in jobsSummary and self.__tqJobs[ tqId ]:
+          self.__setTaskQueueJobs( tqId, [] )
+      for tqId in tqJobs:
+        self.__setTaskQueueJobs( tqId, tqJobs[ tqId ] )
+      self.__lastRefresh = time.time()
+      self.__loaded = True
+      numJobs = len( self.__jobLocation )
+    finally:
+      self.__lock.release()
+    self.__log.verbose( "Refreshed index with %s TQs (%s new, %s changed) and %s jobs in %.3f secs" % \
+                        ( len( tqPriorities ), len( newTQs ), len( changedTQs ), numJobs, time.time() - startTime ) )
+    return S_OK()
+
+  #
+  # Matching
+  #
+
+  def __getCandidates( self, tqMatchDict ):
+    """ Use the inverted indexes to discard most of the TQs that cannot match
+    """
+    candidates = None
+    if tqMatchDict.get( 'OwnerGroup' ):
+      candidates = set()
+      for group in self.__toList( tqMatchDict[ 'OwnerGroup' ] ):
+        candidates.update( self.__byValue[ 'OwnerGroup' ].get( group, () ) )
+    for field in self.__multiValueMatchFields:
+      defField = "%ss" % field
+      if field in tqMatchDict and tqMatchDict[ field ]:
+        if field in self.__tagMatchFields and tqMatchDict[ field ] == 'Any':
+          continue
+        fieldCandidates = set( self.__noValue[ defField ] )
+        for value in self.__toList( tqMatchDict[ field ] ):
+          fieldCandidates.update( self.__byValue[ defField ].get( value, () ) )
+      elif field in self.__strictRequireMatchFields and field not in tqMatchDict:
+        fieldCandidates = self.__noValue[ defField ]
+      else:
+        continue
+      if candidates is None:
+        candidates = set( fieldCandidates )
+      else:
+        candidates.intersection_update( fieldCandidates )
+    if candidates is None:
+      return set( self.__tqDefs )
+    return candidates
+
+  def __matchesOwner( self, tqDef, tqMatchDict, jobSharingGroups ):
+    if 'OwnerDN' in tqMatchDict and 'OwnerGroup' in tqMatchDict:
+      if tqDef[ 'OwnerGroup' ] not in self.__toList( tqMatchDict[ 'OwnerGroup' ] ):
+        return False
+      return tqDef[ 'OwnerGroup' ] in jobSharingGroups or \
+             tqDef[ 'OwnerDN' ] in self.__toList( tqMatchDict[ 'OwnerDN' ] )
+    for field in ( 'OwnerGroup', 'OwnerDN' ):
+      if field in tqMatchDict and tqDef[ field ] not in self.__toList( tqMatchDict[ field ] ):
+        return False
+    return True
+
+  def __matchesNegativeCond( self, tqDef, negativeCond ):
+    """ True if the TQ is not excluded by the negative conditions
+        ( same semantics as TaskQueueDB.__generateNotSQL )
+    """
+    if type( negativeCond ) in ( types.ListType, types.TupleType ):
+      for condDict in negativeCond:
+        if self.__matchesNegativeCond( tqDef, condDict ):
+          return True
+      return False
+    condList = []
+    for field in negativeCond:
+      if field in self.__multiValueMatchFields:
+        tqValues = tqDef[ "%ss" % field ]
+        condList.append( not [ value for value in self.__toList( negativeCond[ field ] ) if value in tqValues ] )
+      elif field in self.__singleValueDefFields:
+        for value in self.__toList( negativeCond[ field ] ):
+          condList.append( value != tqDef[ field ] )
+    return not condList or True in condList
+
+  def __matches( self, tqDef, tqMatchDict, jobSharingGroups, negativeCond ):
+    """ Check a TQ against a resource ( same semantics as TaskQueueDB.__generateTQMatchSQL )
+    """
+    if not self.__matchesOwner( tqDef, tqMatchDict, jobSharingGroups ):
+      return False
+    if 'CPUTime' in tqMatchDict and tqDef[ 'CPUTime' ] > max( self.__toList( tqMatchDict[ 'CPUTime' ] ) ):
+      return False
+    if 'Setup' in tqMatchDict and tqDef[ 'Setup' ] not in self.__toList( tqMatchDict[ 'Setup' ] ):
+      return False
+    for field in self.__multiValueMatchFields:
+      tqValues = tqDef[ "%ss" % field ]
+      if field in tqMatchDict and tqMatchDict[ field ]:
+        resourceValues = self.__toList( tqMatchDict[ field ] )
+        if tqValues:
+          if field in self.__tagMatchFields:
+            if tqMatchDict[ field ] != 'Any' and not tqValues.issubset( resourceValues ):
+              return False
+          elif not tqValues.intersection( resourceValues ):
+            return False
+        if field in self.__bannedJobMatchFields:
+          bannedValues = tqDef[ "Banned%ss" % field ]
+          if not [ value for value in resourceValues if value not in bannedValues ]:
+            return False
+      elif field in self.__strictRequireMatchFields and field not in tqMatchDict and tqValues:
+        return False
+      bannedField = "Banned%s" % field
+      if bannedField in tqMatchDict and tqMatchDict[ bannedField ]:
+        if not [ value for value in self.__toList( tqMatchDict[ bannedField ] ) if value not in tqValues ]:
+          return False
+    if negativeCond and not self.__matchesNegativeCond( tqDef, negativeCond ):
+      return False
+    return True
+
+  def __matchTaskQueues( self, tqMatchDict, numQueuesToGet, negativeCond ):
+    jobSharingGroups = set()
+    if 'OwnerDN' in tqMatchDict and 'OwnerGroup' in tqMatchDict:
+      for group in self.__toList( tqMatchDict[ 'OwnerGroup' ] ):
+        if Properties.JOB_SHARING in CS.getPropertiesForGroup( group ):
+          jobSharingGroups.add( group )
+    self.__lock.acquire()
+    try:
+      #Unlike the DB, empty TQs can be skipped
+      tqList = [ tqId for tqId in self.__getCandidates( tqMatchDict ) if self.__tqJobs.get( tqId ) and \
+                 self.__matches( self.__tqDefs[ tqId ], tqMatchDict, jobSharingGroups, negativeCond ) ]
+      #Same ordering as the DB: ORDER BY RAND() / Priority
+      tqList = [ ( random.random() / max( self.__tqPriorities[ tqId ], TQ_MIN_SHARE ), tqId ) for tqId in tqList ]
+    finally:
+      self.__lock.release()
+    tqList.sort()
+    if numQueuesToGet:
+      tqList = tqList[ :numQueuesToGet ]
+    return [ tqId for _, tqId in tqList ]
+
+  def __pickJobs( self, tqId, numJobs, jobId = False ):
+    """ Choose the priority of the job to get with a probability proportional to the
+        real priority of the jobs and return the oldest jobs with that priority
+    """
+    self.__lock.acquire()
+    try:
+      buckets = self.__tqJobs.get( tqId )
+      if not buckets:
+        return []
+      if jobId:
+        if self.__jobLocation.get( jobId, ( False, ) )[0] == tqId:
+          return [ jobId ]
+        return []
+      weights = [ ( priority, len( buckets[ priority ] ) * self.__realPriorities[ priority ] ) for priority in buckets ]
+      rand = random.random() * sum( [ weight for _, weight in weights ] )
+      for priority, weight in weights:
+        rand -= weight
+        if rand <= 0:
+          break
+      jobList = heapq.nsmallest( numJobs, buckets[ priority ] )
+    finally:
+      self.__lock.release()
+    random.shuffle( jobList )
+    return jobList
+
+  def matchAndGetJob( self, tqMatchDict, numJobsPerTry = 50, numQueuesPerTry = 10, negativeCond = {} ):
+    """ Match a job. Same interface and return value as TaskQueueDB.matchAndGetJob
+    """
+    tqMatchDict = dict( tqMatchDict )
+    for legacyField in ( 'LHCbPlatform', 'SystemConfig' ):
+      if legacyField in tqMatchDict and not 'Platform' in tqMatchDict:
+        tqMatchDict[ 'Platform' ] = tqMatchDict[ legacyField ]
+    #The check escapes the values so do it on a copy. The index uses the values as they are in the DB
+    result = self.__tqDB._checkMatchDefinition( dict( tqMatchDict ) )
+    if not result[ 'OK' ]:
+      self.__log.error( "TQ match request check failed", result[ 'Message' ] )
+      return result
+    result = self.refresh()
+    if not result[ 'OK' ]:
+      return result
+    jobId = tqMatchDict.get( 'JobID', False )
+    for _ in range( self.__maxMatchRetry ):
+      if jobId:
+        tqList = self.__matchTaskQueues( tqMatchDict, 0, {} )
+      else:
+        tqList = self.__matchTaskQueues( tqMatchDict, numQueuesPerTry, negativeCond )
+      if not tqList:
+        self.__log.info( "No TQ matches requirements" )
+        return S_OK( { 'matchFound' : False, 'tqMatch' : tqMatchDict } )
+      for tqId in tqList:
+        for candidateId in self.__pickJobs( tqId, numJobsPerTry, jobId ):
+          result = self.__tqDB.extractJob( candidateId, tqId )
+          if not result[ 'OK' ]:
+            return result
+          self.__lock.acquire()
+          try:
+            self.__removeJob( candidateId )
+            if not result[ 'Value' ]:
+              #Somebody else took it. The index is out of date
+              self.__lastRefresh = 0
+          finally:
+            self.__lock.release()
+          if result[ 'Value' ]:
+            self.__log.info( "Extracted job %s from TQ %s" % ( candidateId, tqId ) )
+            return S_OK( { 'matchFound' : True, 'jobId' : candidateId, 'taskQueueId' : tqId, 'tqMatch' : tqMatchDict } )
+    self.__log.info( "Could not find a match after %s match retries" % self.__maxMatchRetry )
+    return S_ERROR( "Could not find a match after %s match retries" % self.__maxMatchRetry )
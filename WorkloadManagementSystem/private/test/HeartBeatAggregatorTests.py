@@ -0,0 +1,84 @@
+########################################################################
+# $HeadURL $
+# File: HeartBeatAggregatorTests.py
+########################################################################
+
+""" :mod: HeartBeatAggregatorTests
+    =======================
+
+    .. module: HeartBeatAggregatorTests
+    :synopsis: test cases for HeartBeatAggregator
+
+    test cases for the heart beat buffer of the JobStateUpdate service
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+from DIRAC import S_OK
+## SUT
+from DIRAC.WorkloadManagementSystem.private.HeartBeatAggregator import HeartBeatAggregator
+
+class FakeJobDB( object ):
+  """ JobDB look alike recording the calls """
+
+  def __init__( self ):
+    self.heartBeats = []
+    self.commands = { 1 : { 'Kill' : '' } }
+    self.sent = []
+
+  def setHeartBeatDataBulk( self, heartBeatList ):
+    self.heartBeats.append( list( heartBeatList ) )
+    return S_OK()
+
+  def getJobCommands( self ):
+    return S_OK( dict( [ ( jobID, dict( commands ) ) for jobID, commands in self.commands.items() ] ) )
+
+  def setJobCommandStatus( self, jobID, command, status ):
+    self.sent.append( ( jobID, command, status ) )
+    return S_OK()
+
+########################################################################
+class HeartBeatAggregatorTestCase( unittest.TestCase ):
+  """
+  .. class:: HeartBeatAggregatorTestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.jobDB = FakeJobDB()
+    self.aggregator = HeartBeatAggregator( self.jobDB, flushPeriod = 0, maxHeartBeats = 3 )
+
+  def testBuffer( self ):
+    """ heart beats are written together """
+    self.aggregator.addHeartBeat( 1, {}, { 'CPU' : 1 } )
+    self.aggregator.addHeartBeat( '2', { 'Node' : 'a' }, {} )
+    self.assertEqual( self.jobDB.heartBeats, [] )
+    self.assertTrue( self.aggregator.flush()['OK'] )
+    self.assertEqual( [ hb[:3] for hb in self.jobDB.heartBeats[0] ], [ ( 1, {}, { 'CPU' : 1 } ), ( 2, { 'Node' : 'a' }, {} ) ] )
+    self.aggregator.flush()
+    self.assertEqual( len( self.jobDB.heartBeats ), 1 )
+    #A full buffer is flushed
+    for jobID in range( 3 ):
+      self.aggregator.addHeartBeat( jobID, {}, {} )
+    self.assertEqual( len( self.jobDB.heartBeats[1] ), 3 )
+
+  def testCommands( self ):
+    """ commands are sent once """
+    self.assertEqual( self.aggregator.popJobCommands( 2 ), {} )
+    self.assertEqual( self.aggregator.popJobCommands( 1 ), { 'Kill' : '' } )
+    self.assertEqual( self.jobDB.sent, [ ( 1, 'Kill', 'Sent' ) ] )
+    #The DB may not be updated yet when the snapshot is taken
+    self.aggregator.refreshJobCommands()
+    self.assertEqual( self.aggregator.popJobCommands( 1 ), {} )
+    self.jobDB.commands = { 3 : { 'Kill' : '' } }
+    self.aggregator.refreshJobCommands()
+    self.assertEqual( self.aggregator.popJobCommands( 3 ), { 'Kill' : '' } )
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( HeartBeatAggregatorTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
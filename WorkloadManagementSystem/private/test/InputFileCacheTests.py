@@ -0,0 +1,111 @@
+########################################################################
+# $HeadURL $
+# File: InputFileCacheTests.py
+########################################################################
+
+""" :mod: InputFileCacheTests
+    =======================
+
+    .. module: InputFileCacheTests
+    :synopsis: test cases for InputFileCache
+
+    test cases for the node local cache of the JobWrapper input files
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import os
+import time
+import shutil
+import tempfile
+import unittest
+## SUT
+from DIRAC.WorkloadManagementSystem.private.InputFileCache import InputFileCache
+
+########################################################################
+class InputFileCacheTestCase( unittest.TestCase ):
+  """
+  .. class:: InputFileCacheTestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.testDir = tempfile.mkdtemp()
+    self.jobDir = os.path.join( self.testDir, 'job' )
+    os.mkdir( self.jobDir )
+    self.cache = InputFileCache( os.path.join( self.testDir, 'cache' ), 25 )
+    self.assertTrue( self.cache.initialize()['OK'] )
+
+  def tearDown( self ):
+    """ test tear down """
+    shutil.rmtree( self.testDir )
+
+  def storeFile( self, key, data ):
+    """ download look alike """
+    tmpDir = self.cache.getTempDir()['Value']
+    filePath = os.path.join( tmpDir, 'file' )
+    open( filePath, 'w' ).write( data )
+    result = self.cache.store( key, filePath )
+    self.cache.removeTempDir( tmpDir )
+    return result
+
+  def testLink( self ):
+    """ cached files are linked to the job directory """
+    self.assertEqual( self.cache.lookup( 'a' ), None )
+    self.assertFalse( self.cache.linkFile( 'a', os.path.join( self.jobDir, 'a' ) )['OK'] )
+    result = self.storeFile( 'a', '0123456789' )
+    self.assertTrue( result['OK'] )
+    self.assertEqual( self.cache.lookup( 'a' ), result['Value'] )
+    result = self.cache.linkFile( 'a', os.path.join( self.jobDir, 'a' ) )
+    self.assertTrue( result['OK'] )
+    self.assertEqual( open( result['Value'] ).read(), '0123456789' )
+    self.assertEqual( os.stat( result['Value'] ).st_ino, os.stat( self.cache.lookup( 'a' ) ).st_ino )
+    # A copy can be modified without changing the cache
+    result = self.cache.linkFile( 'a', os.path.join( self.jobDir, 'a' ), copy = True )
+    self.assertTrue( result['OK'] )
+    self.assertNotEqual( os.stat( result['Value'] ).st_ino, os.stat( self.cache.lookup( 'a' ) ).st_ino )
+    open( result['Value'], 'w' ).write( 'modified' )
+    self.assertEqual( open( self.cache.lookup( 'a' ) ).read(), '0123456789' )
+
+  def testErrors( self ):
+    """ cache errors are returned, not raised """
+    self.storeFile( 'a', '0123456789' )
+    locksDir = os.path.join( self.testDir, 'cache', 'locks' )
+    shutil.rmtree( locksDir )
+    open( locksDir, 'w' ).close()
+    self.assertFalse( self.cache.lock( [ 'a', 'b' ] )['OK'] )
+    # Nothing is left locked
+    os.unlink( locksDir )
+    os.mkdir( locksDir )
+    self.assertTrue( self.cache.lock( [ 'a', 'b' ] )['OK'] )
+    self.cache.unlock( [ 'a', 'b' ] )
+    shutil.rmtree( os.path.join( self.testDir, 'cache', 'tmp' ) )
+    self.assertFalse( self.cache.getTempDir()['OK'] )
+
+  def testEviction( self ):
+    """ least recently used files are removed first, unless locked """
+    self.storeFile( 'a', '0123456789' )
+    self.storeFile( 'b', '0123456789' )
+    # a is used after b
+    past = time.time() - 10
+    os.utime( self.cache.lookup( 'b' ), ( past, past ) )
+    self.cache.linkFile( 'a', os.path.join( self.jobDir, 'a' ) )
+    self.storeFile( 'c', '0123456789' )
+    self.assertEqual( self.cache.lookup( 'b' ), None )
+    self.assertNotEqual( self.cache.lookup( 'a' ), None )
+    # The job copy is not affected
+    self.assertEqual( open( os.path.join( self.jobDir, 'a' ) ).read(), '0123456789' )
+    os.utime( self.cache.lookup( 'a' ), ( past, past ) )
+    self.assertTrue( self.cache.lock( [ 'a' ] )['OK'] )
+    self.storeFile( 'd', '0123456789' )
+    self.cache.unlock( [ 'a' ] )
+    self.assertNotEqual( self.cache.lookup( 'a' ), None )
+    self.assertEqual( self.cache.lookup( 'c' ), None )
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( InputFileCacheTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
@@ -0,0 +1,141 @@
+########################################################################
+# $HeadURL $
+# File: TaskQueueIndexTests.py
+########################################################################
+
+""" :mod: TaskQueueIndexTests
+    =======================
+
+    .. module: TaskQueueIndexTests
+    :synopsis: test cases for TaskQueueIndex
+
+    test cases for the in memory task queue index used by the Matcher
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+from DIRAC import S_OK
+## SUT
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
+
+class FakeTaskQueueDB( object ):
+  """ TaskQueueDB look alike keeping the TQs in dicts """
+
+  def __init__( self ):
+    self.tqs = {}
+    self.jobs = {}
+    self.listeners = []
+
+  def getSingleValueTQDefFields( self ):
+    return ( 'OwnerDN', 'OwnerGroup', 'Setup', 'CPUTime' )
+
+  def getMultiValueTQDefFields( self ):
+    return ( 'Sites', 'GridCEs', 'GridMiddlewares', 'BannedSites',
+             'Platforms', 'PilotTypes', 'SubmitPools', 'JobTypes', 'Tags' )
+
+  def getMultiValueMatchFields( self ):
+    return ( 'GridCE', 'Site', 'GridMiddleware', 'Platform',
+             'PilotType', 'SubmitPool', 'JobType', 'Tag' )
+
+  def addChangeListener( self, listener ):
+    self.listeners.append( listener )
+
+  def _checkMatchDefinition( self, tqMatchDict ):
+    return S_OK( tqMatchDict )
+
+  def addTQ( self, tqId, **tqDef ):
+    tqDef.setdefault( 'OwnerDN', '/DN/user' )
+    tqDef.setdefault( 'OwnerGroup', 'user' )
+    tqDef.setdefault( 'Setup', 'Test' )
+    tqDef.setdefault( 'CPUTime', 1000 )
+    tqDef.setdefault( 'Priority', 1.0 )
+    self.tqs[ tqId ] = tqDef
+
+  def getTaskQueuePriorities( self ):
+    return S_OK( dict( [ ( tqId, self.tqs[ tqId ][ 'Priority' ] ) for tqId in self.tqs ] ) )
+
+  def getTaskQueueDefinitions( self, tqIdList ):
+    return S_OK( dict( [ ( tqId, dict( self.tqs[ tqId ] ) ) for tqId in tqIdList ] ) )
+
+  def getTaskQueueJobsSummary( self ):
+    summary = {}
+    for jobId, ( tqId, priority ) in self.jobs.items():
+      numJobs, maxJobId, sumPriority = summary.get( tqId, ( 0, 0, 0 ) )
+      summary[ tqId ] = ( numJobs + 1, max( maxJobId, jobId ), sumPriority + priority )
+    return S_OK( summary )
+
+  def getJobsInTaskQueues( self, tqIdList ):
+    return S_OK( [ ( jobId, tqId, priority, float( priority ) ) for jobId, ( tqId, priority ) in self.jobs.items() \
+                   if tqId in tqIdList ] )
+
+  def extractJob( self, jobId, tqId ):
+    if self.jobs.get( jobId, ( None, ) )[0] != tqId:
+      return S_OK( False )
+    del( self.jobs[ jobId ] )
+    for listener in self.listeners:
+      listener( 'jobDeleted', jobId )
+    return S_OK( True )
+
+########################################################################
+class TaskQueueIndexTestCase( unittest.TestCase ):
+  """
+  .. class:: TaskQueueIndexTestCase
+
+  """
+
+  def setUp( self ):
+    """ test setup """
+    self.tqDB = FakeTaskQueueDB()
+    self.tqDB.addTQ( 1, Sites = [ 'Site.A' ], Platforms = [ 'x86_64' ] )
+    self.tqDB.addTQ( 2, BannedSites = [ 'Site.A' ], CPUTime = 100000 )
+    self.tqDB.addTQ( 3, Tags = [ 'MultiCore' ], OwnerGroup = 'prod', OwnerDN = '/DN/prod' )
+    self.tqDB.jobs = { 10 : ( 1, 1 ), 11 : ( 1, 1 ), 20 : ( 2, 1 ), 30 : ( 3, 1 ) }
+    self.index = TaskQueueIndex( self.tqDB, refreshPeriod = 1000 )
+    self.resource = { 'Setup' : 'Test', 'CPUTime' : 5000, 'Site' : 'Site.A', 'Platform' : 'x86_64',
+                      'OwnerDN' : '/DN/user', 'OwnerGroup' : 'user' }
+
+  def getJob( self, resourceDict, negativeCond = {} ):
+    """ match and return the job id or None """
+    result = self.index.matchAndGetJob( resourceDict, negativeCond = negativeCond )
+    self.assertTrue( result[ 'OK' ] )
+    if not result[ 'Value' ][ 'matchFound' ]:
+      return None
+    return result[ 'Value' ][ 'jobId' ]
+
+  def testMatch( self ):
+    """ site, platform, banning and CPU time """
+    self.assertTrue( self.getJob( self.resource ) in ( 10, 11 ) )
+    resource = dict( self.resource, Site = 'Site.B', CPUTime = 200000 )
+    self.assertEqual( self.getJob( resource ), 20 )
+    resource = dict( self.resource, Site = 'Site.B' )
+    self.assertEqual( self.getJob( resource ), None )
+
+  def testStrictAndTags( self ):
+    """ TQs requiring tags need a resource providing them """
+    resource = dict( self.resource, OwnerDN = '/DN/prod', OwnerGroup = 'prod' )
+    self.assertEqual( self.getJob( resource ), None )
+    resource[ 'Tag' ] = [ 'MultiCore', 'GPU' ]
+    self.assertEqual( self.getJob( resource ), 30 )
+
+  def testNegativeCond( self ):
+    """ negative conditions exclude the TQs """
+    self.assertEqual( self.getJob( self.resource, negativeCond = { 'Site' : [ 'Site.A' ] } ), None )
+
+  def testExtraction( self ):
+    """ jobs are taken out and stale jobs are skipped """
+    del( self.tqDB.jobs[ 10 ] )
+    self.index.refresh( force = True )
+    self.tqDB.jobs[ 12 ] = ( 1, 1 )
+    self.assertEqual( self.getJob( self.resource ), 11 )
+    self.assertEqual( self.getJob( self.resource ), None )
+    self.index.refresh( force = True )
+    self.assertEqual( self.getJob( self.resource ), 12 )
+    self.assertEqual( self.getJob( dict( self.resource, JobID = 20 ) ), None )
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( TaskQueueIndexTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )